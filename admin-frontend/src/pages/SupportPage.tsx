@@ -58,6 +58,10 @@ interface Message {
 function SupportPage() {
   const [loading, setLoading] = useState(true);
   const [conversations, setConversations] = useState<Conversation[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Set once older pages are loaded, so polling keeps them
+  const pagedRef = useRef(false);
   const [selectedUserId, setSelectedUserId] = useState<number | null>(null);
   const [messages, setMessages] = useState<Message[]>([]);
   const [messagesLoading, setMessagesLoading] = useState(false);
@@ -89,7 +93,17 @@ function SupportPage() {
   const fetchConversations = async () => {
     try {
       const response = await supportApi.getConversations();
-      setConversations(response.data.conversations);
+      const firstPage: Conversation[] = response.data.conversations;
+      if (pagedRef.current) {
+        // Refresh the first page, keep the older pages already loaded
+        setConversations(prev => {
+          const fresh = new Set(firstPage.map(c => c.user_id));
+          return [...firstPage, ...prev.filter(c => !fresh.has(c.user_id))];
+        });
+      } else {
+        setConversations(firstPage);
+        setNextCursor(response.data.next_cursor);
+      }
     } catch (error) {
       console.error('Failed to fetch conversations:', error);
     } finally {
@@ -97,6 +111,27 @@ function SupportPage() {
     }
   };
 
+  const loadMoreConversations = async () => {
+    if (!nextCursor) return;
+
+    setLoadingMore(true);
+    try {
+      const response = await supportApi.getConversations({ cursor: nextCursor });
+      const page: Conversation[] = response.data.conversations;
+      pagedRef.current = true;
+      setConversations(prev => {
+        const loaded = new Set(prev.map(c => c.user_id));
+        return [...prev, ...page.filter(c => !loaded.has(c.user_id))];
+      });
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Failed to load more conversations:', error);
+      message.error('Failed to load conversations');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchMessages = async (userId: number) => {
     setMessagesLoading(true);
     try {
@@ -185,6 +220,13 @@ function SupportPage() {
           ) : (
             <List
               dataSource={conversations}
+              loadMore={nextCursor ? (
+                <div style={{ textAlign: 'center', padding: '12px 0' }}>
+                  <Button onClick={loadMoreConversations} loading={loadingMore}>
+                    Load more
+                  </Button>
+                </div>
+              ) : null}
               renderItem={(conv) => (
                 <List.Item
                   onClick={() => setSelectedUserId(conv.user_id)}
@@ -118,6 +118,9 @@ export const statsApi = {
     api.get('/stats/api-usage/alerts', { params: { daily_budget_usd: dailyBudget, monthly_budget_usd: monthlyBudget } }),
   apiUsageByUser: (userId: number, days?: number) =>
     api.get(`/stats/api-usage/user/${userId}`, { params: { days } }),
+  providers: () => api.get('/stats/providers'),
+  llmCache: () => api.get('/stats/llm-cache'),
+  blocking: (limit?: number) => api.get('/stats/blocking', { params: { limit } }),
   // Subscriptions
   subscriptionsMonthly: (year?: number, month?: number) =>
     api.get('/stats/subscriptions/monthly', { params: { year, month } }),
@@ -141,7 +144,8 @@ export const settingsApi = {
 };
 
 export const supportApi = {
-  getConversations: () => api.get('/support/conversations'),
+  getConversations: (params?: { limit?: number; cursor?: string }) =>
+    api.get('/support/conversations', { params }),
   getConversation: (userId: number) => api.get(`/support/conversation/${userId}`),
   sendMessage: (userId: number, message: string) => 
     api.post('/support/send', { user_id: userId, message }),
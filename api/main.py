@@ -3,12 +3,16 @@ FastAPI Admin Panel Backend.
 Provides REST API for bot administration.
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from api.routers import auth, users, stats, settings as settings_router, tasks, support
-from database import init_db, close_db
+from database import init_db, close_db, engine
 from database.redis_client import redis_client
+from bot.services.telemetry_service import telemetry_sink
+from bot.services.loop_monitor import loop_monitor
+from bot.utils.metrics import instrument_engine, metrics_exporter
 from config import settings
 import structlog
 
@@ -22,6 +26,10 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Admin API...")
     await init_db()
     await redis_client.connect()
+    telemetry_sink.start()
+    instrument_engine(engine)
+    metrics_exporter.start()  # served by GET /metrics below
+    loop_monitor.start("api")
     
     # Create default admin if needed
     from api.services.admin_service import admin_service
@@ -33,6 +41,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Admin API...")
+    await telemetry_sink.stop()
+    await metrics_exporter.stop()
+    await loop_monitor.stop()
     await redis_client.close()
     await close_db()
     logger.info("Admin API shutdown complete")
@@ -73,6 +84,12 @@ def create_app() -> FastAPI:
         """Health check endpoint."""
         return {"status": "healthy"}
     
+    if settings.metrics_enabled:
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            """Prometheus scrape endpoint."""
+            return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    
     return app
 
 
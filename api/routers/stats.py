@@ -15,9 +15,19 @@ from api.schemas.stats import (
     CostAlert, ProviderStats, ModelStats, DailyUsageData
 )
 from api.services.auth_service import get_current_admin
+from api.services.response_cache import response_cache, NS_DASHBOARD, NS_API_USAGE
 from database import async_session_maker
-from database.models import User, Request, RequestType, VideoTask, VideoTaskStatus, Admin, APIUsageLog, Subscription
+from database.models import (
+    User, Request, RequestType, VideoTask, VideoTaskStatus, Admin, APIUsageLog, Subscription,
+    RequestRollupHourly, UserUsageTotal
+)
+from bot.services.rollup_service import rollup_service, day_bounds
 from bot.services.usage_tracking_service import usage_tracking_service
+from bot.services.ai_service import ai_service
+from bot.services.provider_router import provider_router
+from bot.services.llm_cache import llm_cache
+from bot.services.loop_monitor import loop_monitor
+from bot.middlewares.lanes import collect_lane_stats
 import structlog
 
 logger = structlog.get_logger()
@@ -25,36 +35,36 @@ router = APIRouter()
 
 
 @router.get("/dashboard", response_model=DashboardStats)
+@response_cache.cached(NS_DASHBOARD)
 async def get_dashboard_stats(
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
     Get dashboard statistics.
+    Request counts and costs come from the hourly rollups (UTC days,
+    up to about a minute behind the raw log).
     """
     async with async_session_maker() as session:
-        today = date.today()
         now = datetime.utcnow()
+        today = now.date()
+        today_start, _ = day_bounds(today, today)
         
-        # Active users today
-        active_today_result = await session.execute(
-            select(func.count(func.distinct(Request.user_id)))
-            .where(cast(Request.created_at, Date) == today)
-        )
-        active_users_today = active_today_result.scalar() or 0
-        
-        # Total requests today
-        requests_today_result = await session.execute(
-            select(func.count(Request.id))
-            .where(cast(Request.created_at, Date) == today)
+        # Today's totals by type (also feeds the per-type chart)
+        today_result = await session.execute(
+            select(
+                RequestRollupHourly.request_type,
+                func.sum(RequestRollupHourly.requests).label('requests'),
+                func.sum(RequestRollupHourly.cost_usd).label('cost')
+            )
+            .where(RequestRollupHourly.bucket >= today_start)
+            .group_by(RequestRollupHourly.request_type)
         )
-        total_requests_today = requests_today_result.scalar() or 0
+        today_by_type = {row.request_type: row for row in today_result}
+        total_requests_today = sum(int(r.requests) for r in today_by_type.values())
+        total_cost_today = sum(float(r.cost) for r in today_by_type.values())
         
-        # Total cost today
-        cost_today_result = await session.execute(
-            select(func.coalesce(func.sum(Request.cost_usd), 0))
-            .where(cast(Request.created_at, Date) == today)
-        )
-        total_cost_today = float(cost_today_result.scalar() or 0)
+        # Active users today
+        active_users_today = await rollup_service.unique_users(today, today, session=session)
         
         # Queue size (pending video tasks)
         queue_result = await session.execute(
@@ -72,69 +82,66 @@ async def get_dashboard_stats(
         )
         total_users = total_users_result.scalar() or 0
         
-        # Total requests
-        total_requests_result = await session.execute(
-            select(func.count(Request.id))
+        # Total requests and cost
+        totals_result = await session.execute(
+            select(
+                func.coalesce(func.sum(RequestRollupHourly.requests), 0),
+                func.coalesce(func.sum(RequestRollupHourly.cost_usd), 0)
+            )
         )
-        total_requests = total_requests_result.scalar() or 0
+        total_requests, total_cost = totals_result.one()
+        total_requests = int(total_requests)
+        total_cost = float(total_cost)
         
-        # Total cost
-        total_cost_result = await session.execute(
-            select(func.coalesce(func.sum(Request.cost_usd), 0))
+        # Hourly activity (last 24 hours, current hour last)
+        current_hour = now.replace(minute=0, second=0, microsecond=0)
+        first_hour = current_hour - timedelta(hours=23)
+        hourly_result = await session.execute(
+            select(
+                RequestRollupHourly.bucket,
+                func.sum(RequestRollupHourly.requests).label('requests')
+            )
+            .where(RequestRollupHourly.bucket >= first_hour)
+            .group_by(RequestRollupHourly.bucket)
         )
-        total_cost = float(total_cost_result.scalar() or 0)
+        hourly_counts = {row.bucket: int(row.requests) for row in hourly_result}
         
-        # Hourly activity (last 24 hours)
         hourly_activity = []
         for i in range(24):
-            hour_start = now - timedelta(hours=24-i)
-            hour_end = now - timedelta(hours=23-i)
-            
-            count_result = await session.execute(
-                select(func.count(Request.id))
-                .where(and_(
-                    Request.created_at >= hour_start,
-                    Request.created_at < hour_end
-                ))
-            )
-            count = count_result.scalar() or 0
-            
+            hour_start = first_hour + timedelta(hours=i)
             hourly_activity.append(ChartData(
                 label=hour_start.strftime("%H:00"),
-                value=float(count)
+                value=float(hourly_counts.get(hour_start, 0))
             ))
         
         # Requests by type (today)
-        requests_by_type = []
-        for req_type in RequestType:
-            count_result = await session.execute(
-                select(func.count(Request.id))
-                .where(and_(
-                    Request.type == req_type,
-                    cast(Request.created_at, Date) == today
-                ))
-            )
-            count = count_result.scalar() or 0
-            
-            requests_by_type.append(ChartData(
+        requests_by_type = [
+            ChartData(
                 label=req_type.value.capitalize(),
-                value=float(count)
-            ))
+                value=float(today_by_type[req_type].requests) if req_type in today_by_type else 0.0
+            )
+            for req_type in RequestType
+        ]
         
         # Daily costs (last 30 days)
+        first_day = today - timedelta(days=29)
+        day_bucket = cast(RequestRollupHourly.bucket, Date)
+        daily_result = await session.execute(
+            select(
+                day_bucket.label('day'),
+                func.sum(RequestRollupHourly.cost_usd).label('cost')
+            )
+            .where(RequestRollupHourly.bucket >= day_bounds(first_day, today)[0])
+            .group_by(day_bucket)
+        )
+        costs_by_day = {row.day: float(row.cost) for row in daily_result}
+        
         daily_costs = []
         for i in range(30):
-            day = today - timedelta(days=29-i)
-            
-            cost_result = await session.execute(
-                select(func.coalesce(func.sum(Request.cost_usd), 0))
-                .where(cast(Request.created_at, Date) == day)
-            )
-            cost = float(cost_result.scalar() or 0)
-            
+            day = first_day + timedelta(days=i)
             daily_costs.append(ChartData(
                 label=day.strftime("%m/%d"),
-                value=cost
+                value=costs_by_day.get(day, 0.0)
             ))
         
         # Top 10 users
@@ -143,12 +150,11 @@ async def get_dashboard_stats(
                 User.telegram_id,
                 User.username,
                 User.first_name,
-                func.count(Request.id).label('total_requests'),
-                func.coalesce(func.sum(Request.cost_usd), 0).label('total_cost')
+                UserUsageTotal.requests.label('total_requests'),
+                UserUsageTotal.cost_usd.label('total_cost')
             )
-            .join(Request, Request.user_id == User.id)
-            .group_by(User.id)
-            .order_by(func.count(Request.id).desc())
+            .join(User, User.id == UserUsageTotal.user_id)
+            .order_by(UserUsageTotal.requests.desc())
             .limit(10)
         )
         
@@ -179,54 +185,59 @@ async def get_dashboard_stats(
 
 
 @router.get("/daily", response_model=StatsResponse)
+@response_cache.cached(NS_DASHBOARD)
 async def get_daily_stats(
     start_date: date = Query(default=None),
     end_date: date = Query(default=None),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
-    Get daily statistics for a date range.
-    Defaults to last 30 days.
+    Get daily statistics for a date range (UTC days).
+    Defaults to last 30 days. Unique user counts are HyperLogLog
+    estimates (about 2% error).
     """
     if not end_date:
-        end_date = date.today()
+        end_date = datetime.utcnow().date()
     if not start_date:
         start_date = end_date - timedelta(days=30)
     
     async with async_session_maker() as session:
+        range_start, range_end = day_bounds(start_date, end_date)
+        day_bucket = cast(RequestRollupHourly.bucket, Date)
+        
+        result = await session.execute(
+            select(
+                day_bucket.label('day'),
+                RequestRollupHourly.request_type,
+                func.sum(RequestRollupHourly.requests).label('count'),
+                func.sum(RequestRollupHourly.cost_usd).label('cost')
+            )
+            .where(and_(
+                RequestRollupHourly.bucket >= range_start,
+                RequestRollupHourly.bucket < range_end
+            ))
+            .group_by(day_bucket, RequestRollupHourly.request_type)
+        )
+        rows_by_day = {}
+        for row in result:
+            rows_by_day.setdefault(row.day, []).append(row)
+        
+        users_by_day = await rollup_service.unique_users_by_day(start_date, end_date, session)
+        
         daily_stats = []
         total_requests = 0
         total_cost = 0.0
-        unique_users = set()
         
         current_date = start_date
         while current_date <= end_date:
-            # Get stats for this day
-            requests_result = await session.execute(
-                select(
-                    Request.type,
-                    func.count(Request.id).label('count'),
-                    func.coalesce(func.sum(Request.cost_usd), 0).label('cost')
-                )
-                .where(cast(Request.created_at, Date) == current_date)
-                .group_by(Request.type)
-            )
-            
-            day_requests = list(requests_result)
-            day_total = sum(r.count for r in day_requests)
+            day_requests = rows_by_day.get(current_date, [])
+            day_total = sum(int(r.count) for r in day_requests)
             day_cost = sum(float(r.cost) for r in day_requests)
             
-            # Unique users
-            users_result = await session.execute(
-                select(func.count(func.distinct(Request.user_id)))
-                .where(cast(Request.created_at, Date) == current_date)
-            )
-            day_unique_users = users_result.scalar() or 0
-            
             requests_by_type = [
                 RequestStatsItem(
-                    type=r.type.value,
-                    count=r.count,
+                    type=r.request_type.value,
+                    count=int(r.count),
                     cost_usd=float(r.cost)
                 )
                 for r in day_requests
@@ -235,7 +246,7 @@ async def get_daily_stats(
             daily_stats.append(DailyStats(
                 date=current_date,
                 total_requests=day_total,
-                unique_users=day_unique_users,
+                unique_users=users_by_day.get(current_date, 0),
                 total_cost_usd=day_cost,
                 requests_by_type=requests_by_type
             ))
@@ -245,15 +256,8 @@ async def get_daily_stats(
             
             current_date += timedelta(days=1)
         
-        # Get overall unique users
-        overall_users_result = await session.execute(
-            select(func.count(func.distinct(Request.user_id)))
-            .where(and_(
-                cast(Request.created_at, Date) >= start_date,
-                cast(Request.created_at, Date) <= end_date
-            ))
-        )
-        overall_unique_users = overall_users_result.scalar() or 0
+        # Overall unique users (merged daily sketches)
+        overall_unique_users = await rollup_service.unique_users(start_date, end_date, session=session)
         
         return StatsResponse(
             period_start=start_date,
@@ -299,6 +303,7 @@ async def get_recent_requests(
 
 
 @router.get("/costs", response_model=CostAnalysis)
+@response_cache.cached(NS_DASHBOARD)
 async def get_cost_analysis(
     days: int = Query(30, ge=1, le=365),
     current_admin: Admin = Depends(get_current_admin)
@@ -307,45 +312,31 @@ async def get_cost_analysis(
     Get cost analysis for the specified period.
     """
     async with async_session_maker() as session:
-        start_date = date.today() - timedelta(days=days)
-        
-        # Total cost
-        total_result = await session.execute(
-            select(func.coalesce(func.sum(Request.cost_usd), 0))
-            .where(cast(Request.created_at, Date) >= start_date)
-        )
-        total_cost = float(total_result.scalar() or 0)
+        start_date = datetime.utcnow().date() - timedelta(days=days)
+        range_start, _ = day_bounds(start_date, start_date)
+        in_period = RequestRollupHourly.bucket >= range_start
         
-        # Cost by model
-        model_result = await session.execute(
+        # Cost by model and type in one pass over the rollups
+        result = await session.execute(
             select(
-                Request.model,
-                func.coalesce(func.sum(Request.cost_usd), 0).label('cost')
+                RequestRollupHourly.model,
+                RequestRollupHourly.request_type,
+                func.sum(RequestRollupHourly.cost_usd).label('cost')
             )
-            .where(and_(
-                cast(Request.created_at, Date) >= start_date,
-                Request.model.isnot(None)
-            ))
-            .group_by(Request.model)
+            .where(in_period)
+            .group_by(RequestRollupHourly.model, RequestRollupHourly.request_type)
         )
-        cost_by_model = {
-            row.model: float(row.cost)
-            for row in model_result
-        }
         
-        # Cost by type
-        type_result = await session.execute(
-            select(
-                Request.type,
-                func.coalesce(func.sum(Request.cost_usd), 0).label('cost')
-            )
-            .where(cast(Request.created_at, Date) >= start_date)
-            .group_by(Request.type)
-        )
-        cost_by_type = {
-            row.type.value: float(row.cost)
-            for row in type_result
-        }
+        total_cost = 0.0
+        cost_by_model = {}
+        cost_by_type = {}
+        for row in result:
+            cost = float(row.cost)
+            total_cost += cost
+            if row.model:
+                cost_by_model[row.model] = cost_by_model.get(row.model, 0.0) + cost
+            type_key = row.request_type.value
+            cost_by_type[type_key] = cost_by_type.get(type_key, 0.0) + cost
         
         # Daily average
         daily_average = total_cost / days if days > 0 else 0
@@ -363,6 +354,7 @@ async def get_cost_analysis(
 
 
 @router.get("/api-usage", response_model=APIUsageOverview)
+@response_cache.cached(NS_API_USAGE)
 async def get_api_usage_overview(
     daily_budget_usd: float = Query(10.0, description="Daily budget in USD"),
     monthly_budget_usd: float = Query(200.0, description="Monthly budget in USD"),
@@ -422,6 +414,7 @@ async def get_api_usage_overview(
 
 
 @router.get("/api-usage/daily")
+@response_cache.cached(NS_API_USAGE)
 async def get_api_usage_daily(
     target_date: date = Query(default=None, description="Date to get stats for (default: today)"),
     current_admin: Admin = Depends(get_current_admin)
@@ -433,6 +426,7 @@ async def get_api_usage_daily(
 
 
 @router.get("/api-usage/monthly")
+@response_cache.cached(NS_API_USAGE)
 async def get_api_usage_monthly(
     year: int = Query(default=None, description="Year (default: current)"),
     month: int = Query(default=None, ge=1, le=12, description="Month (default: current)"),
@@ -445,6 +439,7 @@ async def get_api_usage_monthly(
 
 
 @router.get("/api-usage/alerts")
+@response_cache.cached(NS_API_USAGE)
 async def get_api_usage_alerts(
     daily_budget_usd: float = Query(10.0, description="Daily budget in USD"),
     monthly_budget_usd: float = Query(200.0, description="Monthly budget in USD"),
@@ -459,6 +454,59 @@ async def get_api_usage_alerts(
     )
 
 
+@router.get("/providers")
+async def get_provider_status(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Get AI provider configuration and live health.
+    Health (breaker state, error rate, p50/p95 latency per capability) is
+    published by each bot and worker process; one entry per process.
+    """
+    return {
+        "providers": ai_service.get_provider_status(),
+        "processes": await provider_router.collect_status(),
+    }
+
+
+@router.get("/llm-cache")
+async def get_llm_cache_stats(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Get response cache stats per route: hits, near hits, misses, hit rate,
+    entries and the provider cost the hits saved.
+    """
+    return await llm_cache.get_stats()
+
+
+@router.get("/blocking")
+async def get_blocking_sites(
+    limit: int = Query(20, ge=1, le=100),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Get the call sites that blocked the event loop longest (total time),
+    merged across bot, worker and API processes with loop_monitor_enabled.
+    Each site carries its count, total/max blocked ms and the stack of
+    its longest block.
+    """
+    return await loop_monitor.collect_sites(limit)
+
+
+@router.get("/lanes")
+async def get_lane_stats(
+    top: int = Query(10, ge=1, le=100),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Get per-chat update lane stats merged across bot processes: totals
+    (lanes, waiting, running, processed, shed) and the busiest lanes with
+    their queue depth, shed count and longest wait.
+    """
+    return await collect_lane_stats(top)
+
+
 @router.get("/api-usage/user/{user_id}")
 async def get_api_usage_by_user(
     user_id: int,
@@ -2,15 +2,17 @@
 Support router.
 Handles tech support messaging between admins and users.
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from pydantic import BaseModel
 
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, tuple_
 from sqlalchemy.orm import selectinload
 
 from api.services.auth_service import get_current_admin, require_role
+from api.services.response_cache import response_cache, NS_SUPPORT
+from api.services.pagination import decode_cursor, next_cursor
 from database import async_session_maker
 from database.models import SupportMessage, User, Admin
 from config import settings
@@ -57,6 +59,7 @@ class SupportConversationsResponse(BaseModel):
     """List of support conversations."""
     conversations: List[SupportConversation]
     total_unread: int
+    next_cursor: Optional[str] = None
 
 
 class SendMessageRequest(BaseModel):
@@ -77,83 +80,96 @@ class SendMessageResponse(BaseModel):
 # ============================================
 
 @router.get("/conversations", response_model=SupportConversationsResponse)
+@response_cache.cached(NS_SUPPORT)
 async def get_support_conversations(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
-    Get all support conversations grouped by user.
-    Returns list of users with their last message and unread count.
+    Get support conversations grouped by user, most recent first.
+    Returns users with their last message and unread count.
+    Paginated by cursor: pass ``next_cursor`` back to get the next page.
     """
+    after = decode_cursor(cursor, 2)
+    
     async with async_session_maker() as session:
-        # Get all users who have support messages
-        # Subquery for last message per user
-        from sqlalchemy import desc
+        # Last message and unread count per user in one pass (window functions)
+        is_unread = and_(SupportMessage.is_from_user == True, SupportMessage.is_read == False)
+        per_user = (
+            select(
+                SupportMessage.user_id,
+                SupportMessage.message,
+                SupportMessage.created_at,
+                func.row_number().over(
+                    partition_by=SupportMessage.user_id,
+                    order_by=(SupportMessage.created_at.desc(), SupportMessage.id.desc())
+                ).label("rn"),
+                func.count(SupportMessage.id).filter(is_unread).over(
+                    partition_by=SupportMessage.user_id
+                ).label("unread_count")
+            )
+            .subquery()
+        )
         
-        result = await session.execute(
+        query = (
             select(
                 User.id,
                 User.telegram_id,
                 User.username,
                 User.first_name,
                 User.subscription_type,
-                User.subscription_expires_at
+                User.subscription_expires_at,
+                per_user.c.message,
+                per_user.c.created_at,
+                per_user.c.unread_count
             )
-            .join(SupportMessage, SupportMessage.user_id == User.id)
-            .group_by(User.id)
-            .order_by(desc(func.max(SupportMessage.created_at)))
+            .join(per_user, per_user.c.user_id == User.id)
+            .where(per_user.c.rn == 1)
         )
+        if after:
+            last_at, last_user_id = after
+            query = query.where(
+                tuple_(per_user.c.created_at, User.id) < tuple_(last_at, last_user_id)
+            )
         
-        users = list(result)
+        result = await session.execute(
+            query
+            .order_by(per_user.c.created_at.desc(), User.id.desc())
+            .limit(limit + 1)
+        )
+        rows = result.all()
         
-        conversations = []
-        total_unread = 0
+        total_unread_result = await session.execute(
+            select(func.count(SupportMessage.id)).where(is_unread)
+        )
+        total_unread = total_unread_result.scalar() or 0
         
-        for user_row in users:
-            user_id = user_row.id
-            
-            # Get last message for this user
-            last_msg_result = await session.execute(
-                select(SupportMessage)
-                .where(SupportMessage.user_id == user_id)
-                .order_by(desc(SupportMessage.created_at))
-                .limit(1)
-            )
-            last_msg = last_msg_result.scalar_one_or_none()
-            
-            # Get unread count
-            unread_result = await session.execute(
-                select(func.count(SupportMessage.id))
-                .where(and_(
-                    SupportMessage.user_id == user_id,
-                    SupportMessage.is_from_user == True,
-                    SupportMessage.is_read == False
-                ))
+        now = datetime.now(timezone.utc)
+        conversations = []
+        for row in rows[:limit]:
+            has_subscription = bool(
+                row.subscription_type
+                and row.subscription_type.value == "premium"
+                and row.subscription_expires_at
+                and row.subscription_expires_at > now
             )
-            unread_count = unread_result.scalar() or 0
-            total_unread += unread_count
             
-            # Check subscription status
-            has_subscription = False
-            if user_row.subscription_type and user_row.subscription_type.value == "premium":
-                if user_row.subscription_expires_at:
-                    from datetime import timezone
-                    has_subscription = user_row.subscription_expires_at > datetime.now(timezone.utc)
-            
-            if last_msg:
-                conversations.append(SupportConversation(
-                    user_id=user_id,
-                    user_telegram_id=user_row.telegram_id,
-                    username=user_row.username,
-                    first_name=user_row.first_name,
-                    last_message=last_msg.message[:100] + ("..." if len(last_msg.message) > 100 else ""),
-                    last_message_at=last_msg.created_at,
-                    unread_count=unread_count,
-                    has_subscription=has_subscription
-                ))
+            conversations.append(SupportConversation(
+                user_id=row.id,
+                user_telegram_id=row.telegram_id,
+                username=row.username,
+                first_name=row.first_name,
+                last_message=row.message[:100] + ("..." if len(row.message) > 100 else ""),
+                last_message_at=row.created_at,
+                unread_count=row.unread_count,
+                has_subscription=has_subscription
+            ))
         
         return SupportConversationsResponse(
             conversations=conversations,
-            total_unread=total_unread
+            total_unread=total_unread,
+            next_cursor=next_cursor(rows, limit, "created_at", "id")
         )
 
 
@@ -216,6 +232,7 @@ async def get_conversation_messages(
             .values(is_read=True)
         )
         await session.commit()
+        await response_cache.invalidate(NS_SUPPORT)
         
         # Return in chronological order
         messages.reverse()
@@ -257,6 +274,7 @@ async def send_message_to_user(
         session.add(support_msg)
         await session.commit()
         await session.refresh(support_msg)
+        await response_cache.invalidate(NS_SUPPORT)
         
         # Try to send via Telegram
         sent_to_telegram = False
@@ -303,6 +321,7 @@ async def send_message_to_user(
 
 
 @router.get("/unread-count")
+@response_cache.cached(NS_SUPPORT)
 async def get_unread_count(
     current_admin: Admin = Depends(get_current_admin)
 ):
@@ -9,6 +9,8 @@ from sqlalchemy import select, func, and_
 from sqlalchemy.orm import joinedload
 
 from api.services.auth_service import get_current_admin, require_role
+from api.services.response_cache import response_cache, NS_TASKS, NS_DASHBOARD
+from api.services.count_service import count_service
 from database import async_session_maker
 from database.models import VideoTask, VideoTaskStatus, User, Admin
 from datetime import datetime
@@ -40,6 +42,7 @@ class TaskListResponse(BaseModel):
     """Task list response."""
     tasks: List[TaskResponse]
     total: int
+    total_is_estimate: bool = False
 
 
 class QueueStats(BaseModel):
@@ -53,6 +56,7 @@ class QueueStats(BaseModel):
 
 
 @router.get("/queue/stats", response_model=QueueStats)
+@response_cache.cached(NS_TASKS)
 async def get_queue_stats(
     current_admin: Admin = Depends(get_current_admin)
 ):
@@ -144,6 +148,7 @@ async def get_queue_stats(
 async def get_queue_tasks(
     status_filter: Optional[str] = Query(None, pattern="^(queued|in_progress|completed|failed)$"),
     limit: int = Query(50, ge=1, le=200),
+    exact: bool = Query(False, description="Exact total instead of a cached count"),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """Get tasks in queue."""
@@ -172,9 +177,15 @@ async def get_queue_tasks(
             VideoTask.created_at.asc()
         ).limit(limit)
         
-        # Get total count
-        total_result = await session.execute(count_query)
-        total = total_result.scalar() or 0
+        # Get total count (cached briefly; the queue changes constantly)
+        total, total_is_estimate = await count_service.count(
+            session,
+            count_query,
+            table="video_tasks",
+            filters={"view": "queue", "status": status_filter},
+            exact=exact,
+            ttl=5
+        )
         
         # Get tasks
         result = await session.execute(query)
@@ -197,13 +208,14 @@ async def get_queue_tasks(
             for task, user in result
         ]
         
-        return TaskListResponse(tasks=tasks, total=total)
+        return TaskListResponse(tasks=tasks, total=total, total_is_estimate=total_is_estimate)
 
 
 @router.get("/history", response_model=TaskListResponse)
 async def get_task_history(
     status_filter: Optional[str] = Query(None, pattern="^(completed|failed)$"),
     limit: int = Query(50, ge=1, le=200),
+    exact: bool = Query(False, description="Exact total instead of a cached count"),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """Get completed/failed tasks history."""
@@ -224,8 +236,13 @@ async def get_task_history(
         
         query = query.order_by(VideoTask.completed_at.desc()).limit(limit)
         
-        total_result = await session.execute(count_query)
-        total = total_result.scalar() or 0
+        total, total_is_estimate = await count_service.count(
+            session,
+            count_query,
+            table="video_tasks",
+            filters={"view": "history", "status": status_filter},
+            exact=exact
+        )
         
         result = await session.execute(query)
         
@@ -247,7 +264,7 @@ async def get_task_history(
             for task, user in result
         ]
         
-        return TaskListResponse(tasks=tasks, total=total)
+        return TaskListResponse(tasks=tasks, total=total, total_is_estimate=total_is_estimate)
 
 
 @router.delete("/queue/{task_id}")
@@ -283,6 +300,7 @@ async def cancel_task(
         task.completed_at = datetime.utcnow()
         
         await session.commit()
+        await response_cache.invalidate(NS_TASKS, NS_DASHBOARD)
         
         logger.info(
             "Task cancelled",
@@ -3,11 +3,11 @@ Users router.
 Handles user management endpoints.
 """
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 
-from sqlalchemy import select, func, desc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, desc, and_, or_
+from sqlalchemy.orm import selectinload, raiseload
 
 from api.schemas.user import (
     UserResponse, UserListResponse, UserUpdate, 
@@ -15,8 +15,11 @@ from api.schemas.user import (
     SendMessageRequest, GrantPremiumRequest
 )
 from api.services.auth_service import get_current_admin, require_role
+from api.services.pagination import decode_cursor, next_cursor
+from api.services.count_service import count_service
 from database import async_session_maker
-from database.models import User, Request, Admin
+from database.models import User, Request, Admin, UserUsageTotal
+from database.redis_client import redis_client
 from bot.services.user_service import user_service
 from config import settings
 import structlog
@@ -29,109 +32,174 @@ router = APIRouter()
 async def list_users(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     search: Optional[str] = None,
     is_blocked: Optional[bool] = None,
     has_custom_limits: Optional[bool] = None,
+    exact: bool = Query(False, description="Exact total instead of an estimate/cached count"),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
     List users with pagination and filters.
+    
+    Ordered by last activity (most recent first). Pass ``next_cursor``
+    from a response as ``cursor`` to page without OFFSET; ``page`` is
+    kept for the page-number UI and ignored when a cursor is given.
+    ``total`` may be an estimate (see ``total_is_estimate``).
     """
+    after = decode_cursor(cursor, 2)
+    
     async with async_session_maker() as session:
-        # Base query
-        query = select(User)
+        # Base query (relationships are selectin by default; a list needs none of them)
+        query = select(User).options(raiseload("*"))
         count_query = select(func.count(User.id))
         
         # Apply filters
+        filters = []
+        if is_blocked is not None:
+            filters.append(User.is_blocked == is_blocked)
+        
+        if has_custom_limits is not None:
+            if has_custom_limits:
+                filters.append(User.custom_limits.isnot(None))
+            else:
+                filters.append(User.custom_limits.is_(None))
+        
+        exact_user = None
         if search:
-            # ИСПРАВЛЕНО: безопасный поиск
-            search_pattern = f"%{search}%"
+            search = search.strip()
             
-            # Проверяем, является ли поиск числом (для telegram_id)
+            # Substring search, served by the pg_trgm GIN indexes
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            search_pattern = f"%{escaped}%"
             search_filter = (
-                User.username.ilike(search_pattern) |
-                User.first_name.ilike(search_pattern) |
-                User.last_name.ilike(search_pattern)
+                User.username.ilike(search_pattern, escape="\\") |
+                User.first_name.ilike(search_pattern, escape="\\") |
+                User.last_name.ilike(search_pattern, escape="\\")
             )
             
-            # Если поиск - число, добавляем поиск по telegram_id
+            # Exact telegram_id: answered from the unique index alone and
+            # listed ahead of the name matches
             if search.isdigit():
-                search_filter = search_filter | (User.telegram_id == int(search))
+                exact_result = await session.execute(
+                    query.where(User.telegram_id == int(search), *filters)
+                )
+                exact_user = exact_result.scalar_one_or_none()
+                if exact_user is not None:
+                    search_filter = search_filter & (User.id != exact_user.id)
             
-            query = query.where(search_filter)
-            count_query = count_query.where(search_filter)
+            filters.append(search_filter)
         
-        if is_blocked is not None:
-            query = query.where(User.is_blocked == is_blocked)
-            count_query = count_query.where(User.is_blocked == is_blocked)
+        query = query.where(*filters)
+        count_query = count_query.where(*filters)
         
-        if has_custom_limits is not None:
-            if has_custom_limits:
-                query = query.where(User.custom_limits.isnot(None))
-                count_query = count_query.where(User.custom_limits.isnot(None))
-            else:
-                query = query.where(User.custom_limits.is_(None))
-                count_query = count_query.where(User.custom_limits.is_(None))
+        # Total: estimate/cached unless exact=true
+        total, total_is_estimate = await count_service.count(
+            session,
+            count_query,
+            table="users",
+            filters={"search": search, "is_blocked": is_blocked, "has_custom_limits": has_custom_limits},
+            exact=exact
+        )
         
-        # Get total count
-        total_result = await session.execute(count_query)
-        total = total_result.scalar()
+        # The exact hit takes the first slot of the first page
+        shift = 1 if exact_user is not None else 0
+        lead = [exact_user] if shift and not after and page == 1 else []
+        limit = page_size - len(lead)
+        
+        # Keyset pagination on (last_active_at DESC NULLS LAST, id DESC),
+        # matching ix_users_last_active_id; never-active users come last
+        if after:
+            last_active_at, last_id = after
+            if last_active_at is not None:
+                query = query.where(or_(
+                    User.last_active_at < last_active_at,
+                    and_(User.last_active_at == last_active_at, User.id < last_id),
+                    User.last_active_at.is_(None)
+                ))
+            else:
+                query = query.where(and_(User.last_active_at.is_(None), User.id < last_id))
+        else:
+            query = query.offset(max((page - 1) * page_size - shift, 0))
         
-        # Pagination
-        offset = (page - 1) * page_size
-        query = query.order_by(desc(User.last_active_at)).offset(offset).limit(page_size)
+        query = (
+            query
+            .order_by(User.last_active_at.desc().nullslast(), User.id.desc())
+            .limit(limit + 1)
+        )
         
-        # Execute
         result = await session.execute(query)
         users = result.scalars().all()
         
-        # Get request counts and build responses
-        user_responses = []
-        from datetime import timezone
-        now = datetime.now(timezone.utc) if hasattr(datetime, 'now') else __import__('datetime').datetime.now(__import__('datetime').timezone.utc)
-        
-        for user in users:
-            count_result = await session.execute(
-                select(func.count(Request.id)).where(Request.user_id == user.id)
-            )
-            request_count = count_result.scalar() or 0
-            
-            # Build user response with subscription info
-            has_active = False
-            if user.subscription_type.value == "premium" and user.subscription_expires_at:
-                has_active = user.subscription_expires_at > now
-            
-            user_data = UserResponse(
-                id=user.id,
-                telegram_id=user.telegram_id,
-                username=user.username,
-                first_name=user.first_name,
-                last_name=user.last_name,
-                language_code=user.language_code,
-                is_blocked=user.is_blocked,
-                custom_limits=user.custom_limits,
-                settings=user.settings,
-                created_at=user.created_at,
-                updated_at=user.updated_at,
-                last_active_at=user.last_active_at,
-                subscription_type=user.subscription_type.value,
-                subscription_expires_at=user.subscription_expires_at,
-                has_active_subscription=has_active,
-                total_requests=request_count
-            )
-            user_responses.append(user_data)
-        
-        total_pages = (total + page_size - 1) // page_size
-        
-        return UserListResponse(
-            users=user_responses,
-            total=total,
-            page=page,
-            page_size=page_size,
-            total_pages=total_pages
+        return await _build_user_list(
+            session,
+            lead + users[:limit],
+            total + shift,
+            page,
+            page_size,
+            next_cursor(users, limit, "last_active_at", "id") if limit else None,
+            total_is_estimate
         )
 
 
+async def _build_user_list(
+    session,
+    users: List[User],
+    total: int,
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    total_is_estimate: bool = False
+) -> UserListResponse:
+    """Build a UserListResponse with request counts in one extra query."""
+    # Request counts come from the per-user totals kept by the rollup worker
+    counts = {}
+    if users:
+        counts_result = await session.execute(
+            select(UserUsageTotal.user_id, UserUsageTotal.requests)
+            .where(UserUsageTotal.user_id.in_([u.id for u in users]))
+        )
+        counts = dict(counts_result.all())
+    
+    now = datetime.now(timezone.utc)
+    user_responses = []
+    
+    for user in users:
+        # Build user response with subscription info
+        has_active = False
+        if user.subscription_type.value == "premium" and user.subscription_expires_at:
+            has_active = user.subscription_expires_at > now
+        
+        user_responses.append(UserResponse(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            language_code=user.language_code,
+            is_blocked=user.is_blocked,
+            custom_limits=user.custom_limits,
+            settings=user.settings,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+            last_active_at=user.last_active_at,
+            subscription_type=user.subscription_type.value,
+            subscription_expires_at=user.subscription_expires_at,
+            has_active_subscription=has_active,
+            total_requests=counts.get(user.id, 0)
+        ))
+    
+    return UserListResponse(
+        users=user_responses,
+        total=total,
+        page=page,
+        page_size=page_size,
+        total_pages=(total + page_size - 1) // page_size,
+        next_cursor=cursor,
+        total_is_estimate=total_is_estimate
+    )
+
+
 @router.get("/{telegram_id}", response_model=UserResponse)
 async def get_user(
     telegram_id: int,
@@ -483,6 +551,8 @@ async def revoke_premium(
         
         await session.commit()
     
+    await redis_client.clear_premium_plan(telegram_id)
+    
     # Notify user via Telegram about premium revocation
     try:
         from aiogram import Bot as AioBot
@@ -38,6 +38,8 @@ class UserListResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page
+    total_is_estimate: bool = False  # total from planner statistics, not COUNT(*)
 
 
 class UserUpdate(BaseModel):
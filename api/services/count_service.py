@@ -0,0 +1,99 @@
+"""
+Count strategy for paginated admin lists.
+Totals for "page 1 of N" come from the planner's row estimate for
+unfiltered lists on large tables, or from a short-lived cached exact
+count for filtered ones; callers can still ask for an exact count.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from database.redis_client import redis_client
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+
+class CountService:
+    """
+    Decides how to get a list total.
+    
+    - ``exact=True``: always COUNT(*) (and refresh the cache).
+    - No filters and the table is large (``count_estimate_min_rows``):
+      ``pg_class.reltuples`` summed over the table and its partitions,
+      kept current by autovacuum/ANALYZE. Flagged as an estimate.
+    - Otherwise: exact COUNT(*) cached in Redis for ``count_cache_ttl``
+      seconds per (table, filters).
+    """
+    
+    async def count(
+        self,
+        session: AsyncSession,
+        count_query: Select,
+        table: str,
+        filters: Dict[str, Any],
+        exact: bool = False,
+        ttl: Optional[int] = None
+    ) -> Tuple[int, bool]:
+        """
+        Count rows for a list view.
+        
+        Args:
+            session: DB session
+            count_query: SELECT count(...) with the list's filters applied
+            table: Table being counted (for the estimate and cache key)
+            filters: Filter values that shaped count_query (cache key)
+            exact: Skip estimates and cache
+            ttl: Cache TTL override in seconds
+        
+        Returns:
+            (total, is_estimate)
+        """
+        active_filters = {k: v for k, v in filters.items() if v not in (None, "")}
+        
+        if not exact and not active_filters:
+            estimate = await self.estimate_rows(session, table)
+            if estimate >= settings.count_estimate_min_rows:
+                return estimate, True
+        
+        key = self._cache_key(table, active_filters)
+        if not exact:
+            try:
+                cached = await redis_client.client.get(key)
+                if cached is not None:
+                    return int(cached), False
+            except Exception as e:
+                logger.warning("Count cache unavailable", table=table, error=str(e))
+        
+        result = await session.execute(count_query)
+        total = result.scalar() or 0
+        
+        try:
+            await redis_client.client.setex(key, ttl or settings.count_cache_ttl, total)
+        except Exception:
+            pass
+        
+        return total, False
+    
+    async def estimate_rows(self, session: AsyncSession, table: str) -> int:
+        """Planner row estimate for a table (including its partitions)."""
+        result = await session.execute(text(
+            "SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c "
+            "WHERE c.oid = CAST(:table AS regclass) "
+            "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = CAST(:table AS regclass))"
+        ), {"table": table})
+        return int(result.scalar() or 0)
+    
+    def _cache_key(self, table: str, filters: Dict[str, Any]) -> str:
+        normalized = json.dumps(jsonable_encoder(filters), sort_keys=True, separators=(",", ":"))
+        return f"count:{table}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+# Global service instance
+count_service = CountService()
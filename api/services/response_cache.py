@@ -0,0 +1,203 @@
+"""
+Redis-backed cache for admin API responses.
+Dashboard endpoints polled by the admin panel share one cached JSON body
+per route and query: after the freshness window a single request
+refreshes it in the background while everyone keeps getting the
+previous body (stale-while-revalidate).
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from database.redis_client import redis_client
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+# Namespaces (invalidated together via redis_client.bump_cache_generation)
+NS_DASHBOARD = "dashboard"
+NS_API_USAGE = "api_usage"
+NS_TASKS = "tasks"
+NS_SUPPORT = "support"
+
+LOCK_TTL = 30  # seconds a recompute may hold the refresh lock
+LOCK_WAIT = 3.0  # how long a cold miss waits for another process's result
+
+
+class ResponseCache:
+    """
+    Response cache with stale-while-revalidate and single-flight.
+    
+    - Entry younger than ``fresh_seconds``: served as is.
+    - Older, but not yet expired (``api_cache_stale_seconds``): served
+      as is, and one background refresh is started. A Redis lock makes
+      it one refresh across all API workers, not one per admin.
+    - Missing: computed once; concurrent callers in this process await
+      the same result, other processes wait briefly for it to appear.
+    
+    If Redis is unavailable the endpoint is simply called directly.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+    
+    def cached(
+        self,
+        namespace: str,
+        fresh_seconds: Optional[int] = None,
+        exclude: Iterable[str] = ("current_admin",)
+    ):
+        """
+        Decorate a FastAPI endpoint (below the @router decorator).
+        
+        Args:
+            namespace: Invalidation namespace (NS_*)
+            fresh_seconds: Freshness window (default: api_cache_fresh_seconds)
+            exclude: Keyword arguments that are not part of the cache key
+        """
+        excluded = set(exclude)
+        
+        def decorator(func: Callable[..., Awaitable[Any]]):
+            route = f"{func.__module__}.{func.__name__}"
+            
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not settings.api_cache_enabled:
+                    return await func(*args, **kwargs)
+                
+                params = {k: v for k, v in kwargs.items() if k not in excluded}
+                fresh = settings.api_cache_fresh_seconds if fresh_seconds is None else fresh_seconds
+                return await self._get_or_compute(
+                    namespace, route, params, lambda: func(*args, **kwargs), fresh
+                )
+            
+            return wrapper
+        
+        return decorator
+    
+    async def _key(self, namespace: str, route: str, params: Dict[str, Any]) -> str:
+        generation = await redis_client.get_cache_generation(namespace)
+        normalized = json.dumps(jsonable_encoder(params), sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha1(f"{route}|{normalized}".encode()).hexdigest()
+        return f"api_cache:{namespace}:{generation}:{digest}"
+    
+    async def _get_or_compute(
+        self,
+        namespace: str,
+        route: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        fresh_seconds: int
+    ) -> Any:
+        try:
+            key = await self._key(namespace, route, params)
+            raw = await redis_client.client.get(key)
+        except Exception as e:
+            logger.warning("Response cache unavailable", route=route, error=str(e))
+            return await compute()
+        
+        if raw:
+            entry = json.loads(raw)
+            if time.time() - entry["ts"] >= fresh_seconds:
+                self._refresh_in_background(key, compute)
+            return entry["body"]
+        
+        return await self._compute_once(key, compute)
+    
+    async def _store(self, key: str, result: Any) -> Any:
+        body = jsonable_encoder(result)
+        try:
+            await redis_client.client.setex(
+                key,
+                settings.api_cache_stale_seconds,
+                json.dumps({"ts": time.time(), "body": body})
+            )
+        except Exception as e:
+            logger.warning("Failed to store cached response", error=str(e))
+        return body
+    
+    async def _compute_once(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cold miss: one computation per key, shared by concurrent callers."""
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._compute_across_processes(key, compute)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited isn't logged as unhandled
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    async def _compute_across_processes(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = f"{key}:lock"
+        try:
+            acquired = await redis_client.client.set(lock_key, "1", nx=True, ex=LOCK_TTL)
+        except Exception:
+            acquired = True  # no Redis lock available, just compute
+        
+        if not acquired:
+            # Another API worker is computing this key; wait for its result
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+                raw = await redis_client.client.get(key)
+                if raw:
+                    return json.loads(raw)["body"]
+        
+        try:
+            return await self._store(key, await compute())
+        finally:
+            if acquired:
+                try:
+                    await redis_client.client.delete(lock_key)
+                except Exception:
+                    pass
+    
+    def _refresh_in_background(self, key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+        task = self._refreshing.get(key)
+        if task is not None and not task.done():
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key, compute))
+    
+    async def _refresh(self, key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+        lock_key = f"{key}:lock"
+        try:
+            if not await redis_client.client.set(lock_key, "1", nx=True, ex=LOCK_TTL):
+                return  # someone else is refreshing
+            try:
+                await self._store(key, await compute())
+            finally:
+                await redis_client.client.delete(lock_key)
+        except Exception as e:
+            logger.warning("Background response refresh failed", key=key, error=str(e))
+        finally:
+            self._refreshing.pop(key, None)
+    
+    async def invalidate(self, *namespaces: str) -> None:
+        """Drop every cached response in the namespaces."""
+        try:
+            await redis_client.bump_cache_generation(*namespaces)
+        except Exception as e:
+            logger.warning("Failed to invalidate response cache", namespaces=namespaces, error=str(e))
+
+
+# Global cache instance
+response_cache = ResponseCache()
@@ -3,6 +3,8 @@ Main bot initialization and configuration.
 """
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.redis import RedisStorage
 
@@ -11,9 +13,18 @@ from config import settings
 # Initialize Redis storage for FSM
 storage = RedisStorage.from_url(settings.redis_url)
 
+
+def create_session() -> AiohttpSession | None:
+    """Bot API session for ``telegram_api_url`` (a local Bot API server or the load-test fake)."""
+    if not settings.telegram_api_url:
+        return None
+    return AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+
+
 # Initialize bot with default properties
 bot = Bot(
     token=settings.telegram_bot_token,
+    session=create_session(),
     default=DefaultBotProperties(
         parse_mode=ParseMode.HTML,
         link_preview_is_disabled=True
@@ -7,19 +7,21 @@ Features: cached bot_info, streaming text, inline image buttons, group context,
 import re
 import asyncio
 import time
-from typing import Tuple, Optional
+from typing import Optional
 from aiogram import Router, F, Bot
 from aiogram.types import Message, BufferedInputFile, CallbackQuery, User as TgUser
 from aiogram.enums import ChatType, ChatAction
 from aiogram.filters import Command
 
 from bot.services.ai_service import ai_service
+from bot.services.transcription_service import transcription_service
 from bot.services.user_service import user_service
 from bot.services.limit_service import limit_service
 from bot.services.subscription_service import subscription_service
 from bot.services.settings_service import settings_service
 from bot.keyboards.inline import get_subscription_keyboard, get_image_size_keyboard, get_download_keyboard
 from bot.utils.helpers import convert_markdown_to_html, split_text_for_telegram, send_long_message, send_as_file
+from bot.utils.triggers import is_bot_triggered, get_intent_and_prompt
 from config import settings as config_settings
 from database.redis_client import redis_client
 from database.models import RequestType, RequestStatus
@@ -49,109 +51,15 @@ async def _get_bot_id(bot: Bot, data: dict = None) -> int:
     info = await bot.get_me()
     return info.id
 
-# ============================================
-# KEYWORDS
-# ============================================
-
-IMAGE_KEYWORDS = [
-    "сгенерируй", "нарисуй", "создай картинку", "создай изображение",
-    "сделай картинку", "сделай изображение", "покажи как выглядит",
-    "визуализируй", "изобрази", "нарисуй мне", "сгенери",
-    "generate", "draw", "create image", "make picture", "visualize",
-    "покажи", "пикчу", "арт", "картинку"
-]
-
-ANALYZE_KEYWORDS = [
-    "что это", "что здесь", "опиши", "проанализируй", "анализ",
-    "что на фото", "что на картинке", "что изображено", "распознай",
-    "what is this", "what's this", "describe", "analyze", "what do you see"
-]
-
-TEXT_KEYWORDS = [
-    "расскажи", "объясни", "что такое", "как", "почему", "зачем",
-    "ответь", "помоги", "подскажи", "напиши", "скажи",
-    "tell", "explain", "what is", "how", "why", "help"
-]
-
-BOT_TRIGGERS = [
-    "бот", "bot", "ии", "ai", "гпт", "gpt", "ассистент", "assistant"
-]
-
-
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
 
-def is_bot_triggered(text: str, bot_username: str) -> bool:
-    """Check if message is addressed to bot."""
-    if not text:
-        return False
-
-    text_lower = text.lower().strip()
-
-    # @username mention
-    if bot_username and f"@{bot_username.lower()}" in text_lower:
-        return True
-
-    # Trigger words
-    for trigger in BOT_TRIGGERS:
-        if text_lower.startswith(trigger):
-            return True
-        if text_lower.startswith(f"{trigger},"):
-            return True
-        if text_lower.startswith(f"{trigger} "):
-            return True
-        if f" {trigger}" in text_lower or f",{trigger}" in text_lower:
-            return True
-
-    return False
-
-
 def _is_command(text: str) -> bool:
     """Check if text is a bot command like /start@botname."""
     return bool(text) and text.strip().startswith("/")
 
 
-def get_intent_and_prompt(text: str, bot_username: str, has_photo: bool = False) -> Tuple[str, str]:
-    """Determine intent and extract clean prompt."""
-    if not text:
-        return ('analyze' if has_photo else 'auto', '')
-
-    text_lower = text.lower()
-
-    # Clean triggers from text
-    cleaned = text
-    all_triggers = BOT_TRIGGERS.copy()
-    if bot_username:
-        all_triggers.append(f"@{bot_username.lower()}")
-        all_triggers.append(bot_username.lower())
-
-    for trigger in all_triggers:
-        cleaned = re.sub(rf'^{re.escape(trigger)}[,\s]*', '', cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(rf'[,\s]*{re.escape(trigger)}[,\s]*', ' ', cleaned, flags=re.IGNORECASE)
-    cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-
-    if has_photo:
-        for kw in IMAGE_KEYWORDS:
-            if kw in text_lower:
-                prompt = re.sub(rf'\b{re.escape(kw)}\b', '', cleaned, flags=re.IGNORECASE).strip()
-                prompt = re.sub(r'^[,.\s]+', '', prompt).strip()
-                return 'image', prompt if prompt else cleaned
-        return 'analyze', cleaned if cleaned else "Опиши что на изображении"
-
-    for kw in IMAGE_KEYWORDS:
-        if kw in text_lower:
-            prompt = re.sub(rf'\b{re.escape(kw)}\b', '', cleaned, flags=re.IGNORECASE).strip()
-            prompt = re.sub(r'^[,.\s]+', '', prompt).strip()
-            return 'image', prompt if prompt else cleaned
-
-    for kw in TEXT_KEYWORDS:
-        if kw in text_lower:
-            return 'text', cleaned
-
-    return 'auto', cleaned
-
-
 async def send_reply(
     message: Message,
     text: str,
@@ -819,7 +727,8 @@ async def analyze_photo_response(
         result, usage = await ai_service.analyze_image(
             image_data=image_bytes,
             prompt=full_prompt,
-            telegram_id=user_id
+            telegram_id=user_id,
+            image_key=photo.file_unique_id
         )
 
         # Split long result
@@ -1144,15 +1053,14 @@ async def transcribe_voice_response(
     status_msg = await send_reply(message, "🎤 Распознаю речь..." if language == "ru" else "🎤 Transcribing...")
 
     try:
-        file = await message.bot.get_file(voice.file_id)
-        file_bytes = await message.bot.download_file(file.file_path)
-        audio_data = file_bytes.read() if hasattr(file_bytes, 'read') else file_bytes
-
-        text, usage = await ai_service.transcribe_audio(
-            audio_data=audio_data,
+        text, usage = await transcription_service.transcribe_telegram_file(
+            bot=message.bot,
+            file_id=voice.file_id,
+            file_unique_id=voice.file_unique_id,
             filename="voice.ogg",
             language=language if language in ["ru", "en", "zh"] else None,
-            telegram_id=user_id
+            telegram_id=user_id,
+            duration=voice.duration
         )
 
         if not text or not text.strip():
@@ -1240,14 +1148,13 @@ async def transcribe_audio_response(
     status_msg = await send_reply(message, "🎵 Обрабатываю аудио..." if language == "ru" else "🎵 Processing audio...")
 
     try:
-        file = await message.bot.get_file(audio.file_id)
-        file_bytes = await message.bot.download_file(file.file_path)
-        audio_data = file_bytes.read() if hasattr(file_bytes, 'read') else file_bytes
-
-        text, usage = await ai_service.transcribe_audio(
-            audio_data=audio_data,
+        text, usage = await transcription_service.transcribe_telegram_file(
+            bot=message.bot,
+            file_id=audio.file_id,
+            file_unique_id=audio.file_unique_id,
             filename=filename,
-            telegram_id=user_id
+            telegram_id=user_id,
+            duration=audio.duration
         )
 
         if not text or not text.strip():
@@ -1436,7 +1343,8 @@ async def auto_detect_and_respond(message: Message, user_id: int, prompt: str, l
         result, _ = await ai_service.generate_text(
             messages=detect_messages,
             telegram_id=user_id,
-            max_tokens=10
+            max_tokens=10,
+            cache_route="classify"
         )
 
         if "IMAGE" in result.upper():
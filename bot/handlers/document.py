@@ -5,6 +5,7 @@ Supports single documents and multi-document media groups.
 """
 import asyncio
 import time
+from typing import List
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.enums import ChatAction
@@ -13,6 +14,7 @@ from bot.services.ai_service import ai_service
 from bot.services.document_service import document_service
 from bot.services.user_service import user_service
 from bot.services.limit_service import limit_service
+from bot.services.media_group_service import media_group_collector, download_telegram_files
 from bot.keyboards.inline import get_document_actions_keyboard, get_download_keyboard
 from bot.utils.helpers import convert_markdown_to_html, split_text_for_telegram, edit_or_send_long, send_long_message, send_as_file
 from database.redis_client import redis_client
@@ -23,11 +25,6 @@ import structlog
 logger = structlog.get_logger()
 router = Router()
 
-# Document media group collector (same pattern as photo media groups)
-_doc_media_groups: dict = {}
-_doc_media_group_lock = asyncio.Lock()
-
-
 @router.message(F.document)
 async def handle_document(message: Message):
     """Handle document uploads (single or media group)."""
@@ -232,37 +229,11 @@ async def handle_document(message: Message):
 
 async def _collect_doc_media_group(message: Message):
     """Collect documents from a media group, then process them all together."""
-    mg_id = message.media_group_id
-    
-    async with _doc_media_group_lock:
-        if mg_id not in _doc_media_groups:
-            _doc_media_groups[mg_id] = {"messages": [], "task": None}
-        
-        _doc_media_groups[mg_id]["messages"].append(message)
-        
-        # Cancel previous delayed task if exists
-        if _doc_media_groups[mg_id]["task"]:
-            _doc_media_groups[mg_id]["task"].cancel()
-        
-        # Schedule processing after 0.6s of no new docs
-        _doc_media_groups[mg_id]["task"] = asyncio.create_task(
-            _process_doc_media_group_delayed(mg_id)
-        )
+    await media_group_collector.collect(message, "document", _process_doc_media_group)
 
 
-async def _process_doc_media_group_delayed(mg_id: str):
-    """Wait for all documents in a media group, then process."""
-    await asyncio.sleep(0.6)
-    
-    async with _doc_media_group_lock:
-        group_data = _doc_media_groups.pop(mg_id, None)
-    
-    if not group_data or not group_data["messages"]:
-        return
-    
-    msgs = group_data["messages"]
-    msgs.sort(key=lambda m: m.message_id)
-    
+async def _process_doc_media_group(msgs: List[Message]):
+    """Process an assembled document media group (sorted by message_id)."""
     first_msg = msgs[0]
     user_id = first_msg.from_user.id
     
@@ -314,14 +285,21 @@ async def _process_doc_media_group_delayed(mg_id: str):
         all_filenames = []
         all_images = []
         
-        for m in supported_docs:
+        # Download all files concurrently; a failed download only affects its own file
+        downloads = await download_telegram_files(
+            first_msg.bot,
+            [m.document.file_id for m in supported_docs],
+            return_exceptions=True
+        )
+        
+        for m, downloaded in zip(supported_docs, downloads):
             doc = m.document
             filename = doc.file_name or "document"
             
             try:
-                file = await m.bot.get_file(doc.file_id)
-                file_bytes_io = await m.bot.download_file(file.file_path)
-                file_data = file_bytes_io.read() if hasattr(file_bytes_io, 'read') else file_bytes_io
+                if isinstance(downloaded, BaseException):
+                    raise downloaded
+                file_data = downloaded
                 
                 text, metadata, images = await document_service.process_document(
                     file_data=file_data,
@@ -2,7 +2,11 @@
 Inline mode handler.
 Handles inline queries for use in any chat.
 """
+import asyncio
 import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
 from aiogram import Router, Bot
 from aiogram.types import (
     InlineQuery,
@@ -15,13 +19,89 @@ from bot.services.ai_service import ai_service
 from bot.services.user_service import user_service
 from bot.services.limit_service import limit_service
 from bot.services.subscription_service import subscription_service
+from bot.services.llm_cache import normalize_prompt
 from database.models import RequestType, RequestStatus
+from database.redis_client import redis_client
 from config import settings
 import structlog
 
 logger = structlog.get_logger()
 router = Router()
 
+SUPERSEDED = "inline query superseded"
+
+# Answer options per result kind: (cache_time seconds, is_personal)
+ANSWER_OPTIONS = {
+    "help": (3600, False),
+    "gate": (60, True),  # subscription / limit notices
+    "image": (300, False),  # prompt formatting only, no AI call
+    "translate": (300, True),
+    "text": (30, True),  # depends on the user's language
+    "error": (0, True),
+}
+
+INLINE_RECENT_ANSWERS = 10
+INLINE_RECENT_TTL = 600
+INLINE_PREFIX_MIN_CHARS = 8
+
+# Newest inline query task per user (this process)
+_inline_tasks: Dict[int, asyncio.Task] = {}
+
+
+async def _debounce(user_id: int, query_id: str) -> bool:
+    """
+    Supersede the user's previous inline query and wait out the debounce
+    window. Returns False if a newer query from the user arrived meanwhile
+    (in any bot process), in which case this one should not be answered.
+    """
+    current = asyncio.current_task()
+    previous = _inline_tasks.get(user_id)
+    if previous is not None and previous is not current and not previous.done():
+        previous.cancel(SUPERSEDED)
+    _inline_tasks[user_id] = current
+    
+    latest_key = f"inline:latest:{user_id}"
+    try:
+        await redis_client.client.set(latest_key, query_id, ex=60)
+    except Exception:
+        pass
+    
+    await asyncio.sleep(settings.inline_debounce_ms / 1000)
+    
+    try:
+        latest = await redis_client.client.get(latest_key)
+    except Exception:
+        latest = None
+    return latest in (None, query_id)
+
+
+async def _recent_answer(user_id: int, query: str) -> Optional[Tuple[str, str]]:
+    """(answered query, answer) for a recent query that starts with this one."""
+    normalized = normalize_prompt(query, fold=True)
+    if len(normalized) < INLINE_PREFIX_MIN_CHARS:
+        return None
+    try:
+        entries = await redis_client.client.lrange(f"inline:recent:{user_id}", 0, -1)
+    except Exception:
+        return None
+    for raw in entries:
+        answered, answer = json.loads(raw)
+        if normalize_prompt(answered, fold=True).startswith(normalized):
+            return answered, answer
+    return None
+
+
+async def _remember_answer(user_id: int, query: str, answer: str) -> None:
+    key = f"inline:recent:{user_id}"
+    try:
+        async with redis_client.client.pipeline(transaction=False) as pipe:
+            pipe.lpush(key, json.dumps([query, answer], ensure_ascii=False))
+            pipe.ltrim(key, 0, INLINE_RECENT_ANSWERS - 1)
+            pipe.expire(key, INLINE_RECENT_TTL)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Failed to remember inline answer", error=str(e))
+
 
 async def check_channel_subscription_for_inline(bot: Bot, user_id: int) -> bool:
     """
@@ -94,10 +174,33 @@ async def check_channel_subscription_for_inline(bot: Bot, user_id: int) -> bool:
 
 @router.inline_query()
 async def handle_inline_query(inline_query: InlineQuery, bot: Bot):
-    """Handle inline queries."""
+    """
+    Handle inline queries.
+    
+    Telegram sends a query per keystroke: each new query from a user
+    cancels the previous one still being generated, and a query is only
+    answered if no newer one arrives within inline_debounce_ms.
+    """
     user = inline_query.from_user
     query = inline_query.query.strip()
     
+    try:
+        if query and not await _debounce(user.id, inline_query.id):
+            logger.debug("Inline query superseded", user_id=user.id)
+            return
+        await _answer_inline_query(inline_query, bot, query)
+    except asyncio.CancelledError as e:
+        if e.args and e.args[0] == SUPERSEDED:
+            logger.debug("Inline query cancelled by a newer one", user_id=user.id)
+            return
+        raise
+    finally:
+        if _inline_tasks.get(user.id) is asyncio.current_task():
+            del _inline_tasks[user.id]
+
+
+async def _answer_inline_query(inline_query: InlineQuery, bot: Bot, query: str):
+    user = inline_query.from_user
     logger.info(
         "Inline query received",
         user_id=user.id,
@@ -130,7 +233,8 @@ async def handle_inline_query(inline_query: InlineQuery, bot: Bot):
                 )
             )
         ]
-        await inline_query.answer(results, cache_time=60, is_personal=True)
+        cache_time, is_personal = ANSWER_OPTIONS["gate"]
+        await inline_query.answer(results, cache_time=cache_time, is_personal=is_personal)
         return
     
     # Проверяем лимиты
@@ -149,31 +253,32 @@ async def handle_inline_query(inline_query: InlineQuery, bot: Bot):
                 )
             )
         ]
-        await inline_query.answer(results, cache_time=60, is_personal=True)
+        cache_time, is_personal = ANSWER_OPTIONS["gate"]
+        await inline_query.answer(results, cache_time=cache_time, is_personal=is_personal)
         return
     
-    # Пустой запрос
-    if not query:
-        results = await get_help_results()
-        await inline_query.answer(results, cache_time=300, is_personal=True)
-        return
-    
-    # Обрабатываем запрос
+    # Обрабатываем запрос (пустой запрос — подсказки)
+    results, kind = await get_help_results(), "help"
     if query.startswith("/image "):
         prompt = query[7:].strip()
-        results = await handle_inline_image(prompt, user.id) if prompt else await get_help_results()
+        if prompt:
+            results, kind = await handle_inline_image(prompt, user.id), "image"
     
     elif query.startswith("/translate ") or query.startswith("/перевод "):
         text = query.split(" ", 1)[1].strip() if " " in query else ""
-        results = await handle_inline_translate(text, user.id) if text else await get_help_results()
+        if text:
+            results, kind = await handle_inline_translate(text, user.id), "translate"
     
-    else:
-        results = await handle_inline_text(query, user.id)
+    elif query:
+        results, kind = await handle_inline_text(query, user.id), "text"
     
+    if results[0].id == "error":
+        kind = "error"
+    cache_time, is_personal = ANSWER_OPTIONS[kind]
     await inline_query.answer(
         results,
-        cache_time=0,
-        is_personal=True
+        cache_time=cache_time,
+        is_personal=is_personal
     )
 
 
@@ -257,8 +362,17 @@ async def get_help_results():
 
 
 async def handle_inline_text(query: str, user_id: int):
-    """Quick GPT response for inline."""
+    """
+    Quick GPT response for inline.
+    A query that is a prefix of one answered for this user in the last
+    minutes (e.g. after backspacing) reuses that answer.
+    """
     try:
+        recent = await _recent_answer(user_id, query)
+        if recent is not None:
+            query, response = recent
+            return _text_results(query, response, user_id)
+        
         language = await user_service.get_user_language(user_id)
         
         messages = [
@@ -275,25 +389,15 @@ async def handle_inline_text(query: str, user_id: int):
         response, _ = await ai_service.generate_text(
             messages=messages,
             telegram_id=user_id,
-            max_tokens=256
+            max_tokens=256,
+            cache_route="inline_text"
         )
         
-        result_id = f"text_{hashlib.md5(f'{user_id}:{query}'.encode()).hexdigest()[:12]}"
-        
         if len(response) > 4000:
             response = response[:4000] + "..."
         
-        return [
-            InlineQueryResultArticle(
-                id=result_id,
-                title="💬 Ответ",
-                description=response[:100] + ("..." if len(response) > 100 else ""),
-                input_message_content=InputTextMessageContent(
-                    message_text=f"❓ <b>{query}</b>\n\n💬 {response}",
-                    parse_mode="HTML"
-                )
-            )
-        ]
+        await _remember_answer(user_id, query, response)
+        return _text_results(query, response, user_id)
         
     except Exception as e:
         logger.error("Inline text error", user_id=user_id, error=str(e))
@@ -309,6 +413,21 @@ async def handle_inline_text(query: str, user_id: int):
         ]
 
 
+def _text_results(query: str, response: str, user_id: int) -> List[InlineQueryResultArticle]:
+    result_id = f"text_{hashlib.md5(f'{user_id}:{query}'.encode()).hexdigest()[:12]}"
+    return [
+        InlineQueryResultArticle(
+            id=result_id,
+            title="💬 Ответ",
+            description=response[:100] + ("..." if len(response) > 100 else ""),
+            input_message_content=InputTextMessageContent(
+                message_text=f"❓ <b>{query}</b>\n\n💬 {response}",
+                parse_mode="HTML"
+            )
+        )
+    ]
+
+
 async def handle_inline_translate(text: str, user_id: int):
     """Quick translation."""
     try:
@@ -326,7 +445,8 @@ async def handle_inline_translate(text: str, user_id: int):
         translation, _ = await ai_service.generate_text(
             messages=messages,
             telegram_id=user_id,
-            max_tokens=512
+            max_tokens=512,
+            cache_route="translate"
         )
         
         result_id = f"translate_{hashlib.md5(f'{user_id}:{text}'.encode()).hexdigest()[:12]}"
@@ -6,6 +6,7 @@ and multi-photo (media group) processing.
 """
 import asyncio
 import io
+from typing import List
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, BufferedInputFile
 from aiogram.enums import ChatAction
@@ -13,6 +14,8 @@ from database.models import RequestType, RequestStatus
 from bot.services.ai_service import ai_service
 from bot.services.user_service import user_service
 from bot.services.limit_service import limit_service
+from bot.services.media_group_service import media_group_collector, download_telegram_files
+from bot.services.intent_service import intent_classifier
 from bot.keyboards.inline import get_subscription_keyboard, get_photo_actions_keyboard, get_photo_edit_actions_keyboard, get_download_keyboard
 from bot.utils.helpers import convert_markdown_to_html, split_text_for_telegram
 from database.redis_client import redis_client
@@ -25,10 +28,6 @@ import time
 logger = structlog.get_logger()
 router = Router()
 
-# Media group collector: {media_group_id: {"messages": [...], "task": asyncio.Task}}
-_media_groups: dict = {}
-_media_group_lock = asyncio.Lock()
-
 
 @router.message(F.photo)
 async def handle_photo_message(message: Message):
@@ -61,39 +60,12 @@ async def handle_photo_message(message: Message):
 
 
 async def _collect_media_group(message: Message):
-    """Collect messages from a media group, then process them all together."""
-    mg_id = message.media_group_id
-    
-    async with _media_group_lock:
-        if mg_id not in _media_groups:
-            _media_groups[mg_id] = {"messages": [], "task": None}
-        
-        _media_groups[mg_id]["messages"].append(message)
-        
-        # Cancel previous delayed task if exists
-        if _media_groups[mg_id]["task"]:
-            _media_groups[mg_id]["task"].cancel()
-        
-        # Schedule processing after 0.6s of no new photos
-        _media_groups[mg_id]["task"] = asyncio.create_task(
-            _process_media_group_delayed(mg_id)
-        )
+    """Collect photos from a media group, then process them all together."""
+    await media_group_collector.collect(message, "photo", _process_media_group)
 
 
-async def _process_media_group_delayed(mg_id: str):
-    """Wait for all photos in a media group, then process."""
-    await asyncio.sleep(0.6)
-    
-    async with _media_group_lock:
-        group_data = _media_groups.pop(mg_id, None)
-    
-    if not group_data or not group_data["messages"]:
-        return
-    
-    messages = group_data["messages"]
-    # Sort by message_id to maintain order
-    messages.sort(key=lambda m: m.message_id)
-    
+async def _process_media_group(messages: List[Message]):
+    """Process an assembled photo media group (sorted by message_id)."""
     first_msg = messages[0]
     user_id = first_msg.from_user.id
     # Caption is usually only on the first message
@@ -126,14 +98,11 @@ async def _process_media_group_delayed(mg_id: str):
     start_time = time.time()
     
     try:
-        # Download all photos
-        images_data = []
-        for msg in messages:
-            photo = msg.photo[-1]
-            file = await msg.bot.get_file(photo.file_id)
-            file_bytes = await msg.bot.download_file(file.file_path)
-            data = file_bytes.read() if hasattr(file_bytes, 'read') else file_bytes
-            images_data.append(data)
+        # Download all photos concurrently
+        images_data = await download_telegram_files(
+            first_msg.bot,
+            [msg.photo[-1].file_id for msg in messages]
+        )
         
         prompt = caption or (
             "Опиши подробно все изображения" if language == "ru"
@@ -144,7 +113,9 @@ async def _process_media_group_delayed(mg_id: str):
         result, usage = await ai_service.analyze_document_images(
             images=images_data,
             prompt=prompt,
-            telegram_id=user_id
+            telegram_id=user_id,
+            image_keys=[msg.photo[-1].file_unique_id for msg in messages],
+            profile="photo"
         )
         
         duration_ms = int((time.time() - start_time) * 1000)
@@ -400,7 +371,8 @@ async def _classify_photo_intent(caption: str, user_id: int) -> str:
     Classify photo caption intent: EDIT or ANALYZE.
     
     1. First try fast keyword-based classification.
-    2. If ambiguous (no keywords matched), use AI to classify.
+    2. If ambiguous (no keywords matched), use the local classifier.
+    3. Only if it is not confident, use AI to classify.
     
     Returns: "EDIT" or "ANALYZE"
     """
@@ -424,7 +396,18 @@ async def _classify_photo_intent(caption: str, user_id: int) -> str:
         if text.startswith(p) or f" {p}" in text:
             return "ANALYZE"
     
-    # Ambiguous: use AI classifier (fast, small prompt)
+    # Ambiguous: local model, no provider round trip
+    local = intent_classifier.classify(caption, "photo")
+    if intent_classifier.is_confident(local):
+        logger.info(
+            "Local classifier photo intent",
+            intent=local["label"],
+            confidence=round(local["confidence"], 3),
+            user_id=user_id
+        )
+        return local["label"]
+    
+    # Still ambiguous: use AI classifier (fast, small prompt)
     try:
         classify_messages = [
             {
@@ -446,7 +429,8 @@ async def _classify_photo_intent(caption: str, user_id: int) -> str:
             messages=classify_messages,
             telegram_id=user_id,
             max_tokens=5,
-            temperature=0.0
+            temperature=0.0,
+            cache_route="classify"
         )
         
         result = result.strip().upper()
@@ -494,7 +478,8 @@ async def _handle_photo_edit(message: Message, user_id: int, caption: str, langu
         edited_bytes, usage = await ai_service.edit_image(
             image_data=image_data,
             prompt=caption,
-            telegram_id=user_id
+            telegram_id=user_id,
+            image_key=photo.file_unique_id
         )
         
         animation_task.cancel()
@@ -794,7 +779,8 @@ async def _handle_photo_vision(message: Message, user_id: int, caption: str, lan
         result, usage = await ai_service.analyze_image(
             image_data=image_data,
             prompt=prompt,
-            telegram_id=user_id
+            telegram_id=user_id,
+            image_key=photo.file_unique_id
         )
         
         duration_ms = int((time.time() - start_time) * 1000)
@@ -105,8 +105,14 @@ async def save_support_message(
         session.add(support_msg)
         await session.commit()
         await session.refresh(support_msg)
-        
-        return support_msg.id
+    
+    # Admin panel caches unread counts/conversations; drop them
+    try:
+        await redis_client.bump_cache_generation("support")
+    except Exception as e:
+        logger.warning("Failed to invalidate support cache", error=str(e))
+    
+    return support_msg.id
 
 
 async def handle_support_message(message: Message, user_id: int):
@@ -3,7 +3,6 @@ Text message handler.
 Handles GPT text generation with streaming.
 """
 import asyncio
-import re
 import time
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
@@ -12,8 +11,10 @@ from aiogram.enums import ChatAction
 from bot.services.ai_service import ai_service
 from bot.services.user_service import user_service
 from bot.services.limit_service import limit_service
+from bot.services.intent_service import intent_classifier
 from bot.keyboards.inline import get_subscription_keyboard, get_download_keyboard
 from bot.utils.helpers import convert_markdown_to_html, split_text_for_telegram, edit_or_send_long, send_as_docx
+from bot.utils.triggers import TEXT_INTENTS, needs_web_search
 from database.redis_client import redis_client
 from database.models import RequestType, RequestStatus
 from config import settings
@@ -30,57 +31,7 @@ def _should_search_web(text: str) -> bool:
     Only return True for queries that genuinely need real-time / up-to-date info.
     This prevents the model from searching on greetings, casual talk, general knowledge.
     """
-    text_lower = text.lower().strip()
-    
-    # Too short messages are almost never search-worthy
-    if len(text_lower) < 5:
-        return False
-    
-    # Russian keywords that indicate a need for current/real-time data
-    ru_search_triggers = [
-        "новости", "новость", "погода", "курс", "валют", "цена", "стоимость",
-        "сколько стоит", "какой курс", "какая погода", "что случилось",
-        "что произошло", "последние события", "сегодня", "вчера",
-        "актуальн", "свежие", "текущ", "прямо сейчас",
-        "найди", "найти", "загугли", "погугли", "поищи", "ищи в интернете",
-        "что нового", "расписание", "результат матча", "счёт", "счет",
-        "когда выйдет", "когда выходит", "дата выхода", "релиз",
-        "где купить", "где находится", "адрес", "как доехать",
-        "рецепт", "инструкция по",
-    ]
-    
-    # English keywords
-    en_search_triggers = [
-        "news", "weather", "price", "cost", "exchange rate", "stock",
-        "what happened", "latest", "current", "today", "yesterday",
-        "search for", "google", "look up", "find me", "find info",
-        "score", "match result", "release date", "when does",
-        "where to buy", "where is", "address", "how to get to",
-        "recipe for", "instructions for",
-    ]
-    
-    # Question patterns that imply factual lookup
-    question_patterns = [
-        r"(?:кто|что|где|когда|сколько|какой|какая|какое|какие)\s+(?:такое|такой|такая|такие)?\s*\w+\?",
-        r"(?:who|what|where|when|how much|how many)\s+\w+.*\?",
-    ]
-    
-    for trigger in ru_search_triggers + en_search_triggers:
-        if trigger in text_lower:
-            return True
-    
-    for pattern in question_patterns:
-        if re.search(pattern, text_lower):
-            # Only search if the question seems factual (not conversational)
-            conversational = [
-                "как дела", "как ты", "что умеешь", "кто ты", "как тебя зовут",
-                "how are you", "what can you do", "who are you", "what is your name",
-                "что ты", "как мне", "помоги", "объясни",
-            ]
-            if not any(c in text_lower for c in conversational):
-                return True
-    
-    return False
+    return needs_web_search(text)
 
 
 def _detect_intent(text: str) -> dict | None:
@@ -92,95 +43,18 @@ def _detect_intent(text: str) -> dict | None:
         {"type": "IMAGE"|"VIDEO"|"PRESENTATION"|"COMMAND", "prompt": "...", "command": "..."}
         or None if this is a regular text message for GPT.
     """
-    text_lower = text.lower().strip()
-    
-    # --- COMMAND patterns (natural language shortcuts) ---
-    command_patterns = {
-        "new_dialog": [
-            "новый диалог", "очисти контекст", "начни заново", "сбрось контекст",
-            "new dialog", "clear context", "start over", "reset context",
-        ],
-        "limits": [
-            "мои лимиты", "покажи лимиты", "сколько запросов", "сколько осталось",
-            "my limits", "show limits", "how many requests",
-        ],
-        "help": [
-            "что ты умеешь", "справка",
-            "what can you do",
-        ],
-        "settings": [
-            "открой настройки", "покажи настройки",
-            "open settings", "show settings",
-        ],
-    }
-    for cmd, patterns in command_patterns.items():
-        for pattern in patterns:
-            if pattern in text_lower:
-                return {"type": "COMMAND", "prompt": text, "command": cmd}
-    
-    # --- VIDEO patterns (check BEFORE image — "generate video" must not match image) ---
-    video_patterns = [
-        r"(?:создай|сгенерируй|сделай)\s+(?:мне\s+)?видео",
-        r"(?:create|generate|make)\s+(?:me\s+)?(?:a\s+)?video",
-    ]
-    for pat in video_patterns:
-        if re.search(pat, text_lower):
-            cleaned = text
-            for trigger in [
-                "создай мне видео", "создай видео", "сгенерируй мне видео",
-                "сгенерируй видео", "сделай мне видео", "сделай видео",
-                "create me a video", "create a video", "create video",
-                "generate me a video", "generate a video", "generate video",
-                "make me a video", "make a video", "make video",
-            ]:
-                cleaned = re.sub(rf'(?i)^{re.escape(trigger)}\s*', '', cleaned).strip()
-            return {"type": "VIDEO", "prompt": cleaned if cleaned else text}
-    
-    # --- PRESENTATION patterns (check BEFORE image — "создай презентацию" must not match image) ---
-    pres_patterns = [
-        r"(?:создай|сделай|сгенерируй)\s+(?:мне\s+)?презентаци",
-        r"(?:create|make|generate)\s+(?:me\s+)?(?:a\s+)?presentation",
-    ]
-    for pat in pres_patterns:
-        if re.search(pat, text_lower):
-            cleaned = text
-            for trigger in [
-                "создай мне презентацию", "создай презентацию",
-                "сделай мне презентацию", "сделай презентацию",
-                "сгенерируй мне презентацию", "сгенерируй презентацию",
-                "create me a presentation", "create a presentation", "create presentation",
-                "make me a presentation", "make a presentation", "make presentation",
-                "generate me a presentation", "generate a presentation", "generate presentation",
-            ]:
-                cleaned = re.sub(rf'(?i)^{re.escape(trigger)}\s*', '', cleaned).strip()
-            return {"type": "PRESENTATION", "prompt": cleaned if cleaned else text}
-    
-    # --- IMAGE patterns (last — catch-all for "draw X", "generate X") ---
-    image_patterns = [
-        r"(?:сгенерируй|нарисуй|создай|сделай|покажи)\s+(?:мне\s+)?(?:картинк\w*|изображени\w*|фото\w*|пикч\w*|арт\w*)",
-        r"(?:сгенери(?:руй)?|нарисуй)\s+",
-        r"(?:generate|draw|create|make)\s+(?:me\s+)?(?:an?\s+)?(?:image|picture|photo|art|illustration)",
-        r"(?:draw|generate)\s+(?:me\s+)?(?:a\s+)?",
-    ]
-    for pat in image_patterns:
-        if re.search(pat, text_lower):
-            cleaned = text
-            for trigger in [
-                "нарисуй мне", "нарисуй", "сгенерируй мне картинку", "сгенерируй картинку",
-                "сгенерируй мне изображение", "сгенерируй изображение",
-                "сгенерируй мне фото", "сгенерируй фото",
-                "сгенерируй мне", "сгенерируй", "сгенери мне", "сгенери",
-                "создай картинку", "создай изображение", "сделай картинку", "сделай фото",
-                "покажи мне", "покажи",
-                "создай мне", "создай", "сделай мне", "сделай",
-                "draw me a", "draw me an", "draw me", "draw a", "draw an", "draw",
-                "generate me a", "generate me an", "generate me",
-                "generate a", "generate an", "generate",
-                "create image", "create a", "create an", "create",
-                "make picture", "make a", "make an", "make",
-            ]:
-                cleaned = re.sub(rf'(?i)^{re.escape(trigger)}\s*', '', cleaned).strip()
-            return {"type": "IMAGE", "prompt": cleaned if cleaned else text}
+    # Commands, then VIDEO and PRESENTATION before IMAGE, in one precompiled search
+    found = TEXT_INTENTS.match(text)
+    if found is not None:
+        if found["type"] == "COMMAND":
+            return {"type": "COMMAND", "prompt": found["prompt"], "command": found["command"]}
+        return {"type": found["type"], "prompt": found["prompt"]}
+    
+    # --- Local classifier: only PRESENTATION, like the voice classifier ---
+    # (IMAGE/VIDEO stay keyword-only to avoid costly false positives)
+    local = intent_classifier.classify(text, "message")
+    if local["label"] == "PRESENTATION" and intent_classifier.is_confident(local):
+        return {"type": "PRESENTATION", "prompt": text}
     
     return None
 
@@ -4,15 +4,17 @@ Handles Whisper and Qwen ASR speech recognition with smart intent routing.
 Voice commands can trigger image generation, video, text, presentation, etc.
 """
 import io
-import re
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.enums import ChatAction
 
 from bot.services.ai_service import ai_service
+from bot.services.transcription_service import transcription_service
+from bot.services.intent_service import intent_classifier
 from bot.services.user_service import user_service
 from bot.services.limit_service import limit_service
 from bot.utils.helpers import convert_markdown_to_html, split_text_for_telegram, send_long_message, edit_or_send_long, send_as_file
+from bot.utils.triggers import VOICE_INTENTS
 from bot.keyboards.inline import get_download_keyboard
 from database.redis_client import redis_client
 from database.models import RequestType, RequestStatus
@@ -38,80 +40,20 @@ async def classify_voice_intent(text: str, user_id: int) -> dict:
                         command (if COMMAND intent, which command)
     """
     # Quick keyword-based check first (no AI call needed)
-    text_lower = text.lower().strip()
-    
-    # Command patterns
-    command_patterns = {
-        "new_dialog": [
-            "новый диалог", "очисти контекст", "начни заново", "сбрось контекст",
-            "new dialog", "clear context", "start over", "reset context"
-        ],
-        "limits": [
-            "мои лимиты", "покажи лимиты", "сколько запросов", "сколько осталось",
-            "my limits", "show limits", "how many requests"
-        ],
-        "help": [
-            "помощь", "что ты умеешь", "справка",
-            "help", "what can you do"
-        ],
-        "settings": [
-            "настройки", "settings"
-        ],
-    }
-    
-    for cmd, patterns in command_patterns.items():
-        for pattern in patterns:
-            if pattern in text_lower:
-                return {"intent": "COMMAND", "prompt": text, "command": cmd}
-    
-    # Image generation patterns
-    image_patterns = [
-        r"(?:сгенерируй|нарисуй|создай|сделай|покажи)\s+(?:мне\s+)?(?:картинк|изображени|фото|пикч|арт)",
-        r"(?:generate|draw|create|make|show)\s+(?:me\s+)?(?:an?\s+)?(?:image|picture|photo|art)",
-        r"(?:нарисуй|сгенерируй|сгенери)\s+",
-        r"(?:draw|generate)\s+",
-    ]
-    for pat in image_patterns:
-        if re.search(pat, text_lower):
-            # Extract prompt after the trigger phrase
-            cleaned = text
-            for trigger in ["нарисуй мне", "нарисуй", "сгенерируй мне", "сгенерируй", 
-                          "создай картинку", "создай изображение", "сделай картинку",
-                          "draw me", "draw", "generate me", "generate", "create image",
-                          "make picture"]:
-                cleaned = re.sub(rf'(?i)^{re.escape(trigger)}\s*', '', cleaned).strip()
-            return {"intent": "IMAGE", "prompt": cleaned if cleaned else text, "command": None}
-    
-    # Video patterns
-    video_patterns = [
-        r"(?:создай|сгенерируй|сделай)\s+(?:мне\s+)?видео",
-        r"(?:create|generate|make)\s+(?:me\s+)?(?:a\s+)?video",
-    ]
-    for pat in video_patterns:
-        if re.search(pat, text_lower):
-            cleaned = text
-            for trigger in ["создай видео", "сгенерируй видео", "сделай видео",
-                          "create video", "generate video", "make video"]:
-                cleaned = re.sub(rf'(?i)^{re.escape(trigger)}\s*', '', cleaned).strip()
-            return {"intent": "VIDEO", "prompt": cleaned if cleaned else text, "command": None}
-    
-    # Presentation patterns
-    pres_patterns = [
-        r"(?:создай|сделай|сгенерируй)\s+(?:мне\s+)?презентаци",
-        r"(?:create|make|generate)\s+(?:me\s+)?(?:a\s+)?presentation",
-    ]
-    for pat in pres_patterns:
-        if re.search(pat, text_lower):
-            cleaned = text
-            for trigger in ["создай презентацию", "сделай презентацию", "сгенерируй презентацию",
-                          "создай мне презентацию", "create presentation", "make presentation",
-                          "generate presentation", "create a presentation"]:
-                cleaned = re.sub(rf'(?i)^{re.escape(trigger)}\s*', '', cleaned).strip()
-            return {"intent": "PRESENTATION", "prompt": cleaned if cleaned else text, "command": None}
+    found = VOICE_INTENTS.match(text)
+    if found is not None:
+        return {"intent": found["type"], "prompt": found["prompt"], "command": found["command"]}
     
     # AI classification ONLY for PRESENTATION (not for IMAGE/VIDEO to avoid
     # costly false-positives like accidentally generating an image).
     # For IMAGE and VIDEO, we rely exclusively on keyword patterns above.
+    # The local classifier answers first; the LLM is asked only when it is unsure.
+    local = intent_classifier.classify(text, "message")
+    if intent_classifier.is_confident(local):
+        if local["label"] == "PRESENTATION":
+            return {"intent": "PRESENTATION", "prompt": text, "command": None}
+        return {"intent": "TEXT", "prompt": text, "command": None}
+    
     if len(text) < 200:
         try:
             classify_messages = [
@@ -130,7 +72,8 @@ async def classify_voice_intent(text: str, user_id: int) -> dict:
                 messages=classify_messages,
                 telegram_id=user_id,
                 max_tokens=10,
-                temperature=0.1
+                temperature=0.1,
+                cache_route="classify"
             )
             intent = result.strip().upper()
             if intent == "PRESENTATION":
@@ -399,19 +342,15 @@ async def handle_voice_message(message: Message):
         progress_msg = await message.answer("🎤 Transcribing speech...")
     
     try:
-        # Download voice file
-        file = await message.bot.get_file(voice.file_id)
-        file_bytes = await message.bot.download_file(file.file_path)
-        
-        # Read bytes from BytesIO
-        audio_data = file_bytes.read() if hasattr(file_bytes, 'read') else file_bytes
-        
-        # Transcribe using unified AI service
-        text, usage = await ai_service.transcribe_audio(
-            audio_data=audio_data,
+        # Download and transcribe (served from cache for forwarded voices)
+        text, usage = await transcription_service.transcribe_telegram_file(
+            bot=message.bot,
+            file_id=voice.file_id,
+            file_unique_id=voice.file_unique_id,
             filename="voice.ogg",
             language=language if language in ["ru", "en", "zh"] else None,
-            telegram_id=user.id
+            telegram_id=user.id,
+            duration=voice.duration
         )
         
         if not text or not text.strip():
@@ -824,16 +763,14 @@ async def handle_audio_file(message: Message):
         progress_msg = await message.answer("🎵 Processing audio file...")
     
     try:
-        # Download file
-        file = await message.bot.get_file(audio.file_id)
-        file_bytes = await message.bot.download_file(file.file_path)
-        audio_data = file_bytes.read() if hasattr(file_bytes, 'read') else file_bytes
-        
-        # Transcribe using unified AI service
-        text, usage = await ai_service.transcribe_audio(
-            audio_data=audio_data,
+        # Download and transcribe (served from cache for already seen files)
+        text, usage = await transcription_service.transcribe_telegram_file(
+            bot=message.bot,
+            file_id=audio.file_id,
+            file_unique_id=audio.file_unique_id,
             filename=filename,
-            telegram_id=user.id
+            telegram_id=user.id,
+            duration=audio.duration
         )
         
         if not text or not text.strip():
@@ -1,6 +1,9 @@
 """Bot middlewares module."""
 from bot.middlewares.auth import AuthMiddleware
+from bot.middlewares.group_filter import GroupFilterMiddleware
+from bot.middlewares.lanes import LaneMiddleware
 from bot.middlewares.logging import LoggingMiddleware
+from bot.middlewares.request_metrics import RequestMetricsMiddleware
 from bot.middlewares.throttling import ThrottlingMiddleware
 
-__all__ = ["AuthMiddleware", "LoggingMiddleware", "ThrottlingMiddleware"]
+__all__ = ["AuthMiddleware", "GroupFilterMiddleware", "LaneMiddleware", "LoggingMiddleware", "RequestMetricsMiddleware", "ThrottlingMiddleware"]
@@ -11,6 +11,7 @@ from bot.services.subscription_service import subscription_service
 from bot.services.settings_service import settings_service
 from bot.keyboards.main import get_subscription_keyboard
 from config import settings as config_settings
+from database.redis_client import redis_client
 import structlog
 
 logger = structlog.get_logger()
@@ -104,6 +105,10 @@ class AuthMiddleware(BaseMiddleware):
         data['db_user'] = db_user
         data['chat_type'] = chat_type
         
+        # Премиум, о котором ещё не знает лимитер запросов (ThrottlingMiddleware)
+        if data.get('premium_plan') is False and db_user.is_premium:
+            await redis_client.set_premium_plan(user.id, db_user.subscription_expires_at)
+        
         # 3. ПРОВЕРКА БЛОКИРОВКИ
         if db_user.is_blocked:
             logger.warning("Blocked user attempted access", telegram_id=user.id)
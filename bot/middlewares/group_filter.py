@@ -0,0 +1,85 @@
+"""
+Group chat pre-filter.
+Most group traffic is chatter the bot ignores. Whether a message is
+addressed to the bot is decided from the message alone, and the rest is
+dropped before lanes, logging, throttling, auth and any Redis or
+database work.
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, Update
+
+from bot.utils.metrics import GROUP_MESSAGES
+from bot.utils.triggers import is_bot_triggered
+
+GROUP_CHAT_TYPES = {"group", "supergroup"}
+
+# Content the group handlers answer only when the bot is addressed;
+# anything else passes through untouched
+ADDRESSABLE_CONTENT = ("text", "photo", "voice", "audio", "document")
+
+
+def is_addressed_to_bot(message: Message, bot_id: int, bot_username: str) -> bool:
+    """
+    Check if a group message is for the bot: a command (without another
+    bot's @mention), a reply to the bot, a text mention of the bot, or
+    the @username / trigger words the group handlers react to.
+    """
+    text = message.text or message.caption or ""
+    
+    if text.lstrip().startswith("/"):
+        command = text.split(maxsplit=1)[0]
+        _, _, mention = command.partition("@")
+        return not mention or mention.lower() == bot_username.lower()
+    
+    reply = message.reply_to_message
+    if reply and reply.from_user and reply.from_user.id == bot_id:
+        return True
+    
+    for entity in message.entities or message.caption_entities or ():
+        if entity.type == "text_mention" and entity.user and entity.user.id == bot_id:
+            return True
+    
+    return is_bot_triggered(text, bot_username)
+
+
+class GroupFilterMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that drops group messages not addressed to
+    the bot.
+    
+    Register on ``dp.update.outer_middleware`` before the lanes, so
+    chatter neither waits in nor fills a busy group's lane. Uses the
+    ``bot_info`` cached at startup; until it is set everything passes.
+    """
+    
+    def __init__(self):
+        self.passed = 0
+        self.dropped = 0
+        super().__init__()
+    
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        message = event.message
+        bot_info = data.get("bot_info")
+        if (
+            message is None
+            or bot_info is None
+            or message.chat.type not in GROUP_CHAT_TYPES
+            or not any(getattr(message, content) for content in ADDRESSABLE_CONTENT)
+        ):
+            return await handler(event, data)
+        
+        if is_addressed_to_bot(message, bot_info.id, bot_info.username or ""):
+            self.passed += 1
+            GROUP_MESSAGES.labels(result="addressed").inc()
+            return await handler(event, data)
+        
+        self.dropped += 1
+        GROUP_MESSAGES.labels(result="dropped").inc()
+        return None
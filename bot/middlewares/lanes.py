@@ -0,0 +1,228 @@
+"""
+Per-chat update lanes.
+Updates from different chats run concurrently, a chat's messages run one
+at a time in arrival order, and a global cap bounds how many handlers
+run at once. A chat that queues up too much gets a short notice instead
+of an ever-growing backlog. Per-lane stats are published to Redis for
+the admin API.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from database.redis_client import redis_client
+from bot.utils.metrics import HANDLERS_RUNNING, LANE_SHED, LANE_WAITING
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+# Update types kept in order per chat; the rest (callbacks, inline
+# queries, ...) only count against the global cap
+LANED_UPDATE_TYPES = {"message", "edited_message"}
+
+STATS_KEY_PREFIX = "lanes:stats:"
+STATS_TTL = 120
+PUBLISH_SECONDS = 15
+
+SHED_MESSAGE = "⏳ Я ещё обрабатываю ваши предыдущие сообщения. Подождите немного и повторите."
+
+
+class LaneMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that serializes each chat's messages.
+    
+    Polling runs every update as its own task, so without this a user's
+    second message can be handled before the first one finishes. Each
+    chat gets a lane (a FIFO lock) with at most ``lane_max_queue``
+    waiting updates; beyond that the update is dropped with a notice
+    (sent once per saturation). ``update_max_concurrency`` handlers run
+    at once across all chats; a waiting lane does not hold a slot.
+    
+    Register on ``dp.update.outer_middleware`` so it runs after aiogram's
+    own context middleware (event_chat / event_from_user are set), and
+    call ``start()`` once Redis is connected to publish ``stats()``.
+    """
+    
+    def __init__(self):
+        self.instance = f"{socket.gethostname()}:{os.getpid()}"
+        self._lanes: Dict[int, Dict[str, Any]] = {}
+        self._publish_task: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.processed = 0
+        self.shed = 0
+        self.running = 0
+        super().__init__()
+    
+    def _lane(self, key: int) -> Dict[str, Any]:
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = {
+                "lock": asyncio.Lock(),
+                "waiting": 0,
+                "processed": 0,
+                "shed": 0,
+                "max_wait_ms": 0.0,
+                "notified": False,
+            }
+            self._lanes[key] = lane
+        return lane
+    
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.update_max_concurrency)
+        
+        chat = data.get("event_chat")
+        if event.event_type not in LANED_UPDATE_TYPES or chat is None:
+            async with self._slots:
+                return await self._run(handler, event, data)
+        
+        lane = self._lane(chat.id)
+        if lane["waiting"] >= settings.lane_max_queue:
+            await self._shed(event, chat.id, lane)
+            return None
+        
+        lane["waiting"] += 1
+        LANE_WAITING.inc()
+        queued_at = time.monotonic()
+        try:
+            await lane["lock"].acquire()
+        finally:
+            lane["waiting"] -= 1
+            LANE_WAITING.dec()
+        
+        try:
+            lane["notified"] = False
+            lane["max_wait_ms"] = max(lane["max_wait_ms"], (time.monotonic() - queued_at) * 1000)
+            async with self._slots:
+                result = await self._run(handler, event, data)
+            lane["processed"] += 1
+            return result
+        finally:
+            lane["lock"].release()
+            if not lane["lock"].locked() and lane["waiting"] == 0:
+                self._lanes.pop(chat.id, None)
+    
+    async def _run(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.running += 1
+        HANDLERS_RUNNING.inc()
+        try:
+            return await handler(event, data)
+        finally:
+            self.running -= 1
+            HANDLERS_RUNNING.dec()
+            self.processed += 1
+    
+    async def _shed(self, event: Update, chat_id: int, lane: Dict[str, Any]) -> None:
+        self.shed += 1
+        lane["shed"] += 1
+        LANE_SHED.inc()
+        logger.warning("Update lane saturated, update dropped", chat_id=chat_id, waiting=lane["waiting"])
+        
+        if lane["notified"] or event.message is None:
+            return
+        lane["notified"] = True
+        try:
+            await event.message.answer(SHED_MESSAGE)
+        except Exception as e:
+            logger.warning("Failed to send lane saturation notice", chat_id=chat_id, error=str(e))
+    
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """Totals plus the busiest lanes (by waiting updates)."""
+        busiest: List[Dict[str, Any]] = [
+            {
+                "chat_id": chat_id,
+                "waiting": lane["waiting"],
+                "busy": lane["lock"].locked(),
+                "processed": lane["processed"],
+                "shed": lane["shed"],
+                "max_wait_ms": round(lane["max_wait_ms"], 1),
+            }
+            for chat_id, lane in sorted(
+                self._lanes.items(), key=lambda item: item[1]["waiting"], reverse=True
+            )[:top]
+        ]
+        return {
+            "lanes": len(self._lanes),
+            "waiting": sum(lane["waiting"] for lane in self._lanes.values()),
+            "running": self.running,
+            "processed": self.processed,
+            "shed": self.shed,
+            "busiest": busiest,
+        }
+    
+    # =========================================
+    # Status
+    # =========================================
+    
+    def start(self) -> None:
+        """Publish stats() to Redis every PUBLISH_SECONDS."""
+        if self._publish_task is None:
+            self._publish_task = asyncio.create_task(self._publish_loop())
+    
+    async def stop(self) -> None:
+        """Stop publishing and remove this process's snapshot."""
+        if self._publish_task is None:
+            return
+        self._publish_task.cancel()
+        await asyncio.gather(self._publish_task, return_exceptions=True)
+        self._publish_task = None
+        try:
+            await redis_client.client.delete(f"{STATS_KEY_PREFIX}{self.instance}")
+        except Exception as e:
+            logger.warning("Failed to remove lane stats", error=str(e))
+    
+    async def publish(self) -> None:
+        """Store this process's lane stats in Redis for the admin API."""
+        try:
+            await redis_client.client.setex(
+                f"{STATS_KEY_PREFIX}{self.instance}",
+                STATS_TTL,
+                json.dumps({"updated_at": time.time(), **self.stats()})
+            )
+        except Exception as e:
+            logger.warning("Failed to publish lane stats", error=str(e))
+    
+    async def _publish_loop(self) -> None:
+        while True:
+            await self.publish()
+            await asyncio.sleep(PUBLISH_SECONDS)
+
+
+async def collect_lane_stats(top: int = 10) -> Dict[str, Any]:
+    """Lane totals and the busiest lanes merged across every bot process."""
+    totals = {"lanes": 0, "waiting": 0, "running": 0, "processed": 0, "shed": 0}
+    busiest: List[Dict[str, Any]] = []
+    processes: Dict[str, Any] = {}
+    async for key in redis_client.client.scan_iter(match=f"{STATS_KEY_PREFIX}*"):
+        raw = await redis_client.client.get(key)
+        if raw is None:
+            continue
+        snapshot = json.loads(raw)
+        instance = key[len(STATS_KEY_PREFIX):]
+        processes[instance] = {
+            "updated_at": snapshot["updated_at"],
+            **{name: snapshot[name] for name in totals},
+        }
+        for name in totals:
+            totals[name] += snapshot[name]
+        busiest += [{**lane, "instance": instance} for lane in snapshot["busiest"]]
+    
+    busiest.sort(key=lambda lane: (lane["waiting"], lane["max_wait_ms"]), reverse=True)
+    return {**totals, "busiest": busiest[:top], "processes": processes}
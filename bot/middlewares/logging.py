@@ -3,10 +3,12 @@ Logging middleware.
 Logs all incoming updates for debugging and analytics.
 """
 import time
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Tuple
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, Update, InlineQuery
 
+from bot.utils.metrics import observe_update, start_update_counters
+from bot.utils.tracing import trace
 import structlog
 
 logger = structlog.get_logger()
@@ -15,7 +17,9 @@ logger = structlog.get_logger()
 class LoggingMiddleware(BaseMiddleware):
     """
     Middleware for logging all incoming updates.
-    Tracks timing and user activity.
+    Tracks timing and user activity, records handler latency and
+    DB/Redis roundtrips per update in Prometheus metrics, and opens the
+    update's trace.
     """
     
     async def __call__(
@@ -26,11 +30,32 @@ class LoggingMiddleware(BaseMiddleware):
     ) -> Any:
         """Log update and measure handler execution time."""
         
-        start_time = time.time()
+        router, handler_name = self._handler_labels(data)
         
         # Extract event info for logging
         event_info = self._extract_event_info(event)
         
+        # Root span of the update's trace; its trace id is in every log line
+        with trace(
+            f"update {router}.{handler_name}",
+            update_type=event_info["update_type"],
+            user_id=event_info.get("user_id"),
+            chat_id=event_info.get("chat_id")
+        ):
+            return await self._handle(handler, event, data, event_info, router, handler_name)
+    
+    async def _handle(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+        event_info: Dict[str, Any],
+        router: str,
+        handler_name: str
+    ) -> Any:
+        start_time = time.time()
+        counts = start_update_counters()
+        
         logger.info(
             "Incoming update",
             **event_info
@@ -39,7 +64,9 @@ class LoggingMiddleware(BaseMiddleware):
         try:
             result = await handler(event, data)
             
-            duration_ms = int((time.time() - start_time) * 1000)
+            duration = time.time() - start_time
+            duration_ms = int(duration * 1000)
+            observe_update(router, handler_name, event_info["update_type"], "ok", duration, counts)
             
             logger.info(
                 "Update handled successfully",
@@ -50,7 +77,9 @@ class LoggingMiddleware(BaseMiddleware):
             return result
             
         except Exception as e:
-            duration_ms = int((time.time() - start_time) * 1000)
+            duration = time.time() - start_time
+            duration_ms = int(duration * 1000)
+            observe_update(router, handler_name, event_info["update_type"], "error", duration, counts)
             
             logger.error(
                 "Update handler error",
@@ -62,6 +91,15 @@ class LoggingMiddleware(BaseMiddleware):
             
             raise
     
+    def _handler_labels(self, data: Dict[str, Any]) -> Tuple[str, str]:
+        """(router module, handler function) of the matched handler."""
+        handler = data.get("handler")
+        callback = getattr(handler, "callback", None)
+        if callback is None:
+            return "unknown", "unknown"
+        module = getattr(callback, "__module__", "") or ""
+        return module.rsplit(".", 1)[-1] or "unknown", getattr(callback, "__name__", "unknown")
+    
     def _extract_event_info(self, event: Update) -> Dict[str, Any]:
         """Extract relevant info from update for logging."""
         
@@ -0,0 +1,49 @@
+"""
+Bot API request metrics.
+Counts outgoing Telegram calls per method, their latency and how often
+Telegram answers 429 Too Many Requests; each call is also a trace span.
+"""
+import time
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+
+from bot.utils.metrics import TELEGRAM_DURATION, TELEGRAM_REQUESTS, TELEGRAM_RETRY_AFTER
+from bot.utils.tracing import span
+import structlog
+
+logger = structlog.get_logger()
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Session middleware recording every Bot API call.
+    
+    Register with ``bot.session.middleware(RequestMetricsMiddleware())``.
+    """
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod[Any]
+    ) -> Response[Any]:
+        name = type(method).__name__
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span(f"telegram.{name}"):
+                response = await make_request(bot, method)
+            status = "ok"
+            return response
+        except TelegramRetryAfter as e:
+            status = "retry_after"
+            TELEGRAM_RETRY_AFTER.labels(name).inc()
+            logger.warning("Telegram flood control", method=name, retry_after=e.retry_after)
+            raise
+        finally:
+            TELEGRAM_REQUESTS.labels(name, status).inc()
+            TELEGRAM_DURATION.labels(name).observe(time.perf_counter() - started)
@@ -2,11 +2,13 @@
 Throttling middleware.
 Prevents spam and abuse by rate limiting requests.
 """
-from typing import Any, Awaitable, Callable, Dict
+import math
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, Update
 
 from database.redis_client import redis_client
+from config import settings
 import structlog
 
 logger = structlog.get_logger()
@@ -15,28 +17,33 @@ logger = structlog.get_logger()
 class ThrottlingMiddleware(BaseMiddleware):
     """
     Middleware for rate limiting user requests.
-    Uses Redis sliding window counter.
+    Uses a GCRA limiter in Redis over several tiers (per user, per group
+    chat, global), with a higher per-user rate for premium users; one
+    roundtrip per check.
     """
     
-    def __init__(
-        self,
-        rate_limit: int = 30,  # requests
-        time_window: int = 60,  # seconds
-        key_prefix: str = "throttle"
-    ):
+    def __init__(self, key_prefix: str = "throttle"):
         """
         Initialize throttling middleware.
         
         Args:
-            rate_limit: Maximum requests per time window
-            time_window: Time window in seconds
             key_prefix: Redis key prefix
         """
-        self.rate_limit = rate_limit
-        self.time_window = time_window
         self.key_prefix = key_prefix
         super().__init__()
     
+    def _tiers(self, user_id: int, chat_id: Optional[int], chat_type: Optional[str]) -> List[Tuple[str, int, int]]:
+        """(key, limit, period) of every enabled tier, the user's first."""
+        period = settings.throttle_period
+        tiers = []
+        if settings.throttle_user_rate > 0:
+            tiers.append((f"{self.key_prefix}:user:{user_id}", settings.throttle_user_rate, period))
+        if chat_id and chat_type in ("group", "supergroup") and settings.throttle_chat_rate > 0:
+            tiers.append((f"{self.key_prefix}:chat:{chat_id}", settings.throttle_chat_rate, period))
+        if settings.throttle_global_rate > 0:
+            tiers.append((f"{self.key_prefix}:global", settings.throttle_global_rate, period))
+        return tiers
+    
     async def __call__(
         self,
         handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
@@ -45,42 +52,52 @@ class ThrottlingMiddleware(BaseMiddleware):
     ) -> Any:
         """Check rate limit before processing update."""
         
-        # Extract user ID
+        # Extract user and chat
         user_id = None
+        chat = None
         
         if isinstance(event, Message):
             user_id = event.from_user.id if event.from_user else None
+            chat = event.chat
         elif isinstance(event, CallbackQuery):
             user_id = event.from_user.id
+            chat = event.message.chat if event.message else None
         
         if not user_id:
             return await handler(event, data)
         
-        # Check rate limit
-        key = f"{self.key_prefix}:user:{user_id}"
+        tiers = self._tiers(user_id, chat.id if chat else None, chat.type if chat else None)
+        if not tiers:
+            return await handler(event, data)
         
-        is_allowed = await redis_client.check_rate_limit(
-            key,
-            self.rate_limit,
-            self.time_window
+        # Check rate limit
+        user_tier = settings.throttle_user_rate > 0
+        retry_after, is_premium = await redis_client.check_rate_limit(
+            tiers,
+            plan_key=f"user:{user_id}:plan" if user_tier else None,
+            premium_limit=settings.throttle_premium_rate if user_tier else 0
         )
+        # Lets AuthMiddleware mark premium users the limiter doesn't know yet
+        if user_tier:
+            data["premium_plan"] = is_premium
         
-        if not is_allowed:
+        if retry_after > 0:
+            wait = math.ceil(retry_after)
             logger.warning(
                 "User throttled",
                 user_id=user_id,
-                rate_limit=self.rate_limit,
-                time_window=self.time_window
+                chat_id=chat.id if chat else None,
+                retry_after=wait
             )
             
             # Send throttle message
             if isinstance(event, Message):
                 await event.answer(
-                    "⏳ Слишком много запросов. Пожалуйста, подождите немного."
+                    f"⏳ Слишком много запросов. Подождите {wait} сек."
                 )
             elif isinstance(event, CallbackQuery):
                 await event.answer(
-                    "⏳ Слишком много запросов. Подождите немного.",
+                    f"⏳ Слишком много запросов. Подождите {wait} сек.",
                     show_alert=True
                 )
             
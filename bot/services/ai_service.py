@@ -1,13 +1,22 @@
 """
 Unified AI service that routes requests to the appropriate provider.
-Uses CometAPI as the main provider for all AI operations.
+Uses CometAPI as the main provider for all AI operations, with OpenAI as
+a failover chosen by provider_router from live health data.
 GigaChat is used for presentations (separate API).
 """
+import asyncio
+import time
 from typing import Optional, AsyncGenerator, Dict, Any, List, Tuple, Literal
 from decimal import Decimal
 
 from bot.services.cometapi_service import cometapi_service, CometAPIService
 from bot.services.openai_service import openai_service, OpenAIService
+from bot.services.image_service import image_service
+from bot.services.llm_cache import llm_cache
+from bot.services.provider_router import (
+    provider_router, is_client_error, ProviderUnavailableError,
+    TEXT, VISION, IMAGE, VIDEO, AUDIO, OPEN
+)
 from config import settings
 import structlog
 
@@ -15,6 +24,12 @@ logger = structlog.get_logger()
 
 AIProvider = Literal["cometapi", "openai"]
 
+# Models used when a request fails over to OpenAI
+OPENAI_FALLBACK_MODELS = {
+    TEXT: "gpt-4o-mini",
+    VISION: "gpt-4o",
+}
+
 
 class AIService:
     """
@@ -27,6 +42,9 @@ class AIService:
     - Video: default sora-2 (via CometAPI)
     - Voice: default whisper-1 (via CometAPI)
     - Presentations: GigaChat (direct API, separate)
+    
+    Each call goes through provider_router: CometAPI first, OpenAI when
+    CometAPI's circuit is open, it is degraded or the call fails.
     """
     
     def __init__(self):
@@ -64,6 +82,15 @@ class AIService:
             return self.openai
         return self.cometapi
     
+    def get_providers(self) -> List[AIProvider]:
+        """Configured providers in preference order."""
+        providers: List[AIProvider] = []
+        if self.cometapi.is_configured():
+            providers.append("cometapi")
+        if settings.openai_configured or not providers:
+            providers.append("openai")
+        return providers
+    
     # =========================================
     # Text Generation (CometAPI / qwen3-max-2026-01-23)
     # =========================================
@@ -90,23 +117,40 @@ class AIService:
             Tuple of (chunk_text, is_complete_flag)
         """
         model = model or self.MODELS["text"]
+        candidates = provider_router.order(TEXT, self.get_providers())
         
-        # Use CometAPI if configured, otherwise fall back to OpenAI
-        if self.cometapi.is_configured():
-            service = self.cometapi
-            logger.info(f"Text generation using CometAPI/{model}", user_id=telegram_id)
-        else:
-            service = self.openai
-            model = "gpt-4o-mini"  # Fallback model
-            logger.info(f"Text generation using OpenAI/{model} (fallback)", user_id=telegram_id)
-        
-        async for chunk, is_complete in service.generate_text_stream(
-            messages=messages,
-            model=model,
-            max_tokens=max_tokens,
-            temperature=temperature
-        ):
-            yield chunk, is_complete
+        # Fail over only while nothing has been yielded yet
+        last_error = None
+        for index, provider in enumerate(candidates):
+            if not provider_router.allow(provider, TEXT):
+                continue
+            
+            provider_model = model if provider == "cometapi" else OPENAI_FALLBACK_MODELS[TEXT]
+            logger.info(f"Text generation using {provider}/{provider_model}", user_id=telegram_id)
+            
+            started = time.monotonic()
+            yielded = False
+            try:
+                async for chunk, is_complete in self.get_service(provider).generate_text_stream(
+                    messages=messages,
+                    model=provider_model,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                ):
+                    yielded = True
+                    yield chunk, is_complete
+            except Exception as e:
+                provider_router.record(provider, TEXT, (time.monotonic() - started) * 1000, False, e)
+                if yielded or is_client_error(e) or index + 1 == len(candidates):
+                    raise
+                last_error = e
+                logger.warning("Text stream failed, failing over", provider=provider, error=str(e))
+                continue
+            
+            provider_router.record(provider, TEXT, (time.monotonic() - started) * 1000, True)
+            return
+        
+        raise last_error or ProviderUnavailableError("No text provider available")
     
     async def generate_text(
         self,
@@ -114,30 +158,43 @@ class AIService:
         telegram_id: int = None,
         model: str = None,
         max_tokens: int = 4096,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        cache_route: Optional[str] = None
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Generate text without streaming using CometAPI (qwen3-max-2026-01-23).
         
+        Args:
+            cache_route: Response cache route (see llm_cache.ROUTES) for
+                stateless prompts that are safe to share between users.
+                Leave unset for anything personalized or with history.
+        
         Returns:
             Tuple of (response_text, usage_info)
         """
         model = model or self.MODELS["text"]
         
-        if self.cometapi.is_configured():
-            service = self.cometapi
-            logger.info(f"Text generation using CometAPI/{model}", user_id=telegram_id)
-        else:
-            service = self.openai
-            model = "gpt-4o-mini"
-            logger.info(f"Text generation using OpenAI/{model} (fallback)", user_id=telegram_id)
-        
-        return await service.generate_text(
-            messages=messages,
-            model=model,
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
+        if cache_route:
+            cached = await llm_cache.get(cache_route, messages, model, max_tokens, temperature)
+            if cached is not None:
+                return cached
+        
+        logger.info(f"Text generation ({model})", user_id=telegram_id)
+        
+        calls = {
+            provider: lambda provider=provider: self.get_service(provider).generate_text(
+                messages=messages,
+                model=model if provider == "cometapi" else OPENAI_FALLBACK_MODELS[TEXT],
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            for provider in self.get_providers()
+        }
+        text, usage = await provider_router.call(TEXT, calls, hedge=True)
+        
+        if cache_route:
+            await llm_cache.set(cache_route, messages, model, max_tokens, temperature, text, usage)
+        return text, usage
     
     # =========================================
     # Text with Web Search (Responses API)
@@ -156,31 +213,33 @@ class AIService:
         Generate text with optional web search via Responses API.
         
         The model automatically decides when to search the web.
-        Falls back to regular text generation if Responses API fails.
+        When CometAPI is unavailable the request goes to OpenAI as plain
+        text generation (no search).
         
         Returns:
             Tuple of (response_text, usage_info)
         """
         model = model or "qwen3-max-2026-01-23"
+        logger.info(f"Text+search generation ({model})", user_id=telegram_id)
         
-        if self.cometapi.is_configured():
-            logger.info(f"Text+search generation using CometAPI/{model}", user_id=telegram_id)
-            return await self.cometapi.generate_text_with_search(
-                messages=messages,
-                model=model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                enable_search=enable_search,
-            )
-        else:
-            # OpenAI fallback — no search support, use regular generation
-            logger.info("Text generation using OpenAI (fallback, no search)", user_id=telegram_id)
-            return await self.openai.generate_text(
-                messages=messages,
-                model="gpt-4o-mini",
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
+        calls = {}
+        for provider in self.get_providers():
+            if provider == "cometapi":
+                calls[provider] = lambda: self.cometapi.generate_text_with_search(
+                    messages=messages,
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    enable_search=enable_search,
+                )
+            else:
+                calls[provider] = lambda: self.openai.generate_text(
+                    messages=messages,
+                    model=OPENAI_FALLBACK_MODELS[TEXT],
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+        return await provider_router.call(TEXT, calls)
     
     # =========================================
     # Vision (Image Analysis via CometAPI)
@@ -192,62 +251,74 @@ class AIService:
         image_data: bytes = None,
         prompt: str = "Describe this image in detail.",
         telegram_id: int = None,
-        model: str = None
+        model: str = None,
+        image_key: str = None
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Analyze image using CometAPI (qwen3-max-2026-01-23 vision).
         
+        Args:
+            image_key: Stable image ID (Telegram file_unique_id) for the
+                normalization cache
+        
         Returns:
             Tuple of (analysis_text, usage_info)
         """
         model = model or self.MODELS["vision"]
         
-        if self.cometapi.is_configured():
-            logger.info(f"Image analysis using CometAPI/{model}", user_id=telegram_id)
-            return await self.cometapi.analyze_image(
-                image_url=image_url,
-                image_data=image_data,
-                prompt=prompt,
-                model=model
-            )
-        else:
-            logger.info("Image analysis using OpenAI/gpt-4o (fallback)", user_id=telegram_id)
-            return await self.openai.analyze_image(
+        if image_data:
+            image_data = await image_service.normalize(image_data, "photo", cache_key=image_key)
+        
+        logger.info(f"Image analysis ({model})", user_id=telegram_id)
+        calls = {
+            provider: lambda provider=provider: self.get_service(provider).analyze_image(
                 image_url=image_url,
                 image_data=image_data,
                 prompt=prompt,
-                model="gpt-4o"
+                model=model if provider == "cometapi" else OPENAI_FALLBACK_MODELS[VISION]
             )
+            for provider in self.get_providers()
+        }
+        return await provider_router.call(VISION, calls)
     
     async def analyze_document_images(
         self,
         images: List[bytes],
         prompt: str,
         telegram_id: int = None,
-        model: str = None
+        model: str = None,
+        image_keys: List[Optional[str]] = None,
+        profile: str = "document"
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Analyze multiple document page images via CometAPI.
         
+        Args:
+            image_keys: Stable IDs per image (Telegram file_unique_id) for
+                the normalization cache
+            profile: Normalization profile (document for pages, photo for albums)
+        
         Returns:
             Tuple of (analysis_text, usage_info)
         """
         model = model or self.MODELS["vision"]
         
-        if self.cometapi.is_configured():
-            logger.info(f"Document analysis using CometAPI/{model}", user_id=telegram_id)
-            return await self.cometapi.analyze_document_images(
-                images=images,
-                prompt=prompt,
-                model=model
-            )
-        else:
-            logger.info("Document analysis using OpenAI/gpt-4o (fallback)", user_id=telegram_id)
-            return await self.openai.analyze_document_images(
+        image_keys = image_keys or [None] * len(images)
+        images = list(await asyncio.gather(*(
+            image_service.normalize(img, profile, cache_key=key)
+            for img, key in zip(images, image_keys)
+        )))
+        
+        logger.info(f"Document analysis ({model})", user_id=telegram_id)
+        calls = {
+            provider: lambda provider=provider: self.get_service(provider).analyze_document_images(
                 images=images,
                 prompt=prompt,
-                model="gpt-4o"
+                model=model if provider == "cometapi" else OPENAI_FALLBACK_MODELS[VISION]
             )
+            for provider in self.get_providers()
+        }
+        return await provider_router.call(VISION, calls)
     
     # =========================================
     # Image Generation (CometAPI / DALL-E 3)
@@ -278,23 +349,25 @@ class AIService:
         """
         model = model or self.MODELS["image"]
         
-        if self.cometapi.is_configured():
-            logger.info(f"Image generation using CometAPI/{model}", user_id=telegram_id, size=size)
-            return await self.cometapi.generate_image(
-                prompt=prompt,
-                size=size,
-                style=style,
-                quality=quality,
-                model=model
-            )
-        else:
-            logger.info("Image generation using OpenAI/dall-e-3 (fallback)", user_id=telegram_id)
-            return await self.openai.generate_image(
-                prompt=prompt,
-                size=size,
-                style=style,
-                quality=quality
-            )
+        logger.info(f"Image generation ({model})", user_id=telegram_id, size=size)
+        calls = {}
+        for provider in self.get_providers():
+            if provider == "cometapi":
+                calls[provider] = lambda: self.cometapi.generate_image(
+                    prompt=prompt,
+                    size=size,
+                    style=style,
+                    quality=quality,
+                    model=model
+                )
+            else:
+                calls[provider] = lambda: self.openai.generate_image(
+                    prompt=prompt,
+                    size=size,
+                    style=style,
+                    quality=quality
+                )
+        return await provider_router.call(IMAGE, calls)
     
     async def download_image(self, url: str) -> bytes:
         """Download image from URL."""
@@ -313,7 +386,8 @@ class AIService:
         telegram_id: int = None,
         model: str = "gpt-image-1",
         size: str = "auto",
-        quality: str = "auto"
+        quality: str = "auto",
+        image_key: str = None
     ) -> Tuple[bytes, Dict[str, Any]]:
         """
         Edit an image based on text instruction using GPT-Image-1.
@@ -328,29 +402,26 @@ class AIService:
             model: Image editing model
             size: Output size
             quality: Output quality
+            image_key: Stable image ID (Telegram file_unique_id) for the
+                normalization cache
             
         Returns:
             Tuple of (edited_image_bytes, usage_info)
         """
-        if self.cometapi.is_configured():
-            logger.info(f"Image editing using CometAPI/{model}", user_id=telegram_id)
-            return await self.cometapi.edit_image(
-                image_data=image_data,
-                prompt=prompt,
-                model=model,
-                size=size,
-                quality=quality
-            )
-        else:
-            # Fallback to OpenAI direct
-            logger.info(f"Image editing using OpenAI/{model} (fallback)", user_id=telegram_id)
-            return await self.openai.edit_image(
+        image_data = await image_service.normalize(image_data, "edit", cache_key=image_key)
+        
+        logger.info(f"Image editing ({model})", user_id=telegram_id)
+        calls = {
+            provider: lambda provider=provider: self.get_service(provider).edit_image(
                 image_data=image_data,
                 prompt=prompt,
                 model=model,
                 size=size,
                 quality=quality
             )
+            for provider in self.get_providers()
+        }
+        return await provider_router.call(IMAGE, calls)
     
     # =========================================
     # Video Generation (CometAPI / Sora)
@@ -378,31 +449,35 @@ class AIService:
             
         Returns:
             Video task info with video_id
+        
+        No failover: status polling and download go to the default
+        provider, so the video must be created there too. The call is
+        still tracked, and refused while that provider's circuit is open.
         """
         model = model or self.MODELS["video"]
         
-        if self.cometapi.is_configured():
-            logger.info(
-                f"Video creation using CometAPI/{model}",
-                user_id=telegram_id,
-                duration=duration,
-                has_reference=input_reference is not None
-            )
-            return await self.cometapi.create_video(
+        logger.info(
+            f"Video creation ({model})",
+            user_id=telegram_id,
+            duration=duration,
+            has_reference=input_reference is not None
+        )
+        if self.get_default_provider() == "cometapi":
+            calls = {"cometapi": lambda: self.cometapi.create_video(
                 prompt=prompt,
                 model=model,
                 duration=duration,
                 size=size,
                 input_reference=input_reference
-            )
+            )}
         else:
-            logger.info(f"Video creation using OpenAI/{model} (fallback)", user_id=telegram_id)
-            return await self.openai.create_video(
+            calls = {"openai": lambda: self.openai.create_video(
                 prompt=prompt,
                 model=model,
                 duration=duration,
                 size=size
-            )
+            )}
+        return await provider_router.call(VIDEO, calls, failover=False)
     
     async def get_video_status(self, video_id: str) -> Dict[str, Any]:
         """Check video generation status."""
@@ -448,6 +523,7 @@ class AIService:
         filename: str = "audio.ogg",
         language: str = None,
         telegram_id: int = None,
+        duration_seconds: float = None,
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Transcribe audio using CometAPI (Whisper).
@@ -455,20 +531,17 @@ class AIService:
         Returns:
             Tuple of (transcribed_text, usage_info)
         """
-        if self.cometapi.is_configured():
-            logger.info(f"Audio transcription using CometAPI/whisper-1", user_id=telegram_id)
-            return await self.cometapi.transcribe_audio(
+        logger.info("Audio transcription (whisper-1)", user_id=telegram_id)
+        calls = {
+            provider: lambda provider=provider: self.get_service(provider).transcribe_audio(
                 audio_data=audio_data,
                 filename=filename,
-                language=language
-            )
-        else:
-            logger.info("Audio transcription using OpenAI/whisper-1 (fallback)", user_id=telegram_id)
-            return await self.openai.transcribe_audio(
-                audio_data=audio_data,
-                filename=filename,
-                language=language
+                language=language,
+                duration_seconds=duration_seconds
             )
+            for provider in self.get_providers()
+        }
+        return await provider_router.call(AUDIO, calls)
     
     # =========================================
     # Meeting Protocol Generation
@@ -486,54 +559,65 @@ class AIService:
         Returns:
             Tuple of (protocol_text, usage_info)
         """
-        if self.cometapi.is_configured():
-            logger.info("Meeting protocol generation using CometAPI", user_id=telegram_id)
-            return await self.cometapi.generate_meeting_protocol(
-                transcription=transcription,
-                language=language
-            )
-        else:
-            # Fallback: use OpenAI for meeting protocol
-            logger.info("Meeting protocol generation using OpenAI (fallback)", user_id=telegram_id)
-            
-            if language == "ru":
-                system_prompt = """Ты — профессиональный секретарь, который создаёт протоколы совещаний.
-На основе транскрипции создай структурированный протокол совещания."""
+        logger.info("Meeting protocol generation", user_id=telegram_id)
+        calls = {}
+        for provider in self.get_providers():
+            if provider == "cometapi":
+                calls[provider] = lambda: self.cometapi.generate_meeting_protocol(
+                    transcription=transcription,
+                    language=language
+                )
             else:
-                system_prompt = """You are a professional secretary who creates meeting protocols.
+                calls[provider] = lambda: self._openai_meeting_protocol(transcription, language)
+        return await provider_router.call(TEXT, calls)
+    
+    async def _openai_meeting_protocol(
+        self,
+        transcription: str,
+        language: str
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Meeting protocol via OpenAI (failover)."""
+        if language == "ru":
+            system_prompt = """Ты — профессиональный секретарь, который создаёт протоколы совещаний.
+На основе транскрипции создай структурированный протокол совещания."""
+        else:
+            system_prompt = """You are a professional secretary who creates meeting protocols.
 Based on the transcription, create a structured meeting protocol."""
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Создай протокол на основе этой транскрипции:\n\n{transcription}"}
-            ]
-            
-            return await self.openai.generate_text(messages, max_tokens=4096, temperature=0.3)
+        
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Создай протокол на основе этой транскрипции:\n\n{transcription}"}
+        ]
+        
+        return await self.openai.generate_text(messages, max_tokens=4096, temperature=0.3)
     
     # =========================================
     # Utility Methods
     # =========================================
     
     def get_provider_status(self) -> Dict[str, Dict[str, Any]]:
-        """Get status of AI providers."""
+        """
+        Get status of AI providers, with live health from this process
+        (breaker state, error rate, p50/p95 latency per capability).
+        """
+        health = provider_router.status()
+        providers = self.get_providers()
         return {
-            "cometapi": {
-                "configured": self.cometapi.is_configured(),
-                "is_primary": True,
-                "capabilities": ["text", "vision", "image", "video", "voice"]
-            },
-            "openai": {
-                "configured": True,  # Always available as fallback
-                "is_primary": False,
-                "capabilities": ["text", "vision", "image", "video", "voice"]
+            name: {
+                "configured": name in providers,
+                "is_primary": name == self.get_default_provider(),
+                "capabilities": [TEXT, VISION, IMAGE, VIDEO, AUDIO],
+                "health": health.get(name, {}),
             }
+            for name in ("cometapi", "openai")
         }
     
     def is_provider_available(self, provider: str, task_type: str) -> bool:
-        """Check if provider supports a task type."""
-        if provider == "cometapi":
-            return self.cometapi.is_configured()
-        return True  # OpenAI always available
+        """Check if provider is configured and its circuit lets requests through."""
+        if provider not in self.get_providers():
+            return False
+        capability = AUDIO if task_type == "voice" else task_type
+        return provider_router.health(provider, capability).current_state(time.monotonic()) != OPEN
 
 
 # Global service instance
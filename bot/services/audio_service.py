@@ -0,0 +1,173 @@
+"""
+Audio processing helpers built on ffmpeg.
+Used to measure real duration and split long recordings on silence
+before transcription. All ffmpeg calls run in a worker thread.
+"""
+import asyncio
+import os
+import re
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as HH:MM:SS."""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def plan_segments(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    target: float,
+    window: float
+) -> List[float]:
+    """
+    Choose cut points for a recording.
+    
+    Every cut is placed in the middle of the silence closest to
+    ``start + target`` within ``±window``; if there is no silence
+    nearby, the audio is cut hard at ``start + target``.
+    
+    Args:
+        duration: Total duration in seconds
+        silences: (start, end) pairs from silencedetect
+        target: Desired segment length in seconds
+        window: How far a cut may move to hit a silence
+    
+    Returns:
+        Sorted list of cut points (seconds), excluding 0 and ``duration``
+    """
+    midpoints = sorted((s + e) / 2 for s, e in silences if e > s)
+    cuts: List[float] = []
+    position = 0.0
+    
+    # Last segment may be up to target + window long instead of leaving a tiny tail
+    while duration - position > target + window:
+        ideal = position + target
+        candidates = [m for m in midpoints if abs(m - ideal) <= window and m > position]
+        cut = min(candidates, key=lambda m: abs(m - ideal)) if candidates else ideal
+        cuts.append(round(cut, 3))
+        position = cut
+    
+    return cuts
+
+
+class AudioService:
+    """ffmpeg wrapper for duration probing and silence-based splitting."""
+    
+    SILENCE_NOISE_DB = -35
+    SILENCE_MIN_SECONDS = 0.4
+    FFMPEG_TIMEOUT = 300  # seconds
+    
+    async def probe_duration(self, path: str) -> Optional[float]:
+        """Get real duration in seconds from the container (None if unknown)."""
+        try:
+            result = await asyncio.to_thread(
+                subprocess.run,
+                [
+                    'ffprobe', '-v', 'error',
+                    '-show_entries', 'format=duration',
+                    '-of', 'default=noprint_wrappers=1:nokey=1',
+                    path
+                ],
+                capture_output=True, timeout=60
+            )
+            return float(result.stdout.decode().strip())
+        except Exception as e:
+            logger.warning("ffprobe failed", error=str(e))
+            return None
+    
+    async def detect_silences(self, path: str) -> List[Tuple[float, float]]:
+        """Find silent intervals with ffmpeg silencedetect."""
+        result = await asyncio.to_thread(
+            subprocess.run,
+            [
+                'ffmpeg', '-hide_banner', '-nostats',
+                '-i', path,
+                '-af', f'silencedetect=noise={self.SILENCE_NOISE_DB}dB:d={self.SILENCE_MIN_SECONDS}',
+                '-f', 'null', '-'
+            ],
+            capture_output=True, timeout=self.FFMPEG_TIMEOUT
+        )
+        output = result.stderr.decode(errors="ignore")
+        starts = [float(m) for m in _SILENCE_START_RE.findall(output)]
+        ends = [float(m) for m in _SILENCE_END_RE.findall(output)]
+        return list(zip(starts, ends))
+    
+    async def split(
+        self,
+        path: str,
+        tmpdir: str,
+        duration: float,
+        target: float = None,
+        window: float = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Split a recording into segments cut on silence.
+        
+        Segments are re-encoded to 16 kHz mono Opus, which keeps every
+        chunk far below the Whisper upload limit.
+        
+        Returns:
+            List of {"index", "start", "end", "path"} dicts, start/end in
+            seconds from the beginning of the recording
+        """
+        target = target or settings.transcription_chunk_seconds
+        window = window if window is not None else target * 0.2
+        
+        silences = await self.detect_silences(path)
+        cuts = plan_segments(duration, silences, target, window)
+        
+        if not cuts:
+            return [{"index": 0, "start": 0.0, "end": duration, "path": path}]
+        
+        pattern = os.path.join(tmpdir, "segment_%03d.ogg")
+        result = await asyncio.to_thread(
+            subprocess.run,
+            [
+                'ffmpeg', '-hide_banner', '-nostats', '-y',
+                '-i', path,
+                '-vn', '-ac', '1', '-ar', '16000',
+                '-c:a', 'libopus', '-b:a', '32k',
+                '-f', 'segment',
+                '-segment_times', ','.join(str(c) for c in cuts),
+                '-reset_timestamps', '1',
+                pattern
+            ],
+            capture_output=True, timeout=self.FFMPEG_TIMEOUT
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg split failed: {result.stderr.decode(errors='ignore')[-500:]}")
+        
+        bounds = [0.0] + cuts + [duration]
+        segments = []
+        for i in range(len(bounds) - 1):
+            segment_path = pattern % i
+            if os.path.exists(segment_path):
+                segments.append({
+                    "index": i,
+                    "start": bounds[i],
+                    "end": bounds[i + 1],
+                    "path": segment_path,
+                })
+        
+        logger.info(
+            "Audio split on silence",
+            duration=round(duration, 1),
+            silences=len(silences),
+            segments=len(segments)
+        )
+        return segments
+
+
+# Global service instance
+audio_service = AudioService()
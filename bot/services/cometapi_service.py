@@ -5,6 +5,7 @@ Supports Qwen-3-Max for text/image/video, Whisper for audio.
 """
 import asyncio
 import io
+import time
 import base64
 from typing import Optional, AsyncGenerator, Dict, Any, List, Tuple
 from decimal import Decimal
@@ -13,6 +14,7 @@ from openai import AsyncOpenAI
 
 from config import settings
 from bot.services.usage_tracking_service import usage_tracking_service
+from bot.services.image_service import guess_image_filename, guess_image_mime
 import structlog
 
 logger = structlog.get_logger()
@@ -167,6 +169,7 @@ class CometAPIService:
         """
         model = model or self.MODELS["text"]
         
+        started = time.monotonic()
         try:
             response = await self.client.chat.completions.create(
                 model=model,
@@ -201,6 +204,7 @@ class CometAPIService:
                     input_tokens=usage["input_tokens"],
                     output_tokens=usage["output_tokens"],
                     cost_usd=usage["cost_usd"],
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=True
                 )
             except Exception as log_error:
@@ -216,6 +220,7 @@ class CometAPIService:
                     provider="cometapi",
                     model=model,
                     endpoint="chat",
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=False,
                     error_message=str(e)
                 )
@@ -249,6 +254,7 @@ class CometAPIService:
         """
         model = model or self.MODELS["image"]
         
+        started = time.monotonic()
         try:
             response = await self.client.images.generate(
                 model=model,
@@ -298,6 +304,7 @@ class CometAPIService:
                     model=model,
                     endpoint="image",
                     cost_usd=usage["cost_usd"],
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=True
                 )
             except Exception as log_error:
@@ -313,6 +320,7 @@ class CometAPIService:
                     provider="cometapi",
                     model=model or self.MODELS["image"],
                     endpoint="image",
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=False,
                     error_message=str(e)
                 )
@@ -384,6 +392,7 @@ class CometAPIService:
         
         api_key = getattr(settings, 'cometapi_api_key', None) or settings.openai_api_key
         
+        started = time.monotonic()
         try:
             # Use multipart/form-data as per CometAPI docs
             form_data = aiohttp.FormData()
@@ -434,6 +443,7 @@ class CometAPIService:
                     model=model,
                     endpoint="video",
                     cost_usd=Decimal(str(round(cost, 4))),
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=True
                 )
             except Exception as log_error:
@@ -449,6 +459,7 @@ class CometAPIService:
                     provider="cometapi",
                     model=model,
                     endpoint="video",
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=False,
                     error_message=str(e)
                 )
@@ -564,7 +575,8 @@ class CometAPIService:
         self,
         audio_data: bytes,
         filename: str = "audio.ogg",
-        language: str = None
+        language: str = None,
+        duration_seconds: float = None
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Transcribe audio to text using Whisper.
@@ -573,10 +585,12 @@ class CometAPIService:
             audio_data: Audio file bytes
             filename: Original filename for format detection
             language: Optional language hint
+            duration_seconds: Real audio duration, if known (for cost)
             
         Returns:
             Tuple of (transcribed_text, usage_info)
         """
+        started = time.monotonic()
         try:
             # Create file-like object
             audio_file = io.BytesIO(audio_data)
@@ -594,7 +608,10 @@ class CometAPIService:
             text = response.text
             
             # Estimate duration for cost calculation
-            duration_minutes = len(audio_data) / (10 * 60 * 1000)
+            if duration_seconds:
+                duration_minutes = duration_seconds / 60
+            else:
+                duration_minutes = len(audio_data) / (10 * 60 * 1000)
             cost = duration_minutes * self.PRICING["whisper-1"]
             
             usage = {
@@ -611,6 +628,7 @@ class CometAPIService:
                     model=self.MODELS["whisper"],
                     endpoint="audio",
                     cost_usd=usage["cost_usd"],
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=True
                 )
             except Exception as log_error:
@@ -626,6 +644,7 @@ class CometAPIService:
                     provider="cometapi",
                     model=self.MODELS["whisper"],
                     endpoint="audio",
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=False,
                     error_message=str(e)
                 )
@@ -660,6 +679,7 @@ class CometAPIService:
         Returns:
             Tuple of (edited_image_bytes, usage_info)
         """
+        started = time.monotonic()
         try:
             base64_image = base64.b64encode(image_data).decode('utf-8')
             
@@ -667,7 +687,7 @@ class CometAPIService:
             # CometAPI proxies this as OpenAI-compatible API
             import io as _io
             image_file = _io.BytesIO(image_data)
-            image_file.name = "input.png"
+            image_file.name = guess_image_filename(image_data)
             
             response = await self.client.images.edit(
                 model=model,
@@ -721,6 +741,7 @@ class CometAPIService:
                     model=model,
                     endpoint="image_edit",
                     cost_usd=usage["cost_usd"],
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=True
                 )
             except Exception as log_error:
@@ -742,6 +763,7 @@ class CometAPIService:
                     provider="cometapi",
                     model=model,
                     endpoint="image_edit",
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=False,
                     error_message=str(e)
                 )
@@ -778,7 +800,7 @@ class CometAPIService:
                 content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}"
+                        "url": f"data:{guess_image_mime(image_data)};base64,{base64_image}"
                     }
                 })
             
@@ -827,7 +849,7 @@ class CometAPIService:
                 content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}",
+                        "url": f"data:{guess_image_mime(image_data)};base64,{base64_image}",
                         "detail": "high"
                     }
                 })
@@ -889,6 +911,7 @@ class CometAPIService:
         model = model or "qwen3-max-2026-01-23"
         api_key = getattr(settings, 'cometapi_api_key', None) or settings.openai_api_key
         
+        started = time.monotonic()
         try:
             # Build the input for Responses API
             # Convert chat messages format to Responses API format
@@ -1029,6 +1052,7 @@ class CometAPIService:
                     input_tokens=input_tokens,
                     output_tokens=output_tokens,
                     cost_usd=usage["cost_usd"],
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=True
                 )
             except Exception as log_error:
@@ -1045,6 +1069,7 @@ class CometAPIService:
                     provider="cometapi",
                     model=model,
                     endpoint="responses",
+                    duration_ms=int((time.monotonic() - started) * 1000),
                     success=False,
                     error_message=str(e)
                 )
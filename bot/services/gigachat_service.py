@@ -3,6 +3,7 @@ GigaChat API service for presentations and text generation.
 Uses Sber GigaChat API for creating presentation structures.
 """
 import asyncio
+import time
 import aiohttp
 import uuid
 import base64
@@ -10,6 +11,8 @@ from typing import Optional, Dict, Any, List, Tuple
 from decimal import Decimal
 from datetime import datetime, timedelta
 
+from bot.utils.metrics import observe_provider_call, observe_provider_usage
+from bot.utils.tracing import record_span
 from config import settings
 import structlog
 
@@ -132,25 +135,40 @@ class GigaChatService:
             headers['Content-Type'] = 'application/json'
         
         url = f"{self.API_URL}/{endpoint}"
+        model = (json_data or {}).get("model", "GigaChat")
+        started = time.monotonic()
+        span_started = time.time_ns()
+        span_attributes = {"endpoint": endpoint, "model": model}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
-                method,
-                url,
-                headers=headers,
-                json=json_data,
-                ssl=False,
-                **kwargs
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    logger.error("GigaChat request failed", 
-                               status=response.status, 
-                               endpoint=endpoint,
-                               error=error_text)
-                    raise Exception(f"GigaChat request failed: {error_text}")
-                
-                return await response.json()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.request(
+                    method,
+                    url,
+                    headers=headers,
+                    json=json_data,
+                    ssl=False,
+                    **kwargs
+                ) as response:
+                    if response.status != 200:
+                        error_text = await response.text()
+                        logger.error("GigaChat request failed", 
+                                   status=response.status, 
+                                   endpoint=endpoint,
+                                   error=error_text)
+                        raise Exception(f"GigaChat request failed: {error_text}")
+                    
+                    result = await response.json()
+        except Exception as e:
+            observe_provider_call("gigachat", model, endpoint, False, int((time.monotonic() - started) * 1000))
+            record_span("http.gigachat", span_started, span_attributes, e)
+            raise
+        
+        usage = result.get('usage', {}) if isinstance(result, dict) else {}
+        observe_provider_call("gigachat", model, endpoint, True, int((time.monotonic() - started) * 1000))
+        record_span("http.gigachat", span_started, span_attributes)
+        observe_provider_usage("gigachat", model, usage.get('prompt_tokens'), usage.get('completion_tokens'))
+        return result
     
     async def generate_text(
         self,
@@ -193,6 +211,7 @@ class GigaChatService:
                 (usage_info["output_tokens"] / 1000) * pricing["output"]
             )
             usage_info["cost_rub"] = Decimal(str(round(cost_rub, 4)))
+            observe_provider_usage("gigachat", model, cost_rub=usage_info["cost_rub"])
             
             return content, usage_info
             
@@ -0,0 +1,189 @@
+"""
+Image pre-processing service.
+Normalizes photos and document pages before they are sent to vision
+and image-editing models: downscale, recompress, strip EXIF.
+"""
+import asyncio
+import io
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+
+class ImageService:
+    """
+    Service for normalizing images sent to AI providers.
+    
+    Vision models downscale input to a fixed budget anyway (OpenAI fits
+    2048px then 768px on the short side, Qwen-VL caps at ~1M pixels), so
+    anything above that only costs upload bytes, base64 overhead and
+    latency. Pillow work runs in a thread to keep the event loop free.
+    """
+    
+    # Normalization profiles
+    # photo: Telegram photos for vision analysis
+    # document: PDF pages / scans — higher quality to keep small text legible
+    # edit: input for GPT-Image edits — keep more detail, provider output is ≤1536px
+    PROFILES: Dict[str, Dict[str, Any]] = {
+        "photo": {"max_side": 2048, "max_pixels": 1_048_576, "format": "JPEG", "quality": 85},
+        "document": {"max_side": 2048, "max_pixels": 1_572_864, "format": "JPEG", "quality": 90},
+        "edit": {"max_side": 1536, "max_pixels": None, "format": "JPEG", "quality": 95},
+    }
+    
+    def __init__(self):
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+    
+    @property
+    def cache_limit_bytes(self) -> int:
+        return settings.image_cache_max_mb * 1024 * 1024
+    
+    async def normalize(
+        self,
+        image_data: bytes,
+        profile: str = "photo",
+        cache_key: Optional[str] = None
+    ) -> bytes:
+        """
+        Downscale and recompress an image for a provider call.
+        
+        Args:
+            image_data: Original image bytes (JPEG, PNG, WEBP...)
+            profile: Normalization profile name (photo, document, edit)
+            cache_key: Stable image identifier, e.g. Telegram file_unique_id
+        
+        Returns:
+            Normalized image bytes (original bytes if normalization fails
+            or would not make the image smaller)
+        """
+        if not settings.image_normalization_enabled or not image_data:
+            return image_data
+        
+        full_key = f"{profile}:{cache_key}" if cache_key else None
+        if full_key and full_key in self._cache:
+            self._cache.move_to_end(full_key)
+            return self._cache[full_key]
+        
+        try:
+            result, info = await asyncio.to_thread(
+                self._normalize_sync, image_data, profile
+            )
+        except Exception as e:
+            logger.warning("Image normalization failed, sending original", error=str(e), profile=profile)
+            return image_data
+        
+        logger.debug(
+            "Image normalized",
+            profile=profile,
+            original_bytes=len(image_data),
+            result_bytes=len(result),
+            **info
+        )
+        
+        if full_key:
+            self._cache_put(full_key, result)
+        
+        return result
+    
+    def _normalize_sync(
+        self,
+        image_data: bytes,
+        profile_name: str
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """Blocking Pillow part of normalize()."""
+        from PIL import Image, ImageOps
+        
+        profile = self.PROFILES[profile_name]
+        
+        with Image.open(io.BytesIO(image_data)) as src:
+            original_size = src.size
+            original_format = src.format
+            # Apply EXIF orientation before EXIF is dropped on re-encode
+            img = ImageOps.exif_transpose(src)
+            
+            width, height = img.size
+            scale = min(1.0, profile["max_side"] / max(width, height))
+            if profile["max_pixels"]:
+                scale = min(scale, (profile["max_pixels"] / (width * height)) ** 0.5)
+            
+            if scale < 1.0:
+                new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+                img = img.resize(new_size, Image.LANCZOS)
+            
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            out_format = profile["format"]
+            save_kwargs: Dict[str, Any] = {}
+            
+            if out_format == "JPEG" and has_alpha and profile_name == "edit":
+                # Edits may rely on transparency — keep it lossless
+                out_format = "PNG"
+                save_kwargs["optimize"] = True
+            elif out_format in ("JPEG", "WEBP"):
+                if has_alpha:
+                    background = Image.new("RGB", img.size, (255, 255, 255))
+                    background.paste(img.convert("RGBA"), mask=img.convert("RGBA").split()[-1])
+                    img = background
+                elif img.mode != "RGB":
+                    img = img.convert("RGB")
+                save_kwargs["quality"] = profile["quality"]
+                if out_format == "JPEG":
+                    save_kwargs["optimize"] = True
+            
+            buffer = io.BytesIO()
+            # No exif= argument: metadata (GPS, camera info) is stripped
+            img.save(buffer, format=out_format, **save_kwargs)
+            result = buffer.getvalue()
+        
+        info = {
+            "original_size": f"{original_size[0]}x{original_size[1]}",
+            "result_size": f"{img.size[0]}x{img.size[1]}",
+            "format": out_format,
+        }
+        
+        # Already small and compact (e.g. a Telegram thumbnail) — keep as is
+        if scale >= 1.0 and len(result) >= len(image_data) and original_format == out_format:
+            return image_data, info
+        
+        return result, info
+    
+    def _cache_put(self, key: str, value: bytes) -> None:
+        """Store normalized bytes, evicting least recently used entries."""
+        if len(value) > self.cache_limit_bytes:
+            return
+        
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._cache_bytes -= len(old)
+        
+        self._cache[key] = value
+        self._cache_bytes += len(value)
+        
+        while self._cache_bytes > self.cache_limit_bytes and self._cache:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+
+def guess_image_filename(image_data: bytes, stem: str = "input") -> str:
+    """Guess a filename with the right extension from image magic bytes."""
+    if image_data[:3] == b"\xff\xd8\xff":
+        return f"{stem}.jpg"
+    if image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+        return f"{stem}.webp"
+    return f"{stem}.png"
+
+
+def guess_image_mime(image_data: bytes) -> str:
+    """Guess image MIME type from magic bytes (defaults to JPEG)."""
+    if image_data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+# Global service instance
+image_service = ImageService()
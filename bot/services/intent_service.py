@@ -0,0 +1,172 @@
+"""
+Local intent classifier.
+Decides what a message/caption asks for without an LLM round trip:
+a compiled keyword stage for unambiguous cues, then a small linear
+model over hashed word and character n-grams, loaded once from
+bot/data/intent_model.json.
+"""
+import json
+import math
+import os
+import re
+import zlib
+from typing import Any, Dict, List, Optional
+
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data", "intent_model.json"
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and fold ё so both spellings share features."""
+    return text.lower().replace("ё", "е").strip()
+
+
+def extract_features(text: str, dim: int) -> Dict[int, float]:
+    """
+    Hashed bag of features: words, word bigrams, the first word and
+    character 3-grams inside words (robust to Russian inflection).
+    
+    Uses crc32, not hash(), so indices are stable across processes.
+    """
+    tokens = _TOKEN_RE.findall(normalize_text(text))
+    names: List[str] = []
+    
+    if tokens:
+        names.append(f"first:{tokens[0]}")
+    for i, tok in enumerate(tokens):
+        names.append(f"w:{tok}")
+        if i + 1 < len(tokens):
+            names.append(f"b:{tok}_{tokens[i + 1]}")
+        padded = f"<{tok}>"
+        for j in range(len(padded) - 2):
+            names.append(f"c:{padded[j:j + 3]}")
+    
+    features: Dict[int, float] = {}
+    for name in names:
+        idx = zlib.crc32(name.encode("utf-8")) % dim
+        features[idx] = features.get(idx, 0.0) + 1.0
+    
+    # L2-normalize so long messages don't get overconfident
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {k: v / norm for k, v in features.items()}
+
+
+def softmax(scores: List[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class IntentClassifier:
+    """
+    Two-stage local classifier with a confidence score.
+    
+    Tasks (heads) in the model file:
+    - message: TEXT | IMAGE | VIDEO | PRESENTATION | COMMAND
+    - photo: EDIT | ANALYZE (photo caption)
+    
+    Callers compare ``confidence`` with ``settings.intent_confidence_threshold``
+    and only ask the LLM when the local answer is not confident enough.
+    """
+    
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH):
+        self.model_path = model_path
+        self._dim = 0
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+    
+    def load(self, path: str = None) -> None:
+        """Load model weights and compile keyword patterns (once)."""
+        path = path or self.model_path
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        
+        self._dim = data["dim"]
+        self._tasks = {}
+        for task, spec in data["tasks"].items():
+            labels = spec["labels"]
+            keyword_groups = []
+            for i, label in enumerate(labels):
+                phrases = spec.get("keywords", {}).get(label)
+                if phrases:
+                    alternation = "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+                    keyword_groups.append(f"(?P<k{i}>{alternation})")
+            self._tasks[task] = {
+                "labels": labels,
+                "bias": spec["bias"],
+                "weights": {int(k): v for k, v in spec["weights"].items()},
+                "keywords": re.compile("|".join(keyword_groups)) if keyword_groups else None,
+            }
+        
+        self._loaded = True
+        logger.info(
+            "Intent model loaded",
+            path=path,
+            tasks=list(self._tasks),
+            features=sum(len(t["weights"]) for t in self._tasks.values())
+        )
+    
+    def _ensure_loaded(self) -> bool:
+        if not self._loaded:
+            try:
+                self.load()
+            except Exception as e:
+                logger.error("Failed to load intent model", error=str(e))
+                self._loaded = True  # don't retry on every message
+        return bool(self._tasks)
+    
+    def classify(self, text: str, task: str = "message") -> Dict[str, Any]:
+        """
+        Classify text.
+        
+        Returns:
+            {"label": str | None, "confidence": float, "source": "keyword"|"model"|None,
+             "scores": {label: probability}}
+        """
+        if not text or not text.strip() or not self._ensure_loaded() or task not in self._tasks:
+            return {"label": None, "confidence": 0.0, "source": None, "scores": {}}
+        
+        spec = self._tasks[task]
+        labels = spec["labels"]
+        
+        if spec["keywords"] is not None:
+            match = spec["keywords"].search(normalize_text(text))
+            if match:
+                label = labels[int(match.lastgroup[1:])]
+                return {"label": label, "confidence": 1.0, "source": "keyword", "scores": {label: 1.0}}
+        
+        scores = list(spec["bias"])
+        weights = spec["weights"]
+        for idx, value in extract_features(text, self._dim).items():
+            row = weights.get(idx)
+            if row:
+                for i, w in enumerate(row):
+                    scores[i] += w * value
+        
+        probs = softmax(scores)
+        best = max(range(len(labels)), key=lambda i: probs[i])
+        return {
+            "label": labels[best],
+            "confidence": probs[best],
+            "source": "model",
+            "scores": dict(zip(labels, probs)),
+        }
+    
+    def is_confident(self, result: Dict[str, Any], threshold: Optional[float] = None) -> bool:
+        """Whether a classify() result is good enough to skip the LLM."""
+        threshold = settings.intent_confidence_threshold if threshold is None else threshold
+        return result["label"] is not None and result["confidence"] >= threshold
+
+
+# Global classifier instance
+intent_classifier = IntentClassifier()
@@ -10,6 +10,7 @@ from sqlalchemy.dialects.postgresql import insert
 
 from database import async_session_maker
 from database.models import User, DailyLimit, Request, RequestType, RequestStatus
+from bot.services.telemetry_service import telemetry_sink, KIND_REQUEST
 from config import settings
 import structlog
 
@@ -294,9 +295,32 @@ class LimitService:
         """
         Record a request in the database.
         
+        Queued to the telemetry sink when it is running (no DB round
+        trip on the caller's path); written directly otherwise.
+        
         Returns:
-            Request ID or None if failed
+            Request ID, or None if failed or queued
         """
+        # Truncate response preview if needed
+        if response_preview and len(response_preview) > 500:
+            response_preview = response_preview[:497] + "..."
+        
+        if telemetry_sink.is_running:
+            telemetry_sink.enqueue(KIND_REQUEST, dict(
+                telegram_id=telegram_id,
+                type=request_type,
+                prompt=prompt,
+                response_preview=response_preview,
+                tokens_input=tokens_input,
+                tokens_output=tokens_output,
+                cost_usd=cost_usd,
+                model=model,
+                status=status,
+                error_message=error_message,
+                duration_ms=duration_ms
+            ))
+            return None
+        
         async with async_session_maker() as session:
             # Get user ID
             user_result = await session.execute(
@@ -309,10 +333,6 @@ class LimitService:
             
             user_id = user_row[0]
             
-            # Truncate response preview if needed
-            if response_preview and len(response_preview) > 500:
-                response_preview = response_preview[:497] + "..."
-            
             request = Request(
                 user_id=user_id,
                 type=request_type,
@@ -0,0 +1,263 @@
+"""
+Response cache for stateless LLM prompts.
+Inline answers, translations and intent classification prompts repeat
+across users; identical (normalized) prompts are answered from Redis
+instead of the provider. Optionally, near-duplicate prompts on routes
+that allow it are matched with a 64-bit SimHash (CPU only, no model).
+"""
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.redis_client import redis_client
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+# Cache routes. Callers opt in by passing one of these to
+# AIService.generate_text(cache_route=...); anything personalized or
+# carrying conversation history must not.
+#   ttl: seconds an answer is reused
+#   fold: case- and trailing-punctuation-insensitive prompt matching
+#   semantic: near-duplicate matching allowed (with llm_cache_semantic_enabled)
+ROUTES: Dict[str, Dict[str, Any]] = {
+    "inline_text": {"ttl": 6 * 3600, "fold": True, "semantic": True},
+    "translate": {"ttl": 7 * 86400, "fold": False, "semantic": False},
+    "classify": {"ttl": 86400, "fold": True, "semantic": False},
+}
+
+SEMANTIC_MIN_CHARS = 32  # shorter prompts differ too much per character
+SIMHASH_BANDS = 4  # 4 x 16-bit bands: distance <= 3 shares at least one band
+
+_WS_RE = re.compile(r"\s+")
+_TRAILING_PUNCT = " ?!.…"
+
+
+def normalize_prompt(text: str, fold: bool) -> str:
+    """Canonical form of a prompt used for hashing."""
+    text = _WS_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+    if fold:
+        text = text.casefold().rstrip(_TRAILING_PUNCT)
+    return text
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over character trigrams."""
+    weights = [0] * 64
+    grams = {text[i:i + 3] for i in range(max(1, len(text) - 2))}
+    for gram in grams:
+        h = int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def _bands(fingerprint: int) -> List[int]:
+    width = 64 // SIMHASH_BANDS
+    return [(fingerprint >> (i * width)) & ((1 << width) - 1) for i in range(SIMHASH_BANDS)]
+
+
+class LLMResponseCache:
+    """
+    Redis cache of generate_text results keyed by route and prompt.
+    
+    The key covers the model, token limit, temperature, every earlier
+    message (system prompt) and the normalized last user message. Each
+    route keeps at most ``llm_cache_max_entries`` answers; the least
+    recently used ones are evicted. Hits, misses and the provider cost
+    they saved are counted per route (see get_stats).
+    """
+    
+    def _split(
+        self,
+        route: str,
+        messages: List[Dict[str, Any]],
+        model: str,
+        max_tokens: int,
+        temperature: float
+    ) -> Optional[Tuple[str, str]]:
+        """(context digest, normalized prompt), or None if not cacheable."""
+        if route not in ROUTES or not messages:
+            return None
+        last = messages[-1]
+        if last.get("role") != "user" or not isinstance(last.get("content"), str):
+            return None
+        if any(not isinstance(m.get("content"), str) for m in messages[:-1]):
+            return None
+        
+        context = json.dumps(
+            [model, max_tokens, round(temperature, 2), messages[:-1]],
+            ensure_ascii=False, sort_keys=True
+        )
+        context_digest = hashlib.sha256(context.encode()).hexdigest()[:16]
+        return context_digest, normalize_prompt(last["content"], ROUTES[route]["fold"])
+    
+    def _entry_key(self, route: str, digest: str) -> str:
+        return f"llm_cache:{route}:{digest}"
+    
+    def _digest(self, context: str, prompt: str) -> str:
+        return hashlib.sha256(f"{context}|{prompt}".encode()).hexdigest()[:32]
+    
+    def _semantic_enabled(self, route: str, prompt: str) -> bool:
+        return (
+            settings.llm_cache_semantic_enabled
+            and ROUTES[route]["semantic"]
+            and len(prompt) >= SEMANTIC_MIN_CHARS
+        )
+    
+    async def get(
+        self,
+        route: str,
+        messages: List[Dict[str, Any]],
+        model: str,
+        max_tokens: int,
+        temperature: float
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Cached (text, usage_info) for the request, or None.
+        
+        usage_info of a hit reports zero tokens and cost with
+        ``cached=True``; the original cost is added to the saved counter.
+        """
+        if not settings.llm_cache_enabled:
+            return None
+        split = self._split(route, messages, model, max_tokens, temperature)
+        if split is None:
+            return None
+        context, prompt = split
+        
+        try:
+            client = redis_client.client
+            digest = self._digest(context, prompt)
+            raw = await client.get(self._entry_key(route, digest))
+            kind = "hits"
+            
+            if raw is None and self._semantic_enabled(route, prompt):
+                digest = await self._find_near(route, context, prompt)
+                if digest is not None:
+                    raw = await client.get(self._entry_key(route, digest))
+                    kind = "near_hits"
+            
+            if raw is None:
+                await client.hincrby("llm_cache:stats", f"{route}:misses", 1)
+                return None
+            
+            entry = json.loads(raw)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zadd(f"llm_cache:lru:{route}", {digest: time.time()})
+                pipe.hincrby("llm_cache:stats", f"{route}:{kind}", 1)
+                pipe.hincrbyfloat("llm_cache:stats", f"{route}:saved_usd", float(entry["cost_usd"]))
+                pipe.hincrby(
+                    "llm_cache:stats", f"{route}:saved_tokens",
+                    entry["input_tokens"] + entry["output_tokens"]
+                )
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("LLM cache lookup failed", route=route, error=str(e))
+            return None
+        
+        logger.debug("LLM cache hit", route=route, kind=kind)
+        return entry["text"], {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "total_tokens": 0,
+            "model": entry["model"],
+            "provider": entry["provider"],
+            "cost_usd": Decimal("0"),
+            "cached": True,
+        }
+    
+    async def set(
+        self,
+        route: str,
+        messages: List[Dict[str, Any]],
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        text: str,
+        usage: Dict[str, Any]
+    ) -> None:
+        """Store a fresh answer (no-op for uncacheable requests)."""
+        if not settings.llm_cache_enabled or not text:
+            return
+        split = self._split(route, messages, model, max_tokens, temperature)
+        if split is None:
+            return
+        context, prompt = split
+        ttl = ROUTES[route]["ttl"]
+        digest = self._digest(context, prompt)
+        entry = {
+            "text": text,
+            "model": usage.get("model", model),
+            "provider": usage.get("provider"),
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cost_usd": str(usage.get("cost_usd", 0)),
+        }
+        
+        try:
+            client = redis_client.client
+            lru_key = f"llm_cache:lru:{route}"
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.setex(self._entry_key(route, digest), ttl, json.dumps(entry, ensure_ascii=False))
+                pipe.zadd(lru_key, {digest: time.time()})
+                pipe.expire(lru_key, ttl)
+                if self._semantic_enabled(route, prompt):
+                    fingerprint = simhash(prompt)
+                    for index, band in enumerate(_bands(fingerprint)):
+                        band_key = f"llm_cache:sim:{route}:{context}:{index}:{band}"
+                        pipe.sadd(band_key, f"{fingerprint:016x}:{digest}")
+                        pipe.expire(band_key, ttl)
+                pipe.zcard(lru_key)
+                results = await pipe.execute()
+            
+            excess = results[-1] - settings.llm_cache_max_entries
+            if excess > 0:
+                evicted = await client.zpopmin(lru_key, excess)
+                if evicted:
+                    await client.delete(*(self._entry_key(route, member) for member, _ in evicted))
+        except Exception as e:
+            logger.warning("LLM cache store failed", route=route, error=str(e))
+    
+    async def _find_near(self, route: str, context: str, prompt: str) -> Optional[str]:
+        """Digest of the closest cached prompt within the SimHash distance."""
+        fingerprint = simhash(prompt)
+        async with redis_client.client.pipeline(transaction=False) as pipe:
+            for index, band in enumerate(_bands(fingerprint)):
+                pipe.smembers(f"llm_cache:sim:{route}:{context}:{index}:{band}")
+            candidates = set().union(*await pipe.execute())
+        
+        best, best_distance = None, settings.llm_cache_semantic_max_distance + 1
+        for member in candidates:
+            other, digest = member.split(":", 1)
+            distance = bin(fingerprint ^ int(other, 16)).count("1")
+            if distance < best_distance:
+                best, best_distance = digest, distance
+        return best
+    
+    async def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-route hits, near hits, misses, saved USD and tokens."""
+        raw = await redis_client.client.hgetall("llm_cache:stats")
+        stats: Dict[str, Dict[str, float]] = {
+            route: {"hits": 0, "near_hits": 0, "misses": 0, "saved_usd": 0.0, "saved_tokens": 0}
+            for route in ROUTES
+        }
+        for field, value in raw.items():
+            route, name = field.rsplit(":", 1)
+            stats.setdefault(route, {})[name] = float(value) if name == "saved_usd" else int(value)
+        for route, values in stats.items():
+            lookups = values.get("hits", 0) + values.get("near_hits", 0) + values.get("misses", 0)
+            values["hit_rate"] = round(
+                (values.get("hits", 0) + values.get("near_hits", 0)) / lookups, 4
+            ) if lookups else 0.0
+            values["entries"] = await redis_client.client.zcard(f"llm_cache:lru:{route}")
+        return stats
+
+
+# Global cache instance
+llm_cache = LLMResponseCache()
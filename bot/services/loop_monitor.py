@@ -0,0 +1,258 @@
+"""
+Event loop blocking detector.
+A watchdog thread notices when the event loop stops turning and samples
+the loop thread's stack, so synchronous hotspots (document parsing, PIL,
+subprocess calls) show up with their call site instead of as unexplained
+latency spikes.
+"""
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.redis_client import redis_client
+from bot.utils.metrics import LOOP_BLOCK_DURATION, LOOP_BLOCKS
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+STATUS_KEY_PREFIX = "loop_monitor:sites:"
+STATUS_TTL = 3600
+PUBLISH_SECONDS = 30
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STACK_LIMIT = 60  # frames walked when looking for the project call site
+STACK_DEPTH = 12  # innermost frames kept in logs and the admin API
+MAX_SITES = 200
+
+
+def _is_project_frame(filename: str) -> bool:
+    return (
+        filename.startswith(PROJECT_ROOT)
+        and "site-packages" not in filename
+        and filename != __file__
+    )
+
+
+def _format_frame(frame: traceback.FrameSummary) -> str:
+    filename = frame.filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    return f"{filename}:{frame.lineno} in {frame.name}"
+
+
+def blocking_site(stack: List[traceback.FrameSummary]) -> Tuple[str, List[str]]:
+    """
+    (call site, innermost frames) of a stack sample.
+    
+    The site is the innermost frame in this project's code, i.e. the
+    line that called into the blocking library; the stack's innermost
+    frame if no project code is on it.
+    """
+    if not stack:
+        return "unsampled", []
+    site = next((f for f in reversed(stack) if _is_project_frame(f.filename)), stack[-1])
+    return _format_frame(site), [_format_frame(f) for f in stack[-STACK_DEPTH:]]
+
+
+class LoopMonitor:
+    """
+    Opt-in (``loop_monitor_enabled``) detector of blocking callbacks.
+    
+    A heartbeat task stamps the time every ``loop_monitor_interval_ms``.
+    A daemon thread checks the stamp; once it is older than the
+    interval plus ``loop_block_threshold_ms`` the loop is stuck in one
+    callback, and the thread samples the loop thread's stack. When the
+    heartbeat runs again it reports the block (duration from the
+    heartbeat, call site from the sample) as a warning log and metrics,
+    and adds it to per-site totals that are published to Redis for the
+    admin API.
+    """
+    
+    def __init__(self):
+        self.instance = f"{socket.gethostname()}:{os.getpid()}"
+        self.process = "unknown"
+        self._loop_thread_id: Optional[int] = None
+        self._beat = 0.0
+        self._sample: Optional[Tuple[float, List[traceback.FrameSummary]]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sites: Dict[str, Dict[str, Any]] = {}
+        self._last_published = 0.0
+        self._publish_task: Optional[asyncio.Task] = None
+    
+    def start(self, process: str) -> None:
+        """Start monitoring the running loop (no-op unless enabled)."""
+        if not settings.loop_monitor_enabled or self._task is not None:
+            return
+        self.process = process
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Event loop monitor started",
+            process=process,
+            threshold_ms=settings.loop_block_threshold_ms
+        )
+    
+    async def stop(self) -> None:
+        """Stop monitoring and publish the final totals."""
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._sites:
+            await self.publish()
+    
+    # =========================================
+    # Detection
+    # =========================================
+    
+    async def _heartbeat(self) -> None:
+        interval = settings.loop_monitor_interval_ms / 1000
+        threshold = settings.loop_block_threshold_ms / 1000
+        while True:
+            beat = time.monotonic()
+            self._beat = beat
+            await asyncio.sleep(interval)
+            blocked = time.monotonic() - beat - interval
+            sample = self._sample
+            if blocked >= threshold:
+                stack = sample[1] if sample is not None and sample[0] == beat else []
+                self._report(blocked, stack)
+    
+    def _watch(self) -> None:
+        """Watchdog thread: sample the loop thread's stack while it is stuck."""
+        interval = settings.loop_monitor_interval_ms / 1000
+        threshold = settings.loop_block_threshold_ms / 1000
+        while not self._stop.wait(min(interval, threshold / 2)):
+            beat = self._beat
+            if time.monotonic() - beat - interval < threshold:
+                continue
+            if self._sample is not None and self._sample[0] == beat:
+                continue  # this block is already sampled
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._sample = (beat, traceback.extract_stack(frame, limit=STACK_LIMIT))
+    
+    def _report(self, blocked: float, stack: List[traceback.FrameSummary]) -> None:
+        site, frames = blocking_site(stack)
+        duration_ms = blocked * 1000
+        
+        LOOP_BLOCKS.labels(self.process, site).inc()
+        LOOP_BLOCK_DURATION.labels(self.process).observe(blocked)
+        
+        entry = self._sites.get(site)
+        if entry is None:
+            if len(self._sites) >= MAX_SITES:
+                smallest = min(self._sites, key=lambda s: self._sites[s]["total_ms"])
+                del self._sites[smallest]
+            entry = self._sites[site] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "stack": frames}
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        if duration_ms >= entry["max_ms"]:
+            entry["max_ms"] = duration_ms
+            entry["stack"] = frames
+        entry["last_seen"] = time.time()
+        
+        logger.warning(
+            "Event loop blocked",
+            process=self.process,
+            duration_ms=round(duration_ms, 1),
+            site=site,
+            stack=frames
+        )
+        self._maybe_publish()
+    
+    # =========================================
+    # Status
+    # =========================================
+    
+    def top_sites(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """This process's blocking sites, worst (total blocked time) first."""
+        ranked = sorted(self._sites.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        return [
+            {
+                "site": site,
+                "count": entry["count"],
+                "total_ms": round(entry["total_ms"], 1),
+                "max_ms": round(entry["max_ms"], 1),
+                "last_seen": entry["last_seen"],
+                "stack": entry["stack"],
+            }
+            for site, entry in ranked[:limit]
+        ]
+    
+    def _maybe_publish(self) -> None:
+        now = time.monotonic()
+        if now - self._last_published < PUBLISH_SECONDS:
+            return
+        if self._publish_task is not None and not self._publish_task.done():
+            return
+        self._last_published = now
+        self._publish_task = asyncio.get_running_loop().create_task(self.publish())
+    
+    async def publish(self) -> None:
+        """Store this process's top sites in Redis for the admin API."""
+        try:
+            await redis_client.client.setex(
+                f"{STATUS_KEY_PREFIX}{self.instance}",
+                STATUS_TTL,
+                json.dumps({
+                    "process": self.process,
+                    "updated_at": time.time(),
+                    "sites": self.top_sites(50),
+                })
+            )
+        except Exception as e:
+            logger.warning("Failed to publish loop monitor sites", error=str(e))
+    
+    async def collect_sites(self, limit: int = 20) -> Dict[str, Any]:
+        """Top blocking sites merged across every monitored process."""
+        merged: Dict[str, Dict[str, Any]] = {}
+        processes: Dict[str, Any] = {}
+        async for key in redis_client.client.scan_iter(match=f"{STATUS_KEY_PREFIX}*"):
+            raw = await redis_client.client.get(key)
+            if raw is None:
+                continue
+            snapshot = json.loads(raw)
+            instance = key[len(STATUS_KEY_PREFIX):]
+            processes[instance] = {"process": snapshot["process"], "updated_at": snapshot["updated_at"]}
+            
+            for item in snapshot["sites"]:
+                entry = merged.setdefault(item["site"], {
+                    "site": item["site"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "last_seen": 0.0,
+                    "stack": item["stack"],
+                    "processes": [],
+                })
+                entry["count"] += item["count"]
+                entry["total_ms"] = round(entry["total_ms"] + item["total_ms"], 1)
+                entry["last_seen"] = max(entry["last_seen"], item["last_seen"])
+                if item["max_ms"] >= entry["max_ms"]:
+                    entry["max_ms"] = item["max_ms"]
+                    entry["stack"] = item["stack"]
+                if snapshot["process"] not in entry["processes"]:
+                    entry["processes"].append(snapshot["process"])
+        
+        sites = sorted(merged.values(), key=lambda entry: entry["total_ms"], reverse=True)
+        return {"sites": sites[:limit], "processes": processes}
+
+
+# Global monitor instance
+loop_monitor = LoopMonitor()
@@ -0,0 +1,165 @@
+"""
+Media group (album) collector and parallel file downloads.
+
+Telegram delivers every item of an album as a separate update, possibly
+to different bot replicas. Items are accumulated in Redis, and whichever
+replica sees the group go quiet assembles it and runs the handler once.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from aiogram import Bot
+from aiogram.types import Message
+
+from database.redis_client import redis_client
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+MediaGroupHandler = Callable[[List[Message]], Awaitable[None]]
+
+
+class MediaGroupCollector:
+    """
+    Redis-backed media group collector.
+    
+    Each incoming item is RPUSHed to ``media_group:{kind}:{id}`` and gets
+    its position in the list. After the debounce window the item checks
+    whether a later item has arrived: if so, that item owns the flush.
+    The last item pops the whole list in one MULTI/EXEC (LRANGE + DEL) and
+    calls the handler. The pop is the claim: a racing replica gets an
+    empty list, so an album is processed exactly once across replicas and
+    a late item simply starts a new group.
+    """
+    
+    KEY_PREFIX = "media_group"
+    MAX_GROUP_SIZE = 10  # Telegram albums hold at most 10 items
+    GROUP_TTL = 60  # seconds
+    
+    def __init__(self):
+        # Local pending flush tasks, only used to skip redundant wake-ups
+        self._tasks: Dict[str, asyncio.Task] = {}
+    
+    def _key(self, kind: str, media_group_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{kind}:{media_group_id}"
+    
+    def get_debounce(self, count: int) -> float:
+        """
+        Adaptive debounce in seconds for a group that has ``count`` items.
+        
+        The first item waits the longest; the window shrinks as the album
+        fills and drops to zero once it reaches Telegram's maximum size.
+        """
+        if count >= self.MAX_GROUP_SIZE:
+            return 0.0
+        base = settings.media_group_debounce_ms / 1000
+        minimum = settings.media_group_min_debounce_ms / 1000
+        remaining = (self.MAX_GROUP_SIZE - count) / self.MAX_GROUP_SIZE
+        return max(minimum, base * remaining)
+    
+    async def collect(
+        self,
+        message: Message,
+        kind: str,
+        handler: MediaGroupHandler
+    ) -> None:
+        """
+        Add a media group item and schedule the group flush.
+        
+        Args:
+            message: Album item
+            kind: Collector namespace (photo, document)
+            handler: Coroutine called once with all items sorted by message_id
+        """
+        key = self._key(kind, message.media_group_id)
+        
+        pipe = redis_client.client.pipeline()
+        pipe.rpush(key, message.model_dump_json(exclude_none=True))
+        pipe.expire(key, self.GROUP_TTL)
+        results = await pipe.execute()
+        position = results[0]
+        
+        previous = self._tasks.pop(key, None)
+        if previous and not previous.done():
+            previous.cancel()
+        
+        task = asyncio.create_task(
+            self._flush_later(key, position, message.bot, handler)
+        )
+        self._tasks[key] = task
+        task.add_done_callback(
+            lambda t, k=key: self._tasks.pop(k, None) if self._tasks.get(k) is t else None
+        )
+    
+    async def _flush_later(
+        self,
+        key: str,
+        position: int,
+        bot: Bot,
+        handler: MediaGroupHandler
+    ) -> None:
+        """Wait for the group to go quiet, then process it if we own it."""
+        await asyncio.sleep(self.get_debounce(position))
+        
+        # A later item exists (maybe on another replica) — it owns the flush
+        if await redis_client.client.llen(key) > position:
+            return
+        
+        # Atomic pop: whoever gets the items owns the flush
+        pipe = redis_client.client.pipeline(transaction=True)
+        pipe.lrange(key, 0, -1)
+        pipe.delete(key)
+        raw_items, _ = await pipe.execute()
+        
+        if not raw_items:
+            return
+        
+        messages = [
+            Message.model_validate_json(raw, context={"bot": bot})
+            for raw in raw_items
+        ]
+        messages.sort(key=lambda m: m.message_id)
+        
+        logger.info("Media group assembled", key=key, items=len(messages))
+        
+        try:
+            await handler(messages)
+        except Exception as e:
+            logger.error("Media group handler error", key=key, error=str(e))
+
+
+async def download_telegram_files(
+    bot: Bot,
+    file_ids: List[str],
+    max_concurrency: Optional[int] = None,
+    return_exceptions: bool = False
+) -> List[Union[bytes, BaseException]]:
+    """
+    Download several Telegram files concurrently.
+    
+    Args:
+        bot: Bot instance
+        file_ids: Telegram file IDs
+        max_concurrency: Parallel downloads cap (default from settings)
+        return_exceptions: Return per-file errors instead of raising the first one
+    
+    Returns:
+        File contents in the same order as ``file_ids``
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or settings.media_download_concurrency)
+    
+    async def _download(file_id: str) -> bytes:
+        async with semaphore:
+            file = await bot.get_file(file_id)
+            file_bytes = await bot.download_file(file.file_path)
+            return file_bytes.read() if hasattr(file_bytes, 'read') else file_bytes
+    
+    return list(await asyncio.gather(
+        *(_download(fid) for fid in file_ids),
+        return_exceptions=return_exceptions
+    ))
+
+
+# Global collector instance
+media_group_collector = MediaGroupCollector()
@@ -11,6 +11,7 @@ import aiohttp
 from openai import AsyncOpenAI
 
 from config import settings
+from bot.services.image_service import guess_image_filename, guess_image_mime
 import structlog
 
 logger = structlog.get_logger()
@@ -221,7 +222,7 @@ class OpenAIService:
         """
         try:
             image_file = io.BytesIO(image_data)
-            image_file.name = "input.png"
+            image_file.name = guess_image_filename(image_data)
             
             response = await self.client.images.edit(
                 model=model,
@@ -266,7 +267,8 @@ class OpenAIService:
         self,
         audio_data: bytes,
         filename: str = "audio.ogg",
-        language: str = None
+        language: str = None,
+        duration_seconds: float = None
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Transcribe audio to text using Whisper.
@@ -275,6 +277,7 @@ class OpenAIService:
             audio_data: Audio file bytes
             filename: Original filename for format detection
             language: Optional language hint
+            duration_seconds: Real audio duration, if known (for cost)
             
         Returns:
             Tuple of (transcribed_text, usage_info)
@@ -294,7 +297,10 @@ class OpenAIService:
             
             # Estimate duration for cost calculation (rough estimate)
             # Assuming ~10 bytes per ms for OGG
-            duration_minutes = len(audio_data) / (10 * 60 * 1000)
+            if duration_seconds:
+                duration_minutes = duration_seconds / 60
+            else:
+                duration_minutes = len(audio_data) / (10 * 60 * 1000)
             cost = duration_minutes * self.PRICING["whisper-1"]
             
             usage = {
@@ -563,7 +569,7 @@ class OpenAIService:
                 content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}"
+                        "url": f"data:{guess_image_mime(image_data)};base64,{base64_image}"
                     }
                 })
             
@@ -618,7 +624,7 @@ class OpenAIService:
                 content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}",
+                        "url": f"data:{guess_image_mime(image_data)};base64,{base64_image}",
                         "detail": "high"
                     }
                 })
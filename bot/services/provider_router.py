@@ -0,0 +1,415 @@
+"""
+Health-aware routing between AI providers.
+Tracks latency percentiles and error rates per (provider, capability),
+opens a circuit breaker on a provider that keeps failing, fails over to
+the next healthy provider and can hedge slow text requests.
+"""
+import asyncio
+import json
+import math
+import os
+import socket
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from database.redis_client import redis_client
+from bot.utils.metrics import PROVIDER_BREAKER_STATE
+from bot.utils.tracing import span
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+# Capabilities
+TEXT = "text"
+VISION = "vision"
+IMAGE = "image"
+VIDEO = "video"
+AUDIO = "audio"
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_GAUGE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Errors caused by the request itself; another provider won't do better
+CLIENT_ERROR_STATUSES = {400, 404, 413, 415, 422}
+
+STATUS_KEY_PREFIX = "provider_router:status:"
+STATUS_TTL = 120
+
+
+class ProviderUnavailableError(Exception):
+    """No provider can currently serve the capability."""
+
+
+def is_client_error(error: BaseException) -> bool:
+    """True for errors caused by the request (bad input, content policy)."""
+    return getattr(error, "status_code", None) in CLIENT_ERROR_STATUSES
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class EndpointHealth:
+    """Rolling outcomes and breaker state for one provider capability."""
+    
+    def __init__(self):
+        self.samples: Deque[Tuple[float, float, bool]] = deque(maxlen=settings.router_window_size)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.last_error: Optional[str] = None
+    
+    def _window(self, now: float) -> List[Tuple[float, float, bool]]:
+        horizon = now - settings.router_window_seconds
+        while self.samples and self.samples[0][0] < horizon:
+            self.samples.popleft()
+        return list(self.samples)
+    
+    def error_rate(self, now: float) -> float:
+        window = self._window(now)
+        if not window:
+            return 0.0
+        return sum(1 for _, _, ok in window if not ok) / len(window)
+    
+    def latencies(self, now: float) -> List[float]:
+        return [latency for _, latency, ok in self._window(now) if ok]
+    
+    def current_state(self, now: float) -> str:
+        if self.state == OPEN and now - self.opened_at >= settings.router_breaker_cooldown_seconds:
+            return HALF_OPEN
+        return self.state
+    
+    def allow(self, now: float) -> bool:
+        """Whether a request may go to this endpoint (claims the half-open probe)."""
+        state = self.current_state(now)
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self.probe_in_flight:
+            self.state = HALF_OPEN
+            self.probe_in_flight = True
+            return True
+        return False
+    
+    def record(self, now: float, latency_ms: float, ok: bool, error: Optional[str] = None) -> bool:
+        """Store an outcome; returns True if this outcome opened the breaker."""
+        self.samples.append((now, latency_ms, ok))
+        was_probe = self.probe_in_flight
+        self.probe_in_flight = False
+        
+        if ok:
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            return False
+        
+        self.consecutive_failures += 1
+        self.last_error = error
+        window = self._window(now)
+        tripped = (
+            was_probe
+            or self.consecutive_failures >= settings.router_breaker_failures
+            or (
+                len(window) >= settings.router_breaker_min_samples
+                and self.error_rate(now) >= settings.router_breaker_error_rate
+            )
+        )
+        if tripped and self.state != OPEN:
+            self.state = OPEN
+            self.opened_at = now
+            return True
+        if tripped:
+            self.opened_at = now
+        return False
+    
+    def release(self) -> None:
+        """Give back a probe that was cancelled before it finished."""
+        self.probe_in_flight = False
+    
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        latencies = self.latencies(now)
+        p50 = percentile(latencies, 50)
+        p95 = percentile(latencies, 95)
+        return {
+            "state": self.current_state(now),
+            "requests": len(self._window(now)),
+            "error_rate": round(self.error_rate(now), 4),
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+        }
+
+
+class ProviderRouter:
+    """
+    Chooses and calls providers for a capability.
+    
+    Providers are tried in preference order (the order of the ``calls``
+    mapping), except that degraded providers (error rate above
+    ``router_degraded_error_rate`` over the window) move behind healthy
+    ones until their failures age out of the window, and providers
+    with an open breaker are skipped until their cooldown ends; then one
+    probe request decides whether the breaker closes again.
+    
+    A failed call falls over to the next provider. Client errors (bad
+    request, content policy) are raised as is: they neither count against
+    the provider nor get retried elsewhere.
+    
+    With ``router_hedge_enabled``, a hedged call that has not finished
+    after the primary's p95 latency (at least ``router_hedge_min_delay_ms``)
+    is also sent to the next provider; the first success wins and the
+    other call is cancelled.
+    
+    Health is per process; each process publishes a snapshot to Redis so
+    the admin API can show all of them (see collect_status).
+    """
+    
+    def __init__(self):
+        self._health: Dict[Tuple[str, str], EndpointHealth] = {}
+        self._instance = f"{socket.gethostname()}:{os.getpid()}"
+        self._last_published = 0.0
+        self._publish_task: Optional[asyncio.Task] = None
+    
+    def health(self, provider: str, capability: str) -> EndpointHealth:
+        key = (provider, capability)
+        if key not in self._health:
+            self._health[key] = EndpointHealth()
+        return self._health[key]
+    
+    def order(self, capability: str, providers: List[str]) -> List[str]:
+        """Providers sorted healthy first, keeping preference order within a tier."""
+        now = time.monotonic()
+        
+        def rank(item: Tuple[int, str]) -> Tuple[int, float, int]:
+            index, name = item
+            health = self._health.get((name, capability))
+            if health is None:
+                return 0, 0.0, index
+            state = health.current_state(now)
+            if state == OPEN:
+                return 2, 0.0, index
+            if state == HALF_OPEN:
+                return 0, 0.0, index  # next request is the probe
+            error_rate = health.error_rate(now)
+            degraded = (
+                len(health.samples) >= settings.router_breaker_min_samples
+                and error_rate >= settings.router_degraded_error_rate
+            )
+            if degraded:
+                return 1, error_rate, index
+            return 0, 0.0, index
+        
+        return [name for _, name in sorted(enumerate(providers), key=rank)]
+    
+    def hedge_delay(self, provider: str, capability: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None without enough samples."""
+        health = self._health.get((provider, capability))
+        if health is None:
+            return None
+        latencies = health.latencies(time.monotonic())
+        if len(latencies) < settings.router_hedge_min_samples:
+            return None
+        return max(settings.router_hedge_min_delay_ms, percentile(latencies, 95)) / 1000
+    
+    def allow(self, provider: str, capability: str) -> bool:
+        return self.health(provider, capability).allow(time.monotonic())
+    
+    def record(
+        self,
+        provider: str,
+        capability: str,
+        latency_ms: float,
+        ok: bool,
+        error: Optional[BaseException] = None
+    ) -> None:
+        """Record an outcome of a call made outside call() (e.g. streaming)."""
+        health = self.health(provider, capability)
+        if error is not None and is_client_error(error):
+            health.release()
+            return
+        
+        error_text = f"{type(error).__name__}: {error}"[:200] if error is not None else None
+        now = time.monotonic()
+        if health.record(now, latency_ms, ok, error_text):
+            logger.warning(
+                "Provider circuit opened",
+                provider=provider,
+                capability=capability,
+                error=error_text
+            )
+        PROVIDER_BREAKER_STATE.labels(provider, capability).set(
+            STATE_GAUGE_VALUES[health.current_state(now)]
+        )
+        self._maybe_publish()
+    
+    async def call(
+        self,
+        capability: str,
+        calls: Dict[str, Callable[[], Awaitable[Any]]],
+        hedge: bool = False,
+        failover: bool = True
+    ) -> Any:
+        """
+        Run a request on the best available provider.
+        
+        Args:
+            capability: TEXT, VISION, IMAGE, VIDEO or AUDIO
+            calls: Provider name -> zero-argument coroutine factory, in
+                preference order
+            hedge: Allow hedging to a second provider (idempotent calls only)
+            failover: Retry on the next provider after a failure
+        
+        Returns:
+            The first successful result
+        """
+        candidates = self.order(capability, list(calls))
+        if not failover:
+            candidates = candidates[:1]
+        
+        last_error: Optional[BaseException] = None
+        tried: Set[str] = set()
+        for index, provider in enumerate(candidates):
+            if provider in tried or not self.allow(provider, capability):
+                continue
+            tried.add(provider)
+            
+            backups = candidates[index + 1:]
+            delay = None
+            if hedge and backups and settings.router_hedge_enabled:
+                delay = self.hedge_delay(provider, capability)
+            try:
+                if delay is not None:
+                    return await self._hedged(capability, provider, backups, calls, delay, tried)
+                return await self._attempt(provider, capability, calls[provider])
+            except Exception as e:
+                if is_client_error(e):
+                    raise
+                last_error = e
+                if failover and index + 1 < len(candidates):
+                    logger.warning(
+                        "Provider failed, failing over",
+                        provider=provider,
+                        capability=capability,
+                        error=str(e)
+                    )
+        
+        if last_error is not None:
+            raise last_error
+        raise ProviderUnavailableError(
+            f"No {capability} provider available (circuit open: {', '.join(candidates)})"
+        )
+    
+    async def _attempt(
+        self,
+        provider: str,
+        capability: str,
+        factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        started = time.monotonic()
+        try:
+            with span(f"ai.{capability}", provider=provider):
+                result = await factory()
+        except asyncio.CancelledError:
+            self.health(provider, capability).release()
+            raise
+        except Exception as e:
+            self.record(provider, capability, (time.monotonic() - started) * 1000, False, e)
+            raise
+        self.record(provider, capability, (time.monotonic() - started) * 1000, True)
+        return result
+    
+    async def _hedged(
+        self,
+        capability: str,
+        primary: str,
+        backups: List[str],
+        calls: Dict[str, Callable[[], Awaitable[Any]]],
+        delay: float,
+        tried: Set[str]
+    ) -> Any:
+        primary_task = asyncio.create_task(self._attempt(primary, capability, calls[primary]))
+        pending = {primary_task}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary_task.result()
+            
+            backup = next((p for p in backups if self.allow(p, capability)), None)
+            if backup is None:
+                return await primary_task
+            tried.add(backup)
+            
+            logger.info("Hedging slow request", primary=primary, backup=backup, capability=capability)
+            pending.add(asyncio.create_task(self._attempt(backup, capability, calls[backup])))
+            
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    if is_client_error(last_error):
+                        raise last_error
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    # =========================================
+    # Status
+    # =========================================
+    
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Live health in this process: provider -> capability -> stats."""
+        now = time.monotonic()
+        result: Dict[str, Dict[str, Any]] = {}
+        for (provider, capability), health in sorted(self._health.items()):
+            result.setdefault(provider, {})[capability] = health.snapshot(now)
+        return result
+    
+    def _maybe_publish(self) -> None:
+        now = time.monotonic()
+        if now - self._last_published < settings.router_status_publish_seconds:
+            return
+        if self._publish_task is not None and not self._publish_task.done():
+            return
+        self._last_published = now
+        try:
+            self._publish_task = asyncio.get_running_loop().create_task(self.publish())
+        except RuntimeError:
+            pass  # no running loop
+    
+    async def publish(self) -> None:
+        """Store this process's snapshot in Redis for the admin API."""
+        try:
+            await redis_client.client.setex(
+                f"{STATUS_KEY_PREFIX}{self._instance}",
+                STATUS_TTL,
+                json.dumps({"updated_at": time.time(), "providers": self.status()})
+            )
+        except Exception as e:
+            logger.warning("Failed to publish provider health", error=str(e))
+    
+    async def collect_status(self) -> Dict[str, Any]:
+        """Snapshots published by every bot/worker process in the last minutes."""
+        processes = {}
+        async for key in redis_client.client.scan_iter(match=f"{STATUS_KEY_PREFIX}*"):
+            raw = await redis_client.client.get(key)
+            if raw:
+                processes[key[len(STATUS_KEY_PREFIX):]] = json.loads(raw)
+        return processes
+
+
+# Global router instance
+provider_router = ProviderRouter()
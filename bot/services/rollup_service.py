@@ -0,0 +1,291 @@
+"""
+Usage rollups.
+Folds new Request and APIUsageLog rows into hourly aggregate tables,
+a per-day HyperLogLog of active users and per-user totals, so the admin
+dashboard reads a few hundred rollup rows instead of scanning raw logs.
+Run every minute by the worker (see worker.tasks.rollup_usage).
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session_maker
+from database.models import (
+    Request, RequestStatus, APIUsageLog,
+    RequestRollupHourly, APIUsageRollupHourly, UserActivitySketch,
+    UserUsageTotal, RollupWatermark
+)
+from bot.utils.hyperloglog import HyperLogLog
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+SOURCE_REQUESTS = "requests"
+SOURCE_API_USAGE = "api_usage_logs"
+
+
+def utc_hour(column):
+    """date_trunc('hour') of a timestamptz column, as naive UTC."""
+    return func.date_trunc("hour", func.timezone("UTC", column))
+
+
+def day_bounds(start: date, end: date) -> Tuple[datetime, datetime]:
+    """Naive UTC bucket range [start 00:00, end+1 00:00) for inclusive days."""
+    return (
+        datetime.combine(start, datetime.min.time()),
+        datetime.combine(end + timedelta(days=1), datetime.min.time()),
+    )
+
+
+class RollupService:
+    """
+    Incremental rollup maintenance and reads.
+    
+    Each source table has a watermark (last folded row id). A run takes
+    the watermark row FOR UPDATE, aggregates the next id range with
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE (additive) and moves the
+    watermark in the same transaction, so every row is counted exactly
+    once even if two workers run concurrently. Rows younger than
+    ``rollup_lag_seconds`` are left for the next run so transactions that
+    are still in flight are not skipped.
+    """
+    
+    async def run_incremental(self) -> Dict[str, int]:
+        """Fold all pending rows; returns rows processed per source."""
+        processed = {}
+        for source, step in (
+            (SOURCE_REQUESTS, self._fold_requests),
+            (SOURCE_API_USAGE, self._fold_api_usage),
+        ):
+            total = 0
+            for _ in range(settings.rollup_max_batches):
+                rows = await self._run_batch(source, step)
+                total += rows
+                if rows == 0:
+                    break
+            processed[source] = total
+        
+        if any(processed.values()):
+            logger.info("Usage rollups updated", **processed)
+        return processed
+    
+    async def _run_batch(self, source: str, step) -> int:
+        model = Request if source == SOURCE_REQUESTS else APIUsageLog
+        
+        async with async_session_maker() as session:
+            await session.execute(
+                insert(RollupWatermark)
+                .values(name=source, last_id=0)
+                .on_conflict_do_nothing(index_elements=[RollupWatermark.name])
+            )
+            result = await session.execute(
+                select(RollupWatermark).where(RollupWatermark.name == source).with_for_update()
+            )
+            watermark = result.scalar_one()
+            lo = watermark.last_id
+            
+            # The window starts at the next row, not at lo: id gaps wider than
+            # a batch (rolled-back inserts, dropped partitions) must not stall it
+            first_result = await session.execute(
+                select(func.min(model.id)).where(model.id > lo)
+            )
+            first = first_result.scalar()
+            if first is None:
+                await session.rollback()
+                return 0
+            
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.rollup_lag_seconds)
+            hi_result = await session.execute(
+                select(func.max(model.id)).where(and_(
+                    model.id >= first,
+                    model.id < first + settings.rollup_batch_rows,
+                    model.created_at < cutoff
+                ))
+            )
+            hi = hi_result.scalar()
+            if hi is None:
+                await session.rollback()
+                return 0
+            
+            rows = await step(session, lo, hi)
+            watermark.last_id = hi
+            await session.commit()
+            return rows
+    
+    async def _fold_requests(self, session: AsyncSession, lo: int, hi: int) -> int:
+        in_range = and_(Request.id > lo, Request.id <= hi)
+        bucket = utc_hour(Request.created_at)
+        model_name = func.coalesce(Request.model, "")
+        
+        # Hourly aggregates
+        aggregated = (
+            select(
+                bucket,
+                Request.type,
+                model_name,
+                func.count(Request.id),
+                func.count(Request.id).filter(Request.status != RequestStatus.SUCCESS),
+                func.coalesce(func.sum(Request.cost_usd), 0),
+                func.coalesce(func.sum(Request.tokens_input), 0),
+                func.coalesce(func.sum(Request.tokens_output), 0),
+            )
+            .where(in_range)
+            .group_by(bucket, Request.type, model_name)
+        )
+        stmt = insert(RequestRollupHourly).from_select(
+            ["bucket", "request_type", "model", "requests", "errors",
+             "cost_usd", "tokens_input", "tokens_output"],
+            aggregated
+        )
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=["bucket", "request_type", "model"],
+            set_={
+                col: getattr(RequestRollupHourly, col) + getattr(stmt.excluded, col)
+                for col in ("requests", "errors", "cost_usd", "tokens_input", "tokens_output")
+            }
+        ))
+        
+        # Per-user totals
+        per_user = (
+            select(
+                Request.user_id,
+                func.count(Request.id),
+                func.coalesce(func.sum(Request.cost_usd), 0),
+                func.max(Request.created_at),
+            )
+            .where(in_range)
+            .group_by(Request.user_id)
+        )
+        stmt = insert(UserUsageTotal).from_select(
+            ["user_id", "requests", "cost_usd", "last_request_at"], per_user
+        )
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "requests": UserUsageTotal.requests + stmt.excluded.requests,
+                "cost_usd": UserUsageTotal.cost_usd + stmt.excluded.cost_usd,
+                "last_request_at": func.greatest(UserUsageTotal.last_request_at, stmt.excluded.last_request_at),
+            }
+        ))
+        
+        # Active-user sketches
+        day = func.date(func.timezone("UTC", Request.created_at))
+        pairs = await session.execute(
+            select(day, Request.user_id).where(in_range).distinct()
+        )
+        users_by_day: Dict[date, List[int]] = {}
+        for row_day, user_id in pairs:
+            users_by_day.setdefault(row_day, []).append(user_id)
+        
+        for row_day, user_ids in users_by_day.items():
+            existing = await session.execute(
+                select(UserActivitySketch.registers)
+                .where(UserActivitySketch.day == row_day)
+                .with_for_update()
+            )
+            registers = existing.scalar_one_or_none()
+            sketch = HyperLogLog.from_bytes(registers) if registers else HyperLogLog()
+            sketch.update(user_ids)
+            await session.execute(
+                insert(UserActivitySketch)
+                .values(day=row_day, registers=sketch.to_bytes())
+                .on_conflict_do_update(
+                    index_elements=["day"],
+                    set_={"registers": sketch.to_bytes(), "updated_at": func.now()}
+                )
+            )
+        
+        count_result = await session.execute(select(func.count(Request.id)).where(in_range))
+        return count_result.scalar() or 0
+    
+    async def _fold_api_usage(self, session: AsyncSession, lo: int, hi: int) -> int:
+        in_range = and_(APIUsageLog.id > lo, APIUsageLog.id <= hi)
+        bucket = utc_hour(APIUsageLog.created_at)
+        
+        aggregated = (
+            select(
+                bucket,
+                APIUsageLog.provider,
+                APIUsageLog.model,
+                APIUsageLog.endpoint,
+                func.count(APIUsageLog.id),
+                func.count(APIUsageLog.id).filter(APIUsageLog.success.is_(False)),
+                func.coalesce(func.sum(APIUsageLog.input_tokens), 0),
+                func.coalesce(func.sum(APIUsageLog.output_tokens), 0),
+                func.coalesce(func.sum(APIUsageLog.cost_usd), 0),
+                func.coalesce(func.sum(APIUsageLog.cost_rub), 0),
+                func.coalesce(func.sum(APIUsageLog.duration_ms), 0),
+                func.count(APIUsageLog.duration_ms),
+            )
+            .where(in_range)
+            .group_by(bucket, APIUsageLog.provider, APIUsageLog.model, APIUsageLog.endpoint)
+        )
+        columns = [
+            "requests", "errors", "input_tokens", "output_tokens", "cost_usd",
+            "cost_rub", "duration_ms_sum", "duration_count",
+        ]
+        stmt = insert(APIUsageRollupHourly).from_select(
+            ["bucket", "provider", "model", "endpoint"] + columns, aggregated
+        )
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=["bucket", "provider", "model", "endpoint"],
+            set_={
+                col: getattr(APIUsageRollupHourly, col) + getattr(stmt.excluded, col)
+                for col in columns
+            }
+        ))
+        
+        count_result = await session.execute(select(func.count(APIUsageLog.id)).where(in_range))
+        return count_result.scalar() or 0
+    
+    # =========================================
+    # Reads
+    # =========================================
+    
+    async def unique_users(
+        self,
+        start: date,
+        end: date,
+        session: Optional[AsyncSession] = None
+    ) -> int:
+        """Approximate distinct requesting users over inclusive UTC days."""
+        async def _query(s: AsyncSession) -> int:
+            result = await s.execute(
+                select(UserActivitySketch.registers)
+                .where(and_(UserActivitySketch.day >= start, UserActivitySketch.day <= end))
+            )
+            merged = HyperLogLog()
+            found = False
+            for registers in result.scalars():
+                merged.merge(HyperLogLog.from_bytes(registers))
+                found = True
+            return merged.count() if found else 0
+        
+        if session is not None:
+            return await _query(session)
+        async with async_session_maker() as s:
+            return await _query(s)
+    
+    async def unique_users_by_day(
+        self,
+        start: date,
+        end: date,
+        session: AsyncSession
+    ) -> Dict[date, int]:
+        """Approximate distinct requesting users for each UTC day."""
+        result = await session.execute(
+            select(UserActivitySketch.day, UserActivitySketch.registers)
+            .where(and_(UserActivitySketch.day >= start, UserActivitySketch.day <= end))
+        )
+        return {
+            row.day: HyperLogLog.from_bytes(row.registers).count()
+            for row in result
+        }
+
+
+# Global service instance
+rollup_service = RollupService()
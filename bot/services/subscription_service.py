@@ -14,6 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import async_session_maker
 from database.models import User, Subscription, SubscriptionType
+from database.redis_client import redis_client
 from config import settings
 import structlog
 import aiohttp
@@ -489,6 +490,7 @@ class SubscriptionService:
             
             session.add(subscription)
             await session.commit()
+            await redis_client.set_premium_plan(telegram_id, expires_at)
             
             logger.info(
                 "Subscription activated",
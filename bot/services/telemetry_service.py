@@ -0,0 +1,188 @@
+"""
+Non-blocking telemetry sink.
+APIUsageLog and Request rows are queued in memory and written by a
+background task in multi-row INSERTs, off the user-visible path.
+Runs the same way in the bot, worker and admin API processes.
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+
+from database import async_session_maker
+from database.models import APIUsageLog, Request, User
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+KIND_API_USAGE = "api_usage"
+KIND_REQUEST = "request"
+
+
+class TelemetrySink:
+    """
+    Bounded in-process queue drained by a background writer.
+    
+    Rows are flushed every ``telemetry_flush_interval_ms`` or as soon as
+    ``telemetry_batch_size`` rows are waiting. When the queue is above
+    ``telemetry_overload_ratio`` of its capacity, successful API usage
+    rows are sampled at ``telemetry_overload_sample_rate``; when it is
+    full, new rows are dropped. Failed calls and Request rows are never
+    sampled. Everything still queued is flushed on ``stop()``.
+    """
+    
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "sampled_out": 0,
+            "failed": 0,
+        }
+    
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self) -> None:
+        """Start the background writer (idempotent)."""
+        if not settings.telemetry_enabled or self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.telemetry_queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Telemetry sink started", queue_size=settings.telemetry_queue_size)
+    
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop the writer and flush whatever is still queued."""
+        if not self.is_running:
+            return
+        
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        
+        if remaining:
+            try:
+                await asyncio.wait_for(self._write(remaining), timeout)
+            except Exception as e:
+                self.stats["failed"] += len(remaining)
+                logger.error("Telemetry final flush failed", rows=len(remaining), error=str(e))
+        
+        logger.info("Telemetry sink stopped", **self.stats)
+    
+    def enqueue(self, kind: str, row: Dict[str, Any], sampleable: bool = False) -> bool:
+        """
+        Queue a row without waiting.
+        
+        Args:
+            kind: KIND_API_USAGE or KIND_REQUEST
+            row: Column values
+            sampleable: Row may be sampled out under overload
+        
+        Returns:
+            True if the row was queued
+        """
+        if not self.is_running:
+            return False
+        
+        row.setdefault("created_at", datetime.now(timezone.utc))
+        
+        capacity = self._queue.maxsize
+        if sampleable and self._queue.qsize() >= capacity * settings.telemetry_overload_ratio:
+            if random.random() >= settings.telemetry_overload_sample_rate:
+                self.stats["sampled_out"] += 1
+                return False
+        
+        try:
+            self._queue.put_nowait((kind, row))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % 1000 == 1:
+                logger.warning("Telemetry queue full, dropping rows", dropped=self.stats["dropped"])
+            return False
+        
+        self.stats["enqueued"] += 1
+        return True
+    
+    async def _run(self) -> None:
+        """Collect batches by size or time and write them."""
+        interval = settings.telemetry_flush_interval_ms / 1000
+        batch_size = settings.telemetry_batch_size
+        
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + interval
+            
+            while len(batch) < batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                # Shutdown during a write — put the batch back for the final flush
+                for item in batch:
+                    try:
+                        self._queue.put_nowait(item)
+                    except asyncio.QueueFull:
+                        break
+                raise
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                logger.error("Telemetry flush failed", rows=len(batch), error=str(e))
+    
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Write one batch: one multi-row INSERT per table, one transaction."""
+        api_rows = [row for kind, row in batch if kind == KIND_API_USAGE]
+        request_rows = [row for kind, row in batch if kind == KIND_REQUEST]
+        
+        async with async_session_maker() as session:
+            if request_rows:
+                # Resolve telegram_id -> users.id for the whole batch at once
+                telegram_ids = {row["telegram_id"] for row in request_rows}
+                result = await session.execute(
+                    select(User.telegram_id, User.id).where(User.telegram_id.in_(telegram_ids))
+                )
+                user_ids = dict(result.all())
+                
+                resolved = []
+                for row in request_rows:
+                    user_id = user_ids.get(row["telegram_id"])
+                    if user_id is None:
+                        continue
+                    values = {k: v for k, v in row.items() if k != "telegram_id"}
+                    values["user_id"] = user_id
+                    resolved.append(values)
+                request_rows = resolved
+                
+                if request_rows:
+                    await session.execute(insert(Request).values(request_rows))
+            
+            if api_rows:
+                await session.execute(insert(APIUsageLog).values(api_rows))
+            
+            await session.commit()
+        
+        self.stats["written"] += len(api_rows) + len(request_rows)
+
+
+# Global sink instance
+telemetry_sink = TelemetrySink()
@@ -0,0 +1,299 @@
+"""
+Transcription service with a shared result cache.
+Voice notes and audio files are identified by Telegram's file_unique_id,
+which stays the same when a message is forwarded or re-sent, so repeated
+transcriptions of the same file are served from Redis.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import Bot
+
+from bot.services.ai_service import ai_service
+from bot.services.audio_service import audio_service, format_timestamp
+from database.redis_client import redis_client
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+TranscribeCall = Callable[[], Awaitable[Tuple[str, Dict[str, Any]]]]
+
+
+class TranscriptionService:
+    """
+    Cached, deduplicated audio transcription.
+    
+    Results are stored as ``transcription:{file_unique_id}:{language}``
+    with a TTL. A sorted set indexes entries by creation time so the
+    cache can be trimmed to ``transcription_cache_max_entries``.
+    Concurrent requests for the same file within a process share one
+    provider call.
+    """
+    
+    KEY_PREFIX = "transcription"
+    INDEX_KEY = "transcription:index"
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    def _key(self, file_unique_id: str, language: Optional[str]) -> str:
+        return f"{self.KEY_PREFIX}:{file_unique_id}:{language or 'auto'}"
+    
+    async def get_cached(
+        self,
+        file_unique_id: str,
+        language: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get a cached transcription entry (text, duration, cost, model)."""
+        try:
+            raw = await redis_client.client.get(self._key(file_unique_id, language))
+        except Exception as e:
+            logger.warning("Transcription cache read failed", error=str(e))
+            return None
+        return json.loads(raw) if raw else None
+    
+    async def _store(self, key: str, text: str, usage: Dict[str, Any], duration: Optional[int]) -> None:
+        """Store a transcription and trim the cache to its size limit."""
+        ttl = settings.transcription_cache_ttl
+        max_entries = settings.transcription_cache_max_entries
+        now = time.time()
+        entry = {
+            "text": text,
+            "duration": duration,
+            "cost_usd": str(usage.get("cost_usd", 0)),
+            "model": usage.get("model"),
+            "created_at": int(now),
+        }
+        
+        try:
+            pipe = redis_client.client.pipeline()
+            pipe.setex(key, ttl, json.dumps(entry, ensure_ascii=False))
+            pipe.zadd(self.INDEX_KEY, {key: now})
+            # Entries that already expired on their own
+            pipe.zremrangebyscore(self.INDEX_KEY, 0, now - ttl)
+            pipe.zcard(self.INDEX_KEY)
+            results = await pipe.execute()
+            
+            overflow = results[-1] - max_entries
+            if overflow > 0:
+                evicted = await redis_client.client.zpopmin(self.INDEX_KEY, overflow)
+                if evicted:
+                    await redis_client.client.delete(*[k for k, _ in evicted])
+        except Exception as e:
+            logger.warning("Transcription cache write failed", error=str(e))
+    
+    async def transcribe(
+        self,
+        file_unique_id: str,
+        language: Optional[str],
+        call: TranscribeCall,
+        duration: Optional[int] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Transcribe through the cache.
+        
+        Args:
+            file_unique_id: Telegram file_unique_id of the audio
+            language: Language hint passed to the provider (None = auto)
+            call: Coroutine factory doing the actual download + transcription
+            duration: Audio duration in seconds, if known
+        
+        Returns:
+            Tuple of (transcribed_text, usage_info). Cache hits report
+            zero cost and ``cached=True``.
+        """
+        if not settings.transcription_cache_enabled or not file_unique_id:
+            return await call()
+        
+        key = self._key(file_unique_id, language)
+        
+        cached = await self.get_cached(file_unique_id, language)
+        if cached:
+            logger.info("Transcription cache hit", key=key)
+            return cached["text"], self._cached_usage(cached)
+        
+        pending = self._inflight.get(key)
+        if pending:
+            logger.info("Transcription already in flight, waiting", key=key)
+            text, usage = await asyncio.shield(pending)
+            return text, {**usage, "cost_usd": Decimal("0"), "cached": True}
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text, usage = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting — mark the exception as retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result((text, usage))
+        finally:
+            self._inflight.pop(key, None)
+        
+        if text and text.strip():
+            await self._store(key, text, usage, duration)
+        
+        return text, usage
+    
+    async def transcribe_telegram_file(
+        self,
+        bot: Bot,
+        file_id: str,
+        file_unique_id: str,
+        filename: str,
+        language: Optional[str] = None,
+        telegram_id: int = None,
+        duration: Optional[int] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Download a Telegram voice/audio file and transcribe it, skipping
+        the download entirely on a cache hit.
+        """
+        async def _call() -> Tuple[str, Dict[str, Any]]:
+            file = await bot.get_file(file_id)
+            file_bytes = await bot.download_file(file.file_path)
+            audio_data = file_bytes.read() if hasattr(file_bytes, 'read') else file_bytes
+            if duration and duration > settings.transcription_long_audio_seconds:
+                return await self.transcribe_long_audio(
+                    audio_data=audio_data,
+                    filename=filename,
+                    language=language,
+                    telegram_id=telegram_id
+                )
+            return await ai_service.transcribe_audio(
+                audio_data=audio_data,
+                filename=filename,
+                language=language,
+                telegram_id=telegram_id,
+                duration_seconds=duration
+            )
+        
+        return await self.transcribe(file_unique_id, language, _call, duration=duration)
+    
+    async def transcribe_long_audio(
+        self,
+        audio_data: bytes,
+        filename: str = "audio.ogg",
+        language: Optional[str] = None,
+        telegram_id: int = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Transcribe a long recording (e.g. a meeting) in parallel chunks.
+        
+        The audio is split on silence into ~``transcription_chunk_seconds``
+        segments, which are transcribed concurrently (at most
+        ``transcription_concurrency`` at a time) and stitched back in
+        order with ``[HH:MM:SS]`` timestamps.
+        
+        Returns:
+            Tuple of (transcribed_text, usage_info) where usage_info has
+            the real ``duration_seconds`` and the summed cost
+        """
+        ext = os.path.splitext(filename)[1] or ".ogg"
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source_path = os.path.join(tmpdir, f"source{ext}")
+            await asyncio.to_thread(self._write_file, source_path, audio_data)
+            
+            duration = await audio_service.probe_duration(source_path)
+            if not duration:
+                # Unknown container — nothing to split on, send as is
+                return await ai_service.transcribe_audio(
+                    audio_data=audio_data,
+                    filename=filename,
+                    language=language,
+                    telegram_id=telegram_id
+                )
+            
+            segments = await audio_service.split(source_path, tmpdir, duration)
+            if len(segments) == 1:
+                text, usage = await ai_service.transcribe_audio(
+                    audio_data=audio_data,
+                    filename=filename,
+                    language=language,
+                    telegram_id=telegram_id,
+                    duration_seconds=duration
+                )
+                return text, {**usage, "duration_seconds": round(duration, 1)}
+            
+            semaphore = asyncio.Semaphore(settings.transcription_concurrency)
+            
+            async def _transcribe_segment(segment: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+                async with semaphore:
+                    data = await asyncio.to_thread(self._read_file, segment["path"])
+                    kwargs = dict(
+                        audio_data=data,
+                        filename=f"segment_{segment['index']:03d}.ogg",
+                        language=language,
+                        telegram_id=telegram_id,
+                        duration_seconds=segment["end"] - segment["start"]
+                    )
+                    try:
+                        return await ai_service.transcribe_audio(**kwargs)
+                    except Exception as e:
+                        logger.warning("Segment transcription failed, retrying", index=segment["index"], error=str(e))
+                        return await ai_service.transcribe_audio(**kwargs)
+            
+            start_time = time.time()
+            results = await asyncio.gather(*(_transcribe_segment(seg) for seg in segments))
+        
+        parts = []
+        total_cost = Decimal("0")
+        model = None
+        for segment, (text, usage) in zip(segments, results):
+            total_cost += Decimal(str(usage.get("cost_usd", 0)))
+            model = model or usage.get("model")
+            text = (text or "").strip()
+            if text:
+                parts.append(f"[{format_timestamp(segment['start'])}] {text}")
+        
+        logger.info(
+            "Long audio transcribed",
+            user_id=telegram_id,
+            duration=round(duration, 1),
+            segments=len(segments),
+            wall_seconds=round(time.time() - start_time, 1)
+        )
+        
+        return "\n\n".join(parts), {
+            "model": model or "unknown",
+            "duration_seconds": round(duration, 1),
+            "duration_minutes": round(duration / 60, 2),
+            "cost_usd": total_cost,
+            "segments": len(segments),
+        }
+    
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        with open(path, 'wb') as f:
+            f.write(data)
+    
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    @staticmethod
+    def _cached_usage(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "model": entry.get("model") or "unknown",
+            "duration": entry.get("duration"),
+            "cost_usd": Decimal("0"),
+            "original_cost_usd": Decimal(entry.get("cost_usd") or "0"),
+            "cached": True,
+        }
+
+
+# Global service instance
+transcription_service = TranscriptionService()
@@ -0,0 +1,302 @@
+"""
+Telegram update stream for webhook mode.
+The webhook receiver appends raw updates to Redis Streams (sharded by
+chat); any number of bot replicas consume them through consumer groups
+with per-chat ordering, at-least-once delivery and update_id dedup.
+"""
+import asyncio
+import json
+import math
+import os
+import socket
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from database.redis_client import redis_client
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+GROUP = "bot"
+
+# Dedup + append in one step, so a Telegram retry of the same update is
+# dropped and a receiver crash can't mark an update seen without storing it
+_PUBLISH_SCRIPT = """
+if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+    return redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', 'update', ARGV[3])
+end
+return false
+"""
+
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Payload paths that identify the chat (or user) an update belongs to
+_CHAT_PATHS = (
+    ("chat", "id"),
+    ("message", "chat", "id"),
+    ("from", "id"),
+    ("user", "id"),
+    ("voter_chat", "id"),
+)
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """Chat (or user) id an update belongs to; 0 if it has none."""
+    for key, payload in update.items():
+        if key == "update_id" or not isinstance(payload, dict):
+            continue
+        for path in _CHAT_PATHS:
+            value: Any = payload
+            for part in path:
+                value = value.get(part) if isinstance(value, dict) else None
+            if isinstance(value, int):
+                return value
+    return 0
+
+
+class UpdateStream:
+    """
+    Sharded Redis Streams of raw Telegram updates.
+    
+    Updates go to shard ``crc32(chat_id) % update_stream_shards``. Each
+    shard is consumed by exactly one replica at a time (a Redis lease),
+    so one chat's updates are handled in order; replicas split the shards
+    evenly and take over a dead replica's shards when its lease expires.
+    
+    Within a shard, different chats are processed concurrently. An entry
+    is acked only after its handler finishes, so a crash means redelivery
+    (entries idle longer than ``update_claim_idle_ms`` are claimed by the
+    next owner); a done-marker per update_id keeps a redelivered update
+    from being handled twice.
+    """
+    
+    def __init__(self):
+        self.instance = f"{socket.gethostname()}:{os.getpid()}"
+        self._shard_tasks: Dict[int, asyncio.Task] = {}
+        self._releasing: Set[int] = set()
+    
+    def stream_key(self, shard: int) -> str:
+        return f"{settings.update_stream_prefix}:{shard}"
+    
+    def shard_for(self, update: Dict[str, Any]) -> int:
+        chat_id = update_chat_id(update)
+        return zlib.crc32(str(chat_id).encode()) % settings.update_stream_shards
+    
+    # =========================================
+    # Producer (webhook receiver)
+    # =========================================
+    
+    async def publish(self, update: Dict[str, Any]) -> bool:
+        """
+        Append an update to its shard.
+        
+        Returns:
+            False if this update_id was already received (Telegram retry)
+        """
+        entry_id = await redis_client.client.eval(
+            _PUBLISH_SCRIPT,
+            2,
+            f"{settings.update_stream_prefix}:seen:{update['update_id']}",
+            self.stream_key(self.shard_for(update)),
+            settings.update_dedup_ttl,
+            settings.update_stream_maxlen,
+            json.dumps(update, ensure_ascii=False),
+        )
+        return entry_id is not None
+    
+    # =========================================
+    # Consumer (bot replicas)
+    # =========================================
+    
+    async def run(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        stop: asyncio.Event
+    ) -> None:
+        """
+        Consume updates until ``stop`` is set, then drain in-flight
+        updates and release this replica's shards.
+        """
+        logger.info("Update stream consumer started", instance=self.instance)
+        try:
+            while not stop.is_set():
+                try:
+                    await self._rebalance(handler)
+                except Exception as e:
+                    logger.error("Update stream rebalance failed", error=str(e))
+                try:
+                    await asyncio.wait_for(stop.wait(), settings.update_lease_ms / 3000)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for shard in list(self._shard_tasks):
+                self._releasing.add(shard)
+            if self._shard_tasks:
+                await asyncio.gather(*self._shard_tasks.values(), return_exceptions=True)
+            try:
+                await redis_client.client.zrem(self._members_key, self.instance)
+            except Exception:
+                pass
+            logger.info("Update stream consumer stopped", instance=self.instance)
+    
+    @property
+    def _members_key(self) -> str:
+        return f"{settings.update_stream_prefix}:consumers"
+    
+    def _lease_key(self, shard: int) -> str:
+        return f"{self.stream_key(shard)}:owner"
+    
+    async def _rebalance(self, handler: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """Heartbeat, renew owned leases and take or give back shards."""
+        client = redis_client.client
+        now = time.time()
+        lease_ms = settings.update_lease_ms
+        
+        await client.zadd(self._members_key, {self.instance: now})
+        await client.zremrangebyscore(self._members_key, 0, now - 3 * lease_ms / 1000)
+        members = max(1, await client.zcard(self._members_key))
+        fair_share = math.ceil(settings.update_stream_shards / members)
+        
+        for shard, task in list(self._shard_tasks.items()):
+            if task.done():
+                del self._shard_tasks[shard]
+                self._releasing.discard(shard)
+                continue
+            renewed = await client.eval(_RENEW_SCRIPT, 1, self._lease_key(shard), self.instance, lease_ms)
+            if not renewed:
+                logger.warning("Lost update shard lease", shard=shard)
+                self._releasing.add(shard)
+        
+        active = [s for s in self._shard_tasks if s not in self._releasing]
+        for shard in active[fair_share:]:
+            self._releasing.add(shard)  # give back extras so new replicas get work
+        
+        if len(active) >= fair_share:
+            return
+        for shard in range(settings.update_stream_shards):
+            if len(active) >= fair_share:
+                break
+            if shard in self._shard_tasks:
+                continue
+            if await client.set(self._lease_key(shard), self.instance, nx=True, px=lease_ms):
+                self._shard_tasks[shard] = asyncio.create_task(self._consume_shard(shard, handler))
+                active.append(shard)
+                logger.info("Acquired update shard", shard=shard)
+    
+    async def _consume_shard(
+        self,
+        shard: int,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]]
+    ) -> None:
+        client = redis_client.client
+        stream = self.stream_key(shard)
+        try:
+            await client.xgroup_create(stream, GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        
+        lanes: Dict[int, asyncio.Task] = {}  # newest task per chat
+        in_flight: Dict[str, asyncio.Task] = {}  # entry id -> task
+        last_claim = 0.0
+        
+        try:
+            while shard not in self._releasing:
+                if len(in_flight) >= settings.update_shard_max_in_flight:
+                    await asyncio.wait(in_flight.values(), return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                
+                entries: List = []
+                if time.monotonic() - last_claim >= settings.update_claim_idle_ms / 1000:
+                    # Entries a previous owner read but never acked
+                    last_claim = time.monotonic()
+                    claimed = await client.xautoclaim(
+                        stream, GROUP, self.instance,
+                        min_idle_time=settings.update_claim_idle_ms, start_id="0-0", count=100
+                    )
+                    entries = claimed[1]
+                if not entries:
+                    response = await client.xreadgroup(
+                        GROUP, self.instance, {stream: ">"},
+                        count=settings.update_shard_max_in_flight - len(in_flight), block=1000
+                    )
+                    entries = response[0][1] if response else []
+                
+                for entry_id, fields in entries:
+                    if not fields or entry_id in in_flight:
+                        continue  # trimmed while pending, or our own slow handler
+                    update = json.loads(fields["update"])
+                    chat_id = update_chat_id(update)
+                    task = asyncio.create_task(
+                        self._process(stream, entry_id, update, handler, lanes.get(chat_id))
+                    )
+                    lanes[chat_id] = task
+                    in_flight[entry_id] = task
+                    task.add_done_callback(
+                        lambda t, entry_id=entry_id, chat_id=chat_id: self._finished(
+                            lanes, in_flight, entry_id, chat_id, t
+                        )
+                    )
+        except Exception as e:
+            logger.error("Update shard consumer failed", shard=shard, error=str(e))
+        finally:
+            if in_flight:
+                await asyncio.gather(*in_flight.values(), return_exceptions=True)
+            try:
+                await client.eval(_RELEASE_SCRIPT, 1, self._lease_key(shard), self.instance)
+            except Exception:
+                pass
+            logger.info("Released update shard", shard=shard)
+    
+    @staticmethod
+    def _finished(
+        lanes: Dict[int, asyncio.Task],
+        in_flight: Dict[str, asyncio.Task],
+        entry_id: str,
+        chat_id: int,
+        task: asyncio.Task
+    ) -> None:
+        in_flight.pop(entry_id, None)
+        if lanes.get(chat_id) is task:
+            del lanes[chat_id]
+    
+    async def _process(
+        self,
+        stream: str,
+        entry_id: str,
+        update: Dict[str, Any],
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        previous: Optional[asyncio.Task]
+    ) -> None:
+        """Handle one update after the chat's previous one, then ack it."""
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        
+        client = redis_client.client
+        done_key = f"{settings.update_stream_prefix}:done:{update['update_id']}"
+        try:
+            if not await client.exists(done_key):
+                await handler(update)
+                await client.set(done_key, "1", ex=settings.update_dedup_ttl)
+        except Exception as e:
+            # Handler errors are logged by aiogram; the update is not retried
+            logger.error("Update handling failed", update_id=update.get("update_id"), error=str(e))
+        await client.xack(stream, GROUP, entry_id)
+
+
+# Global stream instance
+update_stream = UpdateStream()
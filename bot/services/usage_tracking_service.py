@@ -6,11 +6,13 @@ from datetime import datetime, date, timedelta, timezone
 from typing import Optional, Dict, Any, List, Tuple
 from decimal import Decimal
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, cast, Date
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import async_session_maker
-from database.models import APIUsageLog
+from database.models import APIUsageLog, APIUsageRollupHourly
+from bot.services.telemetry_service import telemetry_sink, KIND_API_USAGE
+from bot.utils.metrics import observe_provider_call, observe_provider_usage
 from config import settings
 import structlog
 
@@ -36,10 +38,13 @@ class UsageTrackingService:
         success: bool = True,
         error_message: str = None,
         user_id: int = None
-    ) -> int:
+    ) -> Optional[int]:
         """
         Log an API call for tracking.
         
+        Queued to the telemetry sink when it is running (no DB round
+        trip on the caller's path); written directly otherwise.
+        
         Args:
             provider: API provider (cometapi, gigachat, openai)
             model: Model name used
@@ -54,8 +59,30 @@ class UsageTrackingService:
             user_id: Database user ID (optional)
             
         Returns:
-            Log entry ID
+            Log entry ID, or None if the entry was queued
         """
+        row = dict(
+            user_id=user_id,
+            provider=provider,
+            model=model,
+            endpoint=endpoint,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost_usd=cost_usd,
+            cost_rub=cost_rub,
+            duration_ms=duration_ms,
+            success=success,
+            error_message=error_message
+        )
+        
+        observe_provider_call(provider, model, endpoint, success, duration_ms)
+        observe_provider_usage(provider, model, input_tokens, output_tokens, cost_usd, cost_rub)
+        
+        if telemetry_sink.is_running:
+            # Failed calls are never sampled out under overload
+            telemetry_sink.enqueue(KIND_API_USAGE, row, sampleable=success)
+            return None
+        
         async with async_session_maker() as session:
             log_entry = APIUsageLog(
                 user_id=user_id,
@@ -83,6 +110,7 @@ class UsageTrackingService:
     ) -> Dict[str, Any]:
         """
         Get daily usage summary.
+        Reads the hourly API usage rollups (UTC day).
         
         Args:
             target_date: Date to get summary for (default: today)
@@ -91,79 +119,71 @@ class UsageTrackingService:
             Dict with usage statistics
         """
         if target_date is None:
-            target_date = date.today()
+            target_date = datetime.now(timezone.utc).date()
         
-        start_dt = datetime.combine(target_date, datetime.min.time()).replace(tzinfo=timezone.utc)
+        start_dt = datetime.combine(target_date, datetime.min.time())
         end_dt = start_dt + timedelta(days=1)
         
         async with async_session_maker() as session:
-            # Get totals by provider
+            # One pass over the day's rollup rows, folded by provider and model
             result = await session.execute(
                 select(
-                    APIUsageLog.provider,
-                    func.count(APIUsageLog.id).label('count'),
-                    func.sum(APIUsageLog.input_tokens).label('input_tokens'),
-                    func.sum(APIUsageLog.output_tokens).label('output_tokens'),
-                    func.sum(APIUsageLog.cost_usd).label('cost_usd'),
-                    func.sum(APIUsageLog.cost_rub).label('cost_rub'),
-                    func.avg(APIUsageLog.duration_ms).label('avg_duration')
+                    APIUsageRollupHourly.provider,
+                    APIUsageRollupHourly.model,
+                    func.sum(APIUsageRollupHourly.requests).label('count'),
+                    func.sum(APIUsageRollupHourly.errors).label('errors'),
+                    func.sum(APIUsageRollupHourly.input_tokens).label('input_tokens'),
+                    func.sum(APIUsageRollupHourly.output_tokens).label('output_tokens'),
+                    func.sum(APIUsageRollupHourly.cost_usd).label('cost_usd'),
+                    func.sum(APIUsageRollupHourly.cost_rub).label('cost_rub'),
+                    func.sum(APIUsageRollupHourly.duration_ms_sum).label('duration_sum'),
+                    func.sum(APIUsageRollupHourly.duration_count).label('duration_count')
                 )
                 .where(and_(
-                    APIUsageLog.created_at >= start_dt,
-                    APIUsageLog.created_at < end_dt
+                    APIUsageRollupHourly.bucket >= start_dt,
+                    APIUsageRollupHourly.bucket < end_dt
                 ))
-                .group_by(APIUsageLog.provider)
+                .group_by(APIUsageRollupHourly.provider, APIUsageRollupHourly.model)
             )
             
             providers = {}
+            models = {}
             total_cost_usd = Decimal("0")
             total_cost_rub = Decimal("0")
             total_requests = 0
+            error_count = 0
             
             for row in result:
-                providers[row.provider] = {
-                    "requests": row.count,
-                    "input_tokens": row.input_tokens or 0,
-                    "output_tokens": row.output_tokens or 0,
-                    "cost_usd": float(row.cost_usd or 0),
-                    "cost_rub": float(row.cost_rub or 0),
-                    "avg_duration_ms": float(row.avg_duration or 0)
-                }
-                total_cost_usd += row.cost_usd or Decimal("0")
-                total_cost_rub += row.cost_rub or Decimal("0")
-                total_requests += row.count
-            
-            # Get totals by model
-            result = await session.execute(
-                select(
-                    APIUsageLog.model,
-                    func.count(APIUsageLog.id).label('count'),
-                    func.sum(APIUsageLog.cost_usd).label('cost_usd')
-                )
-                .where(and_(
-                    APIUsageLog.created_at >= start_dt,
-                    APIUsageLog.created_at < end_dt
-                ))
-                .group_by(APIUsageLog.model)
-            )
-            
-            models = {}
-            for row in result:
-                models[row.model] = {
-                    "requests": row.count,
-                    "cost_usd": float(row.cost_usd or 0)
-                }
+                provider = providers.setdefault(row.provider, {
+                    "requests": 0,
+                    "input_tokens": 0,
+                    "output_tokens": 0,
+                    "cost_usd": 0.0,
+                    "cost_rub": 0.0,
+                    "duration_sum": 0,
+                    "duration_count": 0
+                })
+                provider["requests"] += int(row.count)
+                provider["input_tokens"] += int(row.input_tokens)
+                provider["output_tokens"] += int(row.output_tokens)
+                provider["cost_usd"] += float(row.cost_usd)
+                provider["cost_rub"] += float(row.cost_rub)
+                provider["duration_sum"] += int(row.duration_sum)
+                provider["duration_count"] += int(row.duration_count)
+                
+                model = models.setdefault(row.model, {"requests": 0, "cost_usd": 0.0})
+                model["requests"] += int(row.count)
+                model["cost_usd"] += float(row.cost_usd)
+                
+                total_cost_usd += row.cost_usd
+                total_cost_rub += row.cost_rub
+                total_requests += int(row.count)
+                error_count += int(row.errors)
             
-            # Get error count
-            error_result = await session.execute(
-                select(func.count(APIUsageLog.id))
-                .where(and_(
-                    APIUsageLog.created_at >= start_dt,
-                    APIUsageLog.created_at < end_dt,
-                    APIUsageLog.success == False
-                ))
-            )
-            error_count = error_result.scalar() or 0
+            for provider in providers.values():
+                duration_sum = provider.pop("duration_sum")
+                duration_count = provider.pop("duration_count")
+                provider["avg_duration_ms"] = duration_sum / duration_count if duration_count else 0.0
             
             return {
                 "date": target_date.isoformat(),
@@ -183,6 +203,7 @@ class UsageTrackingService:
     ) -> Dict[str, Any]:
         """
         Get monthly usage summary.
+        Reads the hourly API usage rollups (UTC days).
         
         Args:
             year: Year (default: current)
@@ -197,69 +218,60 @@ class UsageTrackingService:
         if month is None:
             month = now.month
         
-        start_dt = datetime(year, month, 1, tzinfo=timezone.utc)
+        start_dt = datetime(year, month, 1)
         if month == 12:
-            end_dt = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+            end_dt = datetime(year + 1, 1, 1)
         else:
-            end_dt = datetime(year, month + 1, 1, tzinfo=timezone.utc)
+            end_dt = datetime(year, month + 1, 1)
         
         async with async_session_maker() as session:
-            # Get daily totals
+            day_bucket = cast(APIUsageRollupHourly.bucket, Date)
             result = await session.execute(
                 select(
-                    func.date(APIUsageLog.created_at).label('day'),
-                    func.count(APIUsageLog.id).label('count'),
-                    func.sum(APIUsageLog.cost_usd).label('cost_usd'),
-                    func.sum(APIUsageLog.cost_rub).label('cost_rub')
+                    day_bucket.label('day'),
+                    APIUsageRollupHourly.provider,
+                    func.sum(APIUsageRollupHourly.requests).label('count'),
+                    func.sum(APIUsageRollupHourly.cost_usd).label('cost_usd'),
+                    func.sum(APIUsageRollupHourly.cost_rub).label('cost_rub')
                 )
                 .where(and_(
-                    APIUsageLog.created_at >= start_dt,
-                    APIUsageLog.created_at < end_dt
+                    APIUsageRollupHourly.bucket >= start_dt,
+                    APIUsageRollupHourly.bucket < end_dt
                 ))
-                .group_by(func.date(APIUsageLog.created_at))
-                .order_by(func.date(APIUsageLog.created_at))
+                .group_by(day_bucket, APIUsageRollupHourly.provider)
+                .order_by(day_bucket)
             )
             
-            daily_data = []
+            days = {}
+            providers = {}
             total_cost_usd = Decimal("0")
             total_cost_rub = Decimal("0")
             total_requests = 0
             
             for row in result:
-                daily_data.append({
-                    "date": row.day.isoformat() if row.day else None,
-                    "requests": row.count,
-                    "cost_usd": float(row.cost_usd or 0),
-                    "cost_rub": float(row.cost_rub or 0)
+                day = days.setdefault(row.day, {
+                    "date": row.day.isoformat(),
+                    "requests": 0,
+                    "cost_usd": 0.0,
+                    "cost_rub": 0.0
                 })
-                total_cost_usd += row.cost_usd or Decimal("0")
-                total_cost_rub += row.cost_rub or Decimal("0")
-                total_requests += row.count
+                day["requests"] += int(row.count)
+                day["cost_usd"] += float(row.cost_usd)
+                day["cost_rub"] += float(row.cost_rub)
+                
+                provider = providers.setdefault(row.provider, {"requests": 0, "cost_usd": 0.0})
+                provider["requests"] += int(row.count)
+                provider["cost_usd"] += float(row.cost_usd)
+                
+                total_cost_usd += row.cost_usd
+                total_cost_rub += row.cost_rub
+                total_requests += int(row.count)
             
-            # Get provider breakdown
-            provider_result = await session.execute(
-                select(
-                    APIUsageLog.provider,
-                    func.count(APIUsageLog.id).label('count'),
-                    func.sum(APIUsageLog.cost_usd).label('cost_usd')
-                )
-                .where(and_(
-                    APIUsageLog.created_at >= start_dt,
-                    APIUsageLog.created_at < end_dt
-                ))
-                .group_by(APIUsageLog.provider)
-            )
-            
-            providers = {}
-            for row in provider_result:
-                providers[row.provider] = {
-                    "requests": row.count,
-                    "cost_usd": float(row.cost_usd or 0)
-                }
+            daily_data = list(days.values())
             
             # Calculate projections
             days_in_month = (end_dt - start_dt).days
-            days_elapsed = (now - start_dt).days + 1
+            days_elapsed = (now.replace(tzinfo=None) - start_dt).days + 1
             
             if days_elapsed > 0:
                 projected_monthly_usd = float(total_cost_usd) / days_elapsed * days_in_month
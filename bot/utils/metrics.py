@@ -0,0 +1,315 @@
+"""
+Prometheus metrics shared by the bot, worker and admin API.
+Each process exposes its own registry: the API on GET /metrics, the bot
+and worker through a small HTTP exporter (bot_metrics_port /
+worker_metrics_port).
+"""
+import asyncio
+import functools
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from sqlalchemy import event
+
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+# Handler latency buckets (seconds): fast command replies up to slow AI answers
+HANDLER_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PROVIDER_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+ROUNDTRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# =========================================
+# Bot updates
+# =========================================
+
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds",
+    "Update handling time by router module and handler",
+    ["router", "handler", "update_type", "status"],
+    buckets=HANDLER_BUCKETS,
+)
+UPDATE_DB_QUERIES = Histogram(
+    "bot_update_db_queries",
+    "Database statements executed while handling one update",
+    ["update_type"],
+    buckets=ROUNDTRIP_BUCKETS,
+)
+UPDATE_REDIS_ROUNDTRIPS = Histogram(
+    "bot_update_redis_roundtrips",
+    "Redis commands and pipelines executed while handling one update",
+    ["update_type"],
+    buckets=ROUNDTRIP_BUCKETS,
+)
+GROUP_MESSAGES = Counter(
+    "bot_group_messages_total",
+    "Group messages by pre-filter result (addressed to the bot or dropped)",
+    ["result"],
+)
+LANE_SHED = Counter(
+    "bot_lane_shed_total",
+    "Updates dropped because their chat lane was full",
+)
+LANE_WAITING = Gauge(
+    "bot_lane_waiting",
+    "Updates waiting for their chat lane",
+)
+HANDLERS_RUNNING = Gauge(
+    "bot_handlers_running",
+    "Update handlers currently running",
+)
+
+# =========================================
+# Telegram Bot API
+# =========================================
+
+TELEGRAM_REQUESTS = Counter(
+    "telegram_api_requests_total",
+    "Bot API calls by method and outcome",
+    ["method", "status"],
+)
+TELEGRAM_RETRY_AFTER = Counter(
+    "telegram_api_retry_after_total",
+    "Bot API calls rejected with 429 Too Many Requests",
+    ["method"],
+)
+TELEGRAM_DURATION = Histogram(
+    "telegram_api_request_duration_seconds",
+    "Bot API call time by method",
+    ["method"],
+    buckets=HANDLER_BUCKETS,
+)
+
+# =========================================
+# AI providers
+# =========================================
+
+PROVIDER_REQUESTS = Counter(
+    "ai_provider_requests_total",
+    "Provider calls by model, endpoint and outcome",
+    ["provider", "model", "endpoint", "status"],
+)
+PROVIDER_DURATION = Histogram(
+    "ai_provider_request_duration_seconds",
+    "Provider call time by model and endpoint",
+    ["provider", "model", "endpoint"],
+    buckets=PROVIDER_BUCKETS,
+)
+PROVIDER_TOKENS = Counter(
+    "ai_provider_tokens_total",
+    "Tokens billed by providers",
+    ["provider", "model", "direction"],
+)
+PROVIDER_COST = Counter(
+    "ai_provider_cost_total",
+    "Provider spend by model and currency",
+    ["provider", "model", "currency"],
+)
+PROVIDER_BREAKER_STATE = Gauge(
+    "ai_provider_breaker_state",
+    "Circuit breaker state per provider and capability (0 closed, 1 half-open, 2 open)",
+    ["provider", "capability"],
+)
+
+# =========================================
+# Worker
+# =========================================
+
+JOB_DURATION = Histogram(
+    "worker_job_duration_seconds",
+    "arq job run time by function and outcome",
+    ["function", "status"],
+    buckets=PROVIDER_BUCKETS + (600, 1800),
+)
+QUEUE_DEPTH = Gauge(
+    "worker_queue_depth",
+    "Jobs waiting in the arq queue",
+)
+
+# =========================================
+# Process
+# =========================================
+
+LOOP_LAG = Gauge(
+    "event_loop_lag_seconds",
+    "Latest event loop scheduling delay",
+)
+LOOP_LAG_HISTOGRAM = Histogram(
+    "event_loop_lag_seconds_distribution",
+    "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_BLOCKS = Counter(
+    "event_loop_blocked_total",
+    "Callbacks that blocked the event loop past the threshold, by call site",
+    ["process", "site"],
+)
+LOOP_BLOCK_DURATION = Histogram(
+    "event_loop_block_duration_seconds",
+    "Time the event loop was blocked by one callback",
+    ["process"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Per-update roundtrip counts; set by LoggingMiddleware, inherited by the
+# handler's task and any tasks it spawns
+_roundtrips: ContextVar[Optional[Dict[str, int]]] = ContextVar("metrics_roundtrips", default=None)
+
+
+def start_update_counters() -> Dict[str, int]:
+    """Begin counting DB/Redis roundtrips for the current update."""
+    counts = {"db": 0, "redis": 0}
+    _roundtrips.set(counts)
+    return counts
+
+
+def count_roundtrip(kind: str) -> None:
+    """Count one DB statement ("db") or Redis roundtrip ("redis")."""
+    counts = _roundtrips.get()
+    if counts is not None:
+        counts[kind] += 1
+
+
+def observe_update(
+    router: str,
+    handler: str,
+    update_type: str,
+    status: str,
+    duration: float,
+    counts: Dict[str, int]
+) -> None:
+    """Record one handled update."""
+    HANDLER_DURATION.labels(router, handler, update_type, status).observe(duration)
+    UPDATE_DB_QUERIES.labels(update_type).observe(counts["db"])
+    UPDATE_REDIS_ROUNDTRIPS.labels(update_type).observe(counts["redis"])
+
+
+def observe_provider_call(
+    provider: str,
+    model: str,
+    endpoint: str,
+    success: bool,
+    duration_ms: Optional[int] = None
+) -> None:
+    """Record one provider call (latency only when it was measured)."""
+    model = model or "unknown"
+    PROVIDER_REQUESTS.labels(provider, model, endpoint, "ok" if success else "error").inc()
+    if duration_ms is not None:
+        PROVIDER_DURATION.labels(provider, model, endpoint).observe(duration_ms / 1000)
+
+
+def observe_provider_usage(
+    provider: str,
+    model: str,
+    input_tokens: Optional[int] = None,
+    output_tokens: Optional[int] = None,
+    cost_usd: Any = None,
+    cost_rub: Any = None
+) -> None:
+    """Record billed tokens and cost of a provider call."""
+    model = model or "unknown"
+    if input_tokens:
+        PROVIDER_TOKENS.labels(provider, model, "input").inc(input_tokens)
+    if output_tokens:
+        PROVIDER_TOKENS.labels(provider, model, "output").inc(output_tokens)
+    if cost_usd:
+        PROVIDER_COST.labels(provider, model, "usd").inc(float(cost_usd))
+    if cost_rub:
+        PROVIDER_COST.labels(provider, model, "rub").inc(float(cost_rub))
+
+
+def instrument_engine(engine) -> None:
+    """Count statements executed through an (async) SQLAlchemy engine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _count_statement):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _count_statement)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    count_roundtrip("db")
+
+
+def timed_job(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Decorator for arq jobs: record run time and outcome per function."""
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await func(*args, **kwargs)
+            status = "ok"
+            return result
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            JOB_DURATION.labels(func.__name__, status).observe(time.perf_counter() - started)
+    
+    return wrapper
+
+
+async def _monitor_loop_lag(interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+async def _monitor_queue_depth(redis, queue_name: str, interval: float) -> None:
+    while True:
+        try:
+            QUEUE_DEPTH.set(await redis.zcard(queue_name))
+        except Exception as e:
+            logger.warning("Queue depth check failed", error=str(e))
+        await asyncio.sleep(interval)
+
+
+class MetricsExporter:
+    """
+    Background pieces of a process's metrics: the HTTP exporter, the
+    event loop lag probe and (for the worker) the queue depth poll.
+    """
+    
+    def __init__(self):
+        self._tasks: list = []
+        self._serving = False
+    
+    def start(self, port: Optional[int] = None) -> None:
+        """
+        Start the loop lag probe and, if ``port`` is given, serve
+        /metrics on it. No-op when metrics are disabled.
+        """
+        if not settings.metrics_enabled or self._tasks:
+            return
+        if port and not self._serving:
+            try:
+                start_http_server(port)
+                self._serving = True
+                logger.info("Metrics exporter listening", port=port)
+            except OSError as e:
+                logger.warning("Metrics exporter not started", port=port, error=str(e))
+        self._tasks.append(asyncio.create_task(_monitor_loop_lag(settings.loop_lag_interval)))
+    
+    def watch_queue(self, redis, queue_name: str = "arq:queue", interval: float = 15) -> None:
+        """Poll the depth of an arq queue."""
+        if settings.metrics_enabled:
+            self._tasks.append(asyncio.create_task(_monitor_queue_depth(redis, queue_name, interval)))
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# Global exporter instance
+metrics_exporter = MetricsExporter()
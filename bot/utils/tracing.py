@@ -0,0 +1,363 @@
+"""
+Lightweight request tracing.
+Spans follow the W3C trace context model (32-hex trace id, 16-hex span
+id, ``traceparent`` format), so a trace started for a Telegram update
+continues through arq jobs into the worker. Finished spans go to a local
+OTLP/HTTP collector (JSON encoding) or are appended to a JSONL file.
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+import structlog
+from sqlalchemy import event
+
+from config import settings
+
+logger = structlog.get_logger()
+
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL = 2.0  # seconds
+STATEMENT_PREVIEW = 200
+
+_current: ContextVar[Optional[Dict[str, Any]]] = ContextVar("trace_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def current_span() -> Optional[Dict[str, Any]]:
+    """Innermost open span of the running task, if it is traced."""
+    return _current.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """``traceparent`` of the current span, for passing to another process."""
+    span = _current.get()
+    if span is None:
+        return None
+    return f"00-{span['trace_id']}-{span['span_id']}-{'01' if span['sampled'] else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) from a ``traceparent`` value."""
+    parts = value.split("-") if value else []
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2], parts[3] == "01"
+
+
+def _start(
+    name: str,
+    trace_id: str,
+    parent_id: Optional[str],
+    sampled: bool,
+    attributes: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        "trace_id": trace_id,
+        "span_id": _new_id(8),
+        "parent_id": parent_id,
+        "name": name,
+        "start_ns": time.time_ns(),
+        "end_ns": None,
+        "attributes": {k: v for k, v in attributes.items() if v is not None},
+        "error": None,
+        "sampled": sampled,
+    }
+
+
+def _error_text(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}"[:300]
+
+
+@contextlib.contextmanager
+def trace(name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Root span of this process's part of a trace.
+    
+    Continues ``traceparent`` when given (a job enqueued by the bot),
+    otherwise starts a new trace sampled at ``tracing_sample_rate``.
+    The trace id is bound to structlog's context, so every log line of
+    the update or job carries it, sampled or not.
+    """
+    if not settings.tracing_enabled:
+        yield None
+        return
+    
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = _new_id(16), None
+        sampled = random.random() < settings.tracing_sample_rate
+    
+    span = _start(name, trace_id, parent_id, sampled, attributes)
+    token = _current.set(span)
+    log_tokens = structlog.contextvars.bind_contextvars(trace_id=trace_id)
+    try:
+        yield span
+    except BaseException as e:
+        span["error"] = _error_text(e)
+        raise
+    finally:
+        structlog.contextvars.reset_contextvars(**log_tokens)
+        _current.reset(token)
+        tracer.finish(span)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Dict[str, Any]]]:
+    """Child span of the current one; a no-op outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    
+    child = _start(name, parent["trace_id"], parent["span_id"], parent["sampled"], attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child["error"] = _error_text(e)
+        raise
+    finally:
+        _current.reset(token)
+        tracer.finish(child)
+
+
+def record_span(
+    name: str,
+    start_ns: int,
+    attributes: Dict[str, Any],
+    error: Optional[BaseException] = None
+) -> None:
+    """Record an already finished child span (for callback-style hooks)."""
+    parent = _current.get()
+    if parent is None or not parent["sampled"]:
+        return
+    child = _start(name, parent["trace_id"], parent["span_id"], True, attributes)
+    child["start_ns"] = start_ns
+    if error is not None:
+        child["error"] = _error_text(error)
+    tracer.finish(child)
+
+
+def traced_job(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Decorator for arq jobs: run the job as a span of the trace whose
+    ``traceparent`` was passed in the job kwargs (see enqueue sites).
+    """
+    
+    @functools.wraps(func)
+    async def wrapper(ctx, *args, traceparent: Optional[str] = None, **kwargs):
+        attributes = {"job_id": ctx.get("job_id"), "job_try": ctx.get("job_try")}
+        with trace(f"job {func.__name__}", traceparent, **attributes):
+            return await func(ctx, *args, **kwargs)
+    
+    return wrapper
+
+
+# =========================================
+# Database statements
+# =========================================
+
+def trace_engine(engine) -> None:
+    """Record a span per statement executed through an (async) SQLAlchemy engine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _before_statement):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_statement)
+    event.listen(sync_engine, "after_cursor_execute", _after_statement)
+    event.listen(sync_engine, "handle_error", _statement_error)
+
+
+def _before_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context._trace_started = time.time_ns()
+
+
+def _statement_attributes(statement: str) -> Dict[str, Any]:
+    return {
+        "db.operation": statement.split(None, 1)[0].upper() if statement else None,
+        "db.statement": statement[:STATEMENT_PREVIEW],
+    }
+
+
+def _after_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "_trace_started", None)
+    if started is not None:
+        record_span("db", started, _statement_attributes(statement))
+
+
+def _statement_error(exception_context) -> None:
+    context = exception_context.execution_context
+    started = getattr(context, "_trace_started", None)
+    if started is not None:
+        record_span(
+            "db",
+            started,
+            _statement_attributes(exception_context.statement or ""),
+            exception_context.original_exception
+        )
+
+
+# =========================================
+# Export
+# =========================================
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    """
+    Bounded queue of finished, sampled spans drained by a background
+    exporter (``tracing_exporter``: "otlp" or "jsonl"). Spans are dropped
+    when the queue is full; tracing never slows the traced code down.
+    """
+    
+    def __init__(self):
+        self.service = "unknown"
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {"exported": 0, "dropped": 0, "failed": 0}
+    
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self, service: str) -> None:
+        """Start the exporter (no-op unless tracing is enabled)."""
+        if not settings.tracing_enabled or self.is_running:
+            return
+        self.service = service
+        self._queue = asyncio.Queue(maxsize=settings.tracing_queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Tracing started", service=service, exporter=settings.tracing_exporter)
+    
+    async def stop(self) -> None:
+        """Stop the exporter after it has flushed the queued spans."""
+        if not self.is_running:
+            return
+        try:
+            self._queue.put_nowait(None)  # flush and exit
+        except asyncio.QueueFull:
+            self._task.cancel()
+        try:
+            await asyncio.wait_for(self._task, 10)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            logger.warning("Span exporter stopped before flushing", queued=self._queue.qsize())
+        self._task = None
+    
+    def finish(self, span: Dict[str, Any]) -> None:
+        """End a span and queue it for export if sampled."""
+        span["end_ns"] = time.time_ns()
+        if not span["sampled"] or not self.is_running:
+            return
+        try:
+            self._queue.put_nowait(span)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+    
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + EXPORT_INTERVAL
+            while len(batch) < EXPORT_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._export(batch)
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                logger.warning("Span export failed", spans=len(batch), error=str(e))
+    
+    async def _export(self, spans: List[Dict[str, Any]]) -> None:
+        if settings.tracing_exporter == "otlp":
+            await self._export_otlp(spans)
+        else:
+            await asyncio.to_thread(self._write_jsonl, spans)
+        self.stats["exported"] += len(spans)
+    
+    def _write_jsonl(self, spans: List[Dict[str, Any]]) -> None:
+        with open(settings.tracing_jsonl_path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps({
+                    "trace_id": span["trace_id"],
+                    "span_id": span["span_id"],
+                    "parent_id": span["parent_id"],
+                    "service": self.service,
+                    "name": span["name"],
+                    "start_ns": span["start_ns"],
+                    "duration_ms": round((span["end_ns"] - span["start_ns"]) / 1e6, 3),
+                    "attributes": span["attributes"],
+                    "error": span["error"],
+                }, ensure_ascii=False, default=str) + "\n")
+    
+    async def _export_otlp(self, spans: List[Dict[str, Any]]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "bot.utils.tracing"},
+                    "spans": [
+                        {
+                            "traceId": span["trace_id"],
+                            "spanId": span["span_id"],
+                            "parentSpanId": span["parent_id"] or "",
+                            "name": span["name"],
+                            "kind": 1,  # SPAN_KIND_INTERNAL
+                            "startTimeUnixNano": str(span["start_ns"]),
+                            "endTimeUnixNano": str(span["end_ns"]),
+                            "attributes": [
+                                {"key": key, "value": _otlp_value(value)}
+                                for key, value in span["attributes"].items()
+                            ],
+                            "status": (
+                                {"code": 2, "message": span["error"]} if span["error"] else {"code": 1}
+                            ),
+                        }
+                        for span in spans
+                    ],
+                }],
+            }],
+        }
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.post(settings.tracing_otlp_endpoint, json=payload) as response:
+                if response.status >= 300:
+                    raise RuntimeError(f"Collector answered {response.status}: {(await response.text())[:200]}")
+
+
+# Global tracer instance
+tracer = Tracer()
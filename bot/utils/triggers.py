@@ -0,0 +1,406 @@
+"""
+Precompiled intent and trigger matching.
+The keyword vocabularies of the text, voice and group chat handlers are
+compiled once at import into single alternation regexes (keyword lists
+as a character trie), so a message without any trigger - most of them -
+costs one regex search instead of dozens of substring checks and
+uncompiled ``re`` calls.
+"""
+import re
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+
+def keyword_pattern(keywords: Iterable[str]) -> str:
+    """
+    Regex source matching any of the keywords literally.
+    
+    Built as a trie (``на(?:рисуй|йди)``), so at each position the regex
+    tries one branch per distinct first character instead of every word.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            body = f"(?:{body})?"
+        return body
+    
+    return emit(trie)
+
+
+class RuleMatcher:
+    """
+    First matching rule of an ordered list, as if the rules were tried
+    one by one with ``keyword in text`` / ``re.search``.
+    
+    Rules are ``(label, keywords, patterns)``; patterns must only use
+    non-capturing groups. All rules are compiled into one alternation
+    with a named group per rule. A text with no match costs one search;
+    on a match, only the rules ranked above the one found are re-checked,
+    so the result keeps the rules' priority.
+    """
+    
+    def __init__(self, rules: Sequence[Tuple[Hashable, Sequence[str], Sequence[str]]]):
+        self._labels: List[Hashable] = []
+        self._rules: List[re.Pattern] = []
+        sources = []
+        for i, (label, keywords, patterns) in enumerate(rules):
+            parts = ([keyword_pattern(keywords)] if keywords else []) + list(patterns)
+            source = "|".join(f"(?:{part})" for part in parts)
+            self._labels.append(label)
+            self._rules.append(re.compile(source))
+            sources.append(f"(?P<r{i}>{source})")
+        self._any = re.compile("|".join(sources))
+    
+    def match(self, text: str) -> Optional[Tuple[Hashable, Tuple[int, int]]]:
+        """(label, span) of the highest-priority rule matching ``text``."""
+        found = self._any.search(text)
+        if found is None:
+            return None
+        rank = int(found.lastgroup[1:])
+        for i in range(rank):
+            better = self._rules[i].search(text)
+            if better is not None:
+                return self._labels[i], better.span()
+        return self._labels[rank], found.span()
+
+
+class PrefixStripper:
+    """
+    Removes leading trigger phrases, with the same result as applying
+    ``re.sub(rf'(?i)^{trigger}\\s*', '', text).strip()`` for each trigger
+    in order, but compiled once and skipped when none of them leads.
+    """
+    
+    def __init__(self, triggers: Sequence[str]):
+        self._patterns = [re.compile(rf"^{re.escape(t)}\s*", re.IGNORECASE) for t in triggers]
+        self._any = re.compile(keyword_pattern(triggers), re.IGNORECASE)
+    
+    def strip(self, text: str) -> str:
+        if not self._any.match(text.strip()):
+            return text.strip()
+        cleaned = text
+        for pattern in self._patterns:
+            cleaned = pattern.sub("", cleaned).strip()
+        return cleaned
+
+
+class IntentMatcher:
+    """
+    Keyword intent detection: natural-language commands first, then media
+    types in the given order, each with the phrases stripped from the
+    start of the message to get the prompt.
+    """
+    
+    def __init__(
+        self,
+        commands: Dict[str, Sequence[str]],
+        media: Sequence[Tuple[str, Sequence[str], Sequence[str]]]
+    ):
+        rules = [(("COMMAND", command), keywords, ()) for command, keywords in commands.items()]
+        rules += [((kind, None), (), patterns) for kind, patterns, _ in media]
+        self._rules = RuleMatcher(rules)
+        self._strippers = {kind: PrefixStripper(strip) for kind, _, strip in media}
+    
+    def match(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        ``{"type", "command", "prompt", "span"}`` or None; ``span`` is the
+        trigger's position in the lowercased, stripped text.
+        """
+        found = self._rules.match(text.lower().strip())
+        if found is None:
+            return None
+        (kind, command), span = found
+        if kind == "COMMAND":
+            return {"type": kind, "command": command, "prompt": text, "span": span}
+        cleaned = self._strippers[kind].strip(text)
+        return {"type": kind, "command": None, "prompt": cleaned if cleaned else text, "span": span}
+
+
+# =========================================
+# Private chat text messages
+# =========================================
+
+TEXT_INTENTS = IntentMatcher(
+    commands={
+        "new_dialog": [
+            "новый диалог", "очисти контекст", "начни заново", "сбрось контекст",
+            "new dialog", "clear context", "start over", "reset context",
+        ],
+        "limits": [
+            "мои лимиты", "покажи лимиты", "сколько запросов", "сколько осталось",
+            "my limits", "show limits", "how many requests",
+        ],
+        "help": [
+            "что ты умеешь", "справка",
+            "what can you do",
+        ],
+        "settings": [
+            "открой настройки", "покажи настройки",
+            "open settings", "show settings",
+        ],
+    },
+    media=[
+        # VIDEO and PRESENTATION before IMAGE: "generate video" must not match image
+        (
+            "VIDEO",
+            [
+                r"(?:создай|сгенерируй|сделай)\s+(?:мне\s+)?видео",
+                r"(?:create|generate|make)\s+(?:me\s+)?(?:a\s+)?video",
+            ],
+            [
+                "создай мне видео", "создай видео", "сгенерируй мне видео",
+                "сгенерируй видео", "сделай мне видео", "сделай видео",
+                "create me a video", "create a video", "create video",
+                "generate me a video", "generate a video", "generate video",
+                "make me a video", "make a video", "make video",
+            ],
+        ),
+        (
+            "PRESENTATION",
+            [
+                r"(?:создай|сделай|сгенерируй)\s+(?:мне\s+)?презентаци",
+                r"(?:create|make|generate)\s+(?:me\s+)?(?:a\s+)?presentation",
+            ],
+            [
+                "создай мне презентацию", "создай презентацию",
+                "сделай мне презентацию", "сделай презентацию",
+                "сгенерируй мне презентацию", "сгенерируй презентацию",
+                "create me a presentation", "create a presentation", "create presentation",
+                "make me a presentation", "make a presentation", "make presentation",
+                "generate me a presentation", "generate a presentation", "generate presentation",
+            ],
+        ),
+        (
+            "IMAGE",
+            [
+                r"(?:сгенерируй|нарисуй|создай|сделай|покажи)\s+(?:мне\s+)?(?:картинк\w*|изображени\w*|фото\w*|пикч\w*|арт\w*)",
+                r"(?:сгенери(?:руй)?|нарисуй)\s+",
+                r"(?:generate|draw|create|make)\s+(?:me\s+)?(?:an?\s+)?(?:image|picture|photo|art|illustration)",
+                r"(?:draw|generate)\s+(?:me\s+)?(?:a\s+)?",
+            ],
+            [
+                "нарисуй мне", "нарисуй", "сгенерируй мне картинку", "сгенерируй картинку",
+                "сгенерируй мне изображение", "сгенерируй изображение",
+                "сгенерируй мне фото", "сгенерируй фото",
+                "сгенерируй мне", "сгенерируй", "сгенери мне", "сгенери",
+                "создай картинку", "создай изображение", "сделай картинку", "сделай фото",
+                "покажи мне", "покажи",
+                "создай мне", "создай", "сделай мне", "сделай",
+                "draw me a", "draw me an", "draw me", "draw a", "draw an", "draw",
+                "generate me a", "generate me an", "generate me",
+                "generate a", "generate an", "generate",
+                "create image", "create a", "create an", "create",
+                "make picture", "make a", "make an", "make",
+            ],
+        ),
+    ],
+)
+
+
+# =========================================
+# Voice messages (transcribed)
+# =========================================
+
+VOICE_INTENTS = IntentMatcher(
+    commands={
+        "new_dialog": [
+            "новый диалог", "очисти контекст", "начни заново", "сбрось контекст",
+            "new dialog", "clear context", "start over", "reset context",
+        ],
+        "limits": [
+            "мои лимиты", "покажи лимиты", "сколько запросов", "сколько осталось",
+            "my limits", "show limits", "how many requests",
+        ],
+        "help": [
+            "помощь", "что ты умеешь", "справка",
+            "help", "what can you do",
+        ],
+        "settings": [
+            "настройки", "settings",
+        ],
+    },
+    media=[
+        (
+            "IMAGE",
+            [
+                r"(?:сгенерируй|нарисуй|создай|сделай|покажи)\s+(?:мне\s+)?(?:картинк|изображени|фото|пикч|арт)",
+                r"(?:generate|draw|create|make|show)\s+(?:me\s+)?(?:an?\s+)?(?:image|picture|photo|art)",
+                r"(?:нарисуй|сгенерируй|сгенери)\s+",
+                r"(?:draw|generate)\s+",
+            ],
+            [
+                "нарисуй мне", "нарисуй", "сгенерируй мне", "сгенерируй",
+                "создай картинку", "создай изображение", "сделай картинку",
+                "draw me", "draw", "generate me", "generate", "create image",
+                "make picture",
+            ],
+        ),
+        (
+            "VIDEO",
+            [
+                r"(?:создай|сгенерируй|сделай)\s+(?:мне\s+)?видео",
+                r"(?:create|generate|make)\s+(?:me\s+)?(?:a\s+)?video",
+            ],
+            [
+                "создай видео", "сгенерируй видео", "сделай видео",
+                "create video", "generate video", "make video",
+            ],
+        ),
+        (
+            "PRESENTATION",
+            [
+                r"(?:создай|сделай|сгенерируй)\s+(?:мне\s+)?презентаци",
+                r"(?:create|make|generate)\s+(?:me\s+)?(?:a\s+)?presentation",
+            ],
+            [
+                "создай презентацию", "сделай презентацию", "сгенерируй презентацию",
+                "создай мне презентацию", "create presentation", "make presentation",
+                "generate presentation", "create a presentation",
+            ],
+        ),
+    ],
+)
+
+
+# =========================================
+# Web search
+# =========================================
+
+SEARCH_TRIGGERS = [
+    # Russian: current or real-time data
+    "новости", "новость", "погода", "курс", "валют", "цена", "стоимость",
+    "сколько стоит", "какой курс", "какая погода", "что случилось",
+    "что произошло", "последние события", "сегодня", "вчера",
+    "актуальн", "свежие", "текущ", "прямо сейчас",
+    "найди", "найти", "загугли", "погугли", "поищи", "ищи в интернете",
+    "что нового", "расписание", "результат матча", "счёт", "счет",
+    "когда выйдет", "когда выходит", "дата выхода", "релиз",
+    "где купить", "где находится", "адрес", "как доехать",
+    "рецепт", "инструкция по",
+    # English
+    "news", "weather", "price", "cost", "exchange rate", "stock",
+    "what happened", "latest", "current", "today", "yesterday",
+    "search for", "google", "look up", "find me", "find info",
+    "score", "match result", "release date", "when does",
+    "where to buy", "where is", "address", "how to get to",
+    "recipe for", "instructions for",
+]
+
+# Questions that imply a factual lookup, unless they are small talk
+FACT_QUESTION_PATTERNS = [
+    r"(?:кто|что|где|когда|сколько|какой|какая|какое|какие)\s+(?:такое|такой|такая|такие)?\s*\w+\?",
+    r"(?:who|what|where|when|how much|how many)\s+\w+.*\?",
+]
+CONVERSATIONAL = [
+    "как дела", "как ты", "что умеешь", "кто ты", "как тебя зовут",
+    "how are you", "what can you do", "who are you", "what is your name",
+    "что ты", "как мне", "помоги", "объясни",
+]
+
+_SEARCH_TRIGGERS = re.compile(keyword_pattern(SEARCH_TRIGGERS))
+_FACT_QUESTION = re.compile("|".join(f"(?:{p})" for p in FACT_QUESTION_PATTERNS))
+_CONVERSATIONAL = re.compile(keyword_pattern(CONVERSATIONAL))
+
+
+def needs_web_search(text: str) -> bool:
+    """Whether a message asks for real-time or up-to-date information."""
+    text_lower = text.lower().strip()
+    if len(text_lower) < 5:
+        return False
+    if _SEARCH_TRIGGERS.search(text_lower):
+        return True
+    return _FACT_QUESTION.search(text_lower) is not None and _CONVERSATIONAL.search(text_lower) is None
+
+
+# =========================================
+# Group chats
+# =========================================
+
+IMAGE_KEYWORDS = [
+    "сгенерируй", "нарисуй", "создай картинку", "создай изображение",
+    "сделай картинку", "сделай изображение", "покажи как выглядит",
+    "визуализируй", "изобрази", "нарисуй мне", "сгенери",
+    "generate", "draw", "create image", "make picture", "visualize",
+    "покажи", "пикчу", "арт", "картинку"
+]
+
+ANALYZE_KEYWORDS = [
+    "что это", "что здесь", "опиши", "проанализируй", "анализ",
+    "что на фото", "что на картинке", "что изображено", "распознай",
+    "what is this", "what's this", "describe", "analyze", "what do you see"
+]
+
+TEXT_KEYWORDS = [
+    "расскажи", "объясни", "что такое", "как", "почему", "зачем",
+    "ответь", "помоги", "подскажи", "напиши", "скажи",
+    "tell", "explain", "what is", "how", "why", "help"
+]
+
+BOT_TRIGGERS = [
+    "бот", "bot", "ии", "ai", "гпт", "gpt", "ассистент", "assistant"
+]
+
+# A trigger word counts at the start of the message or after a space or comma
+_BOT_TRIGGER = re.compile(rf"(?:^|[ ,])(?:{keyword_pattern(BOT_TRIGGERS)})")
+_IMAGE_KEYWORDS = RuleMatcher([(keyword, [keyword], ()) for keyword in IMAGE_KEYWORDS])
+_IMAGE_KEYWORD_WORDS = {keyword: re.compile(rf"\b{re.escape(keyword)}\b", re.IGNORECASE) for keyword in IMAGE_KEYWORDS}
+_TEXT_KEYWORDS = re.compile(keyword_pattern(TEXT_KEYWORDS))
+_LEADING_PUNCTUATION = re.compile(r"^[,.\s]+")
+_SPACES = re.compile(r"\s+")
+_ADDRESS_PATTERNS: Dict[str, re.Pattern] = {}
+
+
+def is_bot_triggered(text: str, bot_username: str) -> bool:
+    """Check if a group message is addressed to the bot."""
+    if not text:
+        return False
+    text_lower = text.lower().strip()
+    if bot_username and f"@{bot_username.lower()}" in text_lower:
+        return True
+    return _BOT_TRIGGER.search(text_lower) is not None
+
+
+def _address_pattern(bot_username: str) -> re.Pattern:
+    pattern = _ADDRESS_PATTERNS.get(bot_username)
+    if pattern is None:
+        words = BOT_TRIGGERS + ([f"@{bot_username.lower()}", bot_username.lower()] if bot_username else [])
+        pattern = re.compile(rf"[,\s]*(?<![\w@])(?:{keyword_pattern(words)})(?!\w)[,\s]*", re.IGNORECASE)
+        _ADDRESS_PATTERNS[bot_username] = pattern
+    return pattern
+
+
+def strip_bot_address(text: str, bot_username: str) -> str:
+    """Remove the bot's @mention and trigger words (whole words only)."""
+    return _SPACES.sub(" ", _address_pattern(bot_username).sub(" ", text)).strip()
+
+
+def get_intent_and_prompt(text: str, bot_username: str, has_photo: bool = False) -> Tuple[str, str]:
+    """Determine intent and extract clean prompt."""
+    if not text:
+        return ('analyze' if has_photo else 'auto', '')
+    
+    text_lower = text.lower()
+    cleaned = strip_bot_address(text, bot_username)
+    
+    image = _IMAGE_KEYWORDS.match(text_lower)
+    if image is not None:
+        prompt = _IMAGE_KEYWORD_WORDS[image[0]].sub("", cleaned).strip()
+        prompt = _LEADING_PUNCTUATION.sub("", prompt).strip()
+        return 'image', prompt if prompt else cleaned
+    
+    if has_photo:
+        return 'analyze', cleaned if cleaned else "Опиши что на изображении"
+    
+    if _TEXT_KEYWORDS.search(text_lower):
+        return 'text', cleaned
+    
+    return 'auto', cleaned
@@ -0,0 +1,70 @@
+"""
+Webhook receiver.
+Accepts Telegram updates over HTTPS, checks the secret token and appends
+them to the update stream; bot replicas (main.py in webhook mode) consume
+the stream. Kept free of handlers and the database so it stays small and
+can run as several instances behind the load balancer.
+"""
+import hmac
+import json
+
+from aiohttp import web
+
+from bot.services.update_stream import update_stream
+from database.redis_client import redis_client
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+async def handle_update(request: web.Request) -> web.Response:
+    """Store one update; a non-2xx answer makes Telegram retry it later."""
+    token = request.headers.get(SECRET_HEADER, "")
+    if not settings.webhook_secret or not hmac.compare_digest(token, settings.webhook_secret):
+        return web.Response(status=401)
+    
+    try:
+        update = await request.json()
+    except json.JSONDecodeError:
+        return web.Response(status=400)
+    if not isinstance(update, dict) or "update_id" not in update:
+        return web.Response(status=400)
+    
+    try:
+        if not await update_stream.publish(update):
+            logger.debug("Duplicate update dropped", update_id=update["update_id"])
+    except Exception as e:
+        logger.error("Failed to enqueue update", update_id=update["update_id"], error=str(e))
+        return web.Response(status=503)
+    
+    return web.Response(status=200)
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    try:
+        await redis_client.client.ping()
+    except Exception:
+        return web.Response(status=503, text="redis unavailable")
+    return web.Response(text="OK")
+
+
+async def _on_startup(app: web.Application) -> None:
+    await redis_client.connect()
+    logger.info("Webhook receiver started", path=settings.webhook_path)
+
+
+async def _on_cleanup(app: web.Application) -> None:
+    await redis_client.close()
+
+
+def create_app() -> web.Application:
+    """aiohttp application for the webhook receiver."""
+    app = web.Application(client_max_size=settings.webhook_max_body_bytes)
+    app.router.add_post(settings.webhook_path, handle_update)
+    app.router.add_get("/health", handle_health)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
@@ -22,6 +22,7 @@ class Settings(BaseSettings):
     telegram_bot_token: str = Field(..., description="Telegram Bot API Token")
     telegram_channel_id: int = Field(0, description="Channel ID for subscription check")
     telegram_channel_username: str = Field("@channel", description="Channel username for links")
+    telegram_api_url: str = Field("", description="Bot API server base URL (empty: api.telegram.org)")
     
     # CometAPI Configuration (Main AI provider)
     cometapi_api_key: str = Field("", description="CometAPI API Key")
@@ -120,7 +121,124 @@ class Settings(BaseSettings):
     max_pdf_pages: int = Field(50)
     max_excel_rows: int = Field(5000)
     max_ppt_slides: int = Field(100)
-    
+
+    # Media Groups (albums)
+    media_group_debounce_ms: int = Field(1000)  # wait for the 1st item, shrinks as the album fills
+    media_group_min_debounce_ms: int = Field(250)
+    media_download_concurrency: int = Field(5)
+    
+    # Image pre-processing before vision / edit calls
+    image_normalization_enabled: bool = Field(True)
+    image_cache_max_mb: int = Field(64)
+    
+    # Transcription cache (keyed by Telegram file_unique_id + language)
+    transcription_cache_enabled: bool = Field(True)
+    transcription_cache_ttl: int = Field(604800)  # 7 days
+    transcription_cache_max_entries: int = Field(20000)
+    # Long recordings are split on silence and transcribed in parallel
+    transcription_long_audio_seconds: int = Field(600)
+    transcription_chunk_seconds: int = Field(300)
+    transcription_concurrency: int = Field(4)
+    
+    # Local intent classifier: below this confidence the LLM is asked
+    intent_confidence_threshold: float = Field(0.75)
+    
+    # Telemetry sink (APIUsageLog / Request rows written in batches)
+    telemetry_enabled: bool = Field(True)
+    telemetry_queue_size: int = Field(10000)
+    telemetry_batch_size: int = Field(500)
+    telemetry_flush_interval_ms: int = Field(1000)
+    telemetry_overload_ratio: float = Field(0.8)  # queue fill that starts sampling
+    telemetry_overload_sample_rate: float = Field(0.1)  # share of successful usage rows kept
+
+    # Usage rollups (admin dashboard aggregates, maintained by the worker)
+    rollup_batch_rows: int = Field(50000)  # source ids folded per transaction
+    rollup_max_batches: int = Field(20)  # batches per source per run
+    rollup_lag_seconds: int = Field(30)  # leave rows this fresh for the next run
+
+    # Monthly partitions of requests/api_usage_logs
+    partition_months_ahead: int = Field(3)  # upcoming partitions kept ready
+    partition_retention_months: int = Field(0)  # drop partitions older than this (0 = keep all)
+    partition_archive_enabled: bool = Field(True)  # export to gzip CSV before dropping
+    partition_archive_dir: str = Field("archive/partitions")
+
+    # Admin API response cache (polled dashboard endpoints)
+    api_cache_enabled: bool = Field(True)
+    api_cache_fresh_seconds: int = Field(15)  # served without refresh
+    api_cache_stale_seconds: int = Field(300)  # served while refreshing in background
+
+    # Admin list totals
+    count_cache_ttl: int = Field(30)  # cached exact COUNT(*) for filtered lists
+    count_estimate_min_rows: int = Field(100000)  # unfiltered totals above this use pg_class estimates
+
+    # AI provider routing (health tracking, circuit breakers, hedging)
+    router_window_size: int = Field(100)  # outcomes kept per provider capability
+    router_window_seconds: int = Field(300)
+    router_breaker_failures: int = Field(5)  # consecutive failures that open the breaker
+    router_breaker_error_rate: float = Field(0.5)  # ...or this error rate over the window
+    router_breaker_min_samples: int = Field(10)
+    router_breaker_cooldown_seconds: int = Field(30)  # open time before a probe request
+    router_degraded_error_rate: float = Field(0.2)  # demoted behind healthy providers
+    router_hedge_enabled: bool = Field(False)  # duplicate slow text requests to a second provider
+    router_hedge_min_delay_ms: int = Field(1500)  # hedge after max(this, primary p95)
+    router_hedge_min_samples: int = Field(20)
+    router_status_publish_seconds: int = Field(10)
+
+    # Response cache for stateless prompts (inline, translation, intent classification)
+    llm_cache_enabled: bool = Field(True)
+    llm_cache_max_entries: int = Field(5000)  # per route, least recently used evicted
+    llm_cache_semantic_enabled: bool = Field(False)  # near-duplicate (SimHash) matching
+    llm_cache_semantic_max_distance: int = Field(3)  # bits out of 64
+
+    # Inline mode
+    inline_debounce_ms: int = Field(350)  # quiet time after the last keystroke before generating
+
+    # Update ingestion: "polling" (single process) or "webhook" (run_webhook.py + stream consumers)
+    bot_mode: str = Field("polling")
+    webhook_url: str = Field("")  # public base URL; registered with Telegram by the consumers
+    webhook_path: str = Field("/telegram/webhook")
+    webhook_secret: str = Field("")  # X-Telegram-Bot-Api-Secret-Token
+    webhook_host: str = Field("0.0.0.0")
+    webhook_port: int = Field(8081)
+    webhook_max_body_bytes: int = Field(1024 * 1024)
+    update_stream_prefix: str = Field("telegram:updates")
+    update_stream_shards: int = Field(16)  # chats are pinned to a shard; one consumer per shard
+    update_stream_maxlen: int = Field(100000)  # approximate entries kept per shard
+    update_dedup_ttl: int = Field(86400)  # seconds an update_id is remembered
+    update_lease_ms: int = Field(15000)  # shard ownership lease
+    update_claim_idle_ms: int = Field(180000)  # unacked entries older than this are redelivered
+    update_shard_max_in_flight: int = Field(64)
+
+    # Update processing: per-chat message lanes and a global handler cap
+    update_max_concurrency: int = Field(100)
+    lane_max_queue: int = Field(20)  # waiting messages per chat before shedding (albums are up to 10)
+
+    # Throttling (GCRA in Redis): requests per throttle_period seconds, 0 disables a tier
+    throttle_period: int = Field(60)
+    throttle_user_rate: int = Field(30)
+    throttle_premium_rate: int = Field(90)  # per-user rate for premium subscribers
+    throttle_chat_rate: int = Field(60)  # per group chat, shared by its members
+    throttle_global_rate: int = Field(0)  # all users together
+
+    # Prometheus metrics (API serves /metrics itself; bot and worker run an exporter)
+    metrics_enabled: bool = Field(True)
+    bot_metrics_port: int = Field(9101)
+    worker_metrics_port: int = Field(9102)
+    loop_lag_interval: float = Field(0.5)  # seconds between event loop lag probes
+
+    # Blocking-call detector: logs and counts callbacks that hold the event loop
+    loop_monitor_enabled: bool = Field(False)
+    loop_block_threshold_ms: int = Field(100)
+    loop_monitor_interval_ms: int = Field(50)
+
+    # Request tracing (update -> arq job -> provider -> Telegram)
+    tracing_enabled: bool = Field(False)
+    tracing_sample_rate: float = Field(1.0)  # share of new traces exported
+    tracing_exporter: str = Field("jsonl")  # otlp | jsonl
+    tracing_otlp_endpoint: str = Field("http://localhost:4318/v1/traces")
+    tracing_jsonl_path: str = Field("traces.jsonl")
+    tracing_queue_size: int = Field(10000)
+
     # API Timeouts
     openai_timeout: int = Field(120)
     telegram_timeout: int = Field(30)
@@ -102,7 +102,8 @@ async def sync_enums() -> None:
 
 async def init_db() -> None:
     """
-    Initialize database - create all tables and sync enum types.
+    Initialize database - create all tables, sync enum types and
+    create upcoming log partitions.
     Should be called on application startup.
     """
     # Sync enum values before create_all (so new values are available)
@@ -111,8 +112,21 @@ async def init_db() -> None:
     except Exception:
         pass  # Enum type may not exist yet on first run
     
+    from sqlalchemy import text
+    
+    # Trigram indexes on users need pg_trgm
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception:
+        pass  # No privilege; the extension must be created by a superuser
+    
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    
+    # Log tables are range-partitioned by month; make sure inserts have a home
+    from database.partitions import ensure_partitions
+    await ensure_partitions()
 
 
 async def close_db() -> None:
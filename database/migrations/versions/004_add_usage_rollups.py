@@ -0,0 +1,91 @@
+"""Add usage rollup tables for the admin dashboard.
+
+Revision ID: 004_usage_rollups
+Revises: 003_add_referral
+Create Date: 2026-03-02 12:00:00.000000
+
+Hourly aggregates of requests and API usage, daily HyperLogLog sketches
+of active users, per-user totals and the watermarks the worker uses to
+fold new rows in incrementally. Existing rows are picked up by the first
+worker runs (watermarks start at 0).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_usage_rollups'
+down_revision: Union[str, None] = '003_add_referral'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'request_rollups_hourly',
+        sa.Column('bucket', sa.DateTime(timezone=False), nullable=False),
+        sa.Column('request_type', postgresql.ENUM(name='requesttype', create_type=False), nullable=False),
+        sa.Column('model', sa.String(50), nullable=False, server_default=''),
+        sa.Column('requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('errors', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cost_usd', sa.Numeric(14, 6), nullable=False, server_default='0'),
+        sa.Column('tokens_input', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('tokens_output', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('bucket', 'request_type', 'model'),
+    )
+    
+    op.create_table(
+        'api_usage_rollups_hourly',
+        sa.Column('bucket', sa.DateTime(timezone=False), nullable=False),
+        sa.Column('provider', sa.String(50), nullable=False),
+        sa.Column('model', sa.String(100), nullable=False),
+        sa.Column('endpoint', sa.String(100), nullable=False),
+        sa.Column('requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('errors', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('input_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('output_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('cost_usd', sa.Numeric(14, 6), nullable=False, server_default='0'),
+        sa.Column('cost_rub', sa.Numeric(14, 4), nullable=False, server_default='0'),
+        sa.Column('duration_ms_sum', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('duration_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('bucket', 'provider', 'model', 'endpoint'),
+    )
+    
+    op.create_table(
+        'user_activity_sketches',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('registers', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+    )
+    
+    op.create_table(
+        'user_usage_totals',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('requests', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('cost_usd', sa.Numeric(14, 6), nullable=False, server_default='0'),
+        sa.Column('last_request_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index('ix_user_usage_totals_requests', 'user_usage_totals', ['requests'])
+    
+    op.create_table(
+        'rollup_watermarks',
+        sa.Column('name', sa.String(50), nullable=False),
+        sa.Column('last_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rollup_watermarks')
+    op.drop_index('ix_user_usage_totals_requests', table_name='user_usage_totals')
+    op.drop_table('user_usage_totals')
+    op.drop_table('user_activity_sketches')
+    op.drop_table('api_usage_rollups_hourly')
+    op.drop_table('request_rollups_hourly')
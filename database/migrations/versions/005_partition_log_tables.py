@@ -0,0 +1,119 @@
+"""Partition requests and api_usage_logs by month.
+
+Revision ID: 005_partition_logs
+Revises: 004_usage_rollups
+Create Date: 2026-03-09 12:00:00.000000
+
+Rebuilds both log tables as RANGE (created_at) partitioned tables with
+one partition per UTC month, a DEFAULT partition and the primary key
+widened to (id, created_at). Columns, defaults, foreign keys and indexes
+are copied from the existing tables; the id sequences are kept, so ids
+continue where they left off. Rows are copied in one transaction, so
+the bot should be stopped while this runs on a large database.
+
+Upcoming partitions are created by the worker (maintain_partitions).
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_partition_logs'
+down_revision: Union[str, None] = '004_usage_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('requests', 'api_usage_logs')
+MONTHS_AHEAD = 3
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _relkind(bind, table: str):
+    return bind.execute(sa.text(
+        "SELECT relkind FROM pg_class WHERE relname = :table AND relkind IN ('r', 'p')"
+    ), {"table": table}).scalar()
+
+
+def _rebuild(table: str, partitioned: bool) -> None:
+    """Recreate a table as partitioned (or plain) and move its rows over."""
+    bind = op.get_bind()
+    old = f"{table}_old"
+    
+    # Carry over foreign keys and secondary indexes
+    foreign_keys = bind.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+    ), {"table": table}).all()
+    indexes = bind.execute(sa.text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint "
+        "WHERE conrelid = CAST(:table AS regclass) AND contype IN ('p', 'u'))"
+    ), {"table": table}).scalars().all()
+    index_definitions = [
+        bind.execute(sa.text(
+            "SELECT pg_get_indexdef(CAST(:name AS regclass))"
+        ), {"name": name}).scalar()
+        for name in indexes
+    ]
+    sequence = bind.execute(sa.text(
+        "SELECT pg_get_serial_sequence(:table, 'id')"
+    ), {"table": table}).scalar()
+    
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        + (" PARTITION BY RANGE (created_at)" if partitioned else "")
+    )
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    
+    if partitioned:
+        first = bind.execute(sa.text(f"SELECT min(created_at) FROM {old}")).scalar()
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        month = first.date().replace(day=1) if first else current
+        last = _add_months(current, MONTHS_AHEAD)
+        while month <= last:
+            op.execute(
+                f"CREATE TABLE {table}_p{month.year:04d}_{month.month:02d} "
+                f"PARTITION OF {table} FOR VALUES "
+                f"FROM ('{month.isoformat()} 00:00:00+00') "
+                f"TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+            )
+            month = _add_months(month, 1)
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    op.execute(f"DROP TABLE {old}")
+    
+    op.execute(
+        f"ALTER TABLE {table} ADD PRIMARY KEY "
+        + ("(id, created_at)" if partitioned else "(id)")
+    )
+    for name, definition in foreign_keys:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    for definition in index_definitions:
+        # Captured before the rename, so they already point at the new table;
+        # on a partitioned table each one cascades to every partition
+        op.execute(definition.replace(" ON ONLY ", " ON "))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for table in TABLES:
+        # Fresh installs get partitioned tables from create_all already
+        if _relkind(bind, table) == 'r':
+            _rebuild(table, partitioned=True)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for table in TABLES:
+        if _relkind(bind, table) == 'p':
+            _rebuild(table, partitioned=False)
@@ -0,0 +1,46 @@
+"""Add keyset pagination and trigram search indexes on users.
+
+Revision ID: 006_user_search_idx
+Revises: 005_partition_logs
+Create Date: 2026-03-16 12:00:00.000000
+
+The admin user list pages by (last_active_at DESC NULLS LAST, id DESC)
+and searches username/first_name/last_name with ILIKE '%term%', which
+pg_trgm GIN indexes can serve. Indexes are built CONCURRENTLY so the
+users table stays writable.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_user_search_idx'
+down_revision: Union[str, None] = '005_partition_logs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRGM_COLUMNS = ('username', 'first_name', 'last_name')
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_last_active_id "
+            "ON users (last_active_at DESC NULLS LAST, id DESC)"
+        )
+        for column in TRGM_COLUMNS:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_{column}_trgm "
+                f"ON users USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in TRGM_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_users_{column}_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_last_active_id")
@@ -9,14 +9,37 @@ from typing import Optional, Dict, Any, List
 
 from sqlalchemy import (
     String, Integer, BigInteger, Text, Boolean, DateTime, Date,
-    Numeric, Enum, ForeignKey, Index, UniqueConstraint, JSON
+    Numeric, Enum, ForeignKey, Index, UniqueConstraint, JSON, LargeBinary, DDL, event
 )
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.schema import CreateColumn, PrimaryKeyConstraint
 from sqlalchemy.sql import func
 
 from database.connection import Base
 
 
+# Log tables partitioned by month key on (id, created_at), which SQLite
+# (used by the tests) can't autoincrement. There the id alone is the key.
+def _is_partitioned(table) -> bool:
+    return bool(table.dialect_options["postgresql"].get("partition_by"))
+
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _sqlite_primary_key(constraint, compiler, **kw):
+    if _is_partitioned(constraint.table):
+        return None
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
+
+@compiles(CreateColumn, "sqlite")
+def _sqlite_create_column(element, compiler, **kw):
+    column = element.element
+    if column.table is not None and _is_partitioned(column.table) and column.autoincrement is True:
+        return f"{compiler.preparer.format_column(column)} INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT"
+    return compiler.visit_create_column(element, **kw)
+
+
 class RequestType(enum.Enum):
     """Types of user requests."""
     TEXT = "text"
@@ -178,6 +201,33 @@ class User(Base):
         return f"<User(id={self.id}, telegram_id={self.telegram_id}, username={self.username})>"
 
 
+# Admin user list indexes (migration 006 adds them to existing databases).
+# PostgreSQL only: keyset pagination on (last_active_at DESC NULLS LAST, id)
+# and substring ILIKE search via pg_trgm, skipped if the extension is missing.
+event.listen(
+    User.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_users_last_active_id "
+        "ON users (last_active_at DESC NULLS LAST, id DESC)"
+    ).execute_if(dialect="postgresql")
+)
+event.listen(
+    User.__table__,
+    "after_create",
+    DDL("""
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (username gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_users_first_name_trgm ON users USING gin (first_name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_users_last_name_trgm ON users USING gin (last_name gin_trgm_ops);
+    END IF;
+END $$
+""").execute_if(dialect="postgresql")
+)
+
+
 class Request(Base):
     """
     User request log.
@@ -185,6 +235,7 @@ class Request(Base):
     """
     __tablename__ = "requests"
     
+    # Partitioned by month on created_at, so the key includes it
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
@@ -208,7 +259,7 @@ class Request(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
-        nullable=False,
+        primary_key=True,
         index=True
     )
     
@@ -217,6 +268,7 @@ class Request(Base):
     
     __table_args__ = (
         Index("ix_requests_user_type_date", "user_id", "type", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
     
     def __repr__(self) -> str:
@@ -566,6 +618,7 @@ class APIUsageLog(Base):
     """
     __tablename__ = "api_usage_logs"
     
+    # Partitioned by month on created_at, so the key includes it
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     
@@ -591,14 +644,122 @@ class APIUsageLog(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
-        nullable=False,
+        primary_key=True,
         index=True
     )
     
     __table_args__ = (
         Index("ix_api_usage_provider_date", "provider", "created_at"),
         Index("ix_api_usage_model_date", "model", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
     
     def __repr__(self) -> str:
         return f"<APIUsageLog(id={self.id}, provider={self.provider}, model={self.model})>"
+
+
+# =========================================
+# Usage rollups (maintained by the worker, read by the admin dashboard)
+# =========================================
+
+class RequestRollupHourly(Base):
+    """
+    Hourly aggregate of user requests.
+    One row per (UTC hour, request type, model).
+    """
+    __tablename__ = "request_rollups_hourly"
+    
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=False), primary_key=True)  # UTC hour
+    request_type: Mapped[RequestType] = mapped_column(Enum(RequestType), primary_key=True)
+    model: Mapped[str] = mapped_column(String(50), primary_key=True, default="")
+    
+    requests: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    errors: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    cost_usd: Mapped[Decimal] = mapped_column(Numeric(14, 6), default=0, nullable=False)
+    tokens_input: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    tokens_output: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    
+    def __repr__(self) -> str:
+        return f"<RequestRollupHourly(bucket={self.bucket}, type={self.request_type}, requests={self.requests})>"
+
+
+class APIUsageRollupHourly(Base):
+    """
+    Hourly aggregate of provider API calls.
+    One row per (UTC hour, provider, model, endpoint).
+    """
+    __tablename__ = "api_usage_rollups_hourly"
+    
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=False), primary_key=True)  # UTC hour
+    provider: Mapped[str] = mapped_column(String(50), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100), primary_key=True)
+    endpoint: Mapped[str] = mapped_column(String(100), primary_key=True)
+    
+    requests: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    errors: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    input_tokens: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    output_tokens: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    cost_usd: Mapped[Decimal] = mapped_column(Numeric(14, 6), default=0, nullable=False)
+    cost_rub: Mapped[Decimal] = mapped_column(Numeric(14, 4), default=0, nullable=False)
+    duration_ms_sum: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    duration_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    
+    def __repr__(self) -> str:
+        return f"<APIUsageRollupHourly(bucket={self.bucket}, provider={self.provider}, model={self.model})>"
+
+
+class UserActivitySketch(Base):
+    """
+    Daily HyperLogLog sketch of active (requesting) users.
+    Merged across days for range unique-user counts.
+    """
+    __tablename__ = "user_activity_sketches"
+    
+    day: Mapped[date] = mapped_column(Date, primary_key=True)  # UTC date
+    registers: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<UserActivitySketch(day={self.day})>"
+
+
+class UserUsageTotal(Base):
+    """
+    All-time request count and cost per user (top users widget).
+    """
+    __tablename__ = "user_usage_totals"
+    
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    requests: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False, index=True)
+    cost_usd: Mapped[Decimal] = mapped_column(Numeric(14, 6), default=0, nullable=False)
+    last_request_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self) -> str:
+        return f"<UserUsageTotal(user_id={self.user_id}, requests={self.requests})>"
+
+
+class RollupWatermark(Base):
+    """
+    Last source row id folded into the rollups, per source table.
+    Updated in the same transaction as the rollups (exactly-once).
+    """
+    __tablename__ = "rollup_watermarks"
+    
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<RollupWatermark(name={self.name}, last_id={self.last_id})>"
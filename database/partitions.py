@@ -0,0 +1,259 @@
+"""
+Monthly range partitions for the append-only log tables.
+`requests` and `api_usage_logs` are partitioned by created_at (UTC
+months). Helpers here create upcoming partitions and apply the
+retention policy (detach, archive to gzip CSV, drop).
+"""
+import asyncio
+import gzip
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database.connection import engine
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+PARTITIONED_TABLES = ("requests", "api_usage_logs")
+
+_PARTITION_RE = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, months: int) -> date:
+    """First day of the month ``months`` after d's month."""
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month a partition covers, parsed from its name (None for default)."""
+    match = _PARTITION_RE.search(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def partition_bounds(month: date) -> str:
+    """FOR VALUES clause of one monthly partition; bounds are UTC."""
+    return (
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+        f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+def partition_ddl(table: str, month: date) -> str:
+    """CREATE TABLE for one monthly partition."""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+        f"PARTITION OF {table} {partition_bounds(month)}"
+    )
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    result = await conn.execute(text(
+        "SELECT relkind FROM pg_class WHERE relname = :table AND relkind IN ('r', 'p')"
+    ), {"table": table})
+    return result.scalar() == "p"
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> List[str]:
+    result = await conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :table ORDER BY child.relname"
+    ), {"table": table})
+    return [row[0] for row in result]
+
+
+async def _create_partition(conn: AsyncConnection, table: str, month: date, has_default: bool) -> int:
+    """
+    Create one monthly partition.
+    
+    Rows for that month already in the DEFAULT partition (inserted while
+    the partition was missing) would make CREATE ... PARTITION OF fail,
+    so they are moved into a new table which is then attached.
+    
+    Returns:
+        Number of rows moved out of the default partition
+    """
+    name = partition_name(table, month)
+    if has_default:
+        bounds = {
+            "lower": datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+            "upper": datetime.combine(add_months(month, 1), datetime.min.time(), timezone.utc),
+        }
+        in_month = "created_at >= :lower AND created_at < :upper"
+        stray = await conn.execute(text(
+            f"SELECT 1 FROM {table}_default WHERE {in_month} LIMIT 1"
+        ), bounds)
+        if stray.scalar() is not None:
+            await conn.execute(text(
+                f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            ))
+            moved = await conn.execute(text(
+                f"WITH moved AS (DELETE FROM {table}_default WHERE {in_month} RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            await conn.execute(text(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} {partition_bounds(month)}"
+            ))
+            return moved.rowcount
+    
+    await conn.execute(text(partition_ddl(table, month)))
+    return 0
+
+
+async def ensure_partitions(months_ahead: Optional[int] = None) -> List[str]:
+    """
+    Create partitions for the current month and the next ``months_ahead``
+    months, plus a DEFAULT partition as a safety net. Idempotent.
+    
+    Each partition is created in its own transaction, so one failure
+    (logged) does not hold back the others. Tables that are not
+    partitioned (migration not applied yet) are skipped.
+    
+    Returns:
+        Names of partitions that were created
+    """
+    if months_ahead is None:
+        months_ahead = settings.partition_months_ahead
+    
+    current = month_start(datetime.now(timezone.utc).date())
+    created = []
+    
+    for table in PARTITIONED_TABLES:
+        async with engine.connect() as conn:
+            if not await is_partitioned(conn, table):
+                continue
+            existing = set(await list_partitions(conn, table))
+        
+        default = f"{table}_default"
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            try:
+                async with engine.begin() as conn:
+                    moved = await _create_partition(conn, table, month, default in existing)
+            except Exception as e:
+                logger.error("Partition creation failed", partition=name, error=str(e))
+                continue
+            
+            created.append(name)
+            if moved:
+                logger.warning("Rows moved out of the default partition", partition=name, rows=moved)
+        
+        if default not in existing:
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT"
+                    ))
+            except Exception as e:
+                logger.error("Partition creation failed", partition=default, error=str(e))
+                continue
+            created.append(default)
+    
+    if created:
+        logger.info("Partitions created", partitions=created)
+    return created
+
+
+async def _archive_partition(conn: AsyncConnection, name: str) -> str:
+    """
+    COPY a partition into <archive dir>/<name>.csv.gz.
+    
+    Only reads the partition, so it can stay attached. Compression and
+    file writes run in a thread to keep the event loop free.
+    """
+    path = os.path.join(settings.partition_archive_dir, f"{name}.csv.gz")
+    tmp_path = path + ".tmp"
+    await asyncio.to_thread(os.makedirs, settings.partition_archive_dir, exist_ok=True)
+    
+    raw = await conn.get_raw_connection()
+    out = await asyncio.to_thread(gzip.open, tmp_path, "wb")
+    try:
+        async def _write(chunk: bytes) -> None:
+            await asyncio.to_thread(out.write, chunk)
+        
+        await raw.driver_connection.copy_from_table(
+            name, output=_write, format="csv", header=True
+        )
+    finally:
+        await asyncio.to_thread(out.close)
+    
+    await asyncio.to_thread(os.replace, tmp_path, path)
+    return path
+
+
+async def apply_retention(retention_months: Optional[int] = None) -> List[Tuple[str, Optional[str]]]:
+    """
+    Detach and drop partitions entirely older than the retention window.
+    
+    When ``partition_archive_enabled`` is set, each partition is exported
+    to a gzip CSV before it is dropped; a failed export leaves the
+    partition attached so nothing is lost. 0 months keeps everything.
+    
+    Returns:
+        (partition, archive path or None) for every dropped partition
+    """
+    if retention_months is None:
+        retention_months = settings.partition_retention_months
+    if retention_months <= 0:
+        return []
+    
+    cutoff = add_months(month_start(datetime.now(timezone.utc).date()), -retention_months)
+    dropped = []
+    
+    for table in PARTITIONED_TABLES:
+        async with engine.connect() as conn:
+            if not await is_partitioned(conn, table):
+                continue
+            expired = []
+            for name in await list_partitions(conn, table):
+                month = partition_month(name)
+                if month is not None and month < cutoff:
+                    expired.append(name)
+        
+        for name in expired:
+            # Export while still attached (ACCESS SHARE only), then detach
+            # and drop in a short transaction of their own. DETACH takes an
+            # ACCESS EXCLUSIVE lock on the parent; CONCURRENTLY is not
+            # allowed next to a DEFAULT partition.
+            path = None
+            if settings.partition_archive_enabled:
+                try:
+                    async with engine.connect() as conn:
+                        path = await _archive_partition(conn, name)
+                except Exception as e:
+                    logger.error("Partition export failed", partition=name, error=str(e))
+                    continue
+            
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                    await conn.execute(text(f"DROP TABLE {name}"))
+            except Exception as e:
+                logger.error("Partition retention failed", partition=name, error=str(e))
+                continue
+            
+            dropped.append((name, path))
+            logger.info("Partition dropped", partition=name, archive=path)
+    
+    return dropped
@@ -2,13 +2,72 @@
 Redis client for caching and session management.
 """
 import json
-from typing import Optional, Any, List, Dict
-from datetime import timedelta
+from typing import Optional, Any, List, Dict, Tuple
+from datetime import datetime, timedelta
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
 
+from bot.utils.metrics import count_roundtrip
+from bot.utils.tracing import span
 from config import settings
 
 
+# GCRA over several tiers in one roundtrip. Each tier keeps only its
+# theoretical arrival time (ms), expiring once the tier is idle again.
+# KEYS[1] is the premium marker of the first tier's user (may be empty),
+# KEYS[2..] the tier keys; ARGV holds the premium emission interval and
+# period of the first tier, then an interval and period per tier.
+# Nothing is written unless every tier allows the request.
+_RATE_LIMIT_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local premium = 0
+if KEYS[1] ~= '' and tonumber(ARGV[1]) > 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    premium = 1
+end
+local retry_after = 0
+local tats = {}
+for i = 2, #KEYS do
+    local interval = tonumber(ARGV[i * 2 - 1])
+    local period = tonumber(ARGV[i * 2])
+    if i == 2 and premium == 1 then
+        interval = tonumber(ARGV[1])
+    end
+    local tat = math.max(tonumber(redis.call('GET', KEYS[i]) or now), now) + interval
+    if tat - now > period then
+        retry_after = math.max(retry_after, tat - now - period)
+    end
+    tats[i] = tat
+end
+if retry_after == 0 then
+    for i = 2, #KEYS do
+        redis.call('SET', KEYS[i], tats[i], 'PX', tats[i] - now)
+    end
+end
+return {retry_after, premium}
+"""
+
+
+class _CountingPipeline(Pipeline):
+    """Pipeline counted as one roundtrip and traced as one span."""
+    
+    async def execute(self, raise_on_error: bool = True):
+        count_roundtrip("redis")
+        with span("redis.pipeline", commands=len(self.command_stack)):
+            return await super().execute(raise_on_error)
+
+
+class _CountingRedis(redis.Redis):
+    """redis.Redis that counts roundtrips for the per-update metrics."""
+    
+    async def execute_command(self, *args, **options):
+        count_roundtrip("redis")
+        return await super().execute_command(*args, **options)
+    
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> _CountingPipeline:
+        return _CountingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
 class RedisClient:
     """
     Async Redis client wrapper.
@@ -26,7 +85,7 @@ class RedisClient:
             encoding="utf-8",
             decode_responses=True
         )
-        self._client = redis.Redis(connection_pool=self._pool)
+        self._client = _CountingRedis(connection_pool=self._pool)
     
     async def close(self) -> None:
         """Close Redis connection."""
@@ -181,35 +240,43 @@ class RedisClient:
     # =====================================
     
     async def check_rate_limit(
-        self, 
-        key: str, 
-        limit: int, 
-        window_seconds: int
-    ) -> bool:
+        self,
+        tiers: List[Tuple[str, int, int]],
+        plan_key: Optional[str] = None,
+        premium_limit: int = 0
+    ) -> Tuple[float, bool]:
         """
-        Check if rate limit is exceeded.
-        Uses sliding window counter.
-        Returns True if within limit, False if exceeded.
-        """
-        import time
-        
-        now = time.time()
-        window_start = now - window_seconds
+        Check a request against several GCRA rate limits at once.
         
-        pipe = self.client.pipeline()
-        # Remove old entries
-        pipe.zremrangebyscore(key, 0, window_start)
-        # Count current entries
-        pipe.zcard(key)
-        # Add current request
-        pipe.zadd(key, {str(now): now})
-        # Set expiry
-        pipe.expire(key, window_seconds)
+        Args:
+            tiers: (key, limit, period_seconds) per tier; ``limit``
+                requests per period, bursting up to ``limit``
+            plan_key: Premium marker of the user owning the first tier
+            premium_limit: Limit of the first tier for premium users
+            
+        Returns:
+            (retry_after seconds, 0.0 if allowed; whether the premium
+            marker was set). A rejected request consumes nothing.
+        """
+        def interval(limit: int, period: int) -> int:
+            return max(1, period * 1000 // limit) if limit > 0 else 0
         
-        results = await pipe.execute()
-        count = results[1]
+        keys = [plan_key or ""]
+        args = [interval(premium_limit, tiers[0][2]), tiers[0][2] * 1000]
+        for key, limit, period in tiers:
+            keys.append(key)
+            args += [interval(limit, period), period * 1000]
         
-        return count < limit
+        retry_after_ms, premium = await self.client.eval(_RATE_LIMIT_SCRIPT, len(keys), *keys, *args)
+        return retry_after_ms / 1000, bool(premium)
+    
+    async def set_premium_plan(self, telegram_id: int, expires_at: datetime) -> None:
+        """Mark the user premium for rate limiting until the subscription ends."""
+        await self.client.set(f"user:{telegram_id}:plan", "premium", exat=int(expires_at.timestamp()))
+    
+    async def clear_premium_plan(self, telegram_id: int) -> None:
+        """Drop the user's premium rate limits."""
+        await self.client.delete(f"user:{telegram_id}:plan")
     
     # =====================================
     # Document Context
@@ -287,6 +354,26 @@ class RedisClient:
         videos = json.loads(videos_json)
         return videos[-1] if videos else None
     
+    # =====================================
+    # Admin API Response Cache
+    # =====================================
+    
+    async def get_cache_generation(self, namespace: str) -> int:
+        """Current generation of a response-cache namespace."""
+        value = await self.client.get(f"api_cache:gen:{namespace}")
+        return int(value) if value else 0
+    
+    async def bump_cache_generation(self, *namespaces: str) -> None:
+        """
+        Invalidate cached admin API responses for namespaces.
+        Entries are keyed by generation, so old ones just stop being read
+        and expire on their own.
+        """
+        async with self.client.pipeline(transaction=False) as pipe:
+            for namespace in namespaces:
+                pipe.incr(f"api_cache:gen:{namespace}")
+            await pipe.execute()
+    
     # =====================================
     # Generic Methods
     # =====================================
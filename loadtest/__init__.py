@@ -0,0 +1,5 @@
+"""
+Offline load-test harness: fake Telegram Bot API and CometAPI servers
+and a driver that replays synthetic traffic through the real bot.
+Run with ``python -m loadtest --help``.
+"""
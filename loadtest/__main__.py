@@ -0,0 +1,82 @@
+"""
+Offline load test of the bot.
+
+Runs the real dispatcher (middlewares, routers, handlers, local Postgres
+and Redis from .env) against a fake Bot API and a fake CometAPI, so
+nothing reaches Telegram or a paid provider. Synthetic users are
+created with ids from --user-id-base; use a scratch database.
+
+Usage:
+    python -m loadtest --users 50 --duration 60
+    python -m loadtest --users 200 --think-ms 500 --mix text=70,photo=15,voice=15 --json run.json
+    python -m loadtest --rate-429 0.02 --ttft-ms 1500 --provider-error-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+
+from loadtest.scenarios import DEFAULT_MIX, parse_mix
+
+BOT_TOKEN = "100000001:loadtest-token"
+API_KEY = "loadtest-key-000000"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Concurrent synthetic users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to generate traffic")
+    parser.add_argument("--think-ms", type=float, default=2000, help="Mean pause between a user's updates")
+    parser.add_argument("--ramp", type=float, default=5, help="Seconds over which users join")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="Scenario weights, e.g. text=60,photo=20,voice=20 (kinds: %s)" % ", ".join(DEFAULT_MIX)
+    )
+    parser.add_argument("--user-id-base", type=int, default=900000000, help="Telegram id of the first synthetic user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--telegram-port", type=int, default=8181)
+    parser.add_argument("--telegram-latency-ms", type=float, default=30)
+    parser.add_argument("--telegram-jitter-ms", type=float, default=20)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of Bot API calls answered with 429")
+    parser.add_argument("--provider-port", type=int, default=8182)
+    parser.add_argument("--ttft-ms", type=float, default=400, help="Provider time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    parser.add_argument("--reply-words", type=int, default=180)
+    parser.add_argument("--image-ms", type=float, default=3000)
+    parser.add_argument("--provider-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    return parser.parse_args()
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Point the settings at the fakes; must run before the bot is imported."""
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{args.telegram_port}",
+        "COMETAPI_BASE_URL": f"http://127.0.0.1:{args.provider_port}/v1",
+        "COMETAPI_API_KEY": API_KEY,
+        "DEFAULT_AI_PROVIDER": "cometapi",
+        # No real provider may be reached
+        "OPENAI_API_KEY": "",
+        "GIGACHAT_CREDENTIALS": "",
+        "QWEN_API_KEY": "",
+        "BOT_MODE": "polling",
+    })
+    # Exercise getChatMember and keep daily limits out of the way, unless overridden
+    os.environ.setdefault("SUBSCRIPTION_CHECK_ENABLED", "true")
+    os.environ.setdefault("TELEGRAM_CHANNEL_ID", "-1001000000000")
+    for kind in ("TEXT", "IMAGE", "VIDEO", "VOICE", "DOCUMENT", "PRESENTATION"):
+        os.environ.setdefault(f"DEFAULT_{kind}_LIMIT", "1000000")
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment(args)
+    
+    from loadtest.driver import run_load_test
+    asyncio.run(run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()
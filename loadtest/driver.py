@@ -0,0 +1,312 @@
+"""
+Load-test driver.
+Starts the fake Bot API and CometAPI servers, runs the real bot
+(``main.main()``: middlewares, routers, polling) against them and local
+Postgres/Redis, replays synthetic users and reports throughput, latency
+per handler and DB/Redis roundtrips per update.
+
+Import only after the environment points the settings at the fakes
+(see ``loadtest/__main__.py``).
+"""
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from aiohttp import web
+
+import main as bot_main
+from bot.middlewares import logging as logging_middleware
+from bot.services.provider_router import percentile
+from loadtest.fake_cometapi import FakeCometAPI
+from loadtest.fake_telegram import FakeTelegram
+from loadtest.scenarios import SyntheticUser
+
+UPDATE_TIMEOUT = 180  # seconds a user waits for its update to be handled
+
+_record: ContextVar[Optional[Dict[str, Any]]] = ContextVar("loadtest_record", default=None)
+
+
+class UpdateRecorder(BaseMiddleware):
+    """
+    Outermost update middleware: times each update from entering the
+    dispatcher to leaving it (lane wait included) and wakes the user
+    waiting for it. The handler label, handler time and roundtrip counts
+    come from LoggingMiddleware through ``record_observation``.
+    """
+    
+    def __init__(self):
+        self.records: Dict[int, Dict[str, Any]] = {}
+        self.waiters: Dict[int, asyncio.Event] = {}
+        super().__init__()
+    
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        record = {"handler": "unhandled", "status": "ok", "handler_s": None, "db": 0, "redis": 0}
+        record["started"] = time.monotonic()
+        token = _record.set(record)
+        try:
+            return await handler(event, data)
+        except Exception:
+            record["status"] = "error"
+            raise
+        finally:
+            _record.reset(token)
+            record["done"] = time.monotonic()
+            self.records[event.update_id] = record
+            waiter = self.waiters.pop(event.update_id, None)
+            if waiter is not None:
+                waiter.set()
+
+
+def install_observer() -> None:
+    """Copy LoggingMiddleware's per-update observations into the current record."""
+    observe = logging_middleware.observe_update
+    
+    def record_observation(router, handler, update_type, status, duration, counts):
+        record = _record.get()
+        if record is not None:
+            record.update(
+                handler=f"{router}.{handler}",
+                status=status,
+                handler_s=duration,
+                db=counts.get("db", 0),
+                redis=counts.get("redis", 0),
+            )
+        observe(router, handler, update_type, status, duration, counts)
+    
+    logging_middleware.observe_update = record_observation
+
+
+async def start_server(app: web.Application, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+class LoadTest:
+    """
+    Closed-loop run: ``users`` synthetic users each send an update, wait
+    until the bot has handled it, think for an exponentially distributed
+    ``think_ms`` and repeat until ``duration`` seconds have passed.
+    Users are started evenly over ``ramp`` seconds.
+    """
+    
+    def __init__(
+        self,
+        telegram: FakeTelegram,
+        provider: FakeCometAPI,
+        users: int,
+        duration: float,
+        mix: Dict[str, int],
+        think_ms: float = 2000,
+        ramp: float = 5,
+        user_id_base: int = 900000000,
+        seed: int = 1
+    ):
+        self.telegram = telegram
+        self.provider = provider
+        self.users = users
+        self.duration = duration
+        self.mix = mix
+        self.think_ms = think_ms
+        self.ramp = ramp
+        self.user_id_base = user_id_base
+        self.rng = random.Random(seed)
+        self.recorder = UpdateRecorder()
+        self.kinds: Dict[int, str] = {}
+        self.timeouts = 0
+        self.started_at = 0.0
+        self.finished_at = 0.0
+    
+    async def run(self) -> Dict[str, Any]:
+        install_observer()
+        bot_main.dp.update.outer_middleware(self.recorder)  # before main() adds the lanes
+        bot_task = asyncio.create_task(bot_main.main())
+        
+        while not self.telegram.calls["getUpdates"]:
+            if bot_task.done():
+                bot_task.result()  # startup failed: raise its error
+            await asyncio.sleep(0.1)
+        
+        self.started_at = time.monotonic()
+        deadline = self.started_at + self.duration
+        population = [
+            SyntheticUser(self.user_id_base + i, random.Random(self.rng.random()))
+            for i in range(self.users)
+        ]
+        await asyncio.gather(*(
+            self._user_loop(user, i * self.ramp / max(1, self.users), deadline)
+            for i, user in enumerate(population)
+        ))
+        self.finished_at = time.monotonic()
+        
+        await bot_main.dp.stop_polling()
+        await asyncio.wait_for(bot_task, 60)
+        return self.report()
+    
+    async def _user_loop(self, user: SyntheticUser, delay: float, deadline: float) -> None:
+        await asyncio.sleep(delay)
+        kinds, weights = list(self.mix), list(self.mix.values())
+        seq = 0
+        while time.monotonic() < deadline:
+            seq += 1
+            kind, update, chat_id, file = user.next_update(user.rng.choices(kinds, weights)[0], seq)
+            if file is not None:
+                self.telegram.add_file(*file)
+            
+            waiter = asyncio.Event()
+            update_id = self.telegram.push(update, chat_id)
+            self.recorder.waiters[update_id] = waiter
+            self.kinds[update_id] = kind
+            try:
+                await asyncio.wait_for(waiter.wait(), UPDATE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.recorder.waiters.pop(update_id, None)
+            
+            await asyncio.sleep(user.rng.expovariate(1000 / self.think_ms) if self.think_ms else 0)
+    
+    # =========================================
+    # Report
+    # =========================================
+    
+    def report(self) -> Dict[str, Any]:
+        wall = self.finished_at - self.started_at
+        by_handler: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        first_reply: Dict[str, List[float]] = defaultdict(list)
+        
+        for update_id, record in self.recorder.records.items():
+            pushed = self.telegram.pushed_at.get(update_id)
+            record["total_s"] = record["done"] - pushed if pushed else None
+            by_handler[record["handler"]].append(record)
+            replied = self.telegram.first_reply_at.get(update_id)
+            if pushed and replied:
+                first_reply[self.kinds.get(update_id, "?")].append((replied - pushed) * 1000)
+        
+        def ms(values: List[float], pct: float) -> Optional[float]:
+            value = percentile(values, pct)
+            return round(value, 1) if value is not None else None
+        
+        handlers = {}
+        for name, records in sorted(by_handler.items(), key=lambda item: -len(item[1])):
+            handler_ms = [r["handler_s"] * 1000 for r in records if r["handler_s"] is not None]
+            total_ms = [r["total_s"] * 1000 for r in records if r["total_s"] is not None]
+            handlers[name] = {
+                "count": len(records),
+                "errors": sum(1 for r in records if r["status"] == "error"),
+                "p50_ms": ms(handler_ms, 50),
+                "p95_ms": ms(handler_ms, 95),
+                "p99_ms": ms(handler_ms, 99),
+                "e2e_p95_ms": ms(total_ms, 95),
+                "db_avg": round(sum(r["db"] for r in records) / len(records), 1),
+                "redis_avg": round(sum(r["redis"] for r in records) / len(records), 1),
+                "db_max": max(r["db"] for r in records),
+                "redis_max": max(r["redis"] for r in records),
+            }
+        
+        completed = len(self.recorder.records)
+        return {
+            "users": self.users,
+            "duration_s": round(wall, 1),
+            "updates_sent": len(self.kinds),
+            "updates_handled": completed,
+            "timeouts": self.timeouts,
+            "updates_per_second": round(completed / wall, 2) if wall else 0.0,
+            "db_total": sum(r["db"] for r in self.recorder.records.values()),
+            "redis_total": sum(r["redis"] for r in self.recorder.records.values()),
+            "handlers": handlers,
+            "first_reply": {
+                kind: {"count": len(values), "p50_ms": ms(values, 50), "p95_ms": ms(values, 95), "p99_ms": ms(values, 99)}
+                for kind, values in sorted(first_reply.items())
+            },
+            "telegram_calls": dict(self.telegram.calls.most_common()),
+            "telegram_429": dict(self.telegram.throttled),
+            "provider_calls": dict(self.provider.calls.most_common()),
+            "provider_errors": dict(self.provider.errors),
+        }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"\n{report['updates_handled']} of {report['updates_sent']} updates handled in {report['duration_s']}s "
+        f"by {report['users']} users: {report['updates_per_second']} updates/s, "
+        f"{report['timeouts']} timed out"
+    )
+    print(f"DB statements: {report['db_total']}, Redis roundtrips: {report['redis_total']}")
+    
+    def cell(value) -> str:
+        return "-" if value is None else f"{value}"
+    
+    print(f"\n{'handler':<44}{'count':>7}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'e2e p95':>9}{'db/upd':>8}{'redis/upd':>10}")
+    for name, row in report["handlers"].items():
+        print(
+            f"{name[:43]:<44}{row['count']:>7}{row['errors']:>5}{cell(row['p50_ms']):>9}{cell(row['p95_ms']):>9}"
+            f"{cell(row['p99_ms']):>9}{cell(row['e2e_p95_ms']):>9}{row['db_avg']:>8}{row['redis_avg']:>10}"
+        )
+    
+    if report["first_reply"]:
+        print(f"\n{'first reply':<44}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for kind, row in report["first_reply"].items():
+            print(f"{kind:<44}{row['count']:>7}{cell(row['p50_ms']):>9}{cell(row['p95_ms']):>9}{cell(row['p99_ms']):>9}")
+    
+    print("\nBot API calls: " + ", ".join(f"{k}={v}" for k, v in report["telegram_calls"].items()))
+    if report["telegram_429"]:
+        print("Injected 429s: " + ", ".join(f"{k}={v}" for k, v in report["telegram_429"].items()))
+    print("Provider calls: " + ", ".join(f"{k}={v}" for k, v in report["provider_calls"].items()))
+    if report["provider_errors"]:
+        print("Injected provider errors: " + ", ".join(f"{k}={v}" for k, v in report["provider_errors"].items()))
+
+
+async def run_load_test(args) -> Dict[str, Any]:
+    """Run one load test from parsed CLI arguments (see ``loadtest/__main__.py``)."""
+    telegram = FakeTelegram(
+        latency_ms=args.telegram_latency_ms,
+        jitter_ms=args.telegram_jitter_ms,
+        rate_429=args.rate_429,
+    )
+    provider = FakeCometAPI(
+        ttft_ms=args.ttft_ms,
+        tokens_per_second=args.tokens_per_second,
+        reply_words=args.reply_words,
+        image_ms=args.image_ms,
+        error_rate=args.provider_error_rate,
+    )
+    provider.base_url = f"http://127.0.0.1:{args.provider_port}"
+    
+    runners = [
+        await start_server(telegram.app(), args.telegram_port),
+        await start_server(provider.app(), args.provider_port),
+    ]
+    try:
+        load_test = LoadTest(
+            telegram,
+            provider,
+            users=args.users,
+            duration=args.duration,
+            mix=args.mix,
+            think_ms=args.think_ms,
+            ramp=args.ramp,
+            user_id_base=args.user_id_base,
+            seed=args.seed,
+        )
+        report = await load_test.run()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+    
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
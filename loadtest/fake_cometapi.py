@@ -0,0 +1,254 @@
+"""
+Fake OpenAI-compatible CometAPI.
+Implements the endpoints the bot uses (chat completions with and without
+streaming, the Responses API, image generation and edits, Sora videos,
+Whisper transcriptions) with configurable latency, streaming speed and
+error rate, and counts calls per endpoint.
+"""
+import asyncio
+import base64
+import io
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+# Markdown-heavy answers, so reply formatting does realistic work
+ANSWERS = [
+    "## Краткий ответ\n\n**Да**, это возможно. Вот основные шаги:\n\n"
+    "1. Установите зависимости командой `pip install -r requirements.txt`\n"
+    "2. Настройте переменные окружения в файле `.env`\n"
+    "3. Запустите сервис и проверьте логи\n\n"
+    "> Совет: держите конфигурацию в одном месте.\n\n"
+    "```python\nimport asyncio\n\nasync def main():\n    await asyncio.sleep(1)\n\nasyncio.run(main())\n```\n\n"
+    "Если что-то не работает, *проверьте версии* пакетов и ~~старые~~ кэши.",
+    "Here is a comparison:\n\n| Option | Latency | Cost |\n|---|---|---|\n| A | low | high |\n| B | medium | medium |\n\n"
+    "- **A** suits interactive use\n- **B** suits batch jobs\n  - nested point with [a link](https://example.com)\n\n"
+    "In short, *measure first*, then optimize the hot path.",
+    "Рецепт на 4 порции:\n\n- 400 г пасты\n- 200 г томатов\n- 2 зубчика чеснока\n- оливковое масло, соль, базилик\n\n"
+    "### Приготовление\n\nОтварите пасту в подсоленной воде. Параллельно обжарьте чеснок, добавьте томаты и "
+    "тушите 10 минут. Смешайте с пастой и подавайте с **базиликом**. Приятного аппетита!",
+]
+
+
+def _png_bytes() -> bytes:
+    from PIL import Image
+    
+    buffer = io.BytesIO()
+    Image.new("RGB", (512, 512), (40, 90, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeCometAPI:
+    """
+    In-memory provider.
+    
+    ``ttft_ms`` is the wait before the first token (or the whole answer
+    for non-streaming calls), ``tokens_per_second`` the streaming speed,
+    ``reply_words`` the answer length. ``image_ms`` and ``video_seconds``
+    are generation times; ``error_rate`` is the share of requests
+    answered with HTTP 500.
+    """
+    
+    def __init__(
+        self,
+        ttft_ms: float = 400,
+        tokens_per_second: float = 60,
+        reply_words: int = 180,
+        image_ms: float = 3000,
+        video_seconds: float = 20,
+        error_rate: float = 0.0
+    ):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.reply_words = reply_words
+        self.image_ms = image_ms
+        self.video_seconds = video_seconds
+        self.error_rate = error_rate
+        self.base_url = ""  # set by the driver once the port is known
+        
+        self._videos: Dict[str, float] = {}
+        self._png = b""
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+    
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024, middlewares=[self._faults])
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_post("/v1/responses", self._responses)
+        app.router.add_post("/v1/images/generations", self._image)
+        app.router.add_post("/v1/images/edits", self._image)
+        app.router.add_post("/v1/audio/transcriptions", self._transcription)
+        app.router.add_post("/v1/videos", self._create_video)
+        app.router.add_get("/v1/videos/{video_id}", self._video_status)
+        app.router.add_get("/v1/videos/{video_id}/content", self._video_content)
+        app.router.add_get("/v1/videos/{video_id}/download", self._video_content)
+        app.router.add_get("/files/{name}", self._file)
+        return app
+    
+    @web.middleware
+    async def _faults(self, request: web.Request, handler) -> web.StreamResponse:
+        endpoint = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.calls[f"{request.method} {endpoint}"] += 1
+        if self.error_rate and request.method == "POST" and random.random() < self.error_rate:
+            self.errors[endpoint] += 1
+            return web.json_response(
+                {"error": {"message": "Injected upstream error", "type": "server_error"}},
+                status=500
+            )
+        return await handler(request)
+    
+    # =========================================
+    # Text
+    # =========================================
+    
+    def _answer_words(self) -> List[str]:
+        words = random.choice(ANSWERS).split(" ")
+        while len(words) < self.reply_words:
+            words += random.choice(ANSWERS).split(" ")
+        return words[:self.reply_words]
+    
+    @staticmethod
+    def _prompt_tokens(body: Dict[str, Any]) -> int:
+        return max(1, len(json.dumps(body.get("messages") or body.get("input") or "", ensure_ascii=False)) // 4)
+    
+    async def _chat(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get("model", "qwen-3-max")
+        words = self._answer_words()
+        usage = {
+            "prompt_tokens": self._prompt_tokens(body),
+            "completion_tokens": len(words),
+            "total_tokens": self._prompt_tokens(body) + len(words),
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        await asyncio.sleep(self.ttft_ms / 1000)
+        
+        if not body.get("stream"):
+            await asyncio.sleep(len(words) / self.tokens_per_second)
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+        
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        
+        def chunk(delta: Dict[str, Any], finish_reason=None) -> bytes:
+            return ("data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }, ensure_ascii=False) + "\n\n").encode()
+        
+        await response.write(chunk({"role": "assistant", "content": ""}))
+        step = 4  # words per chunk
+        for i in range(0, len(words), step):
+            text = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+            await response.write(chunk({"content": text}))
+            await asyncio.sleep(step / self.tokens_per_second)
+        await response.write(chunk({}, "stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+    
+    async def _responses(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        words = self._answer_words()
+        await asyncio.sleep((self.ttft_ms + len(words) * 1000 / self.tokens_per_second) / 1000)
+        return web.json_response({
+            "id": f"resp_{uuid.uuid4().hex[:12]}",
+            "object": "response",
+            "model": body.get("model"),
+            "output": [{
+                "type": "message",
+                "role": "assistant",
+                "content": [{
+                    "type": "output_text",
+                    "text": " ".join(words),
+                    "annotations": [
+                        {"type": "url_citation", "url": "https://example.com/source", "title": "Example source"},
+                    ],
+                }],
+            }],
+            "usage": {"input_tokens": self._prompt_tokens(body), "output_tokens": len(words)},
+        })
+    
+    # =========================================
+    # Media
+    # =========================================
+    
+    async def _image(self, request: web.Request) -> web.Response:
+        if request.content_type == "application/json":
+            prompt = (await request.json()).get("prompt", "")
+        else:
+            prompt = str((await request.post()).get("prompt", ""))
+        await asyncio.sleep(self.image_ms / 1000)
+        if not self._png:
+            self._png = _png_bytes()
+        if request.path.endswith("/edits"):
+            item = {"b64_json": base64.b64encode(self._png).decode()}
+            usage = {"input_tokens": 800, "output_tokens": 1500}
+        else:
+            item = {"url": f"{self.base_url}/files/image.png", "revised_prompt": prompt}
+            usage = None
+        return web.json_response({"created": int(time.time()), "data": [item], "usage": usage})
+    
+    async def _transcription(self, request: web.Request) -> web.Response:
+        await request.post()
+        await asyncio.sleep(self.ttft_ms / 1000)
+        return web.json_response({"text": "Привет! Напомни мне завтра в девять утра позвонить в банк."})
+    
+    async def _create_video(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        video_id = f"video_{uuid.uuid4().hex[:12]}"
+        self._videos[video_id] = time.monotonic()
+        return web.json_response({
+            "id": video_id,
+            "object": "video",
+            "status": "queued",
+            "model": str(form.get("model", "sora-2")),
+            "seconds": str(form.get("seconds", "4")),
+        })
+    
+    async def _video_status(self, request: web.Request) -> web.Response:
+        video_id = request.match_info["video_id"]
+        created = self._videos.get(video_id)
+        if created is None:
+            return web.json_response({"error": {"message": "Video not found"}}, status=404)
+        progress = min(100, int((time.monotonic() - created) / self.video_seconds * 100))
+        status = "completed" if progress >= 100 else ("in_progress" if progress else "queued")
+        result = {"id": video_id, "object": "video", "status": status, "progress": progress}
+        if status == "completed":
+            result["video_url"] = f"{self.base_url}/files/{video_id}.mp4"
+        return web.json_response(result)
+    
+    async def _video_content(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._video_bytes(), content_type="video/mp4")
+    
+    async def _file(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        if name.endswith(".mp4"):
+            return web.Response(body=self._video_bytes(), content_type="video/mp4")
+        if not self._png:
+            self._png = _png_bytes()
+        return web.Response(body=self._png, content_type="image/png")
+    
+    @staticmethod
+    def _video_bytes() -> bytes:
+        # An ftyp box is enough for the bot, which only forwards the file
+        return b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom" + bytes(64 * 1024)
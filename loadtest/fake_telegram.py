@@ -0,0 +1,247 @@
+"""
+Fake Telegram Bot API server.
+Serves the methods the bot calls (getUpdates long polling, sendMessage,
+editMessageText, getChatMember, getFile and file downloads, media sends),
+answers everything else with ``true``, and records every call. Latency
+and 429 (``retry_after``) responses are injected per request.
+"""
+import asyncio
+import io
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 100000001, "is_bot": True, "first_name": "Load Test", "username": "loadtest_bot"}
+
+# Methods that return the sent or edited message
+MESSAGE_METHODS = {
+    "sendMessage", "editMessageText", "editMessageCaption", "editMessageReplyMarkup",
+    "sendPhoto", "sendDocument", "sendVideo", "sendVoice", "sendAudio",
+    "sendAnimation", "copyMessage", "forwardMessage",
+}
+
+# Methods whose call means the user saw a reply
+REPLY_METHODS = MESSAGE_METHODS | {"sendMediaGroup", "answerInlineQuery", "answerCallbackQuery"}
+
+# Polling and bookkeeping calls are never delayed or throttled
+UNTHROTTLED_METHODS = {"getUpdates", "getMe", "setMyCommands", "deleteWebhook", "close"}
+
+
+def _jpeg_bytes() -> bytes:
+    from PIL import Image
+    
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 240), (200, 120, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _ogg_bytes() -> bytes:
+    # Only the container header; the fake Whisper never decodes it
+    return b"OggS\x00\x02" + bytes(4096)
+
+
+class FakeTelegram:
+    """
+    In-memory Bot API.
+    
+    ``push`` queues an incoming update for getUpdates and remembers when
+    it was queued. ``latency_ms`` (plus up to ``jitter_ms``) delays every
+    bot call except polling; ``rate_429`` is the share of those calls
+    answered with 429 Too Many Requests and ``retry_after`` seconds.
+    """
+    
+    def __init__(
+        self,
+        latency_ms: float = 30,
+        jitter_ms: float = 20,
+        rate_429: float = 0.0,
+        retry_after: int = 1
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._new_update = asyncio.Event()
+        self._next_message_id: Dict[int, int] = defaultdict(lambda: 1000)
+        self._files: Dict[str, bytes] = {}
+        
+        self.pushed_at: Dict[int, float] = {}
+        self.first_reply_at: Dict[int, float] = {}
+        self._last_update_of_chat: Dict[int, int] = {}
+        self.calls: Counter = Counter()
+        self.throttled: Counter = Counter()
+    
+    # =========================================
+    # Driver side
+    # =========================================
+    
+    def push(self, update: Dict[str, Any], chat_id: Optional[int] = None) -> int:
+        """Queue an update; returns its update_id."""
+        update_id = self._next_update_id
+        self._next_update_id += 1
+        update["update_id"] = update_id
+        self._updates.append(update)
+        self.pushed_at[update_id] = time.monotonic()
+        if chat_id is not None:
+            self._last_update_of_chat[chat_id] = update_id
+        self._new_update.set()
+        return update_id
+    
+    def add_file(self, file_id: str, kind: str) -> None:
+        """Make a file downloadable (kind: "photo" or "voice")."""
+        if file_id not in self._files:
+            self._files[file_id] = _jpeg_bytes() if kind == "photo" else _ogg_bytes()
+    
+    def file_size(self, file_id: str) -> int:
+        return len(self._files.get(file_id, b""))
+    
+    @property
+    def pending(self) -> int:
+        return len(self._updates)
+    
+    # =========================================
+    # Bot API
+    # =========================================
+    
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self._handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self._handle_file)
+        return app
+    
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = dict(request.query)
+        if request.can_read_body:
+            form = await request.post()
+            for key, value in form.items():
+                params[key] = value if isinstance(value, str) else "<file>"
+        return params
+    
+    async def _handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method] += 1
+        
+        if method == "getUpdates":
+            return self._ok(await self._get_updates(params))
+        
+        if method not in UNTHROTTLED_METHODS:
+            delay = self.latency_ms + random.random() * self.jitter_ms
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            if self.rate_429 and random.random() < self.rate_429:
+                self.throttled[method] += 1
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }, status=429)
+        
+        if method in REPLY_METHODS:
+            self._record_reply(params)
+        return self._ok(self._result(method, params))
+    
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), min(timeout, 1.0))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+    
+    def _record_reply(self, params: Dict[str, Any]) -> None:
+        try:
+            chat_id = int(params.get("chat_id") or 0)
+        except ValueError:
+            return
+        update_id = self._last_update_of_chat.get(chat_id)
+        if update_id is not None and update_id not in self.first_reply_at:
+            self.first_reply_at[update_id] = time.monotonic()
+    
+    def _result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            return BOT_USER
+        if method == "getChatMember":
+            return {"status": "member", "user": {"id": int(params.get("user_id") or 0), "is_bot": False, "first_name": "User"}}
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            return {
+                "file_id": file_id,
+                "file_unique_id": f"u-{file_id}",
+                "file_size": self.file_size(file_id),
+                "file_path": f"files/{file_id}",
+            }
+        if method == "sendMediaGroup":
+            media = json.loads(params.get("media") or "[]")
+            return [self._message(params, {"photo": self._photo_sizes()}) for _ in media]
+        if method in MESSAGE_METHODS:
+            if params.get("inline_message_id"):
+                return True
+            return self._message(params, self._media(method))
+        return True
+    
+    def _message(self, params: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = int(params.get("chat_id") or 0)
+        message_id = params.get("message_id")
+        if message_id is None:
+            self._next_message_id[chat_id] += 1
+            message_id = self._next_message_id[chat_id]
+        message = {
+            "message_id": int(message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+            **extra,
+        }
+        if params.get("text"):
+            message["text"] = params["text"]
+        if params.get("caption"):
+            message["caption"] = params["caption"]
+        return message
+    
+    def _photo_sizes(self) -> List[Dict[str, Any]]:
+        return [{"file_id": "sent-photo", "file_unique_id": "u-sent-photo", "width": 320, "height": 240}]
+    
+    def _media(self, method: str) -> Dict[str, Any]:
+        file = {"file_id": f"sent-{method}", "file_unique_id": f"u-sent-{method}"}
+        if method == "sendPhoto":
+            return {"photo": self._photo_sizes()}
+        if method == "sendVideo":
+            return {"video": {**file, "width": 1280, "height": 720, "duration": 4}}
+        if method == "sendVoice":
+            return {"voice": {**file, "duration": 3}}
+        if method == "sendAudio":
+            return {"audio": {**file, "duration": 3}}
+        if method == "sendDocument":
+            return {"document": file}
+        if method == "sendAnimation":
+            return {"animation": {**file, "width": 320, "height": 240, "duration": 2}}
+        return {}
+    
+    async def _handle_file(self, request: web.Request) -> web.Response:
+        self.calls["<file download>"] += 1
+        file_id = request.match_info["path"].rsplit("/", 1)[-1]
+        content = self._files.get(file_id)
+        if content is None:
+            return web.Response(status=404)
+        return web.Response(body=content)
+    
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
@@ -0,0 +1,150 @@
+"""
+Synthetic Telegram traffic.
+Builds raw update payloads (as getUpdates returns them) for a population
+of fake users: commands, free-text questions, photos, voice messages,
+inline queries and group chatter, picked by a weighted mix.
+"""
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from loadtest.fake_telegram import BOT_USER
+
+DEFAULT_MIX = {
+    "text": 50,
+    "start": 5,
+    "limits": 5,
+    "photo": 10,
+    "voice": 10,
+    "inline": 10,
+    "group": 10,
+}
+
+TEXT_PROMPTS = [
+    "Привет! Как дела?",
+    "Объясни простыми словами, что такое квантовая запутанность",
+    "Напиши функцию на Python, которая проверяет, является ли строка палиндромом",
+    "Какая погода сегодня в Москве?",
+    "Какие новости сегодня в мире технологий?",
+    "Переведи на английский: я опоздаю на встречу на десять минут",
+    "Составь план тренировок на неделю для начинающего",
+    "Придумай название для кофейни у моря",
+    "What is the difference between a process and a thread?",
+    "Give me three ideas for a weekend trip near Berlin",
+    "Сколько стоит биткоин прямо сейчас?",
+    "Нарисуй кота в космическом скафандре",
+    "Напомни завтра в 9 утра позвонить в банк",
+    "Сделай краткое резюме книги «Мастер и Маргарита»",
+]
+
+INLINE_QUERIES = [
+    "как сварить борщ",
+    "translate good morning to spanish",
+    "столица австралии",
+    "шутка про программистов",
+    "what is 17% of 240",
+]
+
+GROUP_CHATTER = [
+    "всем привет",
+    "кто идёт сегодня на встречу?",
+    "ок, договорились",
+    "смотрите какая новость",
+    "😂😂😂",
+    "скиньте ссылку плиз",
+    "я буду через 15 минут",
+]
+
+PHOTO_CAPTIONS = [None, "Что на этом фото?", "Опиши картинку", "Сделай фон ярче"]
+
+# Supergroups the group scenario posts to
+GROUP_CHAT_IDS = [-1001000000001, -1001000000002, -1001000000003]
+
+
+class SyntheticUser:
+    """One fake Telegram user with its own private chat."""
+    
+    def __init__(self, user_id: int, rng: random.Random):
+        self.user_id = user_id
+        self.rng = rng
+        self.language_code = rng.choice(["ru", "ru", "ru", "en"])
+        self._message_id = 0
+        self.started = False
+    
+    @property
+    def profile(self) -> Dict[str, Any]:
+        return {
+            "id": self.user_id,
+            "is_bot": False,
+            "first_name": f"Load{self.user_id}",
+            "username": f"load_user_{self.user_id}",
+            "language_code": self.language_code,
+        }
+    
+    def _message(self, chat: Dict[str, Any], **content) -> Dict[str, Any]:
+        self._message_id += 1
+        return {
+            "message": {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": chat,
+                "from": self.profile,
+                **content,
+            }
+        }
+    
+    def _private(self, **content) -> Dict[str, Any]:
+        chat = {"id": self.user_id, "type": "private", "first_name": self.profile["first_name"]}
+        return self._message(chat, **content)
+    
+    def _command(self, command: str) -> Dict[str, Any]:
+        return self._private(text=command, entities=[{"type": "bot_command", "offset": 0, "length": len(command)}])
+    
+    def next_update(self, kind: str, seq: int) -> Tuple[str, Dict[str, Any], Optional[int], Optional[Tuple[str, str]]]:
+        """
+        (kind, update payload, chat id, file to serve) for one step of
+        ``kind``. The first step of every user is /start, as with real users.
+        """
+        rng = self.rng
+        if not self.started:
+            self.started = True
+            kind = "start"
+        
+        if kind == "start":
+            return kind, self._command("/start"), self.user_id, None
+        if kind == "limits":
+            return kind, self._command("/limits"), self.user_id, None
+        if kind == "photo":
+            file_id = f"photo-{self.user_id}-{seq}"
+            photo = [{"file_id": file_id, "file_unique_id": f"u-{file_id}", "width": 320, "height": 240, "file_size": 4096}]
+            caption = rng.choice(PHOTO_CAPTIONS)
+            content = {"photo": photo, **({"caption": caption} if caption else {})}
+            return kind, self._private(**content), self.user_id, (file_id, "photo")
+        if kind == "voice":
+            file_id = f"voice-{self.user_id}-{seq}"
+            voice = {"file_id": file_id, "file_unique_id": f"u-{file_id}", "duration": 3, "mime_type": "audio/ogg", "file_size": 4102}
+            return kind, self._private(voice=voice), self.user_id, (file_id, "voice")
+        if kind == "inline":
+            query = {"id": f"{self.user_id}{seq}", "from": self.profile, "query": rng.choice(INLINE_QUERIES), "offset": ""}
+            return kind, {"inline_query": query}, None, None
+        if kind == "group":
+            chat_id = rng.choice(GROUP_CHAT_IDS)
+            chat = {"id": chat_id, "type": "supergroup", "title": f"Load group {chat_id}"}
+            if rng.random() < 0.2:
+                text = f"@{BOT_USER['username']} {rng.choice(TEXT_PROMPTS)}"
+            else:
+                text = rng.choice(GROUP_CHATTER)
+            return kind, self._message(chat, text=text), chat_id, None
+        return "text", self._private(text=rng.choice(TEXT_PROMPTS)), self.user_id, None
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """``text=60,photo=20,voice=20`` -> weights; unknown kinds are rejected."""
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown scenario kind: {kind} (known: {', '.join(DEFAULT_MIX)})")
+        mix[kind] = int(weight or 1)
+    return mix
@@ -2,6 +2,7 @@
 Main entry point for the Telegram AI Bot.
 """
 import asyncio
+import signal
 import sys
 
 import structlog
@@ -11,8 +12,21 @@ from aiogram.types import BotCommand
 
 from bot.bot import bot, dp
 from bot.handlers import setup_routers
-from bot.middlewares import AuthMiddleware, LoggingMiddleware, ThrottlingMiddleware
-from database import init_db, close_db
+from bot.middlewares import (
+    AuthMiddleware,
+    GroupFilterMiddleware,
+    LaneMiddleware,
+    LoggingMiddleware,
+    RequestMetricsMiddleware,
+    ThrottlingMiddleware,
+)
+from bot.services.intent_service import intent_classifier
+from bot.services.loop_monitor import loop_monitor
+from bot.services.telemetry_service import telemetry_sink
+from bot.services.update_stream import update_stream
+from bot.utils.metrics import instrument_engine, metrics_exporter
+from bot.utils.tracing import trace_engine, tracer
+from database import init_db, close_db, engine
 from database.redis_client import redis_client
 from config import settings
 
@@ -20,6 +34,7 @@ from config import settings
 # Configure structlog
 structlog.configure(
     processors=[
+        structlog.contextvars.merge_contextvars,
         structlog.stdlib.filter_by_level,
         structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
@@ -38,6 +53,12 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
+# Group chatter not addressed to the bot is dropped before anything else
+group_filter = GroupFilterMiddleware()
+
+# Per-chat ordering and global concurrency cap for all updates
+update_lanes = LaneMiddleware()
+
 
 async def set_bot_commands(bot: Bot):
     """Set bot commands for menu."""
@@ -68,6 +89,12 @@ async def on_startup():
     await redis_client.connect()
     logger.info("Redis connected")
     
+    # Opt-in blocking-call detector
+    loop_monitor.start("bot")
+    
+    # Per-lane stats for the admin API
+    update_lanes.start()
+    
     # Cache bot info at startup (avoid calling bot.get_me() on every message)
     bot_info = await bot.get_me()
     dp["bot_info"] = bot_info
@@ -77,6 +104,20 @@ async def on_startup():
         bot_username=bot_info.username,
     )
     
+    # Start background writer for usage/request logs
+    telemetry_sink.start()
+    
+    # Prometheus exporter, loop lag probe and per-update DB statement counts
+    instrument_engine(engine)
+    metrics_exporter.start(settings.bot_metrics_port)
+    
+    # Request tracing (opt-in): DB statement spans and the span exporter
+    trace_engine(engine)
+    tracer.start("bot")
+    
+    # Load local intent classifier once
+    intent_classifier.load()
+    
     # Set bot commands
     await set_bot_commands(bot)
     
@@ -87,6 +128,13 @@ async def on_shutdown():
     """Shutdown hook."""
     logger.info("Shutting down bot...")
     
+    # Flush queued usage/request logs while the DB is still available
+    await telemetry_sink.stop()
+    await metrics_exporter.stop()
+    await loop_monitor.stop()
+    await update_lanes.stop()
+    await tracer.stop()
+    
     # Close Redis
     await redis_client.close()
     logger.info("Redis disconnected")
@@ -105,6 +153,10 @@ async def main():
     dp.shutdown.register(on_shutdown)
     
     # Setup middlewares
+    bot.session.middleware(RequestMetricsMiddleware())
+    dp.update.outer_middleware(group_filter)
+    dp.update.outer_middleware(update_lanes)
+    
     dp.message.middleware(LoggingMiddleware())
     dp.message.middleware(ThrottlingMiddleware())
     dp.message.middleware(AuthMiddleware())
@@ -119,6 +171,10 @@ async def main():
     router = setup_routers()
     dp.include_router(router)
     
+    if settings.bot_mode == "webhook":
+        await run_stream_consumer()
+        return
+    
     # Start polling
     logger.info("Starting polling...")
     
@@ -133,6 +189,41 @@ async def main():
         raise
 
 
+async def run_stream_consumer():
+    """
+    Webhook mode: updates arrive through run_webhook.py and the Redis
+    update stream, so any number of these processes can run side by side.
+    """
+    logger.info("Starting update stream consumer...")
+    await dp.emit_startup(bot=bot)
+    
+    if settings.webhook_url:
+        await bot.set_webhook(
+            url=settings.webhook_url.rstrip("/") + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=False
+        )
+        logger.info("Webhook registered", url=settings.webhook_url)
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows
+    
+    async def handle(update: dict) -> None:
+        await dp.feed_raw_update(bot, update)
+    
+    try:
+        await update_stream.run(handle, stop)
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+
+
 if __name__ == "__main__":
     try:
         asyncio.run(main())
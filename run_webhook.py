@@ -0,0 +1,16 @@
+"""
+Run the Telegram webhook receiver (BOT_MODE=webhook).
+"""
+from aiohttp import web
+
+from bot.webhook import create_app
+from config import settings
+
+
+if __name__ == "__main__":
+    web.run_app(
+        create_app(),
+        host=settings.webhook_host,
+        port=settings.webhook_port,
+        access_log=None
+    )
@@ -0,0 +1,59 @@
+"""
+Run the micro-benchmarks in tests/bench against the stored baseline.
+
+Benchmarks live in ``bench_*.py`` files so a plain ``pytest tests/``
+never collects them. Baselines are saved per machine type (OS, Python
+version) in tests/bench/baselines; record one on the reference machine
+and commit it. Without a baseline for the current machine the run only
+reports timings.
+
+Usage:
+    python scripts/bench.py                  # compare with the latest baseline
+    python scripts/bench.py --threshold 10   # fail if a median is >10% slower
+    python scripts/bench.py --save           # record a new baseline
+    python scripts/bench.py -- -k xlsx       # extra pytest arguments
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import pytest
+from pytest_benchmark.utils import get_machine_id
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = ROOT / "tests" / "bench"
+BASELINES = BENCH_DIR / "baselines"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="Save this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=15, help="Allowed median regression, percent")
+    parser.add_argument("pytest_args", nargs="*", help="Passed to pytest after --")
+    args = parser.parse_args()
+    
+    pytest_args = [
+        str(BENCH_DIR),
+        "-o", "python_files=bench_*.py",
+        "--benchmark-only",
+        f"--benchmark-storage=file://{BASELINES}",
+        "--benchmark-sort=name",
+        "--benchmark-columns=min,median,mean,stddev,rounds",
+    ]
+    if args.save:
+        pytest_args.append("--benchmark-save=baseline")
+    elif any((BASELINES / get_machine_id()).glob("*.json")):
+        pytest_args += ["--benchmark-compare", f"--benchmark-compare-fail=median:{args.threshold:g}%"]
+    else:
+        print(
+            f"No baseline for {get_machine_id()} in {BASELINES.relative_to(ROOT)}; "
+            "running without comparison. Record one with: python scripts/bench.py --save",
+            file=sys.stderr
+        )
+    
+    sys.path.insert(0, str(ROOT))
+    sys.exit(pytest.main(pytest_args + args.pytest_args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Offline evaluation of the local intent classifier.
+
+Reports accuracy, per-label precision/recall, the confusion matrix and
+how many messages would still go to the LLM at a given confidence
+threshold (coverage), plus accuracy on the confident part only.
+
+Usage:
+    python scripts/eval_intent_model.py
+    python scripts/eval_intent_model.py --threshold 0.8 --all
+"""
+import argparse
+import sys
+from collections import Counter, defaultdict
+sys.path.insert(0, '.')
+
+from bot.services.intent_service import IntentClassifier, DEFAULT_MODEL_PATH
+from scripts.train_intent_model import DEFAULT_DATASET, is_holdout, load_dataset
+
+
+def evaluate(classifier, rows, threshold):
+    by_task = defaultdict(list)
+    for row in rows:
+        by_task[row["task"]].append(row)
+    
+    for task, task_rows in sorted(by_task.items()):
+        confusion = Counter()
+        confident = confident_correct = correct = 0
+        
+        for row in task_rows:
+            result = classifier.classify(row["text"], task)
+            predicted = result["label"]
+            confusion[(row["label"], predicted)] += 1
+            correct += predicted == row["label"]
+            if result["confidence"] >= threshold:
+                confident += 1
+                confident_correct += predicted == row["label"]
+        
+        labels = sorted({gold for gold, _ in confusion} | {pred for _, pred in confusion if pred})
+        total = len(task_rows)
+        
+        print(f"\n=== {task} ({total} examples) ===")
+        print(f"accuracy:            {correct / total:.3f}")
+        print(f"coverage @ {threshold:.2f}:     {confident / total:.3f}  (LLM calls avoided)")
+        if confident:
+            print(f"accuracy when local: {confident_correct / confident:.3f}")
+        
+        print(f"\n{'label':<14}{'precision':>10}{'recall':>10}{'support':>9}")
+        for label in labels:
+            tp = confusion[(label, label)]
+            predicted = sum(n for (_, p), n in confusion.items() if p == label)
+            support = sum(n for (g, _), n in confusion.items() if g == label)
+            precision = tp / predicted if predicted else 0.0
+            recall = tp / support if support else 0.0
+            print(f"{label:<14}{precision:>10.3f}{recall:>10.3f}{support:>9}")
+        
+        print("\nconfusion (rows = gold, cols = predicted):")
+        print(" " * 14 + "".join(f"{label[:11]:>12}" for label in labels))
+        for gold in labels:
+            print(f"{gold:<14}" + "".join(f"{confusion[(gold, pred)]:>12}" for pred in labels))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--all", action="store_true", help="Evaluate on the whole set, not only held-out rows")
+    args = parser.parse_args()
+    
+    rows = load_dataset(args.dataset)
+    if not args.all:
+        rows = [r for r in rows if is_holdout(r["text"])]
+    
+    classifier = IntentClassifier(args.model)
+    classifier.load()
+    evaluate(classifier, rows, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
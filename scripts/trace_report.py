@@ -0,0 +1,96 @@
+"""
+Per-stage latency breakdown of slow traces from the JSONL span export.
+
+Groups spans by trace, keeps traces whose end-to-end time (first span
+start to last span end, across bot and worker) is above the threshold,
+and prints each one as an indented span tree with durations, plus the
+stages that took the most time over all slow traces.
+
+Usage:
+    python scripts/trace_report.py
+    python scripts/trace_report.py traces.jsonl --min-ms 5000 --limit 5
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+sys.path.insert(0, '.')
+
+
+def load_traces(path):
+    traces = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def trace_duration_ms(spans):
+    start = min(s["start_ns"] for s in spans)
+    end = max(s["start_ns"] + s["duration_ms"] * 1e6 for s in spans)
+    return (end - start) / 1e6
+
+
+def stage_name(span):
+    """Span name without ids, so statements and calls group together."""
+    if span["name"] == "db":
+        return f"db {span['attributes'].get('db.operation', '')}".strip()
+    return span["name"]
+
+
+def print_tree(spans):
+    children = defaultdict(list)
+    ids = {s["span_id"] for s in spans}
+    for span in sorted(spans, key=lambda s: s["start_ns"]):
+        parent = span["parent_id"] if span["parent_id"] in ids else None
+        children[parent].append(span)
+    
+    trace_start = min(s["start_ns"] for s in spans)
+    
+    def walk(parent, depth):
+        for span in children[parent]:
+            offset = (span["start_ns"] - trace_start) / 1e6
+            error = f"  ! {span['error']}" if span.get("error") else ""
+            print(f"  {offset:>10.1f}ms {'  ' * depth}{span['name']} [{span['service']}] {span['duration_ms']:.1f}ms{error}")
+            walk(span["span_id"], depth + 1)
+    
+    walk(None, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="traces.jsonl", help="JSONL span export")
+    parser.add_argument("--min-ms", type=float, default=2000, help="Only traces slower than this")
+    parser.add_argument("--limit", type=int, default=10, help="Slow traces to print in full")
+    args = parser.parse_args()
+    
+    traces = load_traces(args.path)
+    slow = sorted(
+        ((trace_duration_ms(spans), trace_id, spans) for trace_id, spans in traces.items()),
+        reverse=True
+    )
+    slow = [item for item in slow if item[0] >= args.min_ms]
+    print(f"{len(slow)} of {len(traces)} traces slower than {args.min_ms:.0f}ms")
+    
+    stages = defaultdict(lambda: [0, 0.0])
+    for _, _, spans in slow:
+        for span in spans:
+            stats = stages[stage_name(span)]
+            stats[0] += 1
+            stats[1] += span["duration_ms"]
+    
+    if stages:
+        print(f"\n{'stage':<48}{'count':>8}{'total ms':>14}{'avg ms':>12}")
+        for name, (count, total) in sorted(stages.items(), key=lambda item: item[1][1], reverse=True)[:20]:
+            print(f"{name[:47]:<48}{count:>8}{total:>14.1f}{total / count:>12.1f}")
+    
+    for duration, trace_id, spans in slow[:args.limit]:
+        print(f"\n=== {trace_id} {duration:.1f}ms ({len(spans)} spans) ===")
+        print_tree(spans)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Train the local intent classifier.
+
+Fits one softmax-regression head per task on the labeled set and writes
+the weights the bot loads at startup.
+
+Usage:
+    python scripts/train_intent_model.py
+    python scripts/train_intent_model.py --dataset bot/data/intent_dataset.jsonl --out bot/data/intent_model.json
+
+Rows whose text hashes into the held-out split are skipped, so
+scripts/eval_intent_model.py reports accuracy on unseen examples.
+"""
+import argparse
+import json
+import random
+import sys
+import zlib
+sys.path.insert(0, '.')
+
+from bot.services.intent_service import extract_features, softmax, DEFAULT_MODEL_PATH
+
+
+DEFAULT_DATASET = "bot/data/intent_dataset.jsonl"
+DIM = 4096
+EPOCHS = 40
+LEARNING_RATE = 0.5
+L2 = 1e-4
+
+# High-precision phrases that decide the label without the model
+KEYWORDS = {
+    "message": {
+        "PRESENTATION": [
+            "сделай презентацию", "создай презентацию", "сгенерируй презентацию",
+            "подготовь презентацию", "make a presentation", "create a presentation",
+            "generate a presentation", "slide deck",
+        ],
+    },
+    "photo": {
+        "EDIT": ["убери фон", "remove the background", "в стиле ", "in the style of"],
+        "ANALYZE": ["что на фото", "what is in this photo", "опиши фото", "describe this"],
+    },
+}
+
+LABELS = {
+    "message": ["TEXT", "IMAGE", "VIDEO", "PRESENTATION", "COMMAND"],
+    "photo": ["ANALYZE", "EDIT"],
+}
+
+
+def is_holdout(text: str) -> bool:
+    """Deterministic 20% held-out split shared with the eval harness."""
+    return zlib.crc32(text.encode("utf-8")) % 5 == 0
+
+
+def load_dataset(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def train_task(rows, labels):
+    """Plain SGD on cross-entropy with L2; returns (bias, sparse weights)."""
+    label_index = {label: i for i, label in enumerate(labels)}
+    samples = [(extract_features(r["text"], DIM), label_index[r["label"]]) for r in rows]
+    
+    bias = [0.0] * len(labels)
+    weights = {}
+    rng = random.Random(42)
+    
+    for epoch in range(EPOCHS):
+        rng.shuffle(samples)
+        lr = LEARNING_RATE / (1 + epoch * 0.1)
+        for features, target in samples:
+            scores = list(bias)
+            for idx, value in features.items():
+                row = weights.get(idx)
+                if row:
+                    for i, w in enumerate(row):
+                        scores[i] += w * value
+            probs = softmax(scores)
+            for i in range(len(labels)):
+                grad = probs[i] - (1.0 if i == target else 0.0)
+                bias[i] -= lr * grad
+                for idx, value in features.items():
+                    row = weights.setdefault(idx, [0.0] * len(labels))
+                    row[i] -= lr * (grad * value + L2 * row[i])
+    
+    return (
+        [round(b, 4) for b in bias],
+        {
+            str(idx): [round(w, 4) for w in row]
+            for idx, row in sorted(weights.items())
+            if any(abs(w) >= 1e-4 for w in row)
+        },
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+    
+    rows = load_dataset(args.dataset)
+    model = {"version": 1, "dim": DIM, "tasks": {}}
+    
+    for task, labels in LABELS.items():
+        train_rows = [r for r in rows if r["task"] == task and not is_holdout(r["text"])]
+        bias, weights = train_task(train_rows, labels)
+        model["tasks"][task] = {
+            "labels": labels,
+            "bias": bias,
+            "weights": weights,
+            "keywords": KEYWORDS.get(task, {}),
+        }
+        print(f"{task}: trained on {len(train_rows)} rows, {len(weights)} features")
+    
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(model, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Model written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmarks for document-to-text conversion (tables become markdown).
+Heavy parsers run a fixed number of rounds to keep the suite short.
+"""
+import pytest
+
+from bot.services.document_service import DocumentService
+
+
+@pytest.fixture(scope="module")
+def service():
+    return DocumentService()
+
+
+class TestSpreadsheets:
+    """Order tables with 5000 rows."""
+    
+    def test_xlsx_5000_rows(self, benchmark, service, run, xlsx_5000):
+        text, metadata, _ = benchmark.pedantic(
+            lambda: run(service._process_xlsx(xlsx_5000, "orders.xlsx", max_rows=5000)),
+            rounds=5,
+            iterations=1
+        )
+        assert metadata["total_rows"] > 5000
+        assert text.startswith("## Лист: Заказы")
+    
+    def test_csv_5000_rows(self, benchmark, service, run, csv_5000):
+        text, metadata, _ = benchmark(lambda: run(service._process_csv(csv_5000, "orders.csv")))
+        assert "|" in text
+
+
+class TestOfficeDocuments:
+    """Word report with 20 tables of 50 rows."""
+    
+    def test_docx_tables(self, benchmark, service, run, docx_tables):
+        text, metadata, _ = benchmark.pedantic(
+            lambda: run(service._process_docx(docx_tables, "report.docx")),
+            rounds=5,
+            iterations=1
+        )
+        assert metadata["tables"] == 20
+
+
+class TestPdf:
+    """50-page text PDF of invoice rows."""
+    
+    def test_pdf_50_pages(self, benchmark, service, run, pdf_50):
+        pytest.importorskip("pdfplumber")
+        text, metadata, images = benchmark.pedantic(
+            lambda: run(service._process_pdf(pdf_50, "statement.pdf", max_pages=50)),
+            rounds=3,
+            iterations=1
+        )
+        assert metadata["processed_pages"] == 50
+        assert not images
@@ -0,0 +1,52 @@
+"""
+Benchmarks for reply formatting that runs on every AI answer.
+"""
+import pytest
+
+from bot.utils.helpers import (
+    _markdown_to_docx_bytes,
+    convert_markdown_to_html,
+    split_text_for_telegram,
+)
+
+
+class TestMarkdownToHtml:
+    """convert_markdown_to_html on streamed and final answers."""
+    
+    def test_long_reply(self, benchmark, long_reply):
+        html = benchmark(convert_markdown_to_html, long_reply)
+        assert "<b>" in html
+    
+    def test_very_long_reply(self, benchmark, very_long_reply):
+        benchmark(convert_markdown_to_html, very_long_reply)
+    
+    def test_streaming_prefixes(self, benchmark, long_reply):
+        """Every streaming edit converts the answer so far."""
+        prefixes = [long_reply[:end] for end in range(200, len(long_reply), 200)]
+        
+        def convert_all():
+            for prefix in prefixes:
+                convert_markdown_to_html(prefix)
+        
+        benchmark(convert_all)
+
+
+class TestSplitText:
+    """split_text_for_telegram on answers longer than one message."""
+    
+    def test_very_long_reply(self, benchmark, very_long_reply):
+        chunks = benchmark(split_text_for_telegram, very_long_reply)
+        assert len(chunks) > 1
+    
+    def test_converted_html(self, benchmark, very_long_reply):
+        html = convert_markdown_to_html(very_long_reply)
+        benchmark(split_text_for_telegram, html)
+
+
+class TestMarkdownToDocx:
+    """_markdown_to_docx_bytes for the "download as Word" button."""
+    
+    def test_long_reply(self, benchmark, long_reply):
+        pytest.importorskip("docx")
+        data = benchmark(_markdown_to_docx_bytes, long_reply)
+        assert data[:2] == b"PK"
@@ -0,0 +1,53 @@
+"""
+Benchmarks for the keyword intent checks run on every text message.
+"""
+from bot.handlers.channel_comments import get_intent_and_prompt, is_bot_triggered
+from bot.handlers.text import _detect_intent, _should_search_web
+from bot.utils.triggers import VOICE_INTENTS
+
+BOT_USERNAME = "loadtest_bot"
+
+
+class TestPrivateChat:
+    """Checks in the private chat text handler, over a mixed message corpus."""
+    
+    def test_detect_intent(self, benchmark, private_messages):
+        def detect_all():
+            return [_detect_intent(text) for text in private_messages]
+        
+        results = benchmark(detect_all)
+        assert any(result and result["type"] == "IMAGE" for result in results)
+    
+    def test_should_search_web(self, benchmark, private_messages):
+        def check_all():
+            return [_should_search_web(text) for text in private_messages]
+        
+        results = benchmark(check_all)
+        assert any(results) and not all(results)
+    
+    def test_voice_keyword_intent(self, benchmark, private_messages):
+        def match_all():
+            return [VOICE_INTENTS.match(text) for text in private_messages]
+        
+        results = benchmark(match_all)
+        assert any(result and result["type"] == "COMMAND" for result in results)
+
+
+class TestGroupChat:
+    """Trigger and intent checks in groups, where most messages are not for the bot."""
+    
+    def test_is_bot_triggered(self, benchmark, group_messages):
+        def check_all():
+            return [is_bot_triggered(text, BOT_USERNAME) for text in group_messages]
+        
+        results = benchmark(check_all)
+        assert any(results) and not all(results)
+    
+    def test_get_intent_and_prompt(self, benchmark, group_messages):
+        triggered = [text for text in group_messages if is_bot_triggered(text, BOT_USERNAME)]
+        
+        def classify_all():
+            return [get_intent_and_prompt(text, BOT_USERNAME) for text in triggered]
+        
+        results = benchmark(classify_all)
+        assert {"image", "text"} <= {intent for intent, _ in results}
@@ -0,0 +1,201 @@
+"""
+Benchmark corpora.
+Text corpora live in ``corpora/``; office documents and PDFs are built
+once per session from fixed seeds, so every run parses identical bytes.
+"""
+import asyncio
+import csv
+import io
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List
+
+import pytest
+
+CORPORA = Path(__file__).parent / "corpora"
+
+PRODUCTS = [
+    "Ноутбук Lenovo IdeaPad 5", "Смартфон Xiaomi Redmi Note 13", "Наушники Sony WH-1000XM5",
+    "Кофемашина De'Longhi Magnifica", "Пылесос Dyson V15", "Монитор Samsung Odyssey G5",
+    "Клавиатура Logitech MX Keys", "Электросамокат Ninebot Max", "Чайник Bork K810",
+    "Фитнес-браслет Huawei Band 9", "Планшет Apple iPad Air", "Роутер Keenetic Giga",
+]
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург", "Нижний Новгород", "Самара"]
+STATUSES = ["новый", "оплачен", "собран", "в доставке", "доставлен", "возврат"]
+
+
+def _order_rows(count: int, seed: int = 0) -> List[list]:
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        quantity = rng.randint(1, 5)
+        price = round(rng.uniform(990, 149990), 2)
+        rows.append([
+            f"ЗК-{100000 + i}",
+            (start + timedelta(days=rng.randint(0, 364))).isoformat(),
+            rng.choice(PRODUCTS),
+            quantity,
+            price,
+            round(quantity * price, 2),
+            rng.choice(CITIES),
+            rng.choice(STATUSES),
+        ])
+    return rows
+
+
+ORDER_HEADER = ["Номер", "Дата", "Товар", "Кол-во", "Цена", "Сумма", "Город", "Статус"]
+
+
+def build_xlsx(rows: int) -> bytes:
+    from openpyxl import Workbook
+    
+    wb = Workbook()
+    sheet = wb.active
+    sheet.title = "Заказы"
+    sheet.append(ORDER_HEADER)
+    for row in _order_rows(rows):
+        sheet.append(row)
+    
+    summary = wb.create_sheet("Итоги")
+    summary.append(["Город", "Заказов"])
+    for city in CITIES:
+        summary.append([city, None])
+    
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def build_csv(rows: int) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_HEADER)
+    writer.writerows(_order_rows(rows))
+    return buffer.getvalue().encode("utf-8")
+
+
+def build_docx(tables: int, rows: int) -> bytes:
+    from docx import Document
+    
+    doc = Document()
+    doc.add_heading("Отчёт о продажах", level=1)
+    order_rows = _order_rows(tables * rows)
+    for t in range(tables):
+        doc.add_heading(f"Раздел {t + 1}", level=2)
+        doc.add_paragraph(
+            "Ниже приведены заказы за период с разбивкой по городам и статусам. "
+            "Суммы указаны в рублях с учётом скидок и без стоимости доставки."
+        )
+        table = doc.add_table(rows=1, cols=len(ORDER_HEADER))
+        for cell, title in zip(table.rows[0].cells, ORDER_HEADER):
+            cell.text = title
+        for row in order_rows[t * rows:(t + 1) * rows]:
+            cells = table.add_row().cells
+            for cell, value in zip(cells, row):
+                cell.text = str(value)
+    
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages: int, lines_per_page: int = 60) -> bytes:
+    """
+    Text PDF of invoice-like table rows, written directly (standard
+    Helvetica font, so ASCII only) to avoid a PDF library dependency.
+    """
+    rng = random.Random(1)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for p in range(pages):
+        lines = [f"Statement page {p + 1} of {pages}", "Invoice   Date        Item                  Qty   Price      Total"]
+        for i in range(lines_per_page):
+            quantity, price = rng.randint(1, 9), rng.uniform(10, 5000)
+            lines.append(
+                f"INV-{p * lines_per_page + i:06d}  2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}  "
+                f"{rng.choice(['Widget A', 'Gadget Pro', 'Cable 2m', 'Adapter USB-C', 'Dock Station']):<20}  "
+                f"{quantity:>3}  {price:>9.2f}  {quantity * price:>10.2f}"
+            )
+        content = "BT /F1 9 Tf 11 TL 40 800 Td\n" + "".join(f"({_pdf_escape(line)}) '\n" for line in lines) + "ET"
+        objects.append(f"<< /Length {len(content.encode('latin-1'))} >>\nstream\n{content}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+    
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+@pytest.fixture(scope="session")
+def long_reply() -> str:
+    """A long Cyrillic AI answer with headers, lists, code, a table and links."""
+    return (CORPORA / "long_reply_ru.md").read_text(encoding="utf-8")
+
+
+@pytest.fixture(scope="session")
+def very_long_reply(long_reply) -> str:
+    """About 50 KB: a document summary that has to be split into many messages."""
+    return "\n\n".join([long_reply] * 6)
+
+
+@pytest.fixture(scope="session")
+def private_messages() -> List[str]:
+    return (CORPORA / "private_messages.txt").read_text(encoding="utf-8").splitlines()
+
+
+@pytest.fixture(scope="session")
+def group_messages() -> List[str]:
+    return (CORPORA / "group_messages.txt").read_text(encoding="utf-8").splitlines()
+
+
+@pytest.fixture(scope="session")
+def xlsx_5000() -> bytes:
+    pytest.importorskip("openpyxl")
+    return build_xlsx(5000)
+
+
+@pytest.fixture(scope="session")
+def csv_5000() -> bytes:
+    return build_csv(5000)
+
+
+@pytest.fixture(scope="session")
+def docx_tables() -> bytes:
+    pytest.importorskip("docx")
+    return build_docx(tables=20, rows=50)
+
+
+@pytest.fixture(scope="session")
+def pdf_50() -> bytes:
+    return build_pdf(50)
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine to completion on a loop kept for the whole session."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
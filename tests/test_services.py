@@ -203,3 +203,942 @@ class TestOpenAIService:
         )
         
         assert text == "Transcribed text"
+
+
+class TestMediaGroupCollector:
+    """Tests for MediaGroupCollector."""
+    
+    def test_debounce_shrinks_as_album_fills(self):
+        """Test adaptive debounce window."""
+        from bot.services.media_group_service import MediaGroupCollector
+        
+        collector = MediaGroupCollector()
+        
+        first = collector.get_debounce(1)
+        middle = collector.get_debounce(5)
+        
+        assert first > middle > 0
+        # Telegram albums never exceed 10 items - flush immediately
+        assert collector.get_debounce(10) == 0.0
+    
+    @pytest.mark.asyncio
+    async def test_item_arriving_after_flush_is_still_handled(self):
+        """Test a late album item starting a new list under the same key gets its own flush."""
+        from aiogram.types import Message
+        from bot.services import media_group_service as module
+        
+        def item(message_id):
+            return Message.model_validate({
+                "message_id": message_id, "date": 0, "media_group_id": "album",
+                "chat": {"id": 1, "type": "private"}, "caption": str(message_id),
+            }).model_dump_json(exclude_none=True)
+        
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(side_effect=[([item(1), item(2)], 1), ([item(3)], 1)])
+        handler = AsyncMock()
+        
+        collector = module.MediaGroupCollector()
+        with patch.object(module, "redis_client") as redis_mock, \
+                patch.object(collector, "get_debounce", return_value=0):
+            redis_mock.client.llen = AsyncMock(side_effect=[2, 1])
+            redis_mock.client.pipeline.return_value = pipe
+            await collector._flush_later("media_group:photo:album", 2, MagicMock(), handler)
+            await collector._flush_later("media_group:photo:album", 1, MagicMock(), handler)
+        
+        batches = [[m.message_id for m in call.args[0]] for call in handler.await_args_list]
+        assert batches == [[1, 2], [3]]
+
+
+class TestImageService:
+    """Tests for ImageService."""
+    
+    def test_large_photo_is_downscaled(self):
+        """Test normalization fits the photo profile pixel budget."""
+        import io
+        from PIL import Image
+        from bot.services.image_service import ImageService, guess_image_mime
+        
+        buffer = io.BytesIO()
+        Image.new("RGB", (4000, 3000), (200, 100, 50)).save(buffer, format="PNG")
+        
+        service = ImageService()
+        result, info = service._normalize_sync(buffer.getvalue(), "photo")
+        
+        with Image.open(io.BytesIO(result)) as img:
+            assert max(img.size) <= 2048
+            assert img.size[0] * img.size[1] <= ImageService.PROFILES["photo"]["max_pixels"]
+        assert guess_image_mime(result) == "image/jpeg"
+
+
+class TestTranscriptionService:
+    """Tests for TranscriptionService."""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_call(self):
+        """Test in-flight deduplication for the same file."""
+        import asyncio
+        from bot.services.transcription_service import TranscriptionService
+        
+        service = TranscriptionService()
+        calls = 0
+        
+        async def fake_call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "Hello", {"model": "whisper-1", "cost_usd": 0.01}
+        
+        with patch.object(service, "get_cached", AsyncMock(return_value=None)), \
+             patch.object(service, "_store", AsyncMock()):
+            results = await asyncio.gather(
+                service.transcribe("uniq1", "ru", fake_call),
+                service.transcribe("uniq1", "ru", fake_call),
+            )
+        
+        assert calls == 1
+        assert [text for text, _ in results] == ["Hello", "Hello"]
+        assert results[1][1]["cached"] is True
+
+
+class TestAudioService:
+    """Tests for audio splitting helpers."""
+    
+    def test_cuts_snap_to_nearby_silence(self):
+        """Test segment planning prefers silences over hard cuts."""
+        from bot.services.audio_service import plan_segments, format_timestamp
+        
+        # One hour, a pause near the first 5-minute mark only
+        cuts = plan_segments(3600, [(290.0, 292.0)], target=300, window=60)
+        
+        assert cuts[0] == 291.0
+        assert cuts[1] == 591.0  # no silence nearby - hard cut
+        assert all(b > a for a, b in zip(cuts, cuts[1:]))
+        assert 3600 - cuts[-1] <= 360
+        assert format_timestamp(3725) == "01:02:05"
+    
+    def test_short_audio_is_not_split(self):
+        """Test audio shorter than target + window stays whole."""
+        from bot.services.audio_service import plan_segments
+        
+        assert plan_segments(320, [], target=300, window=60) == []
+
+
+class TestIntentClassifier:
+    """Tests for the local intent classifier."""
+    
+    def test_shipped_model_classifies_clear_cases(self):
+        """Test keyword stage and linear model on unambiguous inputs."""
+        from bot.services.intent_service import IntentClassifier
+        
+        classifier = IntentClassifier()
+        classifier.load()
+        
+        keyword = classifier.classify("Сделай презентацию про историю Рима", "message")
+        assert keyword["label"] == "PRESENTATION"
+        assert keyword["source"] == "keyword"
+        
+        model = classifier.classify("переведи текст на фото", "photo")
+        assert model["label"] == "ANALYZE"
+        assert model["source"] == "model"
+        assert 0.5 < model["confidence"] <= 1.0
+    
+    def test_empty_text_has_no_label(self):
+        """Test empty input is never confident."""
+        from bot.services.intent_service import IntentClassifier
+        
+        classifier = IntentClassifier()
+        result = classifier.classify("   ", "message")
+        
+        assert result["label"] is None
+        assert classifier.is_confident(result, threshold=0.0) is False
+
+
+class TestTelemetrySink:
+    """Tests for TelemetrySink."""
+    
+    @pytest.mark.asyncio
+    async def test_rows_are_batched_and_flushed_on_stop(self):
+        """Test queued rows are written in one batch on shutdown."""
+        from bot.services.telemetry_service import TelemetrySink, KIND_API_USAGE
+        
+        sink = TelemetrySink()
+        
+        with patch.object(sink, "_write", AsyncMock()) as write:
+            sink.start()
+            for i in range(3):
+                assert sink.enqueue(KIND_API_USAGE, {"provider": "cometapi", "model": f"m{i}"})
+            await sink.stop()
+        
+        written = [row for call in write.await_args_list for row in call.args[0]]
+        assert len(written) == 3
+        assert all("created_at" in row for _, row in written)
+        assert sink.is_running is False
+    
+    def test_enqueue_without_running_sink_is_rejected(self):
+        """Test callers fall back to direct writes when the sink is off."""
+        from bot.services.telemetry_service import TelemetrySink, KIND_REQUEST
+        
+        sink = TelemetrySink()
+        
+        assert sink.enqueue(KIND_REQUEST, {"telegram_id": 1}) is False
+
+
+class TestHyperLogLog:
+    """Tests for the HyperLogLog sketch used by usage rollups."""
+    
+    def test_count_is_close_to_distinct_values(self):
+        """Test estimate stays within a few percent and ignores duplicates."""
+        from bot.utils.hyperloglog import HyperLogLog
+        
+        sketch = HyperLogLog()
+        sketch.update(range(10000))
+        sketch.update(range(5000))
+        
+        assert abs(sketch.count() - 10000) < 10000 * 0.06
+    
+    def test_merge_matches_union_and_roundtrips(self):
+        """Test merged daily sketches count the union of users."""
+        from bot.utils.hyperloglog import HyperLogLog
+        
+        monday, tuesday = HyperLogLog(), HyperLogLog()
+        monday.update(range(0, 300))
+        tuesday.update(range(200, 500))
+        
+        merged = HyperLogLog.from_bytes(monday.to_bytes())
+        merged.merge(tuesday)
+        
+        assert abs(merged.count() - 500) < 25
+
+
+class TestRollupService:
+    """Tests for incremental usage rollup batches."""
+    
+    @staticmethod
+    def _session(watermark, first_id, hi_id):
+        results = [MagicMock() for _ in range(4)]
+        results[1].scalar_one.return_value = watermark
+        results[2].scalar.return_value = first_id
+        results[3].scalar.return_value = hi_id
+        
+        session = MagicMock()
+        session.execute = AsyncMock(side_effect=results)
+        session.commit = AsyncMock()
+        session.rollback = AsyncMock()
+        session.__aenter__ = AsyncMock(return_value=session)
+        session.__aexit__ = AsyncMock(return_value=False)
+        return session
+    
+    @pytest.mark.asyncio
+    async def test_batch_jumps_id_gap_wider_than_a_batch(self):
+        """Test the window starts at the next pending id, so a gap does not stall the rollup."""
+        from bot.services import rollup_service as module
+        
+        watermark = MagicMock(last_id=100)
+        session = self._session(watermark, first_id=900_000, hi_id=900_050)
+        step = AsyncMock(return_value=51)
+        
+        with patch.object(module, "async_session_maker", MagicMock(return_value=session)):
+            rows = await module.RollupService()._run_batch(module.SOURCE_REQUESTS, step)
+        
+        assert rows == 51
+        step.assert_awaited_once_with(session, 100, 900_050)
+        assert watermark.last_id == 900_050
+        session.commit.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_batch_waits_for_fresh_rows(self):
+        """Test nothing is folded while the next pending row is inside the lag window."""
+        from bot.services import rollup_service as module
+        
+        watermark = MagicMock(last_id=100)
+        session = self._session(watermark, first_id=101, hi_id=None)
+        step = AsyncMock()
+        
+        with patch.object(module, "async_session_maker", MagicMock(return_value=session)):
+            rows = await module.RollupService()._run_batch(module.SOURCE_REQUESTS, step)
+        
+        assert rows == 0
+        step.assert_not_awaited()
+        assert watermark.last_id == 100
+
+
+class TestPartitions:
+    """Tests for monthly log partition helpers."""
+    
+    def test_month_arithmetic_wraps_years(self):
+        """Test partition months roll over December correctly."""
+        from database.partitions import add_months
+        
+        assert add_months(date(2026, 11, 15), 2) == date(2027, 1, 1)
+        assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    
+    def test_partition_name_roundtrip_and_bounds(self):
+        """Test names parse back to their month and bounds are UTC months."""
+        from database.partitions import partition_name, partition_month, partition_ddl
+        
+        name = partition_name("requests", date(2026, 12, 1))
+        
+        assert name == "requests_p2026_12"
+        assert partition_month(name) == date(2026, 12, 1)
+        assert partition_month("requests_default") is None
+        assert "FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')" in partition_ddl("requests", date(2026, 12, 1))
+    
+    @pytest.mark.asyncio
+    async def test_rows_in_default_partition_are_moved_before_attach(self):
+        """Test a month with stray rows in the DEFAULT partition is filled and attached."""
+        from database.partitions import _create_partition
+        
+        stray, moved = MagicMock(), MagicMock(rowcount=3)
+        stray.scalar.return_value = 1
+        conn = MagicMock()
+        conn.execute = AsyncMock(side_effect=[stray, MagicMock(), moved, MagicMock()])
+        
+        assert await _create_partition(conn, "requests", date(2026, 12, 1), has_default=True) == 3
+        
+        statements = [str(call.args[0]) for call in conn.execute.await_args_list]
+        assert statements[1].startswith("CREATE TABLE requests_p2026_12 (LIKE requests")
+        assert "DELETE FROM requests_default" in statements[2]
+        assert statements[3].startswith("ALTER TABLE requests ATTACH PARTITION requests_p2026_12 FOR VALUES")
+    
+    @pytest.mark.asyncio
+    async def test_retention_exports_before_detaching_and_keeps_on_failure(self):
+        """Test the export runs before DETACH, and a failed export leaves the partition."""
+        from contextlib import asynccontextmanager
+        from database import partitions
+        
+        calls = []
+        conn = MagicMock()
+        conn.execute = AsyncMock(side_effect=lambda stmt, *a: calls.append(str(stmt)))
+        
+        @asynccontextmanager
+        async def _conn():
+            yield conn
+        
+        engine = MagicMock(connect=_conn, begin=_conn)
+        async def _archive(conn, name):
+            calls.append(f"export {name}")
+            if name == "requests_p2020_01":
+                raise OSError("disk full")
+            return f"/archive/{name}.csv.gz"
+        
+        archive = AsyncMock(side_effect=_archive)
+        
+        with patch.object(partitions, "engine", engine), \
+                patch.object(partitions, "PARTITIONED_TABLES", ("requests",)), \
+                patch.object(partitions, "is_partitioned", AsyncMock(return_value=True)), \
+                patch.object(partitions, "list_partitions", AsyncMock(
+                    return_value=["requests_default", "requests_p2020_01", "requests_p2020_02"]
+                )), \
+                patch.object(partitions, "_archive_partition", archive), \
+                patch.object(partitions.settings, "partition_archive_enabled", True):
+            dropped = await partitions.apply_retention(retention_months=1)
+        
+        assert dropped == [("requests_p2020_02", "/archive/requests_p2020_02.csv.gz")]
+        assert calls == [
+            "export requests_p2020_01",
+            "export requests_p2020_02",
+            "ALTER TABLE requests DETACH PARTITION requests_p2020_02",
+            "DROP TABLE requests_p2020_02",
+        ]
+
+
+class TestResponseCache:
+    """Tests for the admin API response cache."""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_polls_compute_once(self):
+        """Test N simultaneous dashboard polls run the endpoint once."""
+        import asyncio
+        from api.services.response_cache import ResponseCache
+        
+        store = {}
+        client = MagicMock()
+        client.get = AsyncMock(side_effect=lambda key: store.get(key))
+        client.set = AsyncMock(side_effect=lambda key, value, nx=False, ex=None: store.setdefault(key, value) == value)
+        client.setex = AsyncMock(side_effect=lambda key, ttl, value: store.__setitem__(key, value))
+        client.delete = AsyncMock(side_effect=lambda key: store.pop(key, None))
+        
+        cache = ResponseCache()
+        calls = 0
+        
+        @cache.cached("dashboard")
+        async def endpoint(days: int = 30, current_admin=None):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"days": days}
+        
+        with patch("api.services.response_cache.redis_client") as redis_mock:
+            redis_mock.client = client
+            redis_mock.get_cache_generation = AsyncMock(return_value=0)
+            results = await asyncio.gather(*(endpoint(days=7, current_admin=i) for i in range(5)))
+            cached = await endpoint(days=7, current_admin="other admin")
+        
+        assert calls == 1
+        assert all(r == {"days": 7} for r in results)
+        assert cached == {"days": 7}
+
+
+class TestCursorPagination:
+    """Tests for keyset pagination cursors."""
+    
+    def test_cursor_roundtrip(self):
+        """Test cursors decode back to the sort key they encode."""
+        from datetime import timezone
+        from api.services.pagination import encode_cursor, decode_cursor
+        
+        last_at = datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc)
+        
+        assert decode_cursor(encode_cursor(last_at, 42), 2) == [last_at, 42]
+        assert decode_cursor(None, 2) is None
+    
+    def test_malformed_cursor_is_rejected(self):
+        """Test garbage cursors give a 400 instead of a server error."""
+        from fastapi import HTTPException
+        from api.services.pagination import encode_cursor, decode_cursor
+        
+        with pytest.raises(HTTPException):
+            decode_cursor("not-a-cursor", 2)
+        with pytest.raises(HTTPException):
+            decode_cursor(encode_cursor(1, 2, 3), 2)
+
+
+class TestListUsers:
+    """Tests for the admin user list (keyset pages and search)."""
+    
+    @pytest.fixture
+    def list_users(self, db_engine):
+        """Call list_users against the test database with an exact count."""
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+        from api.routers import users as users_router
+        
+        session_maker = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+        
+        async def exact_count(session, count_query, **kwargs):
+            return (await session.execute(count_query)).scalar(), False
+        
+        async def call(**params):
+            params = {
+                "page": 1, "page_size": 50, "cursor": None, "search": None,
+                "is_blocked": None, "has_custom_limits": None, "exact": True,
+                **params
+            }
+            with patch.object(users_router, "async_session_maker", session_maker), \
+                    patch.object(users_router.count_service, "count", exact_count):
+                return await users_router.list_users(current_admin=MagicMock(), **params)
+        
+        return call
+    
+    @pytest.mark.asyncio
+    async def test_cursor_pages_cover_every_user_once(self, db_session, list_users):
+        """Test following next_cursor walks all users in activity order, inactive last."""
+        from datetime import timedelta
+        from database.models import User
+        
+        now = datetime(2026, 3, 1, 12, 0)
+        db_session.add_all([
+            User(telegram_id=1000 + i, last_active_at=now - timedelta(hours=i // 2) if i < 5 else None)
+            for i in range(7)
+        ])
+        await db_session.commit()
+        
+        seen, cursor = [], None
+        while True:
+            response = await list_users(page_size=2, cursor=cursor)
+            seen += [u.telegram_id for u in response.users]
+            cursor = response.next_cursor
+            if cursor is None:
+                break
+        
+        assert sorted(seen) == list(range(1000, 1007))
+        assert len(seen) == len(set(seen))
+        assert set(seen[-2:]) == {1005, 1006}
+    
+    @pytest.mark.asyncio
+    async def test_numeric_search_lists_exact_telegram_id_first(self, db_session, list_users):
+        """Test an exact telegram_id comes first, followed by names containing the digits."""
+        from database.models import User
+        
+        db_session.add_all([
+            User(telegram_id=424242, first_name="Exact", last_active_at=datetime(2026, 1, 1)),
+            User(telegram_id=1, username="user424242", last_active_at=datetime(2026, 3, 1)),
+            User(telegram_id=2, username="other"),
+        ])
+        await db_session.commit()
+        
+        response = await list_users(search=" 424242 ")
+        
+        assert [u.telegram_id for u in response.users] == [424242, 1]
+        assert response.total == 2
+        assert response.next_cursor is None
+    
+    @pytest.mark.asyncio
+    async def test_exact_telegram_id_respects_filters(self, db_session, list_users):
+        """Test an exact hit that fails the other filters is not listed."""
+        from database.models import User
+        
+        db_session.add_all([
+            User(telegram_id=123456789, is_blocked=False),
+            User(telegram_id=5, username="bad123456789", is_blocked=True),
+        ])
+        await db_session.commit()
+        
+        response = await list_users(search="123456789", is_blocked=True)
+        
+        assert [u.telegram_id for u in response.users] == [5]
+    
+    @pytest.mark.asyncio
+    async def test_search_wildcards_match_literally(self, db_session, list_users):
+        """Test % and _ in a search are literal characters, not LIKE wildcards."""
+        from database.models import User
+        
+        db_session.add_all([
+            User(telegram_id=1, username="john_doe"),
+            User(telegram_id=2, username="johnXdoe"),
+            User(telegram_id=3, first_name="100%"),
+            User(telegram_id=4, first_name="1000"),
+        ])
+        await db_session.commit()
+        
+        underscore = await list_users(search="n_d")
+        percent = await list_users(search="0%")
+        
+        assert [u.telegram_id for u in underscore.users] == [1]
+        assert [u.telegram_id for u in percent.users] == [3]
+
+
+class TestCountService:
+    """Tests for admin list count strategy."""
+    
+    @pytest.mark.asyncio
+    async def test_unfiltered_large_table_uses_estimate(self):
+        """Test no COUNT(*) runs for an unfiltered list on a big table."""
+        from api.services.count_service import CountService
+        
+        service = CountService()
+        session = MagicMock()
+        session.execute = AsyncMock()
+        
+        with patch.object(service, "estimate_rows", AsyncMock(return_value=2_500_000)):
+            total, is_estimate = await service.count(
+                session, MagicMock(), table="users", filters={"search": None}
+            )
+        
+        assert (total, is_estimate) == (2_500_000, True)
+        session.execute.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_filtered_count_is_served_from_cache(self):
+        """Test a cached filtered count skips the database."""
+        from api.services.count_service import CountService
+        
+        service = CountService()
+        session = MagicMock()
+        session.execute = AsyncMock()
+        
+        with patch("api.services.count_service.redis_client") as redis_mock:
+            redis_mock.client.get = AsyncMock(return_value="17")
+            total, is_estimate = await service.count(
+                session, MagicMock(), table="users", filters={"is_blocked": True}
+            )
+        
+        assert (total, is_estimate) == (17, False)
+        session.execute.assert_not_awaited()
+
+
+class TestProviderRouter:
+    """Tests for AI provider routing, breakers and hedging."""
+    
+    @pytest.mark.asyncio
+    async def test_failing_provider_opens_breaker(self):
+        """Test failures fail over, then the broken provider is skipped."""
+        from bot.services.provider_router import ProviderRouter, OPEN
+        
+        router = ProviderRouter()
+        broken = AsyncMock(side_effect=ConnectionError("provider down"))
+        healthy = AsyncMock(return_value="ok")
+        
+        with patch("bot.services.provider_router.redis_client"):
+            for _ in range(5):
+                assert await router.call("text", {"cometapi": broken, "openai": healthy}) == "ok"
+            assert router.status()["cometapi"]["text"]["state"] == OPEN
+            
+            broken.reset_mock()
+            assert await router.call("text", {"cometapi": broken, "openai": healthy}) == "ok"
+        
+        broken.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_client_error_is_not_retried(self):
+        """Test a bad request is raised instead of sent to the next provider."""
+        from bot.services.provider_router import ProviderRouter
+        
+        error = Exception("content policy")
+        error.status_code = 400
+        router = ProviderRouter()
+        fallback = AsyncMock(return_value="ok")
+        
+        with pytest.raises(Exception, match="content policy"):
+            await router.call("image", {"cometapi": AsyncMock(side_effect=error), "openai": fallback})
+        
+        fallback.assert_not_awaited()
+        assert router.status()["cometapi"]["image"]["requests"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_slow_request_is_hedged(self):
+        """Test a request slower than the primary's p95 is raced on the backup."""
+        import asyncio
+        from config import settings
+        from bot.services.provider_router import ProviderRouter
+        
+        router = ProviderRouter()
+        
+        async def slow():
+            await asyncio.sleep(5)
+            return "primary"
+        
+        async def fast():
+            return "backup"
+        
+        with patch.object(settings, "router_hedge_enabled", True), \
+                patch.object(settings, "router_hedge_min_delay_ms", 10), \
+                patch("bot.services.provider_router.redis_client"):
+            for _ in range(settings.router_hedge_min_samples):
+                router.record("cometapi", "text", 20, True)
+            result = await asyncio.wait_for(
+                router.call("text", {"cometapi": slow, "openai": fast}, hedge=True), timeout=1
+            )
+        
+        assert result == "backup"
+
+
+class TestLLMResponseCache:
+    """Tests for the stateless prompt response cache."""
+    
+    def test_normalized_prompts_share_a_key(self):
+        """Test whitespace/case variants hit the same entry on folding routes only."""
+        from bot.services.llm_cache import LLMResponseCache
+        
+        cache = LLMResponseCache()
+        system = {"role": "system", "content": "Be brief."}
+        
+        def key(route, text):
+            return cache._split(route, [system, {"role": "user", "content": text}], "m", 256, 0.7)
+        
+        assert key("inline_text", "How to make  pancakes?") == key("inline_text", "how to make pancakes")
+        assert key("translate", "Apple") != key("translate", "apple")
+        assert key("unknown_route", "hi") is None
+    
+    def test_simhash_separates_near_and_unrelated_prompts(self):
+        """Test near-duplicates are close in Hamming distance, unrelated ones are not."""
+        from bot.services.llm_cache import simhash
+        
+        def distance(a, b):
+            return bin(simhash(a) ^ simhash(b)).count("1")
+        
+        base = "how do i make fluffy pancakes without eggs at home"
+        assert distance(base, base + " quickly") < distance(base, "what is the capital of australia today")
+        assert distance(base, base) == 0
+
+
+class TestInlineDebounce:
+    """Tests for inline query debouncing."""
+    
+    @pytest.mark.asyncio
+    async def test_newer_query_supersedes_older(self):
+        """Test only the last of several rapid inline queries is answered."""
+        import asyncio
+        from bot.handlers import inline
+        
+        latest = {}
+        client = MagicMock()
+        client.set = AsyncMock(side_effect=lambda key, value, ex=None: latest.__setitem__(key, value))
+        client.get = AsyncMock(side_effect=lambda key: latest.get(key))
+        
+        with patch.object(inline, "redis_client") as redis_mock, \
+                patch.object(inline.settings, "inline_debounce_ms", 50):
+            redis_mock.client = client
+            first = asyncio.create_task(inline._debounce(1, "q1"))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(inline._debounce(1, "q2"))
+            
+            assert await second is True
+            with pytest.raises(asyncio.CancelledError):
+                await first
+
+
+class TestUpdateStream:
+    """Tests for webhook update stream sharding."""
+    
+    def test_updates_of_one_chat_share_a_shard(self):
+        """Test messages, callbacks and inline queries are keyed by chat/user."""
+        from bot.services.update_stream import update_chat_id, update_stream
+        
+        message = {"update_id": 1, "message": {"message_id": 5, "chat": {"id": -100200}, "from": {"id": 7}}}
+        callback = {"update_id": 2, "callback_query": {"id": "x", "from": {"id": 7}, "message": {"chat": {"id": -100200}}}}
+        inline = {"update_id": 3, "inline_query": {"id": "q", "from": {"id": 7}, "query": "hi"}}
+        
+        assert update_chat_id(message) == -100200
+        assert update_chat_id(callback) == -100200
+        assert update_chat_id(inline) == 7
+        assert update_chat_id({"update_id": 4}) == 0
+        assert update_stream.shard_for(message) == update_stream.shard_for(callback)
+
+
+class TestLaneMiddleware:
+    """Tests for per-chat update lanes."""
+    
+    @pytest.mark.asyncio
+    async def test_chat_messages_run_in_order_and_overflow_is_shed(self):
+        """Test one chat's messages never overlap and the queue is bounded."""
+        import asyncio
+        from bot.middlewares.lanes import LaneMiddleware
+        from config import settings
+        
+        lanes = LaneMiddleware()
+        order = []
+        
+        async def handler(event, data):
+            order.append(("start", event.n))
+            await asyncio.sleep(0.01)
+            order.append(("end", event.n))
+        
+        def update(n):
+            event = MagicMock(event_type="message", n=n)
+            event.message.answer = AsyncMock()
+            return event
+        
+        chat = MagicMock(id=42)
+        with patch.object(settings, "lane_max_queue", 2):
+            await asyncio.gather(*(lanes(handler, update(n), {"event_chat": chat}) for n in range(4)))
+        
+        assert order == [("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+        assert lanes.stats()["shed"] == 1
+        assert lanes.stats()["lanes"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_published_stats_merge_across_processes(self):
+        """Test the admin view sums totals and ranks busiest lanes from every bot process."""
+        import json
+        from bot.middlewares import lanes as module
+        
+        def snapshot(waiting, busiest):
+            return json.dumps({
+                "updated_at": 1.0, "lanes": len(busiest), "waiting": waiting,
+                "running": 1, "processed": 10, "shed": 2, "busiest": busiest,
+            })
+        
+        def lane(chat_id, waiting):
+            return {"chat_id": chat_id, "waiting": waiting, "busy": True,
+                    "processed": 3, "shed": 1, "max_wait_ms": 5.0}
+        
+        stored = {
+            "lanes:stats:a:1": snapshot(3, [lane(1, 3)]),
+            "lanes:stats:b:2": snapshot(5, [lane(2, 4), lane(3, 1)]),
+        }
+        
+        async def scan_iter(match):
+            for key in stored:
+                yield key
+        
+        with patch.object(module, "redis_client") as redis_mock:
+            redis_mock.client.scan_iter = scan_iter
+            redis_mock.client.get = AsyncMock(side_effect=stored.get)
+            merged = await module.collect_lane_stats(top=2)
+        
+        assert (merged["lanes"], merged["waiting"], merged["shed"]) == (3, 8, 4)
+        assert [(l["chat_id"], l["instance"]) for l in merged["busiest"]] == [(2, "b:2"), (1, "a:1")]
+        assert set(merged["processes"]) == {"a:1", "b:2"}
+
+
+class TestGroupFilterMiddleware:
+    """Tests for the group chat pre-filter."""
+    
+    @pytest.mark.asyncio
+    async def test_only_addressed_group_messages_pass(self):
+        """Test chatter is dropped while mentions, replies and commands pass."""
+        from aiogram.types import Update
+        from bot.middlewares.group_filter import GroupFilterMiddleware
+        
+        middleware = GroupFilterMiddleware()
+        handler = AsyncMock(return_value="handled")
+        bot_info = MagicMock(id=777, username="my_bot")
+        
+        def update(text, chat_type="supergroup", reply_from=None):
+            message = {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": -100, "type": chat_type},
+                "from": {"id": 1, "is_bot": False, "first_name": "User"},
+                "text": text,
+            }
+            if reply_from is not None:
+                message["reply_to_message"] = {
+                    "message_id": 0,
+                    "date": 0,
+                    "chat": {"id": -100, "type": chat_type},
+                    "from": {"id": reply_from, "is_bot": True, "first_name": "Bot"},
+                    "text": "earlier answer",
+                }
+            return Update.model_validate({"update_id": 1, "message": message})
+        
+        data = {"bot_info": bot_info}
+        assert await middleware(handler, update("всем привет"), data) is None
+        assert await middleware(handler, update("/start@other_bot"), data) is None
+        assert await middleware(handler, update("@My_Bot что нового?"), data) == "handled"
+        assert await middleware(handler, update("спасибо!", reply_from=777), data) == "handled"
+        assert await middleware(handler, update("/limits"), data) == "handled"
+        assert await middleware(handler, update("всем привет", chat_type="private"), data) == "handled"
+        
+        assert middleware.dropped == 2
+        assert middleware.passed == 3
+
+
+
+class TestThrottlingMiddleware:
+    """Tests for GCRA throttling."""
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_is_one_script_call_over_all_tiers(self):
+        """Test tiers and the premium rate are sent in a single eval."""
+        from database.redis_client import RedisClient
+        
+        client = RedisClient()
+        client._client = MagicMock()
+        client._client.eval = AsyncMock(return_value=[1500, 1])
+        
+        retry_after, is_premium = await client.check_rate_limit(
+            [("throttle:user:1", 30, 60), ("throttle:chat:-100", 60, 60)],
+            plan_key="user:1:plan",
+            premium_limit=90
+        )
+        
+        assert (retry_after, is_premium) == (1.5, True)
+        client._client.eval.assert_awaited_once()
+        args = client._client.eval.await_args.args
+        assert args[1:5] == (3, "user:1:plan", "throttle:user:1", "throttle:chat:-100")
+        # Emission intervals and periods in ms: premium, user, chat
+        assert args[5:] == (666, 60000, 2000, 60000, 1000, 60000)
+    
+    @pytest.mark.asyncio
+    async def test_throttled_user_is_told_how_long_to_wait(self):
+        """Test the reply carries retry_after and the handler is skipped."""
+        from aiogram.types import Message
+        from bot.middlewares import throttling
+        
+        middleware = throttling.ThrottlingMiddleware()
+        handler = AsyncMock()
+        message = Message.model_validate({
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": -100, "type": "supergroup"},
+            "from": {"id": 1, "is_bot": False, "first_name": "User"},
+            "text": "ещё вопрос",
+        })
+        answer = AsyncMock()
+        
+        with patch.object(throttling, "redis_client") as redis_mock, \
+                patch.object(Message, "answer", answer):
+            redis_mock.check_rate_limit = AsyncMock(return_value=(12.2, False))
+            data = {}
+            assert await middleware(handler, message, data) is None
+        
+        tiers = redis_mock.check_rate_limit.await_args.args[0]
+        assert [key for key, _, _ in tiers][:2] == ["throttle:user:1", "throttle:chat:-100"]
+        answer.assert_awaited_once_with("⏳ Слишком много запросов. Подождите 13 сек.")
+        assert data["premium_plan"] is False
+        handler.assert_not_called()
+
+
+class TestMetrics:
+    """Tests for Prometheus metric helpers."""
+    
+    @pytest.mark.asyncio
+    async def test_roundtrips_are_counted_per_update(self):
+        """Test DB/Redis counts go to the update that made them."""
+        import asyncio
+        from bot.utils.metrics import count_roundtrip, start_update_counters
+        
+        async def update(db, redis):
+            counts = start_update_counters()
+            for _ in range(db):
+                count_roundtrip("db")
+            for _ in range(redis):
+                count_roundtrip("redis")
+            await asyncio.sleep(0)
+            return counts
+        
+        first, second = await asyncio.gather(update(2, 1), update(0, 3))
+        count_roundtrip("db")  # outside any update: ignored
+        
+        assert first == {"db": 2, "redis": 1}
+        assert second == {"db": 0, "redis": 3}
+    
+    @pytest.mark.asyncio
+    async def test_timed_job_records_outcome(self):
+        """Test job durations are labelled by function and status."""
+        from prometheus_client import REGISTRY
+        from bot.utils.metrics import timed_job
+        
+        @timed_job
+        async def sample_job(ctx):
+            raise ValueError("boom")
+        
+        with pytest.raises(ValueError):
+            await sample_job({})
+        
+        assert sample_job.__name__ == "sample_job"
+        assert REGISTRY.get_sample_value(
+            "worker_job_duration_seconds_count", {"function": "sample_job", "status": "error"}
+        ) == 1
+
+
+class TestLoopMonitor:
+    """Tests for the blocking-call detector."""
+    
+    def test_site_is_innermost_project_frame(self):
+        """Test a block inside a library is attributed to the project line calling it."""
+        import os
+        import traceback
+        from bot.services.loop_monitor import PROJECT_ROOT, blocking_site
+        
+        stack = [
+            traceback.FrameSummary("/usr/lib/python3.11/asyncio/events.py", 80, "_run"),
+            traceback.FrameSummary(os.path.join(PROJECT_ROOT, "bot/handlers/documents.py"), 120, "handle_document"),
+            traceback.FrameSummary(os.path.join(PROJECT_ROOT, "bot/services/document_service.py"), 45, "parse_pdf"),
+            traceback.FrameSummary("/usr/lib/python3.11/site-packages/fitz/__init__.py", 900, "get_text"),
+        ]
+        
+        site, frames = blocking_site(stack)
+        
+        assert site == "bot/services/document_service.py:45 in parse_pdf"
+        assert frames[-1].endswith("__init__.py:900 in get_text")
+        assert blocking_site([]) == ("unsampled", [])
+
+
+class TestTracing:
+    """Tests for trace propagation."""
+    
+    @pytest.mark.asyncio
+    async def test_job_continues_the_update_trace(self):
+        """Test a job enqueued with traceparent joins the enqueuing trace."""
+        from bot.utils import tracing
+        
+        seen = {}
+        
+        @tracing.traced_job
+        async def sample_job(ctx, task_id):
+            seen.update(tracing.current_span())
+            return task_id
+        
+        with patch.object(tracing.settings, "tracing_enabled", True), \
+                patch.object(tracing.settings, "tracing_sample_rate", 1.0):
+            with tracing.trace("update video.handle") as root:
+                traceparent = tracing.current_traceparent()
+            
+            assert await sample_job({"job_id": "1"}, task_id=7, traceparent=traceparent) == 7
+        
+        assert seen["trace_id"] == root["trace_id"]
+        assert seen["parent_id"] == root["span_id"]
+        assert tracing.current_span() is None
+        assert tracing.parse_traceparent("garbage") is None
@@ -22,6 +22,15 @@ from bot.utils.validators import (
     validate_file_extension,
     validate_file_size
 )
+from bot.utils.triggers import (
+    RuleMatcher,
+    PrefixStripper,
+    TEXT_INTENTS,
+    VOICE_INTENTS,
+    needs_web_search,
+    is_bot_triggered,
+    get_intent_and_prompt
+)
 
 
 class TestHelpers:
@@ -270,3 +279,64 @@ class TestValidators:
         is_valid, error = validate_file_size(25 * 1024 * 1024, max_size_mb=20)
         assert is_valid is False
         assert "20 MB" in error
+
+
+class TestTriggers:
+    """Tests for precompiled intent and trigger matching."""
+    
+    def test_rule_matcher_keeps_rule_order(self):
+        """Test that an earlier rule wins even if a later one matches first in the text."""
+        matcher = RuleMatcher([
+            ("late", ["zzz"], ()),
+            ("early", ["aaa"], ()),
+        ])
+        
+        assert matcher.match("aaa then zzz")[0] == "late"
+        assert matcher.match("only aaa")[0] == "early"
+        assert matcher.match("nothing") is None
+    
+    def test_prefix_stripper(self):
+        """Test stripping leading trigger phrases."""
+        stripper = PrefixStripper(["нарисуй мне", "нарисуй"])
+        
+        assert stripper.strip("Нарисуй мне кота") == "кота"
+        assert stripper.strip("  кота нарисуй ") == "кота нарисуй"
+    
+    def test_text_intents_priority(self):
+        """Test that commands and video beat image generation."""
+        assert TEXT_INTENTS.match("Новый диалог, нарисуй кота")["command"] == "new_dialog"
+        
+        video = TEXT_INTENTS.match("Сгенерируй видео с закатом над морем")
+        assert video["type"] == "VIDEO"
+        assert video["prompt"] == "с закатом над морем"
+        
+        image = TEXT_INTENTS.match("draw me a red fox")
+        assert image["type"] == "IMAGE"
+        assert image["prompt"] == "red fox"
+        
+        assert TEXT_INTENTS.match("Как работает фотосинтез?") is None
+    
+    def test_voice_intents_vocabulary(self):
+        """Test the wider voice command vocabulary."""
+        assert VOICE_INTENTS.match("открой настройки")["command"] == "settings"
+        assert TEXT_INTENTS.match("настройки") is None
+    
+    def test_needs_web_search(self):
+        """Test web search detection."""
+        assert needs_web_search("Какая погода в Москве?") is True
+        assert needs_web_search("Кто такой Эйнштейн?") is True
+        assert needs_web_search("Кто ты такой?") is False
+        assert needs_web_search("Привет!") is False
+    
+    def test_is_bot_triggered(self):
+        """Test group chat addressing."""
+        assert is_bot_triggered("@MyBot привет", "mybot") is True
+        assert is_bot_triggered("Бот, как дела?", "mybot") is True
+        assert is_bot_triggered("ну что, гпт", "mybot") is True
+        assert is_bot_triggered("всем привет", "mybot") is False
+    
+    def test_get_intent_and_prompt_keeps_words(self):
+        """Test that trigger words are removed only as whole words."""
+        assert get_intent_and_prompt("@mybot explain recursion", "mybot") == ("text", "explain recursion")
+        assert get_intent_and_prompt("Бот, нарисуй кота", "mybot") == ("image", "кота")
+        assert get_intent_and_prompt("", "mybot", has_photo=True) == ("analyze", "")
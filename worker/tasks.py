@@ -7,14 +7,21 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 from arq import create_pool, cron
 from arq.connections import RedisSettings, ArqRedis
+from arq.constants import default_queue_name
 from sqlalchemy import select, update, and_
 
-from database import async_session_maker
+from database import async_session_maker, engine
 from database.models import VideoTask, VideoTaskStatus, RequestType, RequestStatus, Reminder, ReminderType, User
 from database.redis_client import redis_client
 from bot.services.ai_service import ai_service
 from bot.services.limit_service import limit_service
 from bot.services.user_service import user_service
+from bot.services.telemetry_service import telemetry_sink
+from bot.services.rollup_service import rollup_service
+from bot.services.loop_monitor import loop_monitor
+from bot.utils.metrics import instrument_engine, metrics_exporter, timed_job
+from bot.utils.tracing import current_traceparent, span, trace_engine, traced_job, tracer
+from database.partitions import ensure_partitions, apply_retention
 from config import settings
 import structlog
 
@@ -40,6 +47,17 @@ async def get_arq_pool() -> ArqRedis:
     return await create_pool(get_redis_settings())
 
 
+def create_telegram_bot():
+    """Bot client for job results, with Bot API metrics and trace spans."""
+    from aiogram import Bot
+    from bot.bot import create_session
+    from bot.middlewares.request_metrics import RequestMetricsMiddleware
+    
+    bot = Bot(token=settings.telegram_bot_token, session=create_session())
+    bot.session.middleware(RequestMetricsMiddleware())
+    return bot
+
+
 async def queue_video_task(
     user_id: int,
     chat_id: int,
@@ -79,7 +97,8 @@ async def queue_video_task(
     pool = await get_arq_pool()
     await pool.enqueue_job(
         'process_video_generation',
-        task_id=task_id
+        task_id=task_id,
+        traceparent=current_traceparent()
     )
     await pool.close()
     
@@ -128,7 +147,8 @@ async def queue_video_remix_task(
         'process_video_remix',
         task_id=task_id,
         original_video_id=original_video_id,
-        change_prompt=change_prompt
+        change_prompt=change_prompt,
+        traceparent=current_traceparent()
     )
     await pool.close()
     
@@ -146,6 +166,8 @@ async def queue_video_remix_task(
 # ARQ Worker Functions
 # ============================================
 
+@timed_job
+@traced_job
 async def process_video_generation(ctx, task_id: int):
     """
     Process video generation task.
@@ -192,8 +214,7 @@ async def process_video_generation(ctx, task_id: int):
         if task.reference_image_file_id:
             is_animate = True
             try:
-                from aiogram import Bot as DlBot
-                dl_bot = DlBot(token=settings.telegram_bot_token)
+                dl_bot = create_telegram_bot()
                 file = await dl_bot.get_file(task.reference_image_file_id)
                 file_bytes_io = await dl_bot.download_file(file.file_path)
                 import io
@@ -238,20 +259,21 @@ async def process_video_generation(ctx, task_id: int):
             # Optionally update user message with progress
             # (would need to store message_id)
         
-        final_status = await ai_service.wait_for_video(
-            video_id=video_id,
-            poll_interval=settings.video_poll_interval,
-            progress_callback=progress_callback
-        )
+        with span("video.wait", video_id=video_id):
+            final_status = await ai_service.wait_for_video(
+                video_id=video_id,
+                poll_interval=settings.video_poll_interval,
+                progress_callback=progress_callback
+            )
         
         # Download video
-        video_bytes = await ai_service.download_video(video_id)
+        with span("video.download", video_id=video_id):
+            video_bytes = await ai_service.download_video(video_id)
         
         # Send to user via Telegram
-        from aiogram import Bot
         from aiogram.types import BufferedInputFile
         
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = create_telegram_bot()
         
         video_file = BufferedInputFile(
             video_bytes,
@@ -341,9 +363,7 @@ async def process_video_generation(ctx, task_id: int):
             await session.commit()
         
         # Notify user of failure
-        from aiogram import Bot
-        
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = create_telegram_bot()
         
         is_animate = bool(task.reference_image_file_id) if task else False
         
@@ -382,6 +402,8 @@ async def process_video_generation(ctx, task_id: int):
         )
 
 
+@timed_job
+@traced_job
 async def process_video_remix(
     ctx,
     task_id: int,
@@ -458,11 +480,10 @@ async def process_video_remix(
         # Download and send
         video_bytes = await ai_service.download_video(new_video_id)
         
-        from aiogram import Bot
         from aiogram.types import BufferedInputFile
         from bot.keyboards.inline import get_video_actions_keyboard
         
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = create_telegram_bot()
         
         video_file = BufferedInputFile(
             video_bytes,
@@ -543,9 +564,8 @@ async def process_video_remix(
             )
             await session.commit()
         
-        from aiogram import Bot
         
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = create_telegram_bot()
         
         if language == "ru":
             await bot.send_message(
@@ -609,7 +629,8 @@ async def queue_long_video_task(
         prompt=prompt,
         model=model,
         num_clips=num_clips,
-        clip_duration=clip_duration
+        clip_duration=clip_duration,
+        traceparent=current_traceparent()
     )
     await pool.close()
     
@@ -625,6 +646,8 @@ async def queue_long_video_task(
     return task_id
 
 
+@timed_job
+@traced_job
 async def process_long_video(
     ctx,
     task_id: int,
@@ -658,10 +681,9 @@ async def process_long_video(
         telegram_id = user.telegram_id
         language = await user_service.get_user_language(telegram_id)
     
-    from aiogram import Bot
     from aiogram.types import BufferedInputFile
     
-    bot = Bot(token=settings.telegram_bot_token)
+    bot = create_telegram_bot()
     
     try:
         # Update status to in_progress
@@ -1025,6 +1047,7 @@ async def process_long_video(
 # Reminder/Alarm Scheduler
 # ============================================
 
+@timed_job
 async def check_reminders(ctx):
     """
     Check for due reminders and alarms and send notifications.
@@ -1055,8 +1078,7 @@ async def check_reminders(ctx):
         
         logger.info(f"Found {len(reminders)} due reminders")
         
-        from aiogram import Bot
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = create_telegram_bot()
         
         for reminder, user in reminders:
             try:
@@ -1156,6 +1178,41 @@ async def check_reminders(ctx):
         await bot.session.close()
 
 
+# ============================================
+# Usage Rollups
+# ============================================
+
+@timed_job
+async def rollup_usage(ctx):
+    """
+    Fold new requests/API usage rows into the dashboard rollup tables.
+    This runs every minute via cron.
+    """
+    try:
+        await rollup_service.run_incremental()
+    except Exception as e:
+        logger.error("Usage rollup failed", error=str(e))
+
+
+# ============================================
+# Log Partition Maintenance
+# ============================================
+
+@timed_job
+async def maintain_partitions(ctx):
+    """
+    Create upcoming monthly partitions and apply the retention policy.
+    This runs daily via cron (and once on worker startup).
+    """
+    try:
+        await ensure_partitions()
+        dropped = await apply_retention()
+        if dropped:
+            logger.info("Old log partitions archived", partitions=[name for name, _ in dropped])
+    except Exception as e:
+        logger.error("Partition maintenance failed", error=str(e))
+
+
 # Worker class for arq
 class WorkerSettings:
     """arq worker settings."""
@@ -1164,12 +1221,17 @@ class WorkerSettings:
         process_video_generation,
         process_video_remix,
         process_long_video,
-        check_reminders
+        check_reminders,
+        rollup_usage,
+        maintain_partitions
     ]
     
-    # Cron jobs - check reminders every minute
+    # Cron jobs - check reminders and update usage rollups every minute,
+    # maintain log partitions daily
     cron_jobs = [
-        cron(check_reminders, minute={0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59})
+        cron(check_reminders, minute={0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59}),
+        cron(rollup_usage, minute={0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59}),
+        cron(maintain_partitions, hour={3}, minute={15}, run_at_startup=True)
     ]
     
     redis_settings = get_redis_settings()
@@ -1182,9 +1244,20 @@ class WorkerSettings:
         """Worker startup hook."""
         logger.info("Worker started with reminder scheduler")
         await redis_client.connect()
+        telemetry_sink.start()
+        instrument_engine(engine)
+        trace_engine(engine)
+        tracer.start("worker")
+        metrics_exporter.start(settings.worker_metrics_port)
+        metrics_exporter.watch_queue(ctx["redis"], default_queue_name)
+        loop_monitor.start("worker")
     
     @staticmethod
     async def on_shutdown(ctx):
         """Worker shutdown hook."""
         logger.info("Worker shutting down")
+        await telemetry_sink.stop()
+        await metrics_exporter.stop()
+        await loop_monitor.stop()
+        await tracer.stop()
         await redis_client.close()